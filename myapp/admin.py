@@ -2,32 +2,42 @@ from django.contrib import admin
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin, GroupAdmin as BaseGroupAdmin
 from .models import (Contenido, Categoria, Episodio, ContenidoCategoria, Perfil, 
-                     HistorialReproduccion, Favorito, Calificacion, AuditLog)
+                     HistorialReproduccion, Favorito, Calificacion, AuditLog, EstadisticasContenido, AliasContenido)
 from django.utils.html import format_html
 from django.urls import reverse, path
 from django.utils.safestring import mark_safe
 from django.shortcuts import render
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Q, F
 import json
 
 class ContenidoCategoriaInline(admin.TabularInline):
     model = ContenidoCategoria
     extra = 1
 
+class AliasContenidoInline(admin.TabularInline):
+    model = AliasContenido
+    extra = 0
+    fields = ('texto', 'tipo')
+
 class EpisodioInline(admin.TabularInline):
     model = Episodio
     extra = 1
     fields = ('temporada', 'numero_episodio', 'titulo', 'duracion', 'video_url', 'video_file', 'descripcion')
 
 class ContenidoAdmin(admin.ModelAdmin):
-    inlines = [ContenidoCategoriaInline, EpisodioInline]
+    inlines = [ContenidoCategoriaInline, AliasContenidoInline, EpisodioInline]
     list_display = ('titulo', 'tipo', 'año', 'imagen_preview', 'total_episodios', 'popularidad_score', 'tiene_video')
     search_fields = ('titulo', 'descripcion')
     list_filter = ('tipo', 'categorias', 'año', 'idioma')
     list_per_page = 25
+    list_select_related = ('estadisticas',)
     readonly_fields = ('imagen_preview_large', 'fecha_importacion', 'estadisticas_content')
     
+    def get_queryset(self, request):
+        # El formulario de edición también muestra los contadores (estadisticas_content)
+        return super().get_queryset(request).select_related('estadisticas')
+    
     fieldsets = (
         ('Información Básica', {
             'fields': ('titulo', 'tipo', 'año', 'idioma', 'descripcion')
@@ -76,15 +86,18 @@ class ContenidoAdmin(admin.ModelAdmin):
     total_episodios.short_description = "Episodios"
     
     def popularidad_score(self, obj):
-        score = getattr(obj, 'anilist_popularity', 0) or 0
-        if score > 50000:
+        # Puntuación con decaimiento temporal calculada por "calcular_popularidad"
+        estadisticas = getattr(obj, 'estadisticas', None)
+        score = round((estadisticas.puntuacion_popularidad if estadisticas else 0) * 100, 1)
+        if score > 50:
             color = "green"
-        elif score > 10000:
+        elif score > 20:
             color = "orange"
         else:
             color = "gray"
         return format_html('<span style="color: {}; font-weight: bold;">{}</span>', color, score)
     popularidad_score.short_description = "Popularidad"
+    popularidad_score.admin_order_field = 'estadisticas__puntuacion_popularidad'
     
     def tiene_video(self, obj):
         has_video = obj.video_url or obj.episodio_set.filter(
@@ -98,10 +111,12 @@ class ContenidoAdmin(admin.ModelAdmin):
     
     def estadisticas_content(self, obj):
         try:
-            reproducciones = obj.historialreproduccion_set.count()
-            calificaciones = obj.calificacion_set.count()
-            favoritos = obj.favorito_set.count()
-            rating = obj.calificacion_set.aggregate(promedio=Avg('calificacion'))['promedio']
+            # Contadores desnormalizados (la señal post_save de Contenido crea la fila)
+            estadisticas = obj.estadisticas
+            reproducciones = estadisticas.total_reproducciones
+            calificaciones = estadisticas.total_calificaciones
+            favoritos = estadisticas.total_favoritos
+            rating = estadisticas.rating_promedio
             
             return format_html(
                 '''
@@ -110,15 +125,17 @@ class ContenidoAdmin(admin.ModelAdmin):
                     🔥 Reproducciones: <strong style="color: #007cba;">{}</strong><br>
                     ⭐ Calificaciones: <strong style="color: #007cba;">{}</strong><br>
                     ❤️ Favoritos: <strong style="color: #007cba;">{}</strong><br>
-                    📈 Rating promedio: <strong style="color: #007cba;">{}</strong>
+                    📈 Rating promedio: <strong style="color: #007cba;">{}</strong><br>
+                    🏆 Popularidad: <strong style="color: #007cba;">{}</strong>
                 </div>
                 ''',
                 reproducciones,
                 calificaciones, 
                 favoritos,
-                f"{rating:.1f}" if rating else "Sin calificar"
+                f"{rating:.1f}" if rating else "Sin calificar",
+                f"{estadisticas.puntuacion_popularidad * 100:.1f}"
             )
-        except:
+        except EstadisticasContenido.DoesNotExist:
             return "Estadísticas no disponibles"
     estadisticas_content.short_description = "Estadísticas de uso"
     
@@ -382,27 +399,27 @@ def estadisticas_recomendaciones(request):
     
     # Contenido más popular (por reproducciones)
     contenido_mas_visto = Contenido.objects.annotate(
-        total_reproducciones=Count('historialreproduccion'),
-        rating_promedio=Avg('calificacion__calificacion'),
-        total_calificaciones=Count('calificacion')
+        total_reproducciones=F('estadisticas__total_reproducciones'),
+        rating_promedio=F('estadisticas__rating_promedio'),
+        total_calificaciones=F('estadisticas__total_calificaciones')
     ).filter(
         total_reproducciones__gt=0
     ).order_by('-total_reproducciones')[:10]
     
     # Contenido mejor valorado
     contenido_mejor_valorado = Contenido.objects.annotate(
-        rating_promedio=Avg('calificacion__calificacion'),
-        total_calificaciones=Count('calificacion'),
-        total_likes=Count('calificacion', filter=Q(calificacion__calificacion__gte=4))
+        rating_promedio=F('estadisticas__rating_promedio'),
+        total_calificaciones=F('estadisticas__total_calificaciones'),
+        total_likes=F('estadisticas__total_likes')
     ).filter(
         total_calificaciones__gte=3
     ).order_by('-rating_promedio', '-total_calificaciones')[:10]
     
-    # Contenido con más me gusta
+    # Contenido con más me gusta (likes = 5 estrellas, dislikes = 1, como en contadores.py)
     contenido_mas_gustado = Contenido.objects.annotate(
-        total_likes=Count('calificacion', filter=Q(calificacion__calificacion__gte=4)),
-        total_dislikes=Count('calificacion', filter=Q(calificacion__calificacion__lte=2)),
-        rating_promedio=Avg('calificacion__calificacion')
+        total_likes=F('estadisticas__total_likes'),
+        total_dislikes=F('estadisticas__total_dislikes'),
+        rating_promedio=F('estadisticas__rating_promedio')
     ).filter(
         total_likes__gt=0
     ).order_by('-total_likes', '-rating_promedio')[:10]
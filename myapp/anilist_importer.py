@@ -7,12 +7,16 @@ from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from .models import Contenido, Categoria, ContenidoCategoria
 from .anilist_api import anilist_api
+from .embeddings import agregar_contenidos
+from .trigramas import guardar_alias
 import logging
 from urllib.parse import urlparse
 import uuid
 
 logger = logging.getLogger(__name__)
 
+MAX_SINONIMOS = 10  # Sinónimos de AniList guardados como alias de cada título
+
 class AniListImporter:
     """Importador de contenido desde AniList"""
     
@@ -154,6 +158,13 @@ class AniListImporter:
         
         return self._limpiar_descripcion(descripcion)
     
+    def _indexar_embeddings(self, contenidos: List[Contenido]):
+        """Agregar los títulos importados al índice de "más como este" (los ya indexados se omiten)"""
+        try:
+            agregar_contenidos(contenido.id for contenido in contenidos)
+        except Exception as e:
+            logger.error(f"Error al indexar los embeddings de lo importado: {e}")
+    
     def importar_anime_desde_anilist(self, anime_data: Dict) -> Optional[Contenido]:
         """Importar un anime específico desde datos de AniList"""
         try:
@@ -237,6 +248,10 @@ class AniListImporter:
                             categoria=categoria
                         )
             
+            # Títulos alternativos para la búsqueda y el autocompletado
+            guardar_alias(contenido, [(tipo, titles.get(tipo)) for tipo in ('romaji', 'english', 'native')] +
+                          [('sinonimo', synonym) for synonym in synonyms[:MAX_SINONIMOS]])
+            
             logger.info(f"Anime importado exitosamente: {titulo}")
             return contenido
             
@@ -263,6 +278,7 @@ class AniListImporter:
                     contenidos_importados.append(contenido)
             
             logger.info(f"Importados {len(contenidos_importados)} animes de AniList")
+            self._indexar_embeddings(contenidos_importados)
             return contenidos_importados
             
         except Exception as e:
@@ -284,6 +300,7 @@ class AniListImporter:
                     contenidos_importados.append(contenido)
             
             logger.info(f"Importados {len(contenidos_importados)} animes populares")
+            self._indexar_embeddings(contenidos_importados)
             return contenidos_importados
             
         except Exception as e:
@@ -324,6 +341,7 @@ class AniListImporter:
                     contenidos_importados.append(contenido)
             
             logger.info(f"Importados {len(contenidos_importados)} animes de temporada")
+            self._indexar_embeddings(contenidos_importados)
             return contenidos_importados
             
         except Exception as e:
@@ -349,6 +367,7 @@ class AniListImporter:
                     contenidos_importados.append(contenido)
             
             logger.info(f"Importados {len(contenidos_importados)} animes con énfasis en español")
+            self._indexar_embeddings(contenidos_importados)
             return contenidos_importados
             
         except Exception as e:
@@ -0,0 +1,232 @@
+"""
+Autocompletado en memoria de títulos, alias y categorías
+
+Cada proceso carga un ``IndiceAutocompletado`` con una entrada por título,
+alias de AniList (romaji, inglés, nativo y sinónimos) y categoría. Las
+entradas se ordenan por peso (popularidad interna y de AniList, número de
+contenidos de la categoría y frecuencia con que los usuarios buscaron algo
+que empieza igual en ``HistorialBusqueda``), así que el rango de una entrada
+es también su prioridad.
+
+Las claves son el texto normalizado (ver ``trigramas.normalizar``) desde el
+inicio de cada palabra, en una lista ordenada: "shingeki no kyojin" se
+encuentra escribiendo "kyo". Una consulta busca su rango de claves con
+``bisect`` y toma las entradas de menor rango; los prefijos que abarcan más
+de ``MAX_CLAVES_RECORRIDAS`` claves ("a", "ki"...) tienen sus sugerencias
+calculadas al construir el índice, así que ninguna consulta recorre más de
+ese número de claves.
+
+El índice se reconstruye cuando cambia la versión ``catalogo`` y cada
+``AUTOCOMPLETADO_REFRESCO_SEGUNDOS`` (para recoger las búsquedas nuevas).
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import AliasContenido, Categoria, Contenido, EstadisticasContenido, HistorialBusqueda
+from .trigramas import normalizar
+
+logger = logging.getLogger(__name__)
+
+CONTENIDO = 'contenido'
+CATEGORIA = 'categoria'
+
+MAX_CLAVES_RECORRIDAS = 256  # Prefijos con más claves tienen las sugerencias calculadas de antemano
+LONGITUD_CLAVE = 40  # Caracteres guardados por clave (y considerados de la consulta)
+PALABRAS_POR_TEXTO = 8  # Inicios de palabra indexados por texto
+MAX_SUGERENCIAS = 10
+PENALIZACION_ALIAS = 0.01  # A igual contenido, se muestra el título antes que un alias
+TERMINOS_BUSCADOS = 1000
+DIAS_BUSQUEDAS = 30
+LONGITUD_MINIMA_TERMINO = 3
+ENTRADAS_POR_TERMINO = 1000  # Entradas que puede reforzar un término buscado
+
+# (normalizado, texto, tipo, id del contenido o de la categoría, título del contenido, peso)
+Entrada = Tuple[str, str, str, int, str, float]
+
+
+def _peso_busquedas() -> float:
+    return getattr(settings, 'AUTOCOMPLETADO_PESO_BUSQUEDAS', 1.0)
+
+
+def _intervalo_refresco() -> float:
+    return getattr(settings, 'AUTOCOMPLETADO_REFRESCO_SEGUNDOS', 300)
+
+
+def _intervalo_verificacion() -> float:
+    return getattr(settings, 'CATALOGO_VERIFICACION_SEGUNDOS', 5)
+
+
+def _inicios_de_palabra(normalizado: str) -> List[str]:
+    claves = [normalizado]
+    posicion = normalizado.find(' ')
+    while posicion != -1 and len(claves) < PALABRAS_POR_TEXTO:
+        claves.append(normalizado[posicion + 1:])
+        posicion = normalizado.find(' ', posicion + 1)
+    return [clave[:LONGITUD_CLAVE] for clave in claves]
+
+
+class IndiceAutocompletado:
+    """Entradas ordenadas por peso y claves ordenadas alfabéticamente que apuntan a ellas"""
+
+    def __init__(self, version: int, entradas: List[Entrada], busquedas: Dict[str, int] = None):
+        self.version = version
+        self.construido = time.monotonic()
+
+        # Claves provisionales con la posición original para aplicar el peso de las búsquedas
+        claves = sorted((clave, i) for i, entrada in enumerate(entradas) for clave in _inicios_de_palabra(entrada[0]))
+        textos_clave = [clave for clave, _ in claves]
+        pesos = [entrada[5] for entrada in entradas]
+        for termino, total in (busquedas or {}).items():
+            if len(termino) < LONGITUD_MINIMA_TERMINO:
+                continue
+            inicio = bisect_left(textos_clave, termino)
+            fin = bisect_left(textos_clave, termino + '\uffff', inicio)
+            for i in {claves[k][1] for k in range(inicio, min(fin, inicio + ENTRADAS_POR_TERMINO))}:
+                pesos[i] += _peso_busquedas() * math.log1p(total)
+
+        orden = sorted(range(len(entradas)), key=lambda i: (-pesos[i], entradas[i][0]))
+        rango_de = array('I', bytes(4 * len(entradas)))
+        for rango, i in enumerate(orden):
+            rango_de[i] = rango
+        self.textos = [entradas[i][1] for i in orden]
+        self.tipos = [entradas[i][2] for i in orden]
+        self.destinos = array('q', (entradas[i][3] for i in orden))
+        self.titulos = [entradas[i][4] for i in orden]
+        self.claves = textos_clave
+        self.rangos = array('I', (rango_de[i] for _, i in claves))
+
+        # Prefijos con demasiadas claves para recorrerlas en cada consulta: sugerencias precalculadas
+        self.precalculadas: Dict[str, Tuple[int, ...]] = {}
+        grandes = [(0, len(textos_clave))]
+        longitud = 0
+        while grandes and longitud < LONGITUD_CLAVE:
+            longitud += 1
+            siguientes = []
+            for inicio, fin in grandes:
+                posicion = inicio
+                while posicion < fin:
+                    prefijo = textos_clave[posicion][:longitud]
+                    if len(prefijo) < longitud:
+                        # Clave completa más corta que el prefijo: saltar sus repeticiones
+                        posicion = bisect_right(textos_clave, prefijo, posicion, fin)
+                        continue
+                    final = bisect_left(textos_clave, prefijo + '\uffff', posicion, fin)
+                    if final - posicion > MAX_CLAVES_RECORRIDAS:
+                        self.precalculadas[prefijo] = tuple(self._mejores(posicion, final, MAX_SUGERENCIAS))
+                        siguientes.append((posicion, final))
+                    posicion = final
+            grandes = siguientes
+
+    def __len__(self):
+        return len(self.textos)
+
+    def _destino(self, rango: int) -> Tuple[str, int]:
+        return self.tipos[rango], self.destinos[rango]
+
+    def _mejores(self, inicio: int, fin: int, limite: int) -> List[int]:
+        """Rangos más bajos entre las claves ``inicio:fin``, sin repetir contenido o categoría"""
+        # Un contenido puede aparecer por varias claves (título y alias): pedir de más y quitar repetidos
+        candidatos = heapq.nsmallest(limite * 4, self.rangos[inicio:fin])
+        if len(candidatos) < fin - inicio and len(set(map(self._destino, candidatos))) < limite:
+            candidatos = sorted(set(self.rangos[inicio:fin]))
+        resultado, vistos = [], set()
+        for rango in candidatos:
+            destino = self._destino(rango)
+            if destino not in vistos:
+                vistos.add(destino)
+                resultado.append(rango)
+                if len(resultado) == limite:
+                    break
+        return resultado
+
+    def rangos_para(self, consulta: str, limite: int = MAX_SUGERENCIAS) -> List[int]:
+        """Rangos de las mejores entradas cuyo texto tiene una palabra que empieza por la consulta"""
+        prefijo = normalizar(consulta)[:LONGITUD_CLAVE]
+        if not prefijo:
+            return []
+        if prefijo in self.precalculadas and limite <= MAX_SUGERENCIAS:
+            return list(self.precalculadas[prefijo][:limite])
+        inicio = bisect_left(self.claves, prefijo)
+        fin = bisect_left(self.claves, prefijo + '\uffff', inicio)
+        return self._mejores(inicio, fin, limite)
+
+    def sugerir(self, consulta: str, limite: int = MAX_SUGERENCIAS) -> List[Dict]:
+        return [{
+            'texto': self.textos[rango],
+            'tipo': self.tipos[rango],
+            'id': self.destinos[rango],
+            'titulo': self.titulos[rango],
+        } for rango in self.rangos_para(consulta, limite)]
+
+    @classmethod
+    def construir(cls, version: int = 0) -> 'IndiceAutocompletado':
+        popularidad = dict(EstadisticasContenido.objects.values_list('contenido_id', 'puntuacion_popularidad'))
+        entradas: List[Entrada] = []
+        titulos = {}
+        for contenido_id, titulo, normalizado, anilist in Contenido.objects.values_list(
+                'id', 'titulo', 'titulo_normalizado', 'anilist_popularity').iterator(chunk_size=2000):
+            peso = math.log1p(popularidad.get(contenido_id) or 0) + math.log1p(anilist or 0)
+            titulos[contenido_id] = (titulo, peso)
+            entradas.append((normalizado or normalizar(titulo), titulo, CONTENIDO, contenido_id, titulo, peso))
+        for contenido_id, texto, normalizado in AliasContenido.objects.values_list(
+                'contenido_id', 'texto', 'texto_normalizado').iterator(chunk_size=2000):
+            titulo, peso = titulos.get(contenido_id, (texto, 0.0))
+            entradas.append((normalizado or normalizar(texto), texto, CONTENIDO, contenido_id, titulo,
+                             peso - PENALIZACION_ALIAS))
+        for categoria_id, nombre, normalizado, total in Categoria.objects.annotate(
+                total=Count('contenidocategoria')).values_list('id', 'nombre', 'nombre_normalizado', 'total'):
+            entradas.append((normalizado or normalizar(nombre), nombre, CATEGORIA, categoria_id, nombre,
+                             math.log1p(total)))
+        entradas = [entrada for entrada in entradas if entrada[0]]
+
+        busquedas = defaultdict(int)
+        for termino in HistorialBusqueda.obtener_mas_buscados(limite=TERMINOS_BUSCADOS, dias=DIAS_BUSQUEDAS):
+            busquedas[normalizar(termino['termino_normalizado'])] += termino['total_busquedas']
+        return cls(version, entradas, busquedas)
+
+
+_indice: Optional[IndiceAutocompletado] = None
+_ultima_verificacion = 0.0
+_bloqueo = threading.Lock()
+
+
+def invalidar():
+    """Descartar el índice tras una escritura en este proceso (se reconstruye en el próximo acceso)"""
+    global _indice
+    _indice = None
+
+
+def obtener_indice() -> IndiceAutocompletado:
+    """Índice del proceso, reconstruido si cambió el catálogo o pasó el intervalo de refresco"""
+    global _indice, _ultima_verificacion
+    from .versiones import CATALOGO, obtener_versiones
+
+    indice = _indice
+    if indice is not None and time.monotonic() - _ultima_verificacion < _intervalo_verificacion():
+        return indice
+
+    with _bloqueo:
+        version = obtener_versiones([CATALOGO]).get(CATALOGO, (0, None))[0]
+        _ultima_verificacion = time.monotonic()
+        if _indice is None or _indice.version != version or \
+                time.monotonic() - _indice.construido > _intervalo_refresco():
+            inicio = time.perf_counter()
+            _indice = IndiceAutocompletado.construir(version)
+            logger.info(f"Índice de autocompletado construido: {len(_indice)} entradas, "
+                        f"{len(_indice.claves)} claves ({time.perf_counter() - inicio:.2f}s)")
+        return _indice
+
+
+def sugerir(consulta: str, limite: int = MAX_SUGERENCIAS) -> List[Dict]:
+    """Sugerencias para lo que el usuario lleva escrito, de la más a la menos relevante"""
+    return obtener_indice().sugerir(consulta, limite)
@@ -0,0 +1,127 @@
+"""
+Índice de bitmaps del catálogo en memoria
+
+Cada contenido recibe un ordinal denso (su posición ordenado por id) y cada
+categoría, tipo y año guarda un bitset (un ``int`` de Python) con los
+ordinales de sus contenidos. Un filtro como "Acción Y Romance Y serie Y
+2020+" se resuelve con ANDs bit a bit, sin JOIN con ContenidoCategoria.
+
+El índice forma parte del catálogo compacto (ver catalogo_compacto.py), que
+lo construye una vez por proceso y lo reconstruye cuando cambia la versión
+``catalogo``.
+"""
+import random
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+
+def _bitset(ordinales: Iterable[int], tamano: int) -> int:
+    """Construir un bitset a partir de ordinales (vía bytearray, O(n))"""
+    datos = bytearray((tamano + 7) // 8)
+    for ordinal in ordinales:
+        datos[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(datos, 'little')
+
+
+def ordinales(bits: int) -> List[int]:
+    """Posiciones de los bits activos en orden ascendente"""
+    binario = bin(bits)[:1:-1]  # bit 0 primero, sin el prefijo '0b'
+    resultado = []
+    posicion = binario.find('1')
+    while posicion != -1:
+        resultado.append(posicion)
+        posicion = binario.find('1', posicion + 1)
+    return resultado
+
+
+class IndiceBitmaps:
+    def __init__(self, version: int, ids: List[int], tipos: Dict[str, int],
+                 años: Dict[int, int], categorias: Dict[int, int]):
+        self.version = version
+        self.ids = ids  # ordinal -> id de contenido (ascendente)
+        self.tipos = tipos
+        self.años = años
+        self.categorias = categorias
+        self.todos = (1 << len(ids)) - 1
+
+    @classmethod
+    def desde_columnas(cls, version: int, ids: List[int], tipos: Iterable[str], años: Iterable[Optional[int]],
+                       categorias_por_ordinal: Iterable[Iterable[int]]) -> 'IndiceBitmaps':
+        """Construir los bitsets a partir de columnas alineadas por ordinal"""
+        tamano = len(ids)
+        por_tipo, por_año, por_categoria = {}, {}, {}
+        for posicion, (tipo, año, categoria_ids) in enumerate(zip(tipos, años, categorias_por_ordinal)):
+            por_tipo.setdefault(tipo, []).append(posicion)
+            if año:
+                por_año.setdefault(año, []).append(posicion)
+            for categoria_id in categoria_ids:
+                por_categoria.setdefault(categoria_id, []).append(posicion)
+
+        return cls(
+            version, ids,
+            {tipo: _bitset(posiciones, tamano) for tipo, posiciones in por_tipo.items()},
+            {año: _bitset(posiciones, tamano) for año, posiciones in por_año.items()},
+            {categoria_id: _bitset(posiciones, tamano) for categoria_id, posiciones in por_categoria.items()},
+        )
+
+    # ----- Bitsets -----
+
+    def categoria(self, categoria_id: int) -> int:
+        return self.categorias.get(categoria_id, 0)
+
+    def tipo(self, tipo: str) -> int:
+        return self.tipos.get(tipo, 0)
+
+    def rango_años(self, desde: Optional[int] = None, hasta: Optional[int] = None) -> int:
+        bits = 0
+        for año, bits_año in self.años.items():
+            if (desde is None or año >= desde) and (hasta is None or año <= hasta):
+                bits |= bits_año
+        return bits
+
+    def de_ids(self, contenido_ids: Iterable[int]) -> int:
+        """Bitset de una lista de ids (los que no están en el índice se ignoran)"""
+        bits = 0
+        for contenido_id in contenido_ids:
+            posicion = bisect_left(self.ids, contenido_id)
+            if posicion < len(self.ids) and self.ids[posicion] == contenido_id:
+                bits |= 1 << posicion
+        return bits
+
+    def filtrar(self, categorias: Iterable[int] = (), tipo: Optional[str] = None,
+                año_desde: Optional[int] = None, año_hasta: Optional[int] = None) -> int:
+        """AND de todas las condiciones indicadas"""
+        bits = self.todos
+        for categoria_id in categorias:
+            bits &= self.categoria(categoria_id)
+        if tipo:
+            bits &= self.tipo(tipo)
+        if año_desde is not None or año_hasta is not None:
+            bits &= self.rango_años(año_desde, año_hasta)
+        return bits
+
+    def union_categorias(self, categoria_ids: Iterable[int]) -> int:
+        bits = 0
+        for categoria_id in categoria_ids:
+            bits |= self.categoria(categoria_id)
+        return bits
+
+    # ----- Resultados -----
+
+    def a_ids(self, bits: int) -> List[int]:
+        return [self.ids[posicion] for posicion in ordinales(bits)]
+
+    def muestrear(self, bits: int, k: int) -> List[int]:
+        """k ids al azar entre los bits activos"""
+        posiciones = ordinales(bits)
+        return [self.ids[posicion] for posicion in random.sample(posiciones, min(k, len(posiciones)))]
+
+    def categorias_de(self, contenido_id: int) -> List[int]:
+        bit = self.de_ids([contenido_id])
+        return [categoria_id for categoria_id, bits in self.categorias.items() if bits & bit]
+
+
+def obtener_indice() -> IndiceBitmaps:
+    """Índice actual; comparte ordinales y versión con el catálogo compacto"""
+    from .catalogo_compacto import obtener_catalogo
+    return obtener_catalogo().bitmaps
@@ -0,0 +1,246 @@
+"""
+Búsqueda de contenido con backends intercambiables
+
+``views.busqueda`` llama a ``buscar(consulta)`` y no construye consultas;
+el backend se elige con ``BUSQUEDA_BACKEND``:
+
+- ``fts5`` (SQLite): tabla virtual FTS5 ``myapp_contenido_fts`` con el
+  título, la descripción y los nombres de las categorías de cada contenido,
+  sincronizada por triggers de SQLite, así que también la mantienen al día
+  ``bulk_create``, ``update()`` y el SQL directo. Una migración que rehaga
+  ``myapp_contenido``, ``myapp_contenidocategoria`` o ``myapp_categoria``
+  (``AddField``, ``AlterField``... en SQLite) debe quitar antes los triggers
+  y volver a crearlos al final, como ``0029``. Cada término
+  de la consulta se busca como prefijo, el orden es BM25 (el título pesa más
+  que las categorías y estas más que la descripción) y cada resultado trae un
+  fragmento con los términos resaltados. Si FTS5 no llega al límite, se
+  completa con el índice de trigramas (subcadenas y errores de escritura).
+- ``trigramas``: títulos, alias y categorías normalizados (sin acentos)
+  con el índice de trigramas de ``trigramas.py``; sirve con cualquier base
+  de datos y es el que se usa si la tabla FTS5 no existe.
+- ``basico``: ``icontains`` sobre título, descripción y categorías
+  (recorre la tabla; se conserva como referencia).
+
+En todos, buscar "serie" o "película" añade los contenidos de ese tipo.
+``manage.py reconstruir_busqueda`` vuelve a llenar la tabla FTS5 y los trigramas.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Type
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import trigramas
+from .models import Contenido
+
+logger = logging.getLogger(__name__)
+
+TABLA_FTS = 'myapp_contenido_fts'
+PESOS_BM25 = (10.0, 1.0, 4.0)  # titulo, descripcion, categorias
+PALABRAS_FRAGMENTO = 16
+_INICIO_RESALTADO, _FIN_RESALTADO = '\x02', '\x03'
+
+TIPOS_POR_PALABRA = {
+    'serie': 'serie', 'series': 'serie',
+    'pelicula': 'pelicula', 'película': 'pelicula', 'películas': 'pelicula', 'peliculas': 'pelicula',
+    'movie': 'pelicula', 'movies': 'pelicula',
+}
+
+_TERMINOS = re.compile(r'\w+')
+
+# Categorías de un contenido separadas por espacios ({} = expresión con el id del contenido)
+_CATEGORIAS_DE = (
+    "(SELECT coalesce(group_concat(c.nombre, ' '), '') FROM myapp_contenidocategoria cc "
+    "JOIN myapp_categoria c ON c.id = cc.categoria_id WHERE cc.contenido_id = {})"
+)
+
+SQL_CREAR = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+    "titulo, descripcion, categorias, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_insertar AFTER INSERT ON myapp_contenido BEGIN
+        INSERT INTO {TABLA_FTS} (rowid, titulo, descripcion, categorias)
+        VALUES (new.id, new.titulo, new.descripcion, {_CATEGORIAS_DE.format('new.id')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_actualizar AFTER UPDATE OF titulo, descripcion ON myapp_contenido BEGIN
+        UPDATE {TABLA_FTS} SET titulo = new.titulo, descripcion = new.descripcion WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_borrar AFTER DELETE ON myapp_contenido BEGIN
+        DELETE FROM {TABLA_FTS} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenidocategoria_fts_insertar AFTER INSERT ON myapp_contenidocategoria BEGIN
+        UPDATE {TABLA_FTS} SET categorias = {_CATEGORIAS_DE.format('new.contenido_id')} WHERE rowid = new.contenido_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenidocategoria_fts_borrar AFTER DELETE ON myapp_contenidocategoria BEGIN
+        UPDATE {TABLA_FTS} SET categorias = {_CATEGORIAS_DE.format('old.contenido_id')} WHERE rowid = old.contenido_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_categoria_fts_renombrar AFTER UPDATE OF nombre ON myapp_categoria BEGIN
+        UPDATE {TABLA_FTS} SET categorias = {_CATEGORIAS_DE.format(TABLA_FTS + '.rowid')}
+        WHERE rowid IN (SELECT contenido_id FROM myapp_contenidocategoria WHERE categoria_id = new.id);
+    END""",
+]
+
+SQL_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_insertar',
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_actualizar',
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_borrar',
+    'DROP TRIGGER IF EXISTS myapp_contenidocategoria_fts_insertar',
+    'DROP TRIGGER IF EXISTS myapp_contenidocategoria_fts_borrar',
+    'DROP TRIGGER IF EXISTS myapp_categoria_fts_renombrar',
+    f'DROP TABLE IF EXISTS {TABLA_FTS}',
+]
+
+SQL_LLENAR = (
+    f"INSERT INTO {TABLA_FTS} (rowid, titulo, descripcion, categorias) "
+    f"SELECT id, titulo, descripcion, {_CATEGORIAS_DE.format('myapp_contenido.id')} FROM myapp_contenido"
+)
+
+
+def _nombre_backend() -> str:
+    return getattr(settings, 'BUSQUEDA_BACKEND', 'fts5')
+
+
+def _limite() -> int:
+    return getattr(settings, 'BUSQUEDA_LIMITE', 50)
+
+
+def tipo_de_consulta(consulta: str) -> Optional[str]:
+    """Tipo de contenido si la consulta es "serie", "películas"..."""
+    return TIPOS_POR_PALABRA.get(consulta.strip().lower())
+
+
+class BackendBusqueda:
+    """Interfaz de los backends: ``buscar`` devuelve contenidos ordenados por relevancia"""
+    nombre = ''
+
+    def buscar(self, consulta: str, limite: int) -> List[Contenido]:
+        raise NotImplementedError
+
+    def _completar_con_tipo(self, resultados: List[Contenido], consulta: str, limite: int) -> List[Contenido]:
+        """Añadir al final los contenidos del tipo nombrado en la consulta (lo más reciente primero)"""
+        tipo = tipo_de_consulta(consulta)
+        if not tipo or len(resultados) >= limite:
+            return resultados
+        encontrados = {contenido.id for contenido in resultados}
+        del_tipo = Contenido.objects.filter(tipo=tipo).exclude(id__in=encontrados).order_by('-año', '-id')
+        return resultados + list(del_tipo[:limite - len(resultados)])
+
+
+class BackendBasico(BackendBusqueda):
+    """``icontains`` sobre título, descripción y categorías (recorre la tabla)"""
+    nombre = 'basico'
+
+    def buscar(self, consulta: str, limite: int) -> List[Contenido]:
+        filtros = Q(titulo__icontains=consulta) | Q(descripcion__icontains=consulta) | Q(categorias__nombre__icontains=consulta)
+        resultados = list(Contenido.objects.filter(filtros).distinct().order_by('-año', '-id')[:limite])
+        return self._completar_con_tipo(resultados, consulta, limite)
+
+
+class BackendTrigramas(BackendBusqueda):
+    """Subcadenas y coincidencias aproximadas sin acentos con el índice de trigramas"""
+    nombre = 'trigramas'
+
+    def buscar(self, consulta: str, limite: int, excluir: Iterable[int] = ()) -> List[Contenido]:
+        ids = [contenido_id for contenido_id, _ in trigramas.buscar(consulta, limite, excluir)]
+        contenidos = Contenido.objects.in_bulk(ids)
+        resultados = [contenidos[contenido_id] for contenido_id in ids if contenido_id in contenidos]
+        return self._completar_con_tipo(resultados, consulta, limite)
+
+
+class BackendFTS5(BackendBusqueda):
+    """Índice FTS5 de SQLite con orden BM25, prefijos y fragmentos resaltados"""
+    nombre = 'fts5'
+
+    @staticmethod
+    def expresion(consulta: str) -> str:
+        """Consulta FTS5: cada término entre comillas (sin operadores del usuario) y como prefijo"""
+        return ' '.join(f'"{termino}"*' for termino in _TERMINOS.findall(consulta))
+
+    def buscar(self, consulta: str, limite: int) -> List[Contenido]:
+        expresion = self.expresion(consulta)
+        filas = []
+        if expresion:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid, bm25({TABLA_FTS}, %s, %s, %s) AS rango, "
+                    f"snippet({TABLA_FTS}, -1, %s, %s, '…', %s) "
+                    f"FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY rango LIMIT %s",
+                    [*PESOS_BM25, _INICIO_RESALTADO, _FIN_RESALTADO, PALABRAS_FRAGMENTO, expresion, limite],
+                )
+                filas = cursor.fetchall()
+
+        contenidos = Contenido.objects.in_bulk([contenido_id for contenido_id, _, _ in filas])
+        resultados = []
+        for contenido_id, rango, fragmento in filas:
+            contenido = contenidos.get(contenido_id)
+            if contenido is None:
+                continue
+            contenido.relevancia = -rango  # bm25() es menor cuanto más relevante
+            contenido.fragmento = resaltar(fragmento)
+            resultados.append(contenido)
+        if len(resultados) < limite:
+            # Palabras a medias ("ccion") o mal escritas: FTS5 solo encuentra prefijos exactos
+            resultados += BackendTrigramas().buscar(consulta, limite - len(resultados),
+                                                    excluir=[contenido.id for contenido in resultados])
+        return self._completar_con_tipo(resultados, consulta, limite)
+
+
+def resaltar(fragmento: str):
+    """Escapar el fragmento de FTS5 y marcar los términos encontrados con <mark>"""
+    return mark_safe(escape(fragmento or '').replace(_INICIO_RESALTADO, '<mark>').replace(_FIN_RESALTADO, '</mark>'))
+
+
+BACKENDS: Dict[str, Type[BackendBusqueda]] = {
+    BackendFTS5.nombre: BackendFTS5,
+    BackendTrigramas.nombre: BackendTrigramas,
+    BackendBasico.nombre: BackendBasico,
+}
+
+
+def obtener_backend() -> BackendBusqueda:
+    nombre = _nombre_backend()
+    if nombre == BackendFTS5.nombre and connection.vendor != 'sqlite':
+        nombre = BackendTrigramas.nombre
+    return BACKENDS[nombre]()
+
+
+def buscar(consulta: str, limite: Optional[int] = None) -> List[Contenido]:
+    """Contenidos que coinciden con la consulta, del más al menos relevante"""
+    consulta = consulta.strip()
+    if not consulta:
+        return []
+    limite = limite or _limite()
+    backend = obtener_backend()
+    try:
+        return backend.buscar(consulta, limite)
+    except DatabaseError as e:
+        if backend.nombre != BackendFTS5.nombre:
+            raise
+        # Tabla FTS5 ausente (migración sin aplicar, SQLite sin FTS5...)
+        logger.warning(f"Búsqueda {backend.nombre} no disponible, se usan los trigramas: {e}")
+        return BackendTrigramas().buscar(consulta, limite)
+
+
+def crear_indice(cursor):
+    """Crear la tabla FTS5 y sus triggers y llenarla con el catálogo actual"""
+    for sql in SQL_CREAR:
+        cursor.execute(sql)
+    cursor.execute(f'DELETE FROM {TABLA_FTS}')
+    cursor.execute(SQL_LLENAR)
+
+
+def eliminar_indice(cursor):
+    for sql in SQL_ELIMINAR:
+        cursor.execute(sql)
+
+
+def reconstruir_indice() -> int:
+    """Volver a llenar la tabla FTS5 desde cero y compactarla. Devuelve los contenidos indexados"""
+    with connection.cursor() as cursor:
+        crear_indice(cursor)
+        cursor.execute(f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLA_FTS}')
+        return cursor.fetchone()[0]
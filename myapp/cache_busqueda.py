@@ -0,0 +1,160 @@
+"""
+Cache de resultados de búsqueda por término normalizado
+
+Las búsquedas se concentran en pocos términos (ver
+``HistorialBusqueda.obtener_mas_buscados``). Cada proceso guarda, para el
+término normalizado igual que ``termino_normalizado`` (``strip().lower()``)
+y la versión ``catalogo``, la lista de ``(id, fragmento)`` de sus
+resultados. Aciertos y fallos devuelven lo mismo: tarjetas del catálogo
+compacto (un acierto, sin consultas). Al cambiar la versión del catálogo las entradas anteriores dejan
+de usarse y se descartan.
+
+- Desalojo LRU: como mucho ``BUSQUEDA_CACHE_ENTRADAS`` términos por proceso.
+- Single-flight: si varias peticiones del mismo proceso fallan a la vez con
+  el mismo término, solo una ejecuta la búsqueda y el resto espera su
+  resultado (hasta ``BUSQUEDA_CACHE_ESPERA_SEGUNDOS``, después busca por su
+  cuenta).
+- Aciertos, fallos, esperas y desalojos se suman entre todos los procesos
+  con ``metricas.ContadoresCompartidos`` (``manage.py metricas_busqueda``).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+
+from . import buscador
+from .catalogo_compacto import obtener_catalogo
+from .metricas import ContadoresCompartidos
+
+PREFIJO_METRICA = 'busqueda:metricas:'
+METRICAS = ('aciertos', 'fallos', 'esperas', 'desalojos')
+
+# (versión del catálogo, término normalizado, límite) -> [(id, fragmento)]
+Clave = Tuple[int, str, int]
+
+_resultados: 'OrderedDict[Clave, List[Tuple[int, Optional[str]]]]' = OrderedDict()
+_en_vuelo: Dict[Clave, threading.Event] = {}
+_bloqueo = threading.Lock()
+_version: Optional[int] = None
+_ultima_verificacion = 0.0
+_contadores = ContadoresCompartidos(PREFIJO_METRICA, METRICAS)
+
+
+def _ajuste(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _contar(metrica: str, cantidad: int = 1):
+    _contadores.sumar(metrica, cantidad)
+
+
+def metricas() -> Dict[str, float]:
+    resultado = _contadores.valores()
+    peticiones = resultado['aciertos'] + resultado['fallos']
+    resultado['tasa_aciertos'] = resultado['aciertos'] / peticiones if peticiones else 0.0
+    resultado['entradas'] = len(_resultados)
+    return resultado
+
+
+def reiniciar_metricas():
+    _contadores.reiniciar()
+
+
+def normalizar_termino(consulta: str) -> str:
+    """La misma normalización que ``HistorialBusqueda.termino_normalizado``"""
+    return consulta.strip().lower()
+
+
+def invalidar():
+    """Vaciar la cache del proceso tras una escritura en el catálogo"""
+    global _version
+    with _bloqueo:
+        _version = None
+        _resultados.clear()
+
+
+def _version_catalogo() -> int:
+    """Versión ``catalogo``, comprobada como mucho cada ``CATALOGO_VERIFICACION_SEGUNDOS``"""
+    global _version, _ultima_verificacion
+    from .versiones import CATALOGO, obtener_versiones
+
+    if _version is not None and time.monotonic() - _ultima_verificacion < _ajuste('CATALOGO_VERIFICACION_SEGUNDOS', 5):
+        return _version
+    version = obtener_versiones([CATALOGO]).get(CATALOGO, (0, None))[0]
+    with _bloqueo:
+        if version != _version:
+            _resultados.clear()
+        _version, _ultima_verificacion = version, time.monotonic()
+    return version
+
+
+def _leer(clave: Clave) -> Optional[List[Tuple[int, Optional[str]]]]:
+    with _bloqueo:
+        entrada = _resultados.get(clave)
+        if entrada is not None:
+            _resultados.move_to_end(clave)
+        return entrada
+
+
+def _guardar(clave: Clave, entrada: List[Tuple[int, Optional[str]]]):
+    desalojados = 0
+    with _bloqueo:
+        if clave[0] != _version:
+            return  # El catálogo cambió mientras se buscaba
+        _resultados[clave] = entrada
+        _resultados.move_to_end(clave)
+        while len(_resultados) > _ajuste('BUSQUEDA_CACHE_ENTRADAS', 1000):
+            _resultados.popitem(last=False)
+            desalojados += 1
+    if desalojados:
+        _contar('desalojos', desalojados)
+
+
+def _hidratar(entrada: List[Tuple[int, Optional[str]]]) -> List:
+    if not entrada:
+        return []
+    catalogo = obtener_catalogo()
+    tarjetas = (catalogo.tarjeta(contenido_id, fragmento=mark_safe(fragmento) if fragmento else None)
+                for contenido_id, fragmento in entrada)
+    return [tarjeta for tarjeta in tarjetas if tarjeta is not None]
+
+
+def buscar(consulta: str, limite: Optional[int] = None) -> List:
+    """Tarjetas de los resultados de ``buscador.buscar`` para la consulta, desde la cache si es posible"""
+    termino = normalizar_termino(consulta)
+    if not termino:
+        return []
+    clave = (_version_catalogo(), termino, limite or _ajuste('BUSQUEDA_LIMITE', 50))
+
+    entrada = _leer(clave)
+    if entrada is not None:
+        _contar('aciertos')
+        return _hidratar(entrada)
+
+    with _bloqueo:
+        evento = _en_vuelo.get(clave)
+        lider = evento is None
+        if lider:
+            evento = _en_vuelo[clave] = threading.Event()
+    if not lider:
+        evento.wait(_ajuste('BUSQUEDA_CACHE_ESPERA_SEGUNDOS', 5))
+        entrada = _leer(clave)
+        if entrada is not None:
+            _contar('esperas')
+            return _hidratar(entrada)
+
+    _contar('fallos')
+    try:
+        entrada = [(contenido.id, str(getattr(contenido, 'fragmento', '') or '') or None)
+                   for contenido in buscador.buscar(termino, clave[2])]
+        if lider:
+            _guardar(clave, entrada)
+        return _hidratar(entrada)
+    finally:
+        if lider:
+            with _bloqueo:
+                _en_vuelo.pop(clave, None)
+            evento.set()
@@ -0,0 +1,114 @@
+"""
+Cache de recomendaciones por perfil
+
+Calcular las recomendaciones de un perfil cuesta varias consultas por
+estrategia. Se guarda en la cache una lista de candidatos ordenada por
+prioridad (``RECOMENDACIONES_CANDIDATOS`` ids) durante
+``RECOMENDACIONES_TTL`` y cada petición sirve una muestra distinta de ella:
+un muestreo ponderado por puesto sin reemplazo (Efraimidis-Spirakis), de modo
+que los primeros puestos aparecen más a menudo sin repetir siempre el mismo
+orden. Las tarjetas salen del catálogo compacto, sin consultas.
+
+Cada reproducción, calificación o favorito del perfil quita ese contenido de
+la lista (refresco parcial); tras ``RECOMENDACIONES_EVENTOS_REFRESCO`` eventos
+la entrada se descarta para recalcularla con los nuevos gustos. Al fallar,
+la lista se toma de ``RecomendacionPrecalculada`` si sigue vigente (ver
+precalculo.py) y solo si no se calcula en vivo. Aciertos, fallos, listas
+precalculadas usadas, refrescos parciales e invalidaciones se suman entre
+todos los procesos para dimensionarla (ver metricas.py y
+``manage.py metricas_recomendaciones``).
+"""
+import heapq
+import random
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalogo_compacto import obtener_catalogo
+from .metricas import ContadoresCompartidos
+from .precalculo import leer_precalculadas
+from .recommendations import SistemaRecomendaciones
+from .vistos import obtener_vistos
+
+PREFIJO = 'recomendaciones:v1:'
+PREFIJO_METRICA = 'recomendaciones:metricas:'
+METRICAS = ('aciertos', 'fallos', 'precalculadas', 'parciales', 'invalidaciones')
+
+_contadores = ContadoresCompartidos(PREFIJO_METRICA, METRICAS)
+
+
+def _ajuste(nombre: str, defecto: int) -> int:
+    return getattr(settings, nombre, defecto)
+
+
+def _contar(metrica: str):
+    _contadores.sumar(metrica)
+
+
+def metricas() -> Dict[str, float]:
+    resultado = _contadores.valores()
+    peticiones = resultado['aciertos'] + resultado['fallos']
+    resultado['tasa_aciertos'] = resultado['aciertos'] / peticiones if peticiones else 0.0
+    return resultado
+
+
+def reiniciar_metricas():
+    _contadores.reiniciar()
+
+
+def _calcular(perfil, limite: int) -> Dict:
+    solicitados = max(_ajuste('RECOMENDACIONES_CANDIDATOS', 40), limite)
+    ids = leer_precalculadas(perfil.id)
+    if ids is not None and len(ids) >= limite:
+        _contar('precalculadas')
+    else:
+        candidatos = SistemaRecomendaciones(perfil).obtener_candidatos(solicitados)
+        ids = [contenido.id for contenido in candidatos]
+    return {'ids': ids, 'total': len(ids), 'solicitados': solicitados, 'eventos': 0}
+
+
+def diversificar(ids: List[int], limite: int, rng: Optional[random.Random] = None) -> List[int]:
+    """
+    ``limite`` ids sin reemplazo con probabilidad decreciente según el puesto
+    (peso 1/sqrt(puesto + 1)); el resultado queda en el orden de la muestra
+    """
+    rng = rng or random
+    claves = ((rng.random() ** ((puesto + 1) ** 0.5), contenido_id) for puesto, contenido_id in enumerate(ids))
+    return [contenido_id for _, contenido_id in heapq.nlargest(limite, claves)]
+
+
+def obtener_recomendaciones_cacheadas(perfil, limite: int = 10):
+    """Tarjetas recomendadas para el perfil servidas desde la lista cacheada"""
+    clave = PREFIJO + str(perfil.id)
+    entrada = cache.get(clave)
+    vistos = obtener_vistos(perfil.id)
+    disponibles = [i for i in entrada['ids'] if i not in vistos] if entrada else []
+
+    if entrada is None or entrada['solicitados'] < limite or len(disponibles) < limite <= entrada['total']:
+        # Sin entrada, pedida para un límite menor, o se quedó corta al descontar lo visto
+        _contar('fallos')
+        entrada = _calcular(perfil, limite)
+        cache.set(clave, entrada, _ajuste('RECOMENDACIONES_TTL', 30 * 60))
+        disponibles = [i for i in entrada['ids'] if i not in vistos]
+    else:
+        _contar('aciertos')
+
+    return obtener_catalogo().tarjetas(diversificar(disponibles, limite))
+
+
+def registrar_evento(perfil_id: int, contenido_id: Optional[int] = None):
+    """Reproducción, calificación o favorito del perfil: refresco parcial o invalidación"""
+    clave = PREFIJO + str(perfil_id)
+    entrada = cache.get(clave)
+    if entrada is None:
+        return
+    entrada['eventos'] += 1
+    if entrada['eventos'] >= _ajuste('RECOMENDACIONES_EVENTOS_REFRESCO', 5):
+        cache.delete(clave)
+        _contar('invalidaciones')
+        return
+    if contenido_id in entrada['ids']:
+        entrada['ids'].remove(contenido_id)
+    cache.set(clave, entrada, _ajuste('RECOMENDACIONES_TTL', 30 * 60))
+    _contar('parciales')
@@ -0,0 +1,290 @@
+"""
+Modelo de lectura compacto del catálogo
+
+Las vistas de listado solo necesitan una proyección de tarjeta (id, titulo,
+tipo, año, duración, portada, anilist_score y categorías). El catálogo se
+carga una vez por proceso en columnas ``array`` (struct-of-arrays): los
+textos van concatenados en un único bloque UTF-8 con desplazamientos y las
+categorías en formato CSR. Las posiciones son los mismos ordinales densos
+del índice de bitmaps, así que filtrar, ordenar y obtener el top-k no toca
+la base de datos. Se reconstruye cuando cambia la versión ``catalogo``.
+"""
+import logging
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .bitmaps import IndiceBitmaps, ordinales as _ordinales_de
+from .models import Categoria, Contenido, ContenidoCategoria
+
+logger = logging.getLogger(__name__)
+
+TIPOS = [valor for valor, _ in Contenido.TIPO_CHOICES]
+NOMBRES_TIPO = dict(Contenido.TIPO_CHOICES)
+
+# (id, titulo, tipo, año, duracion, imagen_portada, anilist_score)
+FilaCatalogo = Tuple[int, str, str, Optional[int], Optional[int], str, Optional[float]]
+
+
+class _Textos:
+    """Lista de cadenas guardada como un bloque UTF-8 y sus desplazamientos"""
+    __slots__ = ('datos', 'desplazamientos')
+
+    def __init__(self, textos: Iterable[str]):
+        bloque = bytearray()
+        self.desplazamientos = array('I', [0])
+        for texto in textos:
+            bloque += (texto or '').encode()
+            self.desplazamientos.append(len(bloque))
+        self.datos = bytes(bloque)
+
+    def __getitem__(self, posicion: int) -> str:
+        return self.datos[self.desplazamientos[posicion]:self.desplazamientos[posicion + 1]].decode()
+
+    def bytes_ocupados(self) -> int:
+        return len(self.datos) + self.desplazamientos.itemsize * len(self.desplazamientos)
+
+
+class _Portada:
+    """Sustituto ligero de ``ImageFieldFile`` para las plantillas"""
+    __slots__ = ('name',)
+
+    def __init__(self, nombre: str):
+        self.name = nombre
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+
+class _CategoriasTarjeta:
+    """Imita ``contenido.categorias.all`` con las categorías del catálogo compacto"""
+    __slots__ = ('_categorias',)
+
+    def __init__(self, categorias: List[Categoria]):
+        self._categorias = categorias
+
+    def all(self):
+        return self._categorias
+
+
+class Tarjeta:
+    """Vista de un contenido dentro del catálogo compacto (compatible con las plantillas de listado)"""
+    __slots__ = ('_catalogo', '_ordinal', '_extras')
+
+    def __init__(self, catalogo: 'CatalogoCompacto', ordinal: int, extras: Optional[Dict] = None):
+        self._catalogo = catalogo
+        self._ordinal = ordinal
+        self._extras = extras or {}
+
+    def __getattr__(self, nombre):
+        # Métricas de los estantes (rating_promedio, total_reproducciones...)
+        try:
+            return self._extras[nombre]
+        except KeyError:
+            raise AttributeError(nombre)
+
+    def __eq__(self, otra):
+        return isinstance(otra, Tarjeta) and otra.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<Tarjeta {self.id}: {self.titulo}>'
+
+    @property
+    def id(self) -> int:
+        return self._catalogo.ids[self._ordinal]
+
+    pk = id
+
+    @property
+    def titulo(self) -> str:
+        return self._catalogo.titulos[self._ordinal]
+
+    @property
+    def tipo(self) -> str:
+        return TIPOS[self._catalogo.tipos[self._ordinal]]
+
+    def get_tipo_display(self) -> str:
+        return NOMBRES_TIPO[self.tipo]
+
+    @property
+    def año(self) -> Optional[int]:
+        return self._catalogo.años[self._ordinal] or None
+
+    @property
+    def duracion(self) -> Optional[int]:
+        return self._catalogo.duraciones[self._ordinal] or None
+
+    @property
+    def anilist_score(self) -> Optional[float]:
+        score = self._catalogo.scores[self._ordinal]
+        return None if math.isnan(score) else round(score, 2)
+
+    @property
+    def imagen_portada(self) -> _Portada:
+        return _Portada(self._catalogo.portadas[self._ordinal])
+
+    @property
+    def categoria_ids(self) -> List[int]:
+        return self._catalogo.categorias_de(self._ordinal)
+
+    @property
+    def categorias(self) -> _CategoriasTarjeta:
+        nombres = self._catalogo.nombres_categorias
+        return _CategoriasTarjeta(sorted(
+            (Categoria(id=categoria_id, nombre=nombres.get(categoria_id, ''))
+             for categoria_id in self.categoria_ids),
+            key=lambda categoria: categoria.nombre
+        ))
+
+
+class CatalogoCompacto:
+    def __init__(self, version: int, filas: Sequence[FilaCatalogo],
+                 relaciones: Iterable[Tuple[int, int]], nombres_categorias: Dict[int, str]):
+        self.version = version
+        self.nombres_categorias = nombres_categorias
+
+        # Columnas alineadas por ordinal (filas ordenadas por id)
+        self.ids = array('q', (fila[0] for fila in filas))
+        self.titulos = _Textos(fila[1] for fila in filas)
+        self.tipos = array('B', (TIPOS.index(fila[2]) if fila[2] in TIPOS else 0 for fila in filas))
+        self.años = array('H', (fila[3] or 0 for fila in filas))
+        self.duraciones = array('H', (min(fila[4] or 0, 65535) for fila in filas))
+        self.portadas = _Textos(fila[5] for fila in filas)
+        self.scores = array('f', (float(fila[6]) if fila[6] is not None else math.nan for fila in filas))
+
+        # Categorías en formato CSR: categorias[inicio[o]:inicio[o + 1]]
+        por_ordinal = [[] for _ in filas]
+        for contenido_id, categoria_id in relaciones:
+            ordinal = self.ordinal(contenido_id)
+            if ordinal is not None:
+                por_ordinal[ordinal].append(categoria_id)
+        self.inicio_categorias = array('I', [0])
+        self.categorias = array('I')
+        for categoria_ids in por_ordinal:
+            self.categorias.extend(categoria_ids)
+            self.inicio_categorias.append(len(self.categorias))
+
+        self.bitmaps = IndiceBitmaps.desde_columnas(
+            version, list(self.ids), (fila[2] for fila in filas), (fila[3] for fila in filas), por_ordinal
+        )
+
+        # Permutaciones precalculadas para ordenar sin comparar en cada consulta
+        ordinales = range(len(filas))
+        self.por_titulo = array('I', sorted(ordinales, key=lambda o: (filas[o][1].casefold(), filas[o][0])))
+        self.por_año = array('I', sorted(ordinales, key=lambda o: (filas[o][3] or 0, filas[o][0])))
+        self.por_score = array('I', sorted(
+            (o for o in ordinales if filas[o][6] is not None), key=lambda o: (filas[o][6], filas[o][0])
+        ))
+
+    @classmethod
+    def construir(cls, version: int = 0) -> 'CatalogoCompacto':
+        filas = list(Contenido.objects.order_by('id').values_list(
+            'id', 'titulo', 'tipo', 'año', 'duracion', 'imagen_portada', 'anilist_score'
+        ).iterator(chunk_size=5000))
+        relaciones = ContenidoCategoria.objects.values_list('contenido_id', 'categoria_id').iterator(chunk_size=5000)
+        return cls(version, filas, relaciones, dict(Categoria.objects.values_list('id', 'nombre')))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def ordinal(self, contenido_id: int) -> Optional[int]:
+        posicion = bisect_left(self.ids, contenido_id)
+        if posicion < len(self.ids) and self.ids[posicion] == contenido_id:
+            return posicion
+        return None
+
+    def categorias_de(self, ordinal: int) -> List[int]:
+        return list(self.categorias[self.inicio_categorias[ordinal]:self.inicio_categorias[ordinal + 1]])
+
+    def tarjeta(self, contenido_id: int, **extras) -> Optional[Tarjeta]:
+        ordinal = self.ordinal(contenido_id)
+        return None if ordinal is None else Tarjeta(self, ordinal, extras)
+
+    def tarjetas(self, contenido_ids: Iterable[int]) -> List[Tarjeta]:
+        """Tarjetas de los ids indicados, en el mismo orden (los inexistentes se omiten)"""
+        return [tarjeta for tarjeta in map(self.tarjeta, contenido_ids) if tarjeta is not None]
+
+    def consultar(self, categorias: Iterable[int] = (), tipo: Optional[str] = None,
+                  año_desde: Optional[int] = None, año_hasta: Optional[int] = None,
+                  orden: str = '-id', limite: int = 24) -> List[Tarjeta]:
+        """
+        Filtrar y devolver los primeros ``limite`` resultados según ``orden``
+        ('id', 'titulo', 'año' o 'anilist_score', con '-' para descendente; los
+        contenidos sin puntuación no aparecen al ordenar por ``anilist_score``).
+        """
+        bits = self.bitmaps.filtrar(categorias, tipo, año_desde, año_hasta)
+        campo = orden.lstrip('-')
+        descendente = orden.startswith('-')
+        if campo == 'id':
+            todos = _ordinales_de(bits)
+            ordinales = todos[::-1][:limite] if descendente else todos[:limite]
+        else:
+            # Recorrer la permutación del campo hasta reunir ``limite`` ordinales del filtro
+            permutacion = {'titulo': self.por_titulo, 'año': self.por_año, 'anilist_score': self.por_score}[campo]
+            recorrido = reversed(permutacion) if descendente else permutacion
+            mascara = bits.to_bytes((len(self.ids) + 7) // 8 or 1, 'little')
+            ordinales = []
+            for o in recorrido:
+                if mascara[o >> 3] >> (o & 7) & 1:
+                    ordinales.append(o)
+                    if len(ordinales) >= limite:
+                        break
+        return [Tarjeta(self, o) for o in ordinales]
+
+    def bytes_ocupados(self) -> int:
+        """Memoria aproximada de las columnas (sin los bitsets)"""
+        columnas = (self.ids, self.tipos, self.años, self.duraciones, self.scores,
+                    self.inicio_categorias, self.categorias, self.por_titulo, self.por_año, self.por_score)
+        return sum(c.itemsize * len(c) for c in columnas) + \
+            self.titulos.bytes_ocupados() + self.portadas.bytes_ocupados()
+
+
+_catalogo: Optional[CatalogoCompacto] = None
+_ultima_verificacion = 0.0
+_bloqueo = threading.Lock()
+
+
+def _intervalo_verificacion() -> float:
+    return getattr(settings, 'CATALOGO_VERIFICACION_SEGUNDOS', 5)
+
+
+def invalidar():
+    """Descartar el catálogo tras una escritura en este proceso (se reconstruye en el próximo acceso)"""
+    global _catalogo
+    _catalogo = None
+
+
+def obtener_catalogo() -> CatalogoCompacto:
+    """Catálogo actual, reconstruido si la versión del catálogo cambió"""
+    global _catalogo, _ultima_verificacion
+    from .versiones import CATALOGO, obtener_versiones
+
+    catalogo = _catalogo
+    if catalogo is not None and time.monotonic() - _ultima_verificacion < _intervalo_verificacion():
+        return catalogo
+
+    with _bloqueo:
+        version = obtener_versiones([CATALOGO]).get(CATALOGO, (0, None))[0]
+        _ultima_verificacion = time.monotonic()
+        if _catalogo is None or _catalogo.version != version:
+            inicio = time.perf_counter()
+            _catalogo = CatalogoCompacto.construir(version)
+            logger.info(f"Catálogo compacto construido: {len(_catalogo)} contenidos "
+                        f"({_catalogo.bytes_ocupados() / 1024:.0f} KB, {time.perf_counter() - inicio:.2f}s)")
+        return _catalogo
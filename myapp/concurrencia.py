@@ -0,0 +1,49 @@
+"""
+Ejecución concurrente de tareas síncronas desde vistas asíncronas
+
+Las consultas independientes (estantes vencidos, recomendaciones) se
+reparten en el pool de hilos de ``asgiref`` con un semáforo que limita
+cuántas se ejecutan a la vez, y por tanto cuántas conexiones a la base de
+datos se abren por petición.
+"""
+import asyncio
+from typing import Callable, List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+def _concurrencia() -> int:
+    return getattr(settings, 'INDEX_CONCURRENCIA', 4)
+
+
+def cerrando_conexiones(funcion: Callable) -> Callable:
+    """Cerrar las conexiones del hilo del pool al terminar la tarea"""
+    def envoltura():
+        try:
+            return funcion()
+        finally:
+            connections.close_all()
+    return envoltura
+
+
+async def ejecutar_en_paralelo(tareas: List[Callable]) -> list:
+    """
+    Ejecutar funciones síncronas sin argumentos de forma concurrente.
+    Devuelve los resultados en el mismo orden que las tareas.
+
+    Con ``INDEX_CONCURRENCIA = 1`` se ejecutan una tras otra en el hilo
+    principal (necesario con SQLite en memoria, p. ej. en las pruebas).
+    """
+    concurrencia = _concurrencia()
+    if concurrencia <= 1:
+        return [await sync_to_async(tarea)() for tarea in tareas]
+
+    limite = asyncio.Semaphore(concurrencia)
+
+    async def ejecutar(tarea):
+        async with limite:
+            return await sync_to_async(cerrando_conexiones(tarea), thread_sensitive=False)()
+
+    return await asyncio.gather(*(ejecutar(tarea) for tarea in tareas))
@@ -0,0 +1,131 @@
+"""
+Contadores de interacción desnormalizados por contenido
+
+Las reproducciones, likes, dislikes, favoritos y el rating promedio se
+mantienen en ``EstadisticasContenido`` con actualizaciones atómicas ``F()``
+en cada escritura, de modo que los rankings ordenan por una columna indexada
+en lugar de agregar las tablas de eventos.
+"""
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+
+from .models import Calificacion, EstadisticasContenido, Favorito, HistorialReproduccion
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_CONTADORES = (
+    'total_reproducciones', 'total_likes', 'total_dislikes', 'total_favoritos',
+    'total_calificaciones', 'suma_calificaciones',
+)
+
+
+def deltas_calificacion(valor: Optional[int], signo: int) -> Dict[str, int]:
+    """Cambios en los contadores al sumar (signo=1) o restar (signo=-1) una calificación"""
+    if valor is None:
+        return {}
+    return {
+        'total_calificaciones': signo,
+        'suma_calificaciones': signo * valor,
+        'total_likes': signo if valor == 5 else 0,
+        'total_dislikes': signo if valor == 1 else 0,
+    }
+
+
+def actualizar_contadores(contenido_id: int, **deltas):
+    """Aplicar incrementos atómicos a los contadores de un contenido"""
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    cambios = {campo: F(campo) + delta for campo, delta in deltas.items()}
+    if 'total_calificaciones' in deltas or 'suma_calificaciones' in deltas:
+        # En un UPDATE las columnas de la derecha conservan su valor anterior
+        total = F('total_calificaciones') + deltas.get('total_calificaciones', 0)
+        suma = F('suma_calificaciones') + deltas.get('suma_calificaciones', 0)
+        cambios['rating_promedio'] = Case(
+            When(GreaterThan(total, 0), then=Cast(suma, FloatField()) / total),
+            default=None,
+            output_field=FloatField(),
+        )
+
+    actualizados = EstadisticasContenido.objects.filter(contenido_id=contenido_id).update(**cambios)
+    if not actualizados:
+        # Sin fila de contadores todavía: recalcular desde los eventos
+        recalcular_contadores([contenido_id])
+
+
+def _contadores_reales(contenido_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+    """Calcular los contadores a partir de las tablas de eventos"""
+    filtro = {} if contenido_ids is None else {'contenido_id__in': list(contenido_ids)}
+    reales = {}
+
+    def fila(contenido_id):
+        return reales.setdefault(contenido_id, {campo: 0 for campo in CAMPOS_CONTADORES})
+
+    for dato in HistorialReproduccion.objects.filter(**filtro).values('contenido_id').annotate(total=Count('id')):
+        fila(dato['contenido_id'])['total_reproducciones'] = dato['total']
+
+    for dato in Favorito.objects.filter(**filtro).values('contenido_id').annotate(total=Count('id')):
+        fila(dato['contenido_id'])['total_favoritos'] = dato['total']
+
+    calificaciones = Calificacion.objects.filter(**filtro).values('contenido_id').annotate(
+        total=Count('id'),
+        suma=Sum('calificacion'),
+        likes=Count('id', filter=Q(calificacion=5)),
+        dislikes=Count('id', filter=Q(calificacion=1)),
+    )
+    for dato in calificaciones:
+        contadores = fila(dato['contenido_id'])
+        contadores['total_calificaciones'] = dato['total']
+        contadores['suma_calificaciones'] = dato['suma'] or 0
+        contadores['total_likes'] = dato['likes']
+        contadores['total_dislikes'] = dato['dislikes']
+
+    return reales
+
+
+def recalcular_contadores(contenido_ids: Optional[Iterable[int]] = None, aplicar: bool = True) -> int:
+    """
+    Reconciliar los contadores con las tablas de eventos.
+    Devuelve cuántos contenidos tenían contadores desincronizados.
+    """
+    from .models import Contenido
+
+    contenidos = Contenido.objects.all()
+    if contenido_ids is not None:
+        contenido_ids = list(contenido_ids)
+        contenidos = contenidos.filter(id__in=contenido_ids)
+    ids = list(contenidos.values_list('id', flat=True))
+
+    reales = _contadores_reales(contenido_ids)
+    actuales = EstadisticasContenido.objects.in_bulk(ids)
+
+    crear, modificar = [], []
+    for contenido_id in ids:
+        valores = reales.get(contenido_id) or {campo: 0 for campo in CAMPOS_CONTADORES}
+        total = valores['total_calificaciones']
+        rating = valores['suma_calificaciones'] / total if total else None
+
+        estadisticas = actuales.get(contenido_id)
+        if estadisticas is None:
+            crear.append(EstadisticasContenido(contenido_id=contenido_id, rating_promedio=rating, **valores))
+            continue
+        if any(getattr(estadisticas, campo) != valor for campo, valor in valores.items()) or \
+                estadisticas.rating_promedio != rating:
+            for campo, valor in valores.items():
+                setattr(estadisticas, campo, valor)
+            estadisticas.rating_promedio = rating
+            modificar.append(estadisticas)
+
+    if aplicar:
+        EstadisticasContenido.objects.bulk_create(crear, batch_size=500, ignore_conflicts=True)
+        EstadisticasContenido.objects.bulk_update(
+            modificar, list(CAMPOS_CONTADORES) + ['rating_promedio'], batch_size=500
+        )
+    if crear or modificar:
+        logger.info(f"Contadores reconciliados: {len(crear)} creados, {len(modificar)} corregidos")
+    return len(crear) + len(modificar)
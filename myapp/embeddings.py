@@ -0,0 +1,466 @@
+"""
+Vectores de contenido y búsqueda aproximada de vecinos ("más como este")
+
+Cada contenido se representa con un vector denso que concatena tres bloques,
+cada uno de norma 1 y escalado por la raíz de su peso (``EMBEDDINGS_PESOS``),
+de modo que el coseno entre dos contenidos es la suma ponderada de los
+cosenos de cada bloque:
+
+- texto: TF-IDF sobre título (doble peso) y descripción, con vocabulario
+  limitado a ``EMBEDDINGS_VOCABULARIO`` términos y reducido a
+  ``EMBEDDINGS_DIMENSION_TEXTO`` dimensiones con una proyección aleatoria
+- categorías: pertenencia a cada categoría (one-hot)
+- métricas: puntuación y popularidad (logarítmica) de AniList en [0, 1]
+
+``manage.py construir_embeddings`` guarda la matriz como ``.npy`` (abierta con
+``mmap_mode='r'``, como los factores de ``factorizacion.py``) junto a un
+índice IVF: k-means esférico con ~sqrt(n) centroides y los vectores
+agrupados por centroide, así que una consulta compara con los centroides y
+recorre solo las ``EMBEDDINGS_SONDEOS`` listas más cercanas.
+
+``agregar_contenidos`` indexa los títulos nuevos (p. ej. los que importa
+``AniListImporter``) con el vocabulario, la proyección y los centroides
+existentes; reescribe la matriz entera (O(catálogo) por llamada), así que
+se llama una vez por lote importado. Cuando lo agregado supera ``FRACCION_RECONSTRUCCION`` del índice
+solo lo marca para reconstruir: el k-means no se ejecuta dentro de una
+petición, lo hace ``manage.py construir_embeddings --si-hace-falta`` (cron).
+
+Los escritores (importaciones simultáneas y el comando) se serializan con un
+bloqueo de fichero junto al directorio, y cada uno escribe en su propio
+directorio temporal antes de sustituir el actual.
+"""
+import html
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from filelock import FileLock, Timeout
+from django.utils import timezone
+
+from .models import Categoria, Contenido, ContenidoCategoria
+from .versiones import RECOMENDADORES, incrementar_version
+
+logger = logging.getLogger(__name__)
+
+PESOS_POR_DEFECTO = {'texto': 0.55, 'categorias': 0.4, 'metricas': 0.05}
+FRACCION_RECONSTRUCCION = 0.2  # Contenidos agregados (sobre el tamaño construido) antes de reconstruir entero
+ITERACIONES_KMEANS = 10
+MUESTRA_KMEANS_POR_LISTA = 64  # Vectores de muestra por centroide al entrenar el k-means
+SEMILLA = 42
+ESPERA_BLOQUEO_SEGUNDOS = 30  # Espera máxima de una importación por el bloqueo de escritura
+CELDAS_POR_BLOQUE = 1 << 22  # entradas TF del bloque × dimensión (acota la proyección temporal)
+
+_ETIQUETAS = re.compile(r'<[^>]+>')
+_PALABRAS = re.compile(r'[^\W\d_]{3,}')
+
+
+def _directorio() -> str:
+    return str(getattr(settings, 'EMBEDDINGS_DIR', os.path.join(settings.BASE_DIR, 'modelos', 'embeddings')))
+
+
+def _dimension_texto() -> int:
+    return getattr(settings, 'EMBEDDINGS_DIMENSION_TEXTO', 64)
+
+
+def _vocabulario_maximo() -> int:
+    return getattr(settings, 'EMBEDDINGS_VOCABULARIO', 20000)
+
+
+def _sondeos() -> int:
+    return getattr(settings, 'EMBEDDINGS_SONDEOS', 8)
+
+
+def _pesos() -> Dict[str, float]:
+    return getattr(settings, 'EMBEDDINGS_PESOS', PESOS_POR_DEFECTO)
+
+
+def tokenizar(titulo: str, descripcion: str) -> Counter:
+    """Frecuencia de cada término (las descripciones de AniList traen HTML); el título cuenta doble"""
+    texto = _ETIQUETAS.sub(' ', html.unescape(descripcion or ''))
+    terminos = Counter(_PALABRAS.findall(texto.lower()))
+    for termino in _PALABRAS.findall((titulo or '').lower()):
+        terminos[termino] += 2
+    return terminos
+
+
+def _normalizar_filas(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return np.divide(matriz, normas, out=np.zeros_like(matriz), where=normas > 0)
+
+
+class Codificador:
+    """Vocabulario, IDF, proyección y categorías con los que se construyó el índice"""
+
+    def __init__(self, vocabulario: Dict[str, int], idf: np.ndarray, proyeccion: np.ndarray,
+                 categoria_ids: np.ndarray, popularidad_maxima: float, score_medio: float,
+                 pesos: Dict[str, float]):
+        self.vocabulario = vocabulario
+        self.idf = idf
+        self.proyeccion = proyeccion
+        self.categoria_ids = categoria_ids
+        self.popularidad_maxima = popularidad_maxima
+        self.score_medio = score_medio
+        self.pesos = pesos
+
+    @classmethod
+    def ajustar(cls, documentos: Sequence[Counter], filas: Sequence[Tuple], categoria_ids: np.ndarray,
+                dimension: int, vocabulario_maximo: int, pesos: Dict[str, float]) -> 'Codificador':
+        frecuencia_documental = Counter()
+        for terminos in documentos:
+            frecuencia_documental.update(terminos.keys())
+        # Los términos de un solo documento no acercan a nadie; si el catálogo es pequeño se conservan
+        minima = 2 if len(documentos) >= 100 else 1
+        terminos = sorted((t for t, df in frecuencia_documental.items() if df >= minima),
+                          key=lambda t: (-frecuencia_documental[t], t))[:vocabulario_maximo]
+        vocabulario = {termino: i for i, termino in enumerate(terminos)}
+        total = len(documentos)
+        idf = np.array([math.log((1 + total) / (1 + frecuencia_documental[t])) + 1 for t in terminos], dtype=np.float32)
+        rng = np.random.default_rng(SEMILLA)
+        proyeccion = (rng.standard_normal((len(terminos), dimension)) / math.sqrt(dimension)).astype(np.float32)
+
+        scores = [float(fila[1]) for fila in filas if fila[1] is not None]
+        popularidades = [fila[2] or 0 for fila in filas]
+        return cls(vocabulario, idf, proyeccion, categoria_ids,
+                   popularidad_maxima=float(max(popularidades, default=0)),
+                   score_medio=sum(scores) / len(scores) if scores else 50.0, pesos=pesos)
+
+    def codificar(self, documentos: Sequence[Counter], categorias: Sequence[Iterable[int]],
+                  filas: Sequence[Tuple]) -> np.ndarray:
+        """Vectores de norma 1 (float32) de los contenidos, en el orden recibido"""
+        total = len(documentos)
+        dimension = self.proyeccion.shape[1]
+
+        # TF-IDF sublineal disperso (fila, término, valor) proyectado por bloques de filas completas
+        # con unas CELDAS_POR_BLOQUE / dimensión entradas, sumadas por fila con reduceat.
+        # La norma del TF-IDF no importa: el bloque de texto se normaliza después de proyectar
+        texto = np.zeros((total, dimension), dtype=np.float32)
+        entradas_por_bloque = max(1, CELDAS_POR_BLOQUE // max(dimension, 1))
+        filas_tf, terminos_tf, valores_tf = [], [], []
+        for fila, terminos in enumerate(documentos):
+            for termino, frecuencia in terminos.items():
+                columna = self.vocabulario.get(termino)
+                if columna is not None:
+                    filas_tf.append(fila)
+                    terminos_tf.append(columna)
+                    valores_tf.append(1 + math.log(frecuencia))
+            if len(filas_tf) >= entradas_por_bloque or (fila == total - 1 and filas_tf):
+                self._proyectar(texto, filas_tf, terminos_tf, valores_tf)
+                filas_tf, terminos_tf, valores_tf = [], [], []
+
+        bloque_categorias = np.zeros((total, len(self.categoria_ids)), dtype=np.float32)
+        for fila, ids in enumerate(categorias):
+            # Las categorías creadas después de construir el índice se ignoran hasta reconstruirlo
+            ids = np.fromiter(ids, dtype=np.int64)
+            posiciones = np.searchsorted(self.categoria_ids, ids)
+            validas = posiciones < len(self.categoria_ids)
+            validas[validas] &= self.categoria_ids[posiciones[validas]] == ids[validas]
+            bloque_categorias[fila, posiciones[validas]] = 1.0
+
+        metricas = np.zeros((total, 2), dtype=np.float32)
+        escala_popularidad = math.log1p(self.popularidad_maxima) or 1.0
+        for fila, (_, score, popularidad) in enumerate(filas):
+            metricas[fila, 0] = (float(score) if score is not None else self.score_medio) / 100
+            metricas[fila, 1] = min(1.0, math.log1p(popularidad or 0) / escala_popularidad)
+
+        vectores = np.hstack([
+            math.sqrt(self.pesos.get('texto', 0)) * _normalizar_filas(texto),
+            math.sqrt(self.pesos.get('categorias', 0)) * _normalizar_filas(bloque_categorias),
+            math.sqrt(self.pesos.get('metricas', 0)) * metricas / math.sqrt(2),
+        ])
+        return _normalizar_filas(vectores).astype(np.float32)
+
+    def _proyectar(self, texto: np.ndarray, filas: List[int], terminos: List[int], valores: List[float]):
+        """Sumar en ``texto`` la proyección de un bloque de entradas TF (filas completas y crecientes)"""
+        filas = np.array(filas, dtype=np.int64)
+        terminos = np.array(terminos, dtype=np.int64)
+        contribuciones = (np.array(valores, dtype=np.float32) * self.idf[terminos])[:, None] * self.proyeccion[terminos]
+        inicios = np.flatnonzero(np.r_[True, filas[1:] != filas[:-1]])
+        texto[filas[inicios]] = np.add.reduceat(contribuciones, inicios, axis=0)
+
+    def guardar(self, directorio: str):
+        np.save(os.path.join(directorio, 'idf.npy'), self.idf)
+        np.save(os.path.join(directorio, 'proyeccion.npy'), self.proyeccion)
+        np.save(os.path.join(directorio, 'categoria_ids.npy'), self.categoria_ids)
+        with open(os.path.join(directorio, 'vocabulario.json'), 'w') as archivo:
+            json.dump(list(self.vocabulario), archivo)
+
+    @classmethod
+    def abrir(cls, directorio: str, metadatos: Dict) -> 'Codificador':
+        with open(os.path.join(directorio, 'vocabulario.json')) as archivo:
+            vocabulario = {termino: i for i, termino in enumerate(json.load(archivo))}
+        return cls(vocabulario, np.load(os.path.join(directorio, 'idf.npy')),
+                   np.load(os.path.join(directorio, 'proyeccion.npy')),
+                   np.load(os.path.join(directorio, 'categoria_ids.npy')),
+                   metadatos['popularidad_maxima'], metadatos['score_medio'], metadatos['pesos'])
+
+
+def _leer_contenidos(contenido_ids: Optional[Iterable[int]] = None):
+    """(ids, documentos, categorías, (id, score, popularidad)) de los contenidos, ordenados por id"""
+    consulta = Contenido.objects.order_by('id')
+    relaciones = ContenidoCategoria.objects.all()
+    if contenido_ids is not None:
+        contenido_ids = list(contenido_ids)
+        consulta = consulta.filter(id__in=contenido_ids)
+        relaciones = relaciones.filter(contenido_id__in=contenido_ids)
+    filas = list(consulta.values_list('id', 'titulo', 'descripcion', 'anilist_score', 'anilist_popularity')
+                 .iterator(chunk_size=2000))
+    categorias = {}
+    for contenido_id, categoria_id in relaciones.values_list('contenido_id', 'categoria_id').iterator(chunk_size=10000):
+        categorias.setdefault(contenido_id, []).append(categoria_id)
+    ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+    documentos = [tokenizar(fila[1], fila[2]) for fila in filas]
+    return ids, documentos, [categorias.get(fila[0], []) for fila in filas], [(fila[0], fila[3], fila[4]) for fila in filas]
+
+
+def kmeans_esferico(vectores: np.ndarray, listas: int, iteraciones: int = ITERACIONES_KMEANS,
+                    semilla: int = SEMILLA) -> np.ndarray:
+    """Centroides de norma 1 entrenados con una muestra de los vectores"""
+    rng = np.random.default_rng(semilla)
+    listas = max(1, min(listas, len(vectores)))
+    muestra = vectores
+    if len(vectores) > listas * MUESTRA_KMEANS_POR_LISTA:
+        muestra = vectores[np.sort(rng.choice(len(vectores), listas * MUESTRA_KMEANS_POR_LISTA, replace=False))]
+    muestra = np.asarray(muestra, dtype=np.float32)
+    centroides = muestra[rng.choice(len(muestra), listas, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignacion = np.argmax(muestra @ centroides.T, axis=1)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignacion, muestra)
+        vacios = np.flatnonzero(~sumas.any(axis=1))
+        # Un centroide sin vectores se recoloca sobre un vector al azar
+        sumas[vacios] = muestra[rng.choice(len(muestra), len(vacios))]
+        centroides = _normalizar_filas(sumas)
+    return centroides
+
+
+class IndiceEmbeddings:
+    """
+    Vectores agrupados por lista del IVF: la lista ``l`` ocupa las filas
+    ``indptr[l]:indptr[l + 1]`` de ``vectores`` e ``ids``
+    """
+
+    def __init__(self, vectores: np.ndarray, ids: np.ndarray, indptr: np.ndarray, centroides: np.ndarray,
+                 codificador: Optional[Codificador] = None, metadatos: Optional[Dict] = None):
+        self.vectores = vectores
+        self.ids = ids
+        self.indptr = indptr
+        self.centroides = centroides
+        self.codificador = codificador
+        self.metadatos = metadatos or {}
+        self._orden = np.argsort(ids, kind='stable')
+        self._ids_ordenados = ids[self._orden]
+
+    @classmethod
+    def desde_vectores(cls, vectores: np.ndarray, ids: np.ndarray, centroides: np.ndarray, **kwargs) -> 'IndiceEmbeddings':
+        """Agrupar los vectores por su centroide más cercano"""
+        asignacion = np.argmax(vectores @ centroides.T, axis=1) if len(vectores) else np.zeros(0, dtype=np.int64)
+        orden = np.argsort(asignacion, kind='stable')
+        indptr = np.zeros(len(centroides) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(asignacion, minlength=len(centroides)), out=indptr[1:])
+        return cls(np.ascontiguousarray(vectores[orden], dtype=np.float32), ids[orden], indptr, centroides, **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fila(self, contenido_id: int) -> Optional[int]:
+        posicion = int(np.searchsorted(self._ids_ordenados, contenido_id))
+        if posicion < len(self._ids_ordenados) and self._ids_ordenados[posicion] == contenido_id:
+            return int(self._orden[posicion])
+        return None
+
+    def buscar(self, vector: np.ndarray, limite: int = 10, excluir: Iterable[int] = (),
+               sondeos: Optional[int] = None) -> List[Tuple[int, float]]:
+        """[(id, coseno)] de los vecinos aproximados de ``vector``, de más a menos parecido"""
+        sondeos = max(1, min(sondeos or _sondeos(), len(self.centroides)))
+        cercanas = np.argpartition(-(self.centroides @ vector), sondeos - 1)[:sondeos]
+        rangos = [(self.indptr[lista], self.indptr[lista + 1]) for lista in np.sort(cercanas)]
+        filas = np.concatenate([np.arange(inicio, fin) for inicio, fin in rangos if fin > inicio] or [np.zeros(0, dtype=np.int64)])
+        if not len(filas):
+            return []
+        puntuaciones = self.vectores[filas] @ vector
+        excluidos = np.fromiter(excluir, dtype=np.int64)
+        if len(excluidos):
+            puntuaciones[np.isin(self.ids[filas], excluidos)] = -np.inf
+        k = min(limite, len(puntuaciones))
+        mejores = np.argpartition(-puntuaciones, k - 1)[:k]
+        mejores = mejores[np.argsort(-puntuaciones[mejores], kind='stable')]
+        return [(int(self.ids[filas[i]]), float(puntuaciones[i])) for i in mejores if np.isfinite(puntuaciones[i])]
+
+    def similares(self, contenido_id: int, excluir: Iterable[int] = (), limite: int = 10,
+                  sondeos: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Vecinos de un contenido indexado (vacío si aún no está en el índice)"""
+        fila = self.fila(contenido_id)
+        if fila is None:
+            return []
+        return self.buscar(np.asarray(self.vectores[fila]), limite, [contenido_id, *excluir], sondeos)
+
+
+def bloqueo_escritura() -> FileLock:
+    """Bloqueo de fichero (reentrante en el mismo hilo) que serializa a quienes escriben el índice"""
+    directorio = _directorio()
+    os.makedirs(os.path.dirname(directorio) or '.', exist_ok=True)
+    return FileLock(directorio + '.lock', is_singleton=True)
+
+
+def guardar_indice(indice: IndiceEmbeddings, metadatos: Dict):
+    """Escribir el índice en un directorio temporal propio y sustituir el actual de una vez"""
+    directorio = _directorio()
+    padre, nombre = os.path.split(directorio)
+    temporal = tempfile.mkdtemp(prefix=nombre + '.', suffix='.tmp', dir=padre or '.')
+    np.save(os.path.join(temporal, 'vectores.npy'), indice.vectores)
+    np.save(os.path.join(temporal, 'ids.npy'), indice.ids)
+    np.save(os.path.join(temporal, 'indptr.npy'), indice.indptr)
+    np.save(os.path.join(temporal, 'centroides.npy'), indice.centroides)
+    indice.codificador.guardar(temporal)
+    with open(os.path.join(temporal, 'indice.json'), 'w') as archivo:
+        json.dump({'actualizado': timezone.now().isoformat(), **metadatos}, archivo)
+
+    with bloqueo_escritura():
+        anterior = temporal[:-len('.tmp')] + '.old'
+        if os.path.exists(directorio):
+            os.replace(directorio, anterior)
+        os.replace(temporal, directorio)
+    shutil.rmtree(anterior, ignore_errors=True)
+    # Los similares de la página de detalle cambian: invalidar su ETag
+    incrementar_version(RECOMENDADORES)
+
+
+def abrir_indice(directorio: str, mmap: bool = True) -> IndiceEmbeddings:
+    with open(os.path.join(directorio, 'indice.json')) as archivo:
+        metadatos = json.load(archivo)
+    return IndiceEmbeddings(
+        np.load(os.path.join(directorio, 'vectores.npy'), mmap_mode='r' if mmap else None),
+        np.load(os.path.join(directorio, 'ids.npy')),
+        np.load(os.path.join(directorio, 'indptr.npy')),
+        np.load(os.path.join(directorio, 'centroides.npy')),
+        Codificador.abrir(directorio, metadatos), metadatos,
+    )
+
+
+def construir_indice(listas: Optional[int] = None) -> Dict:
+    """Codificar todo el catálogo, entrenar el IVF y guardar. Devuelve un resumen"""
+    inicio = time.perf_counter()
+    ids, documentos, categorias, filas = _leer_contenidos()
+    categoria_ids = np.array(sorted(Categoria.objects.values_list('id', flat=True)), dtype=np.int64)
+    codificador = Codificador.ajustar(documentos, filas, categoria_ids, _dimension_texto(),
+                                      _vocabulario_maximo(), _pesos())
+    vectores = codificador.codificar(documentos, categorias, filas)
+    codificacion = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    listas = listas or max(1, round(math.sqrt(len(ids))))
+    centroides = kmeans_esferico(vectores, listas) if len(ids) else np.zeros((1, vectores.shape[1]), dtype=np.float32)
+    indice = IndiceEmbeddings.desde_vectores(vectores, ids, centroides, codificador=codificador)
+    resumen = {
+        'contenidos': len(ids), 'dimension': int(vectores.shape[1]), 'vocabulario': len(codificador.vocabulario),
+        'listas': len(centroides), 'construidos': len(ids), 'agregados': 0,
+        'codificacion_segundos': round(codificacion, 2), 'ivf_segundos': round(time.perf_counter() - inicio, 2),
+        'bytes_vectores': int(vectores.nbytes),
+    }
+    metadatos = {**resumen, 'popularidad_maxima': codificador.popularidad_maxima,
+                 'score_medio': codificador.score_medio, 'pesos': codificador.pesos}
+    with bloqueo_escritura():
+        # Lo importado mientras se entrenaba se agregó al índice anterior: agregarlo también a este
+        importados = sorted(set(Contenido.objects.values_list('id', flat=True)) - set(ids.tolist()))
+        indice, agregados = _con_agregados(indice, importados)
+        metadatos.update(contenidos=len(indice), agregados=agregados)
+        guardar_indice(indice, metadatos)
+    resumen.update(contenidos=len(indice), agregados=agregados)
+    logger.info(f"Índice de embeddings construido: {resumen}")
+    return resumen
+
+
+def _con_agregados(indice: IndiceEmbeddings, nuevos: Sequence[int]) -> Tuple[IndiceEmbeddings, int]:
+    """
+    Índice con los contenidos ``nuevos`` codificados y asignados a los
+    centroides existentes. Las listas IVF se reordenan, así que se copia y se
+    reescribe la matriz entera: agregar cuesta O(catálogo) en memoria y E/S
+    aunque sean pocos títulos (conviene agregar por lotes, no uno a uno).
+    """
+    if not nuevos:
+        return indice, 0
+    ids, documentos, categorias, filas = _leer_contenidos(nuevos)
+    if not len(ids):
+        return indice, 0
+    vectores = indice.codificador.codificar(documentos, categorias, filas)
+    actualizado = IndiceEmbeddings.desde_vectores(
+        np.concatenate([np.asarray(indice.vectores), vectores]), np.concatenate([indice.ids, ids]),
+        indice.centroides, codificador=indice.codificador)
+    return actualizado, len(ids)
+
+
+def necesita_reconstruccion() -> bool:
+    """Sin índice o con más de ``FRACCION_RECONSTRUCCION`` agregados desde la última construcción"""
+    indice = obtener_indice_embeddings()
+    return indice is None or bool(indice.metadatos.get('reconstruir'))
+
+
+def agregar_contenidos(contenido_ids: Iterable[int]) -> int:
+    """
+    Indexar contenidos nuevos sin reentrenar (los ya indexados se omiten).
+    Devuelve cuántos se agregaron; sin índice construido, o si otro proceso
+    mantiene el bloqueo más de ``ESPERA_BLOQUEO_SEGUNDOS``, no hace nada (la
+    próxima construcción los incluirá).
+    """
+    contenido_ids = {int(contenido_id) for contenido_id in contenido_ids}
+    try:
+        with bloqueo_escritura().acquire(timeout=ESPERA_BLOQUEO_SEGUNDOS):
+            # Leer el índice dentro del bloqueo para no perder lo que agregó otro escritor
+            indice = obtener_indice_embeddings()
+            if indice is None:
+                return 0
+            nuevos = sorted(contenido_id for contenido_id in contenido_ids if indice.fila(contenido_id) is None)
+            actualizado, agregados = _con_agregados(indice, nuevos)
+            if not agregados:
+                return 0
+            metadatos = indice.metadatos
+            total = metadatos.get('agregados', 0) + agregados
+            # Pasado el umbral el vocabulario y los centroides ya no representan bien el catálogo
+            reconstruir = total > FRACCION_RECONSTRUCCION * max(metadatos.get('construidos', 0), 1)
+            guardar_indice(actualizado, {**metadatos, 'contenidos': len(actualizado), 'agregados': total,
+                                         'reconstruir': reconstruir})
+    except Timeout:
+        logger.warning(f"Índice de embeddings ocupado: {len(contenido_ids)} contenidos sin agregar")
+        return 0
+    logger.info(f"Índice de embeddings: {agregados} contenidos agregados"
+                + (" (pendiente de reconstruir con manage.py construir_embeddings)" if reconstruir else ""))
+    return agregados
+
+
+_indice: Optional[IndiceEmbeddings] = None
+_indice_firma = None
+
+
+def obtener_indice_embeddings() -> Optional[IndiceEmbeddings]:
+    """Índice actual (se vuelve a abrir si se reconstruyó o amplió). None si aún no se ha construido"""
+    global _indice, _indice_firma
+    try:
+        estado = os.stat(os.path.join(_directorio(), 'indice.json'))
+    except FileNotFoundError:
+        return None
+    firma = (estado.st_ino, estado.st_mtime_ns)
+    if _indice is None or _indice_firma != firma:
+        try:
+            _indice = abrir_indice(_directorio())
+            _indice_firma = firma
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"No se pudo abrir el índice de embeddings: {e}")
+            return None
+    return _indice
+
+
+def similares_embeddings(contenido_id: int, excluir: Iterable[int] = (), limite: int = 10) -> List[Tuple[int, float]]:
+    """[(id, coseno)] más parecidos a ``contenido_id``; vacío sin índice o si el contenido no está indexado"""
+    indice = obtener_indice_embeddings()
+    if indice is None:
+        return []
+    return indice.similares(contenido_id, excluir, limite)
@@ -0,0 +1,326 @@
+"""
+Estantes precalculados de la página principal
+
+Cada estante no personalizado de ``views.index`` se calcula fuera del camino
+de la petición y se guarda en la cache como una lista de IDs con sus métricas.
+La vista lee todos los estantes con una sola lectura (``cache.get_many``) y
+los hidrata con las tarjetas del catálogo compacto en memoria.
+
+Estantes y marcas de desactualizado viven en la cache por defecto, que es
+compartida (en disco): lo que escribe ``manage.py reconstruir_estantes`` o
+marca una señal en un proceso lo ven todos los demás. Si un estante vencido
+tiene una versión anterior, solo el proceso que obtiene el bloqueo lo
+reconstruye; el resto sigue sirviendo la anterior mientras tanto.
+"""
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .models import Categoria, Contenido
+from .tendencias import obtener_tendencias
+from .catalogo_compacto import obtener_catalogo
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_CACHE = 'estantes:'
+PREFIJO_SUCIO = 'estantes:sucio:'
+PREFIJO_BLOQUEO = 'estantes:reconstruyendo:'
+BLOQUEO_TTL = 60  # Si el proceso que reconstruye muere, otro lo intenta pasado este tiempo
+
+
+def _filas(queryset, *campos, **expresiones) -> List[Dict]:
+    """Convertir un queryset en una lista compacta de diccionarios"""
+    return [dict(fila) for fila in queryset.values('id', *campos, **expresiones)]
+
+
+# Métricas de los contadores desnormalizados expuestas con el nombre que usa la plantilla
+METRICAS_REPRODUCCIONES = {'total_reproducciones': F('estadisticas__total_reproducciones')}
+METRICAS_VALORACIONES = {
+    'rating_promedio': F('estadisticas__rating_promedio'),
+    'total_calificaciones': F('estadisticas__total_calificaciones'),
+}
+METRICAS_LIKES = {
+    'total_likes': F('estadisticas__total_likes'),
+    'total_dislikes': F('estadisticas__total_dislikes'),
+}
+
+
+def _contenidos_recientes():
+    return _filas(Contenido.objects.order_by('-id')[:8])
+
+
+def _contenido_popular():
+    return _filas(
+        Contenido.objects.filter(
+            estadisticas__total_reproducciones__gt=0
+        ).order_by('-estadisticas__total_reproducciones')[:6],
+        **METRICAS_REPRODUCCIONES
+    )
+
+
+def _categorias_populares():
+    return list(
+        Categoria.objects.annotate(
+            total_contenido=Count('contenidos')
+        ).filter(
+            total_contenido__gt=0
+        ).order_by('-total_contenido').values('id', 'nombre', 'total_contenido')[:6]
+    )
+
+
+def _terminos_mas_buscados():
+    return [
+        {clave: valor for clave, valor in termino.items() if clave != 'contenido_ids'}
+        for termino in obtener_tendencias()['terminos']
+    ]
+
+
+def _contenido_mas_buscado():
+    # Mapeo término -> contenidos precalculado por tendencias.resolver_tendencias
+    contenido_ids = []
+    for termino in obtener_tendencias()['terminos'][:6]:
+        for contenido_id in termino['contenido_ids']:
+            if contenido_id not in contenido_ids:
+                contenido_ids.append(contenido_id)
+            if len(contenido_ids) >= 8:
+                return [{'id': contenido_id} for contenido_id in contenido_ids]
+    return [{'id': contenido_id} for contenido_id in contenido_ids]
+
+
+def _contenido_mas_visto():
+    return _filas(
+        Contenido.objects.filter(
+            estadisticas__total_reproducciones__gt=0
+        ).order_by('-estadisticas__total_reproducciones')[:8],
+        **METRICAS_REPRODUCCIONES, **METRICAS_VALORACIONES
+    )
+
+
+def _contenido_mas_gustado():
+    return _filas(
+        Contenido.objects.filter(
+            estadisticas__total_likes__gt=0
+        ).order_by('-estadisticas__total_likes', '-estadisticas__rating_promedio')[:8],
+        **METRICAS_LIKES, **METRICAS_VALORACIONES
+    )
+
+
+def _contenido_mejor_valorado():
+    return _filas(
+        Contenido.objects.filter(
+            estadisticas__total_calificaciones__gte=3  # Al menos 3 calificaciones para ser considerado
+        ).order_by('-estadisticas__rating_promedio', '-estadisticas__total_calificaciones')[:8],
+        **METRICAS_VALORACIONES, total_likes=F('estadisticas__total_likes')
+    )
+
+
+def _contenido_destacado():
+    # Hero slider: puntuación de popularidad precalculada (ver popularidad.py)
+    return _filas(
+        Contenido.objects.filter(
+            imagen_portada__isnull=False  # Solo contenido con imagen
+        ).order_by(F('estadisticas__puntuacion_popularidad').desc(nulls_last=True), '-id')[:4],
+        **METRICAS_VALORACIONES, **METRICAS_REPRODUCCIONES,
+        puntuacion_popularidad=F('estadisticas__puntuacion_popularidad')
+    )
+
+
+def _contenido_agregado_recientemente():
+    return _filas(
+        Contenido.objects.filter(imagen_portada__isnull=False).order_by('-id')[:6],
+        **METRICAS_REPRODUCCIONES
+    )
+
+
+def _contenido_live_action():
+    live_action = _filas(
+        Contenido.objects.filter(
+            tipo='pelicula',
+            imagen_portada__isnull=False
+        ).order_by(F('estadisticas__total_reproducciones').desc(nulls_last=True), '-id')[:6],
+        **METRICAS_REPRODUCCIONES
+    )
+
+    # Si no hay suficientes películas, agregar series
+    if len(live_action) < 6:
+        live_action += _filas(
+            Contenido.objects.filter(
+                imagen_portada__isnull=False
+            ).exclude(
+                id__in=[fila['id'] for fila in live_action]
+            ).order_by('-id')[:6 - len(live_action)]
+        )
+    return live_action
+
+
+def _contenido_sidebar_mas_visto():
+    return _filas(
+        Contenido.objects.filter(
+            estadisticas__total_reproducciones__gt=0,
+            imagen_portada__isnull=False
+        ).order_by('-estadisticas__total_reproducciones')[:4],
+        **METRICAS_REPRODUCCIONES
+    )
+
+
+def _nuevo_contenido_sidebar():
+    return _filas(Contenido.objects.filter(imagen_portada__isnull=False).order_by('-id')[:4])
+
+
+# Dependencias que invalidan cada estante
+CATALOGO = 'catalogo'
+REPRODUCCIONES = 'reproducciones'
+CALIFICACIONES = 'calificaciones'
+TENDENCIAS = 'tendencias'
+POPULARIDAD = 'popularidad'
+
+# nombre del estante -> (función de cálculo, dependencias)
+ESTANTES = {
+    'contenidos_recientes': (_contenidos_recientes, {CATALOGO}),
+    'contenido_popular': (_contenido_popular, {CATALOGO, REPRODUCCIONES}),
+    'categorias_populares': (_categorias_populares, {CATALOGO}),
+    'terminos_mas_buscados': (_terminos_mas_buscados, {TENDENCIAS}),
+    'contenido_mas_buscado': (_contenido_mas_buscado, {CATALOGO, TENDENCIAS}),
+    'contenido_mas_visto': (_contenido_mas_visto, {CATALOGO, REPRODUCCIONES, CALIFICACIONES}),
+    'contenido_mas_gustado': (_contenido_mas_gustado, {CATALOGO, CALIFICACIONES}),
+    'contenido_mejor_valorado': (_contenido_mejor_valorado, {CATALOGO, CALIFICACIONES}),
+    'contenido_destacado': (_contenido_destacado, {CATALOGO, POPULARIDAD}),
+    'contenido_agregado_recientemente': (_contenido_agregado_recientemente, {CATALOGO, REPRODUCCIONES}),
+    'contenido_live_action': (_contenido_live_action, {CATALOGO, REPRODUCCIONES}),
+    'contenido_sidebar_mas_visto': (_contenido_sidebar_mas_visto, {CATALOGO, REPRODUCCIONES}),
+    'nuevo_contenido_sidebar': (_nuevo_contenido_sidebar, {CATALOGO}),
+}
+
+# Estantes que no son listas de Contenido
+ESTANTES_SIN_CONTENIDO = {'categorias_populares', 'terminos_mas_buscados'}
+
+
+def _ttl():
+    return getattr(settings, 'ESTANTES_TTL', 900)
+
+
+def _refresco_minimo():
+    return getattr(settings, 'ESTANTES_REFRESCO_MINIMO', 60)
+
+
+def construir_estante(nombre: str) -> Dict:
+    """Calcular un estante y guardarlo en la cache"""
+    funcion, _ = ESTANTES[nombre]
+    entrada = {'generado': time.time(), 'filas': funcion()}
+    cache.set(PREFIJO_CACHE + nombre, entrada, _ttl())
+    cache.delete(PREFIJO_SUCIO + nombre)
+    return entrada
+
+
+def reconstruir_estantes(nombres=None) -> Dict[str, Dict]:
+    """Reconstruir los estantes indicados (todos por defecto)"""
+    return {nombre: construir_estante(nombre) for nombre in (nombres or ESTANTES)}
+
+
+def estantes_dependientes(dependencia: str) -> List[str]:
+    """Nombres de los estantes que dependen de una tabla"""
+    return [nombre for nombre, (_, dependencias) in ESTANTES.items() if dependencia in dependencias]
+
+
+def marcar_estantes_sucios(dependencia: str):
+    """Marcar como desactualizados los estantes que dependen de una tabla"""
+    cache.set_many({PREFIJO_SUCIO + nombre: True for nombre in estantes_dependientes(dependencia)}, _ttl())
+
+
+def leer_cache_estantes() -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    Leer todos los estantes con una sola lectura.
+    Devuelve el snapshot y los nombres de los estantes vencidos o ausentes.
+    """
+    claves = [PREFIJO_CACHE + nombre for nombre in ESTANTES]
+    claves += [PREFIJO_SUCIO + nombre for nombre in ESTANTES]
+    datos = cache.get_many(claves)
+
+    ahora = time.time()
+    snapshot, vencidos = {}, []
+    for nombre in ESTANTES:
+        entrada = datos.get(PREFIJO_CACHE + nombre)
+        sucio = datos.get(PREFIJO_SUCIO + nombre)
+        if entrada is None or (sucio and ahora - entrada['generado'] >= _refresco_minimo()):
+            vencidos.append(nombre)
+        snapshot[nombre] = entrada
+    return snapshot, vencidos
+
+
+def firma_estantes(request=None) -> Optional[Tuple[str, datetime]]:
+    """
+    Firma del snapshot actual para el ETag de la página principal.
+    Devuelve None si algún estante está vencido (la vista lo reconstruirá).
+    """
+    snapshot, vencidos = leer_cache_estantes()
+    if vencidos:
+        return None
+    generados = [snapshot[nombre]['generado'] for nombre in ESTANTES]
+    token = ','.join(f'{generado:.6f}' for generado in generados)
+    return token, datetime.fromtimestamp(max(generados), tz=dt_timezone.utc)
+
+
+def construir_estante_seguro(nombre: str, anterior: Optional[Dict] = None) -> Dict:
+    """Reconstruir un estante conservando la versión anterior si falla"""
+    try:
+        return construir_estante(nombre)
+    except Exception as e:
+        logger.error(f"Error al construir el estante {nombre}: {e}")
+        return anterior or {'generado': time.time(), 'filas': []}
+
+
+def _leer_snapshot() -> Dict[str, Dict]:
+    """Leer todos los estantes y recalcular los vencidos"""
+    snapshot, vencidos = leer_cache_estantes()
+    for nombre in vencidos:
+        anterior = snapshot[nombre]
+        if anterior is not None and not cache.add(PREFIJO_BLOQUEO + nombre, True, BLOQUEO_TTL):
+            continue  # Otro proceso lo está reconstruyendo: servir la versión anterior
+        try:
+            snapshot[nombre] = construir_estante_seguro(nombre, anterior)
+        finally:
+            if anterior is not None:
+                cache.delete(PREFIJO_BLOQUEO + nombre)
+    return snapshot
+
+
+def obtener_estantes() -> Dict[str, list]:
+    """
+    Devuelve el contexto de estantes de la página principal listo para la plantilla
+    """
+    return hidratar_estantes(_leer_snapshot())
+
+
+def hidratar_estantes(snapshot: Dict[str, Dict]) -> Dict[str, list]:
+    """Convertir un snapshot de estantes en objetos listos para la plantilla"""
+    # Tarjetas del catálogo compacto en memoria: sin consultas para hidratar
+    catalogo = obtener_catalogo()
+
+    context = {}
+    for nombre, entrada in snapshot.items():
+        if nombre == 'categorias_populares':
+            categorias = []
+            for fila in entrada['filas']:
+                categoria = Categoria(id=fila['id'], nombre=fila['nombre'])
+                categoria.total_contenido = fila['total_contenido']
+                categorias.append(categoria)
+            context[nombre] = categorias
+            continue
+        if nombre in ESTANTES_SIN_CONTENIDO:
+            context[nombre] = entrada['filas']
+            continue
+
+        estante = []
+        for fila in entrada['filas']:
+            # Cada estante tiene su propia tarjeta con sus métricas
+            extras = {campo: valor for campo, valor in fila.items() if campo != 'id'}
+            tarjeta = catalogo.tarjeta(fila['id'], **extras)
+            if tarjeta is not None:  # None si se eliminó después de generar el snapshot
+                estante.append(tarjeta)
+        context[nombre] = estante
+    return context
@@ -0,0 +1,240 @@
+"""
+Evaluación offline de las estrategias de recomendación
+
+``generar_dataset`` crea un catálogo y una base de perfiles sintéticos con
+gustos por categoría y popularidad de cola larga, y reparte sus
+interacciones con un corte temporal: lo anterior al corte se guarda como
+historial (entrenamiento) y lo posterior se reserva como lo que cada perfil
+"verá después" (prueba). ``evaluar`` ejecuta cada estrategia de
+``SistemaRecomendaciones`` sobre una muestra de perfiles y mide:
+
+- calidad: precision@k, recall@k y cobertura del catálogo
+- coste: latencia p50/p95/p99 y consultas SQL por llamada, y para el
+  pipeline completo la latencia de cada etapa
+
+Todo depende de la semilla, así que dos ejecuciones con los mismos
+parámetros son comparables. ``manage.py evaluar_recomendaciones`` lo
+ejecuta en una base de datos de prueba temporal.
+"""
+import logging
+import math
+import random
+import tempfile
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Set
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from . import catalogo_compacto, versiones
+from .contadores import recalcular_contadores
+from .factorizacion import entrenar_modelo
+from .gustos import reconstruir_gustos
+from .models import (Calificacion, Categoria, Contenido, ContenidoCategoria, Favorito, HistorialReproduccion,
+                     Perfil)
+from .pipeline import ResultadoPipeline
+from .popularidad import actualizar_popularidad
+from .recommendations import SistemaRecomendaciones
+
+logger = logging.getLogger(__name__)
+
+# Nombre -> método de SistemaRecomendaciones que devuelve la lista de contenidos
+ESTRATEGIAS = {
+    'colaborativas': '_recomendaciones_colaborativas',
+    'historial': '_recomendaciones_por_historial',
+    'rating': '_recomendaciones_por_rating',
+    'categorias': '_recomendaciones_por_categorias',
+    'populares': '_recomendaciones_populares',
+    'combinada': 'ejecutar_pipeline',  # Pipeline completo, con tiempos por etapa
+}
+
+PROBABILIDAD_GUSTO = 0.8  # Interacciones dentro de las categorías preferidas del perfil
+PROBABILIDAD_FAVORITO = 0.15
+PROBABILIDAD_CALIFICACION = 0.3
+EXPONENTE_POPULARIDAD = 0.8  # Peso 1 / puesto^s de cada contenido
+
+
+def percentil(valores: Sequence[float], p: float) -> float:
+    """Percentil por rango más cercano (p entre 0 y 100)"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class _Selector:
+    """Elección ponderada por popularidad con pesos acumulados (O(log n) por elección)"""
+
+    def __init__(self, ids: List[int], pesos: Dict[int, float]):
+        self.ids = ids
+        self.acumulados = list(accumulate(pesos[contenido_id] for contenido_id in ids))
+
+    def elegir(self, rng: random.Random) -> int:
+        return self.ids[bisect_right(self.acumulados, rng.random() * self.acumulados[-1])]
+
+
+def generar_dataset(perfiles: int = 500, contenidos: int = 2000, categorias: int = 20,
+                    interacciones: int = 30, fraccion_prueba: float = 0.2, dias: int = 90,
+                    semilla: int = 42) -> Dict[int, Set[int]]:
+    """
+    Poblar la base de datos con datos sintéticos. Las interacciones anteriores al corte
+    temporal se guardan; devuelve las posteriores como {perfil_id: contenidos de prueba}.
+    """
+    rng = random.Random(semilla)
+    inicio = time.perf_counter()
+
+    lista_categorias = Categoria.objects.bulk_create([
+        Categoria(nombre=f'Sintética {semilla}-{i}') for i in range(categorias)
+    ])
+    tipos = [valor for valor, _ in Contenido.TIPO_CHOICES]
+    catalogo = Contenido.objects.bulk_create([
+        Contenido(titulo=f'Sintético {i}', tipo=rng.choice(tipos), año=rng.randint(1990, 2025),
+                  anilist_score=round(rng.uniform(50, 95), 2))
+        for i in range(contenidos)
+    ], batch_size=1000)
+    ids = [contenido.id for contenido in catalogo]
+
+    por_categoria = defaultdict(list)
+    relaciones = []
+    for contenido_id in ids:
+        for categoria in rng.sample(lista_categorias, rng.randint(1, 3)):
+            por_categoria[categoria.id].append(contenido_id)
+            relaciones.append(ContenidoCategoria(contenido_id=contenido_id, categoria_id=categoria.id))
+    ContenidoCategoria.objects.bulk_create(relaciones, batch_size=1000)
+
+    puestos = ids[:]
+    rng.shuffle(puestos)
+    pesos = {contenido_id: 1 / (puesto + 1) ** EXPONENTE_POPULARIDAD for puesto, contenido_id in enumerate(puestos)}
+    todo_el_catalogo = _Selector(ids, pesos)
+    selectores = {categoria_id: _Selector(miembros, pesos) for categoria_id, miembros in por_categoria.items()}
+
+    usuarios = User.objects.bulk_create([
+        User(username=f'sintetico_{semilla}_{i}') for i in range(perfiles)
+    ], batch_size=1000)
+    lista_perfiles = Perfil.objects.bulk_create([
+        Perfil(usuario=usuario, nombre=f'Sintético {i}', tipo='adulto') for i, usuario in enumerate(usuarios)
+    ], batch_size=1000)
+
+    # (momento en días, perfil, contenido, preferido)
+    eventos = []
+    for perfil in lista_perfiles:
+        preferidas = rng.sample(sorted(selectores), min(rng.randint(2, 3), len(selectores)))
+        elegidos = set()
+        for _ in range(interacciones * 3):
+            if len(elegidos) >= min(interacciones, len(ids)):
+                break
+            preferido = rng.random() < PROBABILIDAD_GUSTO
+            selector = selectores[rng.choice(preferidas)] if preferido else todo_el_catalogo
+            contenido_id = selector.elegir(rng)
+            if contenido_id not in elegidos:
+                elegidos.add(contenido_id)
+                eventos.append((rng.uniform(0, dias), perfil.id, contenido_id, preferido))
+
+    eventos.sort()
+    corte = int(len(eventos) * (1 - fraccion_prueba))
+    historial, favoritos, calificaciones = [], [], []
+    for _, perfil_id, contenido_id, preferido in eventos[:corte]:
+        historial.append(HistorialReproduccion(perfil_id=perfil_id, contenido_id=contenido_id,
+                                               tiempo_reproducido=rng.randint(60, 1500)))
+        if rng.random() < PROBABILIDAD_FAVORITO:
+            favoritos.append(Favorito(perfil_id=perfil_id, contenido_id=contenido_id))
+        if rng.random() < PROBABILIDAD_CALIFICACION:
+            valor = rng.randint(4, 5) if preferido else rng.randint(1, 3)
+            calificaciones.append(Calificacion(perfil_id=perfil_id, contenido_id=contenido_id, calificacion=valor))
+    HistorialReproduccion.objects.bulk_create(historial, batch_size=1000)
+    Favorito.objects.bulk_create(favoritos, batch_size=1000)
+    Calificacion.objects.bulk_create(calificaciones, batch_size=1000)
+
+    prueba = defaultdict(set)
+    for _, perfil_id, contenido_id, _ in eventos[corte:]:
+        prueba[perfil_id].add(contenido_id)
+
+    logger.info(f"Dataset sintético: {contenidos} contenidos, {perfiles} perfiles, {corte} interacciones de "
+                f"entrenamiento y {len(eventos) - corte} de prueba ({time.perf_counter() - inicio:.1f}s)")
+    return dict(prueba)
+
+
+def preparar_derivados():
+    """
+    Reconstruir lo que las señales mantienen en vivo (``bulk_create`` no las emite):
+    contadores, popularidad, afinidades y catálogo compacto
+    """
+    recalcular_contadores()
+    actualizar_popularidad()
+    reconstruir_gustos()
+    versiones.incrementar_version(versiones.CATALOGO)
+    catalogo_compacto.invalidar()
+
+
+def evaluar(prueba: Dict[int, Set[int]], k: int = 10, muestra: int = 200, semilla: int = 42,
+            estrategias: Optional[Sequence[str]] = None, iteraciones_colaborativo: int = 10) -> Dict[str, Dict]:
+    """
+    Ejecutar cada estrategia para una muestra de perfiles con datos de prueba y
+    devolver {estrategia: métricas}. El modelo colaborativo se entrena con los
+    datos actuales en un directorio temporal.
+    """
+    estrategias = list(estrategias or ESTRATEGIAS)
+    rng = random.Random(semilla)
+    perfil_ids = sorted(perfil_id for perfil_id, items in prueba.items() if items)
+    perfil_ids = sorted(rng.sample(perfil_ids, min(muestra, len(perfil_ids))))
+    perfiles = Perfil.objects.in_bulk(perfil_ids)
+    total_catalogo = Contenido.objects.count()
+
+    with tempfile.TemporaryDirectory() as directorio, \
+            override_settings(RECOMENDADOR_DIR=directorio), \
+            override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                  'LOCATION': 'evaluacion-recomendaciones'}}):
+        if 'colaborativas' in estrategias:
+            entrenar_modelo(iteraciones=iteraciones_colaborativo)
+
+        resultados = {}
+        for nombre in estrategias:
+            random.seed(semilla)  # Las estrategias barajan con el módulo random
+            tiempos, consultas, precisiones, recuerdos = [], [], [], []
+            recomendados = set()
+            por_etapa = defaultdict(list)
+            for perfil_id in perfil_ids:
+                sistema = SistemaRecomendaciones(perfiles[perfil_id])
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    lista = getattr(sistema, ESTRATEGIAS[nombre])(k)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas))
+                if isinstance(lista, ResultadoPipeline):
+                    for medicion in lista.mediciones:
+                        por_etapa[medicion['etapa']].append(medicion)
+                    lista = lista.contenidos
+
+                ids = [contenido.id for contenido in lista][:k]
+                recomendados.update(ids)
+                aciertos = len(prueba[perfil_id].intersection(ids))
+                precisiones.append(aciertos / k)
+                recuerdos.append(aciertos / len(prueba[perfil_id]))
+
+            evaluados = len(perfil_ids) or 1
+            resultados[nombre] = {
+                'perfiles': len(perfil_ids),
+                'precision': sum(precisiones) / evaluados,
+                'recall': sum(recuerdos) / evaluados,
+                'cobertura': len(recomendados) / total_catalogo if total_catalogo else 0.0,
+                'p50_ms': percentil(tiempos, 50),
+                'p95_ms': percentil(tiempos, 95),
+                'p99_ms': percentil(tiempos, 99),
+                'consultas_media': sum(consultas) / evaluados,
+                'consultas_max': max(consultas, default=0),
+                'etapas': {
+                    etapa: {
+                        'p50_ms': percentil([medicion['ms'] for medicion in mediciones], 50),
+                        'p95_ms': percentil([medicion['ms'] for medicion in mediciones], 95),
+                        'salida_media': sum(medicion['salida'] for medicion in mediciones) / len(mediciones),
+                    }
+                    for etapa, mediciones in por_etapa.items()
+                },
+            }
+    # El catálogo y el modelo de este proceso se construyeron con los datos sintéticos
+    catalogo_compacto.invalidar()
+    return resultados
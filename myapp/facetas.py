@@ -0,0 +1,123 @@
+"""
+Navegación facetada del catálogo
+
+``ConteoFaceta`` guarda cuántos contenidos hay por categoría × tipo × década
+y se mantiene de forma incremental desde las señales de Contenido y
+ContenidoCategoria. Los conteos de cada faceta para los filtros activos se
+leen de esa tabla pequeña en lugar de agregar el catálogo en cada cambio de
+filtro. ``manage.py reconstruir_facetas`` la recalcula desde cero.
+"""
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Categoria, Contenido, ContenidoCategoria, ConteoFaceta
+
+logger = logging.getLogger(__name__)
+
+# (categoria_id o None, tipo, decada o None)
+ClaveFaceta = Tuple[Optional[int], str, Optional[int]]
+
+
+def decada(año: Optional[int]) -> Optional[int]:
+    return año // 10 * 10 if año else None
+
+
+def claves_contenido(tipo: str, año: Optional[int], categoria_ids: Iterable[int] = (), total: bool = True) -> List[ClaveFaceta]:
+    """Claves de faceta a las que contribuye un contenido"""
+    bucket = decada(año)
+    claves = [(categoria_id, tipo, bucket) for categoria_id in categoria_ids]
+    if total:
+        claves.append((None, tipo, bucket))
+    return claves
+
+
+def ajustar_conteos(cambios: Dict[ClaveFaceta, int]):
+    """Aplicar incrementos atómicos a los conteos de faceta"""
+    for (categoria_id, tipo, bucket), delta in cambios.items():
+        if not delta:
+            continue
+        actualizados = ConteoFaceta.objects.filter(
+            categoria_id=categoria_id, tipo=tipo, decada=bucket
+        ).update(total=F('total') + delta)
+        if not actualizados and delta > 0:
+            conteo, creado = ConteoFaceta.objects.get_or_create(
+                categoria_id=categoria_id, tipo=tipo, decada=bucket, defaults={'total': delta}
+            )
+            if not creado:
+                ConteoFaceta.objects.filter(pk=conteo.pk).update(total=F('total') + delta)
+
+
+def sumar(claves: Iterable[ClaveFaceta], signo: int):
+    ajustar_conteos(Counter({clave: signo for clave in claves}))
+
+
+def reconstruir_facetas() -> int:
+    """Recalcular todos los conteos desde el catálogo. Devuelve el número de filas"""
+    conteos = Counter()
+    for fila in Contenido.objects.values('tipo', 'año').annotate(total=Count('id')):
+        conteos[(None, fila['tipo'], decada(fila['año']))] += fila['total']
+
+    relaciones = ContenidoCategoria.objects.values(
+        'categoria_id', 'contenido__tipo', 'contenido__año'
+    ).annotate(total=Count('id'))
+    for fila in relaciones:
+        conteos[(fila['categoria_id'], fila['contenido__tipo'], decada(fila['contenido__año']))] += fila['total']
+
+    with transaction.atomic():
+        ConteoFaceta.objects.all().delete()
+        ConteoFaceta.objects.bulk_create([
+            ConteoFaceta(categoria_id=categoria_id, tipo=tipo, decada=bucket, total=total)
+            for (categoria_id, tipo, bucket), total in conteos.items() if total
+        ], batch_size=500)
+    logger.info(f"Facetas reconstruidas: {len(conteos)} conteos")
+    return len(conteos)
+
+
+def _agrupar(campo: str, **filtros) -> Dict:
+    filas = ConteoFaceta.objects.filter(**filtros).values(campo).annotate(suma=Sum('total'))
+    return {fila[campo]: fila['suma'] for fila in filas if fila['suma']}
+
+
+def conteos_facetas(categoria_id: Optional[int] = None, tipo: Optional[str] = None,
+                    bucket: Optional[int] = None) -> Dict[str, list]:
+    """
+    Conteos de cada faceta aplicando los demás filtros activos
+    (el filtro de la propia faceta no se aplica, para mostrar las alternativas).
+    """
+    filtro_tipo = {'tipo': tipo} if tipo else {}
+    filtro_decada = {'decada': bucket} if bucket else {}
+
+    por_categoria = _agrupar('categoria_id', categoria__isnull=False, **filtro_tipo, **filtro_decada)
+    por_tipo = _agrupar('tipo', categoria_id=categoria_id, **filtro_decada)
+    por_decada = _agrupar('decada', categoria_id=categoria_id, **filtro_tipo)
+
+    categorias = Categoria.objects.filter(id__in=por_categoria).order_by('nombre')
+    nombres_tipo = dict(Contenido.TIPO_CHOICES)
+    return {
+        'categorias': [{'id': c.id, 'nombre': c.nombre, 'total': por_categoria[c.id]} for c in categorias],
+        'tipos': [{'valor': valor, 'nombre': nombres_tipo.get(valor, valor), 'total': total}
+                  for valor, total in sorted(por_tipo.items())],
+        'decadas': [{'valor': valor, 'total': total}
+                    for valor, total in sorted(por_decada.items(), key=lambda item: item[0] or 0, reverse=True)
+                    if valor is not None],
+    }
+
+
+def filtrar_catalogo(categoria_id: Optional[int] = None, tipo: Optional[str] = None, bucket: Optional[int] = None):
+    contenidos = Contenido.objects.all()
+    if categoria_id:
+        contenidos = contenidos.filter(categorias__id=categoria_id)
+    if tipo:
+        contenidos = contenidos.filter(tipo=tipo)
+    if bucket:
+        contenidos = contenidos.filter(año__gte=bucket, año__lt=bucket + 10)
+    return contenidos
+
+
+def navegar(categoria_id: Optional[int] = None, tipo: Optional[str] = None, bucket: Optional[int] = None):
+    """Devuelve el queryset filtrado y los conteos de faceta para los mismos filtros"""
+    return filtrar_catalogo(categoria_id, tipo, bucket), conteos_facetas(categoria_id, tipo, bucket)
@@ -0,0 +1,265 @@
+"""
+Filtrado colaborativo por factorización de matrices (ALS implícito)
+
+Las reproducciones, favoritos y calificaciones positivas forman una matriz
+dispersa perfil × contenido de "confianza" ``c = 1 + alpha * r`` (Hu, Koren y
+Volinsky, 2008). ``manage.py entrenar_recomendador`` la factoriza offline con
+mínimos cuadrados alternos en NumPy: cada media iteración aproxima, por
+lotes de filas, el sistema f × f de cada fila con gradiente conjugado usando
+solo sus entradas no nulas, así que el coste crece con el número de
+interacciones y no con perfiles × catálogo.
+
+Los factores se guardan como ``.npy`` y se abren con ``mmap_mode='r'``: los
+procesos web comparten las páginas del fichero en lugar de copiarlas. La
+puntuación de un perfil es un producto ``Q @ x`` seguido de un top-k. Cada
+entrenamiento escribe en su propio directorio temporal y la sustitución se
+serializa con un bloqueo de fichero, como el índice de ``embeddings.py``.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from filelock import FileLock
+
+from .models import Calificacion, Favorito, HistorialReproduccion
+from .versiones import RECOMENDADORES, incrementar_version
+
+logger = logging.getLogger(__name__)
+
+PESOS_POR_DEFECTO = {'reproduccion': 1.0, 'favorito': 3.0, 'calificacion_positiva': 2.0}
+CALIFICACION_POSITIVA = 4
+ELEMENTOS_POR_LOTE = 1 << 24  # no nulos del lote × factores (acota las matrices densas del lote)
+
+
+def _directorio() -> str:
+    return str(getattr(settings, 'RECOMENDADOR_DIR', os.path.join(settings.BASE_DIR, 'modelos', 'als')))
+
+
+def _pesos() -> Dict[str, float]:
+    return getattr(settings, 'RECOMENDADOR_PESOS', PESOS_POR_DEFECTO)
+
+
+class MatrizDispersa:
+    """Matriz CSR mínima (indptr, columnas, valores) con las filas ordenadas"""
+
+    def __init__(self, filas: np.ndarray, columnas: np.ndarray, valores: np.ndarray,
+                 total_filas: int, total_columnas: int):
+        # Ordenar por (fila, columna) y sumar duplicados
+        claves, inversa = np.unique(filas.astype(np.int64) * total_columnas + columnas, return_inverse=True)
+        self.valores = np.bincount(inversa, weights=valores).astype(np.float32)
+        filas, self.columnas = np.divmod(claves, total_columnas)
+        self.indptr = np.zeros(total_filas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(filas, minlength=total_filas), out=self.indptr[1:])
+        self.forma = (total_filas, total_columnas)
+        self._filas = filas
+
+    @property
+    def no_nulos(self) -> int:
+        return len(self.valores)
+
+    def transpuesta(self) -> 'MatrizDispersa':
+        return MatrizDispersa(self.columnas, self._filas, self.valores, self.forma[1], self.forma[0])
+
+
+def matriz_interacciones(pesos: Optional[Dict[str, float]] = None) -> Tuple[MatrizDispersa, np.ndarray, np.ndarray]:
+    """Matriz perfil × contenido con la fuerza de cada interacción. Devuelve (matriz, perfil_ids, contenido_ids)"""
+    pesos = pesos or _pesos()
+    fuentes = [
+        (HistorialReproduccion.objects.values_list('perfil_id', 'contenido_id'), pesos.get('reproduccion', 0)),
+        (Favorito.objects.values_list('perfil_id', 'contenido_id'), pesos.get('favorito', 0)),
+        (Calificacion.objects.filter(calificacion__gte=CALIFICACION_POSITIVA).values_list('perfil_id', 'contenido_id'),
+         pesos.get('calificacion_positiva', 0)),
+    ]
+    pares, valores = [], []
+    for consulta, peso in fuentes:
+        if peso:
+            filas = np.array(list(consulta.iterator(chunk_size=10000)), dtype=np.int64).reshape(-1, 2)
+            pares.append(filas)
+            valores.append(np.full(len(filas), peso, dtype=np.float32))
+    pares = np.concatenate(pares) if pares else np.zeros((0, 2), dtype=np.int64)
+    valores = np.concatenate(valores) if valores else np.zeros(0, dtype=np.float32)
+
+    perfil_ids, filas = np.unique(pares[:, 0], return_inverse=True)
+    contenido_ids, columnas = np.unique(pares[:, 1], return_inverse=True)
+    matriz = MatrizDispersa(filas, columnas, valores, len(perfil_ids), len(contenido_ids))
+    return matriz, perfil_ids, contenido_ids
+
+
+def _sumar_por_fila(valores: np.ndarray, segmentos: np.ndarray, con_datos: np.ndarray, filas: int) -> np.ndarray:
+    """Sumar las entradas de cada fila (CSR ordenado); las filas vacías quedan a cero"""
+    resultado = np.zeros((filas, valores.shape[1]), dtype=np.float32)
+    if len(con_datos):
+        resultado[con_datos] = np.add.reduceat(valores, segmentos, axis=0)
+    return resultado
+
+
+def _resolver(matriz: MatrizDispersa, fijos: np.ndarray, actuales: np.ndarray, alpha: float,
+              regularizacion: float, pasos: int = 3) -> np.ndarray:
+    """
+    Media iteración de ALS implícito: para cada fila u aproximar la solución de
+    (YᵀY + Yᵀ(C_u − I)Y + λI) x_u = Yᵀ C_u p_u (p_u = 1 en sus columnas) con unos
+    pocos pasos de gradiente conjugado partiendo de ``actuales``. Cada paso cuesta
+    O(no nulos × factores), sin formar una matriz f × f por fila.
+    """
+    factores = fijos.shape[1]
+    resultado = actuales.copy()
+    base = fijos.T @ fijos + regularizacion * np.eye(factores, dtype=np.float32)
+    maximo_no_nulos = max(1, ELEMENTOS_POR_LOTE // factores)
+
+    desde = 0
+    while desde < matriz.forma[0]:
+        hasta = int(np.searchsorted(matriz.indptr, matriz.indptr[desde] + maximo_no_nulos, side='right')) - 1
+        hasta = min(max(hasta, desde + 1), matriz.forma[0])
+        inicio, fin = matriz.indptr[desde], matriz.indptr[hasta]
+        longitudes = np.diff(matriz.indptr[desde:hasta + 1])
+        con_datos = np.flatnonzero(longitudes)
+        segmentos = (matriz.indptr[desde:hasta] - inicio)[con_datos]
+        filas = np.repeat(np.arange(hasta - desde), longitudes)
+        y = fijos[matriz.columnas[inicio:fin]]
+        extra = alpha * matriz.valores[inicio:fin]  # c - 1
+
+        def producto(v):
+            # (YᵀY + λI) v + Yᵀ(C − I)Y v, fila a fila
+            cercania = extra * np.einsum('ij,ij->i', y, v[filas])
+            return v @ base + _sumar_por_fila(cercania[:, None] * y, segmentos, con_datos, hasta - desde)
+
+        x = resultado[desde:hasta]
+        residuo = _sumar_por_fila((1 + extra)[:, None] * y, segmentos, con_datos, hasta - desde) - producto(x)
+        direccion = residuo.copy()
+        norma = np.einsum('ij,ij->i', residuo, residuo)
+        for _ in range(pasos):
+            a_direccion = producto(direccion)
+            curvatura = np.einsum('ij,ij->i', direccion, a_direccion)
+            paso = np.divide(norma, curvatura, out=np.zeros_like(norma), where=curvatura > 0)
+            x += paso[:, None] * direccion
+            residuo -= paso[:, None] * a_direccion
+            nueva_norma = np.einsum('ij,ij->i', residuo, residuo)
+            beta = np.divide(nueva_norma, norma, out=np.zeros_like(norma), where=norma > 0)
+            direccion = residuo + beta[:, None] * direccion
+            norma = nueva_norma
+        desde = hasta
+    return resultado
+
+
+def entrenar(matriz: MatrizDispersa, factores: int = 32, iteraciones: int = 10, regularizacion: float = 0.1,
+             alpha: float = 10.0, semilla: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Factorizar la matriz de interacciones. Devuelve (factores de perfil, factores de contenido)"""
+    rng = np.random.default_rng(semilla)
+    perfiles = (rng.standard_normal((matriz.forma[0], factores)) * 0.01).astype(np.float32)
+    contenidos = (rng.standard_normal((matriz.forma[1], factores)) * 0.01).astype(np.float32)
+    transpuesta = matriz.transpuesta()
+    for _ in range(iteraciones):
+        perfiles = _resolver(matriz, contenidos, perfiles, alpha, regularizacion)
+        contenidos = _resolver(transpuesta, perfiles, contenidos, alpha, regularizacion)
+    return perfiles, contenidos
+
+
+def bloqueo_escritura() -> FileLock:
+    """Bloqueo de fichero que serializa los entrenamientos que guardan el modelo (cron y manuales)"""
+    directorio = _directorio()
+    os.makedirs(os.path.dirname(directorio) or '.', exist_ok=True)
+    return FileLock(directorio + '.lock', is_singleton=True)
+
+
+def guardar_modelo(perfiles: np.ndarray, contenidos: np.ndarray, perfil_ids: np.ndarray,
+                   contenido_ids: np.ndarray, metadatos: Optional[Dict] = None):
+    """Escribir el modelo en un directorio temporal propio y sustituir el actual de una vez"""
+    directorio = _directorio()
+    padre, nombre = os.path.split(directorio)
+    os.makedirs(padre or '.', exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=nombre + '.', suffix='.tmp', dir=padre or '.')
+    np.save(os.path.join(temporal, 'perfiles.npy'), perfiles)
+    np.save(os.path.join(temporal, 'contenidos.npy'), contenidos)
+    np.save(os.path.join(temporal, 'perfil_ids.npy'), perfil_ids)
+    np.save(os.path.join(temporal, 'contenido_ids.npy'), contenido_ids)
+    with open(os.path.join(temporal, 'modelo.json'), 'w') as archivo:
+        json.dump({'entrenado': timezone.now().isoformat(), **(metadatos or {})}, archivo)
+
+    with bloqueo_escritura():
+        anterior = temporal[:-len('.tmp')] + '.old'
+        if os.path.exists(directorio):
+            os.replace(directorio, anterior)
+        os.replace(temporal, directorio)
+    shutil.rmtree(anterior, ignore_errors=True)
+    # Las recomendaciones de las páginas con ETag cambian: invalidarlo
+    incrementar_version(RECOMENDADORES)
+
+
+def entrenar_modelo(factores: int = 32, iteraciones: int = 10, regularizacion: float = 0.1,
+                    alpha: float = 10.0) -> Dict:
+    """Construir la matriz, entrenar y guardar. Devuelve un resumen del entrenamiento"""
+    inicio = time.perf_counter()
+    matriz, perfil_ids, contenido_ids = matriz_interacciones()
+    carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    perfiles, contenidos = entrenar(matriz, factores, iteraciones, regularizacion, alpha)
+    duracion = time.perf_counter() - inicio
+
+    resumen = {
+        'perfiles': len(perfil_ids), 'contenidos': len(contenido_ids), 'interacciones': matriz.no_nulos,
+        'factores': factores, 'iteraciones': iteraciones, 'carga_segundos': round(carga, 2),
+        'entrenamiento_segundos': round(duracion, 2),
+        'bytes_factores': perfiles.nbytes + contenidos.nbytes,
+    }
+    guardar_modelo(perfiles, contenidos, perfil_ids, contenido_ids, resumen)
+    logger.info(f"Recomendador entrenado: {resumen}")
+    return resumen
+
+
+class ModeloFactorizado:
+    """Factores abiertos como memoria mapeada (solo lectura)"""
+
+    def __init__(self, directorio: str):
+        self.perfiles = np.load(os.path.join(directorio, 'perfiles.npy'), mmap_mode='r')
+        self.contenidos = np.load(os.path.join(directorio, 'contenidos.npy'), mmap_mode='r')
+        self.perfil_ids = np.load(os.path.join(directorio, 'perfil_ids.npy'))
+        self.contenido_ids = np.load(os.path.join(directorio, 'contenido_ids.npy'))
+
+    def _posiciones(self, ids_ordenados: np.ndarray, ids: Iterable[int]) -> np.ndarray:
+        ids = np.fromiter(ids, dtype=np.int64)
+        posiciones = np.searchsorted(ids_ordenados, ids)
+        validas = posiciones < len(ids_ordenados)
+        validas[validas] &= ids_ordenados[posiciones[validas]] == ids[validas]
+        return posiciones[validas]
+
+    def recomendar(self, perfil_id: int, excluir: Iterable[int] = (), limite: int = 10) -> List[int]:
+        """Ids de los contenidos con mayor puntuación para el perfil (vacío si el perfil no está en el modelo)"""
+        fila = self._posiciones(self.perfil_ids, [perfil_id])
+        if not len(fila) or not len(self.contenido_ids):
+            return []
+        puntuaciones = self.contenidos @ self.perfiles[fila[0]]
+        puntuaciones[self._posiciones(self.contenido_ids, excluir)] = -np.inf
+        k = min(limite, len(puntuaciones))
+        mejores = np.argpartition(-puntuaciones, k - 1)[:k]
+        mejores = mejores[np.argsort(-puntuaciones[mejores], kind='stable')]
+        return [int(self.contenido_ids[i]) for i in mejores if np.isfinite(puntuaciones[i])]
+
+
+_modelo: Optional[ModeloFactorizado] = None
+_modelo_firma = None
+
+
+def obtener_modelo() -> Optional[ModeloFactorizado]:
+    """Modelo actual (se vuelve a abrir si el entrenamiento lo sustituyó). None si aún no se ha entrenado"""
+    global _modelo, _modelo_firma
+    try:
+        estado = os.stat(os.path.join(_directorio(), 'modelo.json'))
+    except FileNotFoundError:
+        return None
+    firma = (estado.st_ino, estado.st_mtime_ns)
+    if _modelo is None or _modelo_firma != firma:
+        try:
+            _modelo = ModeloFactorizado(_directorio())
+            _modelo_firma = firma
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo abrir el modelo de recomendaciones: {e}")
+            return None
+    return _modelo
@@ -0,0 +1,148 @@
+"""
+Afinidad de cada perfil por categoría
+
+Las estrategias de recomendación necesitan las categorías preferidas del
+perfil. En lugar de agregar Categoria → contenidos → historial / favoritos /
+calificaciones en cada petición, ``AfinidadCategoria`` guarda una puntuación
+por perfil y categoría que las señales actualizan con incrementos ``F()``
+sobre las categorías del contenido afectado. Leerlas es una consulta por el
+índice (perfil, -puntuacion).
+
+El decaimiento temporal es "hacia adelante": cada interacción suma
+``peso * 2^((fecha - EPOCA) / vida_media)``, así que las recientes pesan más
+sin reescribir las antiguas, y borrar o modificar una interacción resta
+exactamente lo que sumó (se usa su fecha original). Las puntuaciones
+guardadas solo son comparables dentro de un perfil; ``afinidades`` las
+devuelve ya escaladas al momento actual. Con una vida media de 30 días el
+factor no desborda un float hasta dentro de más de 80 años.
+``manage.py reconstruir_gustos`` las recalcula desde las interacciones.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .catalogo_compacto import obtener_catalogo
+from .models import AfinidadCategoria, Calificacion, ContenidoCategoria, Favorito, HistorialReproduccion
+
+logger = logging.getLogger(__name__)
+
+EPOCA = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+PESOS_POR_DEFECTO = {'reproduccion': 1.0, 'favorito': 3.0, 'calificacion': 1.0}
+CALIFICACION_NEUTRA = 3
+
+
+def _vida_media_dias() -> float:
+    return getattr(settings, 'GUSTOS_VIDA_MEDIA_DIAS', 30)
+
+
+def _pesos() -> Dict[str, float]:
+    return {**PESOS_POR_DEFECTO, **getattr(settings, 'GUSTOS_PESOS', {})}
+
+
+def factor(fecha: Optional[datetime] = None) -> float:
+    """Escala de una interacción ocurrida en ``fecha`` respecto a EPOCA"""
+    segundos = ((fecha or timezone.now()) - EPOCA).total_seconds()
+    return 2 ** (segundos / (_vida_media_dias() * 24 * 60 * 60))
+
+
+def peso_reproduccion() -> float:
+    return _pesos()['reproduccion']
+
+
+def peso_favorito() -> float:
+    return _pesos()['favorito']
+
+
+def peso_calificacion(valor: Optional[int]) -> float:
+    """Positiva por encima de 3 estrellas, negativa por debajo"""
+    if valor is None:
+        return 0.0
+    return _pesos()['calificacion'] * (valor - CALIFICACION_NEUTRA)
+
+
+def _categorias_contenido(contenido_id: int) -> List[int]:
+    catalogo = obtener_catalogo()
+    ordinal = catalogo.ordinal(contenido_id)
+    if ordinal is None:
+        # Contenido creado en otro proceso y aún no visto por el catálogo de este
+        return list(ContenidoCategoria.objects.filter(contenido_id=contenido_id).values_list('categoria_id', flat=True))
+    return catalogo.categorias_de(ordinal)
+
+
+def ajustar_afinidad(perfil_id: int, contenido_id: int, peso: float, fecha: Optional[datetime] = None):
+    """Sumar ``peso`` (con su decaimiento) a las categorías del contenido: una actualización por categoría nueva"""
+    categoria_ids = _categorias_contenido(contenido_id)
+    if not peso or not categoria_ids:
+        return
+    delta = peso * factor(fecha)
+    afinidades = AfinidadCategoria.objects.filter(perfil_id=perfil_id, categoria_id__in=categoria_ids)
+    if afinidades.update(puntuacion=F('puntuacion') + delta) == len(categoria_ids):
+        return
+
+    existentes = set(afinidades.values_list('categoria_id', flat=True))
+    for categoria_id in categoria_ids:
+        if categoria_id in existentes:
+            continue
+        afinidad, creada = AfinidadCategoria.objects.get_or_create(
+            perfil_id=perfil_id, categoria_id=categoria_id, defaults={'puntuacion': delta}
+        )
+        if not creada:
+            AfinidadCategoria.objects.filter(pk=afinidad.pk).update(puntuacion=F('puntuacion') + delta)
+
+
+def afinidades(perfil_id: int, limite: Optional[int] = 8) -> List[Tuple[int, float]]:
+    """(categoria_id, afinidad actual) de las categorías con afinidad positiva, de mayor a menor"""
+    filas = AfinidadCategoria.objects.filter(
+        perfil_id=perfil_id, puntuacion__gt=0
+    ).order_by('-puntuacion', 'categoria_id').values_list('categoria_id', 'puntuacion')
+    if limite is not None:
+        filas = filas[:limite]
+    escala = factor()
+    return [(categoria_id, puntuacion / escala) for categoria_id, puntuacion in filas]
+
+
+def categorias_preferidas(perfil_id: int, limite: int = 8) -> List[int]:
+    return [categoria_id for categoria_id, _ in afinidades(perfil_id, limite)]
+
+
+def _eventos(filtro: Dict) -> Iterable[Tuple[int, int, float, datetime]]:
+    """(perfil, contenido, peso, fecha) de todas las interacciones"""
+    for perfil_id, contenido_id, fecha in HistorialReproduccion.objects.filter(**filtro).values_list(
+            'perfil_id', 'contenido_id', 'fecha').iterator(chunk_size=5000):
+        yield perfil_id, contenido_id, peso_reproduccion(), fecha
+    for perfil_id, contenido_id, fecha in Favorito.objects.filter(**filtro).values_list(
+            'perfil_id', 'contenido_id', 'fecha_agregado').iterator(chunk_size=5000):
+        yield perfil_id, contenido_id, peso_favorito(), fecha
+    for perfil_id, contenido_id, valor, fecha in Calificacion.objects.filter(**filtro).values_list(
+            'perfil_id', 'contenido_id', 'calificacion', 'fecha').iterator(chunk_size=5000):
+        yield perfil_id, contenido_id, peso_calificacion(valor), fecha
+
+
+def reconstruir_gustos(perfil_ids: Optional[Iterable[int]] = None) -> int:
+    """Recalcular las afinidades desde las interacciones. Devuelve el número de filas guardadas"""
+    filtro = {} if perfil_ids is None else {'perfil_id__in': list(perfil_ids)}
+    categorias = defaultdict(list)
+    for contenido_id, categoria_id in ContenidoCategoria.objects.values_list('contenido_id', 'categoria_id'):
+        categorias[contenido_id].append(categoria_id)
+
+    puntuaciones = defaultdict(float)
+    for perfil_id, contenido_id, peso, fecha in _eventos(filtro):
+        if peso:
+            delta = peso * factor(fecha)
+            for categoria_id in categorias.get(contenido_id, ()):
+                puntuaciones[(perfil_id, categoria_id)] += delta
+
+    with transaction.atomic():
+        AfinidadCategoria.objects.filter(**filtro).delete()
+        AfinidadCategoria.objects.bulk_create([
+            AfinidadCategoria(perfil_id=perfil_id, categoria_id=categoria_id, puntuacion=puntuacion)
+            for (perfil_id, categoria_id), puntuacion in puntuaciones.items()
+        ], batch_size=1000)
+    logger.info(f"Gustos reconstruidos: {len(puntuaciones)} afinidades")
+    return len(puntuaciones)
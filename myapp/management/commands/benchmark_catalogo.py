@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from myapp.catalogo_compacto import CatalogoCompacto, TIPOS
+from myapp.models import Contenido
+import random
+import statistics
+import time
+import tracemalloc
+
+
+class Command(BaseCommand):
+    help = 'Mide memoria y latencia del catálogo compacto en memoria con catálogos sintéticos (no usa la base de datos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000, 1000000], help='Tamaños de catálogo a probar')
+        parser.add_argument('--categorias', type=int, default=40, help='Número de categorías sintéticas')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Mediciones por consulta')
+
+    def handle(self, *args, **options):
+        bytes_por_modelo = self._bytes_por_instancia_modelo()
+        self.stdout.write(f'Referencia: ~{bytes_por_modelo:.0f} bytes por instancia de Contenido cargada del ORM\n')
+
+        for tamano in options['tamanos']:
+            filas, relaciones = self._catalogo_sintetico(tamano, options['categorias'])
+            nombres = {categoria_id: f'Categoría {categoria_id}' for categoria_id in range(1, options['categorias'] + 1)}
+
+            # tracemalloc ralentiza la construcción: medir tiempo y memoria por separado
+            inicio = time.perf_counter()
+            CatalogoCompacto(1, filas, relaciones, nombres)
+            construccion = time.perf_counter() - inicio
+
+            tracemalloc.start()
+            catalogo = CatalogoCompacto(1, filas, relaciones, nombres)
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(self.style.HTTP_INFO(f'📦 {tamano:,} contenidos'))
+            self.stdout.write(f'   construcción: {construccion:.2f}s')
+            self.stdout.write(f'   memoria: {memoria / 2**20:.1f} MB ({memoria / tamano:.0f} B/contenido; '
+                              f'columnas {catalogo.bytes_ocupados() / 2**20:.1f} MB) '
+                              f'vs ~{bytes_por_modelo * tamano / 2**20:.0f} MB como instancias del ORM')
+
+            consultas = {
+                'filtro 2 categorías + tipo + año, -id': lambda: catalogo.consultar([1, 2], 'serie', 2015, None, '-id'),
+                'filtro 1 categoría, orden titulo': lambda: catalogo.consultar([3], orden='titulo'),
+                'filtro año, orden -año': lambda: catalogo.consultar(año_desde=2020, orden='-año'),
+                'top-k anilist_score': lambda: catalogo.consultar(orden='-anilist_score'),
+                'tarjetas de 50 ids': lambda: [t.titulo for t in catalogo.tarjetas(random.sample(range(1, tamano + 1), 50))],
+            }
+            for nombre, consulta in consultas.items():
+                tiempos = []
+                for _ in range(options['repeticiones']):
+                    inicio = time.perf_counter()
+                    consulta()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                self.stdout.write(f'   {nombre:<42} p50 {statistics.median(tiempos):8.2f} ms   máx {max(tiempos):8.2f} ms')
+            del catalogo, filas, relaciones
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completado'))
+
+    def _catalogo_sintetico(self, tamano, total_categorias):
+        rnd = random.Random(42)
+        filas = [
+            (i, f'Anime sintético {rnd.getrandbits(32):08x}', rnd.choice(TIPOS), rnd.randint(1980, 2025),
+             rnd.choice([None, 24, 90, 120]), f'portadas/{i}.jpg', rnd.choice([None, rnd.uniform(40, 95)]))
+            for i in range(1, tamano + 1)
+        ]
+        relaciones = [
+            (i, categoria_id)
+            for i in range(1, tamano + 1)
+            for categoria_id in rnd.sample(range(1, total_categorias + 1), rnd.randint(1, 3))
+        ]
+        return filas, relaciones
+
+    def _bytes_por_instancia_modelo(self, muestra=5000):
+        """Memoria media de una instancia de Contenido con todos sus campos (incluida la descripción)"""
+        tracemalloc.start()
+        campos = [f.attname for f in Contenido._meta.concrete_fields]
+        instancias = []
+        for i in range(muestra):
+            valores = {
+                'id': i, 'titulo': f'Anime sintético {i:08x}', 'titulo_normalizado': f'anime sintetico {i:08x}',
+                'tipo': 'serie', 'descripcion': 'Descripción de ejemplo ' * 20, 'año': 2020, 'duracion': 24,
+                'idioma': 'Japonés', 'imagen_portada': f'portadas/{i}.jpg', 'video_url': None, 'video_file': '',
+                'anilist_id': i, 'anilist_score': 75.5, 'anilist_popularity': 1000, 'anilist_url': None,
+                'fecha_importacion': None,
+            }
+            # Los campos que se añadan al modelo quedan vacíos en lugar de desplazar los demás
+            instancias.append(Contenido.from_db('default', campos, [valores.get(campo) for campo in campos]))
+        memoria, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del instancias
+        return memoria / muestra
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from myapp.models import Perfil, Contenido, Categoria, ContenidoCategoria, HistorialReproduccion, Calificacion
+from myapp import views
+from myapp.contadores import recalcular_contadores
+from myapp.popularidad import actualizar_popularidad
+import asyncio
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de la página principal síncrona y asíncrona con distintos tamaños de catálogo (usa una base de datos de prueba temporal)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 1000, 5000], help='Tamaños de catálogo a probar')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Mediciones por vista y escenario')
+        parser.add_argument('--concurrencia', type=int, default=4, help='Valor de INDEX_CONCURRENCIA para la vista asíncrona')
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(INDEX_CONCURRENCIA=options['concurrencia']):
+                self._ejecutar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _ejecutar(self, options):
+        usuario = User.objects.create_user(username='benchmark', password='benchmark')
+        perfil = Perfil.objects.create(usuario=usuario, nombre='Benchmark', tipo='adulto')
+        factory = RequestFactory()
+
+        self.stdout.write(f'{"catálogo":>10} {"escenario":>10} {"sync (ms)":>12} {"async (ms)":>12} {"mejora":>8}')
+        for tamano in sorted(options['tamanos']):
+            self._poblar_catalogo(tamano, perfil)
+            for escenario, frio in (('frío', True), ('caliente', False)):
+                sync = self._medir(lambda: views.index(self._peticion(factory, usuario)), frio, options['repeticiones'])
+                asincrona = self._medir(
+                    lambda: asyncio.run(views.index_async(self._peticion(factory, usuario))), frio, options['repeticiones']
+                )
+                self.stdout.write(
+                    f'{tamano:>10} {escenario:>10} {sync:>12.1f} {asincrona:>12.1f} {sync / asincrona:>7.2f}x'
+                )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completado'))
+
+    def _peticion(self, factory, usuario):
+        peticion = factory.get('/')
+        peticion.user = usuario
+        peticion.session = {}
+
+        async def auser():
+            return usuario
+        peticion.auser = auser
+        return peticion
+
+    def _medir(self, vista, frio, repeticiones):
+        """Mediana de latencia en ms; en frío se vacía la cache antes de cada medición"""
+        cache.clear()
+        vista()  # Calentamiento
+        tiempos = []
+        for _ in range(repeticiones):
+            if frio:
+                cache.clear()
+            inicio = time.perf_counter()
+            vista()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
+
+    def _poblar_catalogo(self, tamano, perfil):
+        """Completar el catálogo hasta el tamaño pedido con interacciones aleatorias"""
+        categorias = [Categoria.objects.get_or_create(nombre=nombre)[0]
+                      for nombre in ('Acción', 'Drama', 'Comedia', 'Romance', 'Fantasía', 'Sci-Fi')]
+        existentes = Contenido.objects.count()
+        if existentes >= tamano:
+            return
+
+        Contenido.objects.bulk_create([
+            Contenido(
+                titulo=f'Anime {i}', tipo=random.choice(['serie', 'pelicula']), año=random.randint(1990, 2024),
+                descripcion=f'Descripción del anime {i}', imagen_portada=f'portadas/{i}.jpg',
+            )
+            for i in range(existentes, tamano)
+        ], batch_size=500)
+        nuevos = list(Contenido.objects.order_by('-id').values_list('id', flat=True)[:tamano - existentes])
+
+        ContenidoCategoria.objects.bulk_create([
+            ContenidoCategoria(contenido_id=contenido_id, categoria=categoria)
+            for contenido_id in nuevos
+            for categoria in random.sample(categorias, 2)
+        ], batch_size=500)
+        HistorialReproduccion.objects.bulk_create([
+            HistorialReproduccion(perfil=perfil, contenido_id=random.choice(nuevos), tiempo_reproducido=600)
+            for _ in range(tamano * 2)
+        ], batch_size=500)
+        Calificacion.objects.bulk_create([
+            Calificacion(perfil=perfil, contenido_id=contenido_id, calificacion=random.randint(1, 5))
+            for contenido_id in random.sample(nuevos, len(nuevos) // 2)
+        ], batch_size=500)
+
+        # bulk_create no emite señales: sincronizar los contadores desnormalizados
+        recalcular_contadores()
+        actualizar_popularidad()
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from myapp.models import Contenido, Categoria, ContenidoCategoria
+from myapp import catalogo_compacto, muestreo
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compara ORDER BY RANDOM() con los pools barajados de muestreo.py (usa una base de datos de prueba temporal)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano', type=int, default=100000, help='Contenidos del catálogo sintético')
+        parser.add_argument('--k', type=int, default=10, help='Elementos por muestra')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Mediciones por método')
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._ejecutar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _ejecutar(self, options):
+        tamano, k = options['tamano'], options['k']
+        inicio = time.perf_counter()
+        categorias = self._poblar(tamano)
+        self.stdout.write(f'📦 {tamano:,} contenidos creados ({time.perf_counter() - inicio:.1f}s)')
+
+        elegidas = [c.id for c in categorias[:2]]
+        vistos = set(random.sample(range(1, tamano + 1), 200))
+
+        catalogo_compacto.invalidar()
+        inicio = time.perf_counter()
+        muestreo.aleatorios(k)
+        muestreo.de_categorias(elegidas, k)
+        frio = (time.perf_counter() - inicio) * 1000
+
+        metodos = [
+            ('ORDER BY RANDOM() catálogo', lambda: list(
+                Contenido.objects.exclude(id__in=vistos).order_by('?')[:k])),
+            ('pool barajado catálogo', lambda: Contenido.objects.in_bulk(
+                muestreo.aleatorios(k, excluir=vistos))),
+            ('ORDER BY RANDOM() 2 categorías', lambda: list(
+                Contenido.objects.filter(categorias__in=elegidas).exclude(id__in=vistos).distinct().order_by('?')[:k])),
+            ('pools barajados 2 categorías', lambda: Contenido.objects.in_bulk(
+                muestreo.de_categorias(elegidas, k, excluir=vistos))),
+        ]
+        self.stdout.write(f'{"método":<34} {"p50 (ms)":>10} {"máx (ms)":>10}')
+        medianas = {}
+        for nombre, metodo in metodos:
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                metodo()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            medianas[nombre] = statistics.median(tiempos)
+            self.stdout.write(f'{nombre:<34} {medianas[nombre]:>10.2f} {max(tiempos):>10.2f}')
+
+        self.stdout.write(f'Construcción inicial de catálogo y pools (una vez por proceso y rotación): {frio:.0f} ms')
+        self.stdout.write(f'Mejora: catálogo {medianas["ORDER BY RANDOM() catálogo"] / medianas["pool barajado catálogo"]:.0f}x, '
+                          f'categorías {medianas["ORDER BY RANDOM() 2 categorías"] / medianas["pools barajados 2 categorías"]:.0f}x')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completado'))
+
+    def _poblar(self, tamano):
+        categorias = [Categoria.objects.create(nombre=f'Categoría {i}') for i in range(20)]
+        tipos = [valor for valor, _ in Contenido.TIPO_CHOICES]
+        for desde in range(0, tamano, 5000):
+            contenidos = Contenido.objects.bulk_create([
+                Contenido(titulo=f'Anime {i}', tipo=random.choice(tipos), año=random.randint(1980, 2025))
+                for i in range(desde, min(desde + 5000, tamano))
+            ])
+            ContenidoCategoria.objects.bulk_create([
+                ContenidoCategoria(contenido=contenido, categoria=categoria)
+                for contenido in contenidos
+                for categoria in random.sample(categorias, random.randint(1, 3))
+            ])
+        return categorias
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from myapp.estantes import POPULARIDAD, estantes_dependientes, reconstruir_estantes
+from myapp.popularidad import actualizar_popularidad
+import time
+
+
+class Command(BaseCommand):
+    help = ('Recalcula la puntuación de popularidad con decaimiento temporal de todo el catálogo y los estantes '
+            'que la usan (ejecutar periódicamente, p. ej. con cron)')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        actualizados = actualizar_popularidad()
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Popularidad recalculada: {actualizados} contenidos actualizados ({duracion:.2f}s)'
+        ))
+        if not actualizados:
+            return
+
+        # Reconstruir aquí los estantes marcados para que ninguna petición pague el recálculo
+        inicio = time.perf_counter()
+        snapshot = reconstruir_estantes(estantes_dependientes(POPULARIDAD))
+        self.stdout.write(f'📦 {len(snapshot)} estantes reconstruidos ({time.perf_counter() - inicio:.2f}s)')
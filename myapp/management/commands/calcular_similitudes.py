@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from myapp.similitud import actualizar_similitudes
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los vecinos más similares de cada contenido por categorías y co-consumo (ejecutar periódicamente, p. ej. con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vecinos', type=int, default=None, help='Vecinos por contenido (por defecto SIMILITUD_VECINOS)')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        guardados = actualizar_similitudes(options['vecinos'])
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Similitudes recalculadas: {guardados} vecinos guardados ({duracion:.2f}s)'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from myapp.estantes import TENDENCIAS, estantes_dependientes, reconstruir_estantes
+from myapp.tendencias import resolver_tendencias
+import time
+
+
+class Command(BaseCommand):
+    help = ('Resuelve los términos más buscados a contenidos, guarda el mapeo en la cache y reconstruye los '
+            'estantes que lo usan (ejecutar periódicamente, p. ej. con cron)')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        tendencias = resolver_tendencias()
+        snapshot = reconstruir_estantes(estantes_dependientes(TENDENCIAS))
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(tendencias["terminos"])} términos resueltos y {len(snapshot)} estantes reconstruidos '
+            f'({duracion:.2f}s)'
+        ))
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from myapp.embeddings import (IndiceEmbeddings, construir_indice, kmeans_esferico, necesita_reconstruccion,
+                              obtener_indice_embeddings)
+from myapp.evaluacion import percentil
+import math
+import numpy as np
+import time
+
+
+class Command(BaseCommand):
+    help = ('Construye los vectores de contenido (TF-IDF, categorías y métricas de AniList) y su índice IVF '
+            'en EMBEDDINGS_DIR, y mide la latencia y el recall de las consultas frente a la búsqueda exacta')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listas', type=int, default=None, help='Listas del IVF (por defecto ~raíz del catálogo)')
+        parser.add_argument('--sondeos', type=int, default=None, help='Listas recorridas por consulta (por defecto EMBEDDINGS_SONDEOS)')
+        parser.add_argument('--consultas', type=int, default=500, help='Consultas de la medición')
+        parser.add_argument('--k', type=int, default=10, help='Vecinos por consulta')
+        parser.add_argument('--sintetico', type=int, default=0,
+                            help='Medir con N vectores sintéticos agrupados (no guarda el índice)')
+        parser.add_argument('--si-hace-falta', action='store_true',
+                            help='Reconstruir solo si no hay índice o las importaciones lo marcaron (para cron)')
+
+    def handle(self, *args, **options):
+        if options['si_hace_falta'] and not options['sintetico'] and not necesita_reconstruccion():
+            self.stdout.write(self.style.SUCCESS('✅ El índice de embeddings está al día'))
+            return
+        if options['sintetico']:
+            indice = self._indice_sintetico(options)
+        else:
+            resumen = construir_indice(options['listas'])
+            self.stdout.write(f"📦 {resumen['contenidos']} contenidos × {resumen['dimension']} dimensiones "
+                              f"({resumen['vocabulario']} términos), {resumen['listas']} listas IVF, "
+                              f"{resumen['bytes_vectores'] / 2**20:.1f} MB")
+            self.stdout.write(f"   codificación: {resumen['codificacion_segundos']:.2f}s, "
+                              f"k-means: {resumen['ivf_segundos']:.2f}s")
+            indice = obtener_indice_embeddings()
+
+        if indice is not None and len(indice):
+            self._medir(indice, options)
+        if options['sintetico']:
+            self.stdout.write(self.style.SUCCESS('✅ Medición sintética completada (índice no guardado)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Índice de embeddings construido y guardado'))
+
+    def _medir(self, indice, options):
+        """Latencia por consulta del IVF y recall@k frente al producto con toda la matriz"""
+        rng = np.random.default_rng(42)
+        k = options['k']
+        filas = rng.choice(len(indice), min(options['consultas'], len(indice)), replace=False)
+        vectores = np.asarray(indice.vectores)
+        tiempos, recuerdos = [], []
+        for fila in filas:
+            contenido_id = int(indice.ids[fila])
+            inicio = time.perf_counter()
+            aproximados = indice.similares(contenido_id, limite=k, sondeos=options['sondeos'])
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+            puntuaciones = vectores @ vectores[fila]
+            puntuaciones[fila] = -np.inf
+            exactos = np.argpartition(-puntuaciones, min(k, len(puntuaciones) - 1))[:k]
+            esperados = {int(indice.ids[i]) for i in exactos if np.isfinite(puntuaciones[i])}
+            if esperados:
+                recuerdos.append(len(esperados.intersection(i for i, _ in aproximados)) / len(esperados))
+        self.stdout.write(f"⏱️ {len(filas)} consultas top-{k}: p50 {percentil(tiempos, 50):.3f} ms, "
+                          f"p99 {percentil(tiempos, 99):.3f} ms, recall@{k} {np.mean(recuerdos or [0]):.3f}")
+
+    def _indice_sintetico(self, options):
+        """Vectores alrededor de ~raíz(N) temas, con la dimensión típica del catálogo (64 de texto + categorías)"""
+        rng = np.random.default_rng(42)
+        total = options['sintetico']
+        dimension = 96
+        temas = max(1, round(math.sqrt(total)))
+        centros = rng.standard_normal((temas, dimension)).astype(np.float32)
+        vectores = centros[rng.integers(0, temas, total)] + 1.2 * rng.standard_normal((total, dimension)).astype(np.float32)
+        vectores /= np.linalg.norm(vectores, axis=1, keepdims=True)
+
+        inicio = time.perf_counter()
+        centroides = kmeans_esferico(vectores, options['listas'] or temas)
+        indice = IndiceEmbeddings.desde_vectores(vectores, np.arange(1, total + 1, dtype=np.int64), centroides)
+        self.stdout.write(f"📦 {total} vectores sintéticos × {dimension} dimensiones, {len(centroides)} listas IVF "
+                          f"({time.perf_counter() - inicio:.2f}s)")
+        return indice
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from myapp.factorizacion import MatrizDispersa, entrenar, entrenar_modelo
+import numpy as np
+import resource
+import time
+import tracemalloc
+
+
+class Command(BaseCommand):
+    help = 'Entrena el modelo de filtrado colaborativo (ALS implícito) y guarda sus factores en RECOMENDADOR_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factores', type=int, default=32, help='Dimensión de los vectores latentes')
+        parser.add_argument('--iteraciones', type=int, default=10, help='Iteraciones de ALS')
+        parser.add_argument('--regularizacion', type=float, default=0.1, help='Regularización L2 (lambda)')
+        parser.add_argument('--alpha', type=float, default=10.0, help='Escala de la confianza c = 1 + alpha * r')
+        parser.add_argument('--sintetico', type=int, default=0,
+                            help='Entrenar con N interacciones sintéticas (no guarda el modelo) para medir la escala')
+
+    def handle(self, *args, **options):
+        tracemalloc.start()
+        if options['sintetico']:
+            resumen = self._entrenar_sintetico(options)
+        else:
+            resumen = entrenar_modelo(options['factores'], options['iteraciones'],
+                                      options['regularizacion'], options['alpha'])
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        self.stdout.write(f"📊 {resumen['perfiles']} perfiles × {resumen['contenidos']} contenidos, "
+                          f"{resumen['interacciones']} interacciones")
+        self.stdout.write(f"   carga de la matriz: {resumen['carga_segundos']:.2f}s")
+        self.stdout.write(f"   entrenamiento: {resumen['entrenamiento_segundos']:.2f}s "
+                          f"({resumen['iteraciones']} iteraciones, {resumen['factores']} factores)")
+        self.stdout.write(f"   memoria: pico {pico / 2**20:.1f} MB (NumPy + Python), RSS máximo {rss_maximo:.0f} MB, "
+                          f"factores {resumen['bytes_factores'] / 2**20:.1f} MB")
+        if options['sintetico']:
+            self.stdout.write(self.style.SUCCESS('✅ Entrenamiento sintético completado (modelo no guardado)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Modelo de recomendaciones entrenado y guardado'))
+
+    def _entrenar_sintetico(self, options):
+        """Interacciones con popularidad de cola larga: ~1 perfil por cada 50 interacciones"""
+        rng = np.random.default_rng(42)
+        total = options['sintetico']
+        perfiles = max(1, total // 50)
+        contenidos = max(2, min(100000, total // 100))
+
+        inicio = time.perf_counter()
+        filas = rng.integers(0, perfiles, total)
+        columnas = np.minimum(rng.zipf(1.3, total) - 1, contenidos - 1)
+        matriz = MatrizDispersa(filas, columnas, rng.choice([1.0, 2.0, 3.0], total).astype(np.float32),
+                                perfiles, contenidos)
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        factores_perfil, factores_contenido = entrenar(matriz, options['factores'], options['iteraciones'],
+                                                       options['regularizacion'], options['alpha'])
+        return {
+            'perfiles': perfiles, 'contenidos': contenidos, 'interacciones': matriz.no_nulos,
+            'factores': options['factores'], 'iteraciones': options['iteraciones'],
+            'carga_segundos': carga, 'entrenamiento_segundos': time.perf_counter() - inicio,
+            'bytes_factores': factores_perfil.nbytes + factores_contenido.nbytes,
+        }
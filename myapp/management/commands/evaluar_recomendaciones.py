@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from myapp.evaluacion import ESTRATEGIAS, evaluar, generar_dataset, preparar_derivados
+import time
+
+
+class Command(BaseCommand):
+    help = ('Evalúa offline las estrategias de recomendación (precision@k, recall@k, cobertura, latencia y consultas) '
+            'con un dataset sintético y corte temporal (usa una base de datos de prueba temporal)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfiles', type=int, default=2000, help='Perfiles sintéticos')
+        parser.add_argument('--contenidos', type=int, default=5000, help='Contenidos del catálogo sintético')
+        parser.add_argument('--categorias', type=int, default=20, help='Categorías del catálogo sintético')
+        parser.add_argument('--interacciones', type=int, default=30, help='Interacciones por perfil')
+        parser.add_argument('--prueba', type=float, default=0.2, help='Fracción más reciente reservada para evaluar')
+        parser.add_argument('--k', type=int, default=10, help='Tamaño de la lista evaluada')
+        parser.add_argument('--muestra', type=int, default=200, help='Perfiles evaluados')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla del dataset y de las estrategias')
+        parser.add_argument('--estrategia', action='append', dest='estrategias', choices=list(ESTRATEGIAS),
+                            help='Evaluar solo esta estrategia (se puede repetir)')
+
+    def handle(self, *args, **options):
+        if not 0 < options['prueba'] < 1:
+            raise CommandError('--prueba debe estar entre 0 y 1')
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._ejecutar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _ejecutar(self, options):
+        inicio = time.perf_counter()
+        prueba = generar_dataset(options['perfiles'], options['contenidos'], options['categorias'],
+                                 options['interacciones'], options['prueba'], semilla=options['semilla'])
+        preparar_derivados()
+        reservadas = sum(len(items) for items in prueba.values())
+        self.stdout.write(f"📦 {options['perfiles']:,} perfiles × {options['contenidos']:,} contenidos, "
+                          f"{reservadas:,} interacciones reservadas para prueba ({time.perf_counter() - inicio:.1f}s)")
+
+        k = options['k']
+        resultados = evaluar(prueba, k, options['muestra'], options['semilla'], options['estrategias'])
+        self.stdout.write(f'{"estrategia":<14} {f"prec@{k}":>8} {f"rec@{k}":>8} {"cobert.":>8} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"consultas":>10}')
+        for nombre, datos in resultados.items():
+            self.stdout.write(
+                f"{nombre:<14} {datos['precision']:>8.3f} {datos['recall']:>8.3f} {datos['cobertura']:>8.1%} "
+                f"{datos['p50_ms']:>8.2f} {datos['p95_ms']:>8.2f} {datos['p99_ms']:>8.2f} "
+                f"{datos['consultas_media']:>6.1f}/{datos['consultas_max']:<3}"
+            )
+        for nombre, datos in resultados.items():
+            if datos['etapas']:
+                self.stdout.write(f'⏱️ Etapas del pipeline ({nombre}):')
+                for etapa, medidas in datos['etapas'].items():
+                    self.stdout.write(f"   {etapa:<22} p50 {medidas['p50_ms']:>7.2f} ms  p95 {medidas['p95_ms']:>7.2f} ms  "
+                                      f"{medidas['salida_media']:>6.1f} candidatos")
+        self.stdout.write(f'📊 {next(iter(resultados.values()))["perfiles"]} perfiles evaluados; '
+                          f'consultas = media/máximo por llamada')
+        self.stdout.write(self.style.SUCCESS('✅ Evaluación completada'))
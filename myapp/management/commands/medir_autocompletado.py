@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from myapp.autocompletado import CONTENIDO, IndiceAutocompletado
+from myapp.evaluacion import percentil
+import itertools
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = ('Construye el índice de autocompletado como lo hace cada proceso y mide la latencia de las '
+            'sugerencias con prefijos de 1 a 8 caracteres tomados de los títulos')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultas', type=int, default=5000, help='Consultas de la medición')
+        parser.add_argument('--sintetico', type=int, default=0,
+                            help='Medir con N títulos sintéticos en lugar del catálogo')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if options['sintetico']:
+            indice = self._indice_sintetico(options['sintetico'])
+        else:
+            indice = IndiceAutocompletado.construir()
+        self.stdout.write(f"📦 {len(indice)} entradas, {len(indice.claves)} claves, "
+                          f"{len(indice.precalculadas)} prefijos precalculados "
+                          f"({time.perf_counter() - inicio:.2f}s)")
+        if not len(indice):
+            self.stdout.write(self.style.WARNING('Catálogo vacío: no hay nada que medir'))
+            return
+
+        rng = random.Random(42)
+        textos = indice.textos
+        consultas = []
+        for _ in range(options['consultas']):
+            texto = rng.choice(textos)
+            palabras = texto.split() or [texto]
+            palabra = rng.choice(palabras)
+            consultas.append(palabra[:rng.randint(1, 8)])
+
+        tiempos = []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            indice.sugerir(consulta)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        self.stdout.write(f"⏱️ {len(consultas)} consultas: p50 {percentil(tiempos, 50):.3f} ms, "
+                          f"p99 {percentil(tiempos, 99):.3f} ms, máx {max(tiempos):.3f} ms")
+        self.stdout.write(self.style.SUCCESS('✅ Medición de autocompletado completada'))
+
+    def _indice_sintetico(self, total):
+        """Títulos de 2 a 5 palabras de un vocabulario con frecuencias de Zipf"""
+        rng = random.Random(42)
+        silabas = ['ka', 'shi', 'no', 'to', 'ri', 'ma', 'su', 'ken', 'yu', 'ra', 'mi', 'ta', 'ro', 'ne', 'ha']
+        vocabulario = [''.join(rng.choice(silabas) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+        acumulados = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocabulario))))
+        entradas = []
+        for contenido_id in range(1, total + 1):
+            titulo = ' '.join(rng.choices(vocabulario, cum_weights=acumulados, k=rng.randint(2, 5)))
+            entradas.append((titulo, titulo, CONTENIDO, contenido_id, titulo, rng.random() * 10))
+        return IndiceAutocompletado(0, entradas)
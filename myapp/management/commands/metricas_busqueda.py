@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from myapp import telemetria
+from myapp.cache_busqueda import metricas, reiniciar_metricas
+
+
+class Command(BaseCommand):
+    help = ('Muestra la tasa de aciertos de la cache de resultados de búsqueda y los registros de '
+            'historial y auditoría escritos en lote')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Poner los contadores a cero tras mostrarlos')
+
+    def handle(self, *args, **options):
+        datos = metricas()
+        self.stdout.write(f"📊 Aciertos: {datos['aciertos']}  Fallos: {datos['fallos']}  "
+                          f"Tasa de aciertos: {datos['tasa_aciertos']:.1%}")
+        self.stdout.write(f"   Esperas por la misma búsqueda en curso: {datos['esperas']}  "
+                          f"Desalojos LRU: {datos['desalojos']}")
+        registros = telemetria.metricas()
+        self.stdout.write(f"📦 Historial y auditoría escritos: {registros['escritos']} en {registros['lotes']} lotes  "
+                          f"Descartados (buffer lleno): {registros['descartados']}  "
+                          f"Perdidos por error: {registros['errores']}")
+        if options['reiniciar']:
+            reiniciar_metricas()
+            telemetria.reiniciar_metricas()
+            self.stdout.write(self.style.SUCCESS('✅ Contadores reiniciados'))
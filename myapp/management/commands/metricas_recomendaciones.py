@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from myapp.cache_recomendaciones import metricas, reiniciar_metricas
+
+
+class Command(BaseCommand):
+    help = 'Muestra la tasa de aciertos de la cache de recomendaciones por perfil (suma de todos los procesos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Poner los contadores a cero tras mostrarlos')
+
+    def handle(self, *args, **options):
+        datos = metricas()
+        self.stdout.write(f"📊 Aciertos: {datos['aciertos']}  Fallos: {datos['fallos']}  "
+                          f"Tasa de aciertos: {datos['tasa_aciertos']:.1%}")
+        self.stdout.write(f"   Fallos servidos desde listas precalculadas: {datos['precalculadas']}")
+        self.stdout.write(f"   Refrescos parciales: {datos['parciales']}  Invalidaciones: {datos['invalidaciones']}")
+        if options['reiniciar']:
+            reiniciar_metricas()
+            self.stdout.write(self.style.SUCCESS('✅ Contadores reiniciados'))
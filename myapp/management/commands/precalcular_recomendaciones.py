@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from myapp.precalculo import precalcular
+
+
+class Command(BaseCommand):
+    help = 'Precalcula las recomendaciones de todos los perfiles con un pool de procesos (ejecutar antes de las horas punta)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, nargs='+', default=None,
+                            help='Procesos del pool (por defecto PRECALCULO_PROCESOS); con varios valores '
+                                 'se ejecuta una vez por cada uno y se comparan los perfiles por segundo')
+        parser.add_argument('--trozo', type=int, default=100, help='Perfiles por tarea enviada a cada proceso')
+        parser.add_argument('--reanudar', metavar='LOTE', default=None,
+                            help='Continuar una ejecución interrumpida: solo los perfiles sin lista de ese lote')
+
+    def handle(self, *args, **options):
+        if options['reanudar'] and len(options['procesos'] or []) > 1:
+            raise CommandError('--reanudar continúa una sola ejecución: indica un único valor de --procesos')
+        resumenes = []
+        for procesos in options['procesos'] or [None]:
+            resumen = precalcular(procesos, options['trozo'], options['reanudar'], self._progreso)
+            self.stdout.write('')
+            self.stdout.write(f"📦 Lote {resumen['lote']}: {resumen['perfiles']} perfiles en {resumen['segundos']:.2f}s "
+                              f"con {resumen['procesos']} procesos ({resumen['perfiles_por_segundo']:.1f} perfiles/s)")
+            resumenes.append(resumen)
+
+        if len(resumenes) > 1:
+            self.stdout.write('📊 Rendimiento por número de procesos:')
+            base = resumenes[0]['perfiles_por_segundo'] or 1
+            for resumen in resumenes:
+                self.stdout.write(f"   {resumen['procesos']:>3} procesos: {resumen['perfiles_por_segundo']:8.1f} perfiles/s "
+                                  f"(x{resumen['perfiles_por_segundo'] / base:.2f})")
+        self.stdout.write(self.style.SUCCESS('✅ Recomendaciones precalculadas'))
+
+    def _progreso(self, hechos, total):
+        self.stdout.write(f'\r   {hechos}/{total} perfiles', ending='')
+        self.stdout.flush()
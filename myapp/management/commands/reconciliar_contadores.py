@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from myapp.contadores import recalcular_contadores
+import time
+
+
+class Command(BaseCommand):
+    help = 'Reconcilia los contadores de interacción de cada contenido con las tablas de eventos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contenido', type=int, action='append', help='ID de contenido a reconciliar (se puede repetir)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informar las diferencias, sin corregirlas')
+
+    def handle(self, *args, **options):
+        aplicar = not options['dry_run']
+        inicio = time.perf_counter()
+        desincronizados = recalcular_contadores(options['contenido'], aplicar=aplicar)
+        duracion = time.perf_counter() - inicio
+
+        if not desincronizados:
+            self.stdout.write(self.style.SUCCESS(f'✅ Contadores sincronizados ({duracion:.2f}s)'))
+        elif aplicar:
+            self.stdout.write(self.style.WARNING(f'🔧 {desincronizados} contenidos corregidos ({duracion:.2f}s)'))
+        else:
+            self.stdout.write(self.style.WARNING(f'⚠️ {desincronizados} contenidos desincronizados (sin cambios)'))
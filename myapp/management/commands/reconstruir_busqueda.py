@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from myapp import trigramas
+from myapp.buscador import BACKENDS, reconstruir_indice
+import time
+
+
+class Command(BaseCommand):
+    help = ('Recalcula las columnas normalizadas, los trigramas y el índice FTS5 de la búsqueda '
+            'y compara la latencia de los backends')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comparar', action='append', default=[], metavar='CONSULTA',
+                            help='Medir esta consulta con cada backend (se puede repetir)')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Repeticiones de cada medición')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        resumen = trigramas.reconstruir()
+        self.stdout.write(f"📦 {resumen['titulo_normalizado']} títulos, {resumen['texto_normalizado']} alias y "
+                          f"{resumen['nombre_normalizado']} categorías normalizados de nuevo; "
+                          f"{resumen['trigramas']} trigramas ({time.perf_counter() - inicio:.2f}s)")
+        inicio = time.perf_counter()
+        if connection.vendor != 'sqlite':
+            # El índice FTS5 solo existe con SQLite; los demás motores usan los trigramas
+            self.stdout.write(self.style.SUCCESS('✅ Trigramas reconstruidos'))
+            return
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Índice de búsqueda reconstruido: {total} contenidos ({time.perf_counter() - inicio:.2f}s)'
+        ))
+
+        for consulta in options['comparar']:
+            self.stdout.write(f'📊 "{consulta}"')
+            for nombre, backend in BACKENDS.items():
+                inicio = time.perf_counter()
+                for _ in range(options['repeticiones']):
+                    resultados = backend().buscar(consulta, 50)
+                duracion = (time.perf_counter() - inicio) / options['repeticiones'] * 1000
+                self.stdout.write(f'   {nombre:<10} {duracion:>8.2f} ms  {len(resultados)} resultados')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from myapp.estantes import ESTANTES, reconstruir_estantes
+import time
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los estantes precalculados de la página principal (pensado para cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estante', action='append', help='Nombre del estante a reconstruir (se puede repetir)')
+
+    def handle(self, *args, **options):
+        nombres = options['estante']
+        desconocidos = [nombre for nombre in nombres or [] if nombre not in ESTANTES]
+        if desconocidos:
+            raise CommandError(f"Estantes desconocidos: {', '.join(desconocidos)}")
+
+        inicio = time.perf_counter()
+        snapshot = reconstruir_estantes(nombres)
+        duracion = time.perf_counter() - inicio
+
+        for nombre, entrada in snapshot.items():
+            self.stdout.write(f'  • {nombre}: {len(entrada["filas"])} elementos')
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(snapshot)} estantes reconstruidos en {duracion:.2f}s'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from myapp.facetas import reconstruir_facetas
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero los conteos de facetas del catálogo (categoría × tipo × década)'
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reconstruir_facetas()
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} conteos de faceta reconstruidos ({duracion:.2f}s)'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from myapp.gustos import reconstruir_gustos
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde las interacciones la afinidad de cada perfil por categoría'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfil', type=int, action='append', dest='perfiles',
+                            help='Reconstruir solo este perfil (se puede repetir)')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reconstruir_gustos(options['perfiles'])
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} afinidades por categoría reconstruidas ({duracion:.2f}s)'))
@@ -0,0 +1,84 @@
+"""
+Contadores de métricas compartidos por todos los procesos
+
+Las caches de recomendaciones y de búsqueda y la telemetría cuentan
+aciertos, fallos, lotes... en cada petición. Cada proceso acumula los
+incrementos en memoria y los suma a la cache por defecto (compartida por los
+procesos del servidor y los comandos, ver ``CACHES``) como mucho cada
+``METRICAS_VOLCADO_SEGUNDOS`` y al terminar, así que contar no hace E/S en el
+camino de la petición y ``manage.py metricas_*`` ve el total de todos los
+procesos. Leer vuelca antes lo pendiente del proceso que lee.
+
+``incr`` es atómico con Redis o Memcached. Con la cache en disco dos
+procesos que vuelcan la misma métrica en el mismo instante pueden perder uno
+de los dos incrementos; para tasas de acierto es suficiente.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _intervalo_volcado() -> float:
+    return getattr(settings, 'METRICAS_VOLCADO_SEGUNDOS', 5)
+
+
+class ContadoresCompartidos:
+    """Contadores con nombre bajo un prefijo de la cache, acumulados por proceso y volcados en bloque"""
+
+    def __init__(self, prefijo: str, nombres: Sequence[str]):
+        self.prefijo = prefijo
+        self.nombres = tuple(nombres)
+        self._pendientes = Counter()
+        self._bloqueo = threading.Lock()
+        self._pid = os.getpid()
+        self._ultimo_volcado = time.monotonic()
+        atexit.register(self.volcar)
+
+    def _claves(self):
+        return [self.prefijo + nombre for nombre in self.nombres]
+
+    def _tras_fork(self):
+        if self._pid != os.getpid():
+            # Proceso hijo tras un fork: lo pendiente lo vuelca el padre
+            self._pendientes.clear()
+            self._pid = os.getpid()
+
+    def sumar(self, nombre: str, cantidad: int = 1):
+        with self._bloqueo:
+            self._tras_fork()
+            self._pendientes[nombre] += cantidad
+            if time.monotonic() - self._ultimo_volcado < _intervalo_volcado():
+                return
+        self.volcar()
+
+    def volcar(self):
+        """Sumar a la cache compartida lo acumulado por este proceso"""
+        with self._bloqueo:
+            self._tras_fork()
+            pendientes, self._pendientes = self._pendientes, Counter()
+            self._ultimo_volcado = time.monotonic()
+        for nombre, cantidad in pendientes.items():
+            clave = self.prefijo + nombre
+            if not cache.add(clave, cantidad, None):
+                try:
+                    cache.incr(clave, cantidad)
+                except ValueError:
+                    # La clave se borró entre add() e incr()
+                    cache.set(clave, cantidad, None)
+
+    def valores(self) -> Dict[str, int]:
+        """Totales de todos los procesos (incluido lo pendiente de este)"""
+        self.volcar()
+        valores = cache.get_many(self._claves())
+        return {nombre: valores.get(self.prefijo + nombre, 0) for nombre in self.nombres}
+
+    def reiniciar(self):
+        with self._bloqueo:
+            self._pendientes.clear()
+        cache.delete_many(self._claves())
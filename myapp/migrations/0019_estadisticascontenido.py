@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-18 07:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def poblar_estadisticas(apps, schema_editor):
+    Contenido = apps.get_model('myapp', 'Contenido')
+    EstadisticasContenido = apps.get_model('myapp', 'EstadisticasContenido')
+    filas = []
+    contenidos = Contenido.objects.annotate(
+        reproducciones=Count('historialreproduccion', distinct=True),
+        favoritos=Count('favorito', distinct=True),
+    )
+    calificaciones = {
+        dato['contenido_id']: dato
+        for dato in apps.get_model('myapp', 'Calificacion').objects.values('contenido_id').annotate(
+            total=Count('id'),
+            suma=Sum('calificacion'),
+            likes=Count('id', filter=Q(calificacion=5)),
+            dislikes=Count('id', filter=Q(calificacion=1)),
+        )
+    }
+    for contenido in contenidos.iterator():
+        dato = calificaciones.get(contenido.id, {})
+        total = dato.get('total', 0)
+        filas.append(EstadisticasContenido(
+            contenido_id=contenido.id,
+            total_reproducciones=contenido.reproducciones,
+            total_favoritos=contenido.favoritos,
+            total_calificaciones=total,
+            suma_calificaciones=dato.get('suma') or 0,
+            total_likes=dato.get('likes', 0),
+            total_dislikes=dato.get('dislikes', 0),
+            rating_promedio=(dato['suma'] / total) if total else None,
+        ))
+    EstadisticasContenido.objects.bulk_create(filas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_contenido_video_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticasContenido',
+            fields=[
+                ('contenido', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to='myapp.contenido')),
+                ('total_reproducciones', models.PositiveIntegerField(db_index=True, default=0)),
+                ('total_likes', models.PositiveIntegerField(db_index=True, default=0)),
+                ('total_dislikes', models.PositiveIntegerField(default=0)),
+                ('total_favoritos', models.PositiveIntegerField(default=0)),
+                ('total_calificaciones', models.PositiveIntegerField(db_index=True, default=0)),
+                ('suma_calificaciones', models.PositiveIntegerField(default=0)),
+                ('rating_promedio', models.FloatField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de Contenido',
+                'verbose_name_plural': 'Estadísticas de Contenidos',
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0019_estadisticascontenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estadisticascontenido',
+            name='popularidad_calculada',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='estadisticascontenido',
+            name='puntuacion_popularidad',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0021_versiondatos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['titulo', 'id'], name='myapp_conte_titulo_06f07d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['año', 'id'], name='myapp_conte_año_433043_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['tipo', '-id'], name='myapp_conte_tipo_ac5448_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['tipo', 'titulo', 'id'], name='myapp_conte_tipo_8612bf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenido',
+            index=models.Index(fields=['tipo', 'año', 'id'], name='myapp_conte_tipo_d1d177_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenidocategoria',
+            index=models.Index(fields=['categoria', 'contenido'], name='myapp_conte_categor_a2b34b_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 07:32
+
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_facetas(apps, schema_editor):
+    Contenido = apps.get_model('myapp', 'Contenido')
+    ContenidoCategoria = apps.get_model('myapp', 'ContenidoCategoria')
+    ConteoFaceta = apps.get_model('myapp', 'ConteoFaceta')
+
+    def decada(año):
+        return año // 10 * 10 if año else None
+
+    conteos = Counter()
+    for fila in Contenido.objects.values('tipo', 'año').annotate(total=Count('id')):
+        conteos[(None, fila['tipo'], decada(fila['año']))] += fila['total']
+    for fila in ContenidoCategoria.objects.values('categoria_id', 'contenido__tipo', 'contenido__año').annotate(total=Count('id')):
+        conteos[(fila['categoria_id'], fila['contenido__tipo'], decada(fila['contenido__año']))] += fila['total']
+
+    ConteoFaceta.objects.bulk_create([
+        ConteoFaceta(categoria_id=categoria_id, tipo=tipo, decada=bucket, total=total)
+        for (categoria_id, tipo, bucket), total in conteos.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0022_indices_paginacion_catalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoFaceta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('serie', 'Serie'), ('pelicula', 'Película')], max_length=10)),
+                ('decada', models.PositiveIntegerField(blank=True, help_text='Año inicial de la década (1990, 2000...)', null=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='myapp.categoria')),
+            ],
+            options={
+                'verbose_name': 'Conteo de Faceta',
+                'verbose_name_plural': 'Conteos de Facetas',
+                'unique_together': {('categoria', 'tipo', 'decada')},
+            },
+        ),
+        migrations.RunPython(poblar_facetas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 07:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0023_conteofaceta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContenidoSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.FloatField()),
+                ('posicion', models.PositiveSmallIntegerField(help_text='0 = el más similar')),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='myapp.contenido')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.contenido')),
+            ],
+            options={
+                'verbose_name': 'Contenido Similar',
+                'verbose_name_plural': 'Contenidos Similares',
+                'indexes': [models.Index(fields=['contenido', 'posicion'], name='myapp_conte_conteni_d9e222_idx')],
+                'unique_together': {('contenido', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0024_contenidosimilar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calificacion',
+            index=models.Index(fields=['perfil', 'contenido'], name='myapp_calif_perfil__91e853_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorito',
+            index=models.Index(fields=['perfil', 'contenido'], name='myapp_favor_perfil__af7a49_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialreproduccion',
+            index=models.Index(fields=['perfil', 'contenido'], name='myapp_histo_perfil__fcad62_idx'),
+        ),
+    ]
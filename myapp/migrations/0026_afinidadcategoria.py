@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 08:01
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def poblar_afinidades(apps, schema_editor):
+    from myapp.gustos import factor, peso_calificacion, peso_favorito, peso_reproduccion
+
+    ContenidoCategoria = apps.get_model('myapp', 'ContenidoCategoria')
+    HistorialReproduccion = apps.get_model('myapp', 'HistorialReproduccion')
+    Favorito = apps.get_model('myapp', 'Favorito')
+    Calificacion = apps.get_model('myapp', 'Calificacion')
+    AfinidadCategoria = apps.get_model('myapp', 'AfinidadCategoria')
+
+    categorias = defaultdict(list)
+    for contenido_id, categoria_id in ContenidoCategoria.objects.values_list('contenido_id', 'categoria_id'):
+        categorias[contenido_id].append(categoria_id)
+
+    eventos = [(p, c, peso_reproduccion(), f) for p, c, f in
+               HistorialReproduccion.objects.values_list('perfil_id', 'contenido_id', 'fecha')]
+    eventos += [(p, c, peso_favorito(), f) for p, c, f in
+                Favorito.objects.values_list('perfil_id', 'contenido_id', 'fecha_agregado')]
+    eventos += [(p, c, peso_calificacion(v), f) for p, c, v, f in
+                Calificacion.objects.values_list('perfil_id', 'contenido_id', 'calificacion', 'fecha')]
+
+    puntuaciones = defaultdict(float)
+    for perfil_id, contenido_id, peso, fecha in eventos:
+        for categoria_id in categorias.get(contenido_id, ()):
+            puntuaciones[(perfil_id, categoria_id)] += peso * factor(fecha)
+
+    AfinidadCategoria.objects.bulk_create([
+        AfinidadCategoria(perfil_id=perfil_id, categoria_id=categoria_id, puntuacion=puntuacion)
+        for (perfil_id, categoria_id), puntuacion in puntuaciones.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0025_indices_vistos_perfil'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AfinidadCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.FloatField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.categoria')),
+                ('perfil', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='afinidades', to='myapp.perfil')),
+            ],
+            options={
+                'verbose_name': 'Afinidad por Categoría',
+                'verbose_name_plural': 'Afinidades por Categoría',
+                'indexes': [models.Index(fields=['perfil', '-puntuacion'], name='myapp_afini_perfil__2ce3b9_idx')],
+                'unique_together': {('perfil', 'categoria')},
+            },
+        ),
+        migrations.RunPython(poblar_afinidades, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 08:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0026_afinidadcategoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecomendacionPrecalculada',
+            fields=[
+                ('perfil', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recomendacion_precalculada', serialize=False, to='myapp.perfil')),
+                ('contenido_ids', models.JSONField(default=list, help_text='Ids ordenados por prioridad')),
+                ('version_perfil', models.PositiveBigIntegerField(default=0)),
+                ('lote', models.CharField(db_index=True, help_text='Ejecución que la generó (para reanudar)', max_length=20)),
+                ('generado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Recomendación Precalculada',
+                'verbose_name_plural': 'Recomendaciones Precalculadas',
+            },
+        ),
+    ]
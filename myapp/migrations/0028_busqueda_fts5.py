@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# SQL copiado de myapp/buscador.py tal como estaba al crear la migración:
+# la migración no debe cambiar si el módulo cambia después
+
+_CATEGORIAS_DE = (
+    "(SELECT coalesce(group_concat(c.nombre, ' '), '') FROM myapp_contenidocategoria cc "
+    "JOIN myapp_categoria c ON c.id = cc.categoria_id WHERE cc.contenido_id = {})"
+)
+
+SQL_CREAR = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS myapp_contenido_fts USING fts5("
+    "titulo, descripcion, categorias, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_insertar AFTER INSERT ON myapp_contenido BEGIN
+        INSERT INTO myapp_contenido_fts (rowid, titulo, descripcion, categorias)
+        VALUES (new.id, new.titulo, new.descripcion, {_CATEGORIAS_DE.format('new.id')});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_actualizar AFTER UPDATE OF titulo, descripcion ON myapp_contenido BEGIN
+        UPDATE myapp_contenido_fts SET titulo = new.titulo, descripcion = new.descripcion WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_borrar AFTER DELETE ON myapp_contenido BEGIN
+        DELETE FROM myapp_contenido_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenidocategoria_fts_insertar AFTER INSERT ON myapp_contenidocategoria BEGIN
+        UPDATE myapp_contenido_fts SET categorias = {_CATEGORIAS_DE.format('new.contenido_id')} WHERE rowid = new.contenido_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenidocategoria_fts_borrar AFTER DELETE ON myapp_contenidocategoria BEGIN
+        UPDATE myapp_contenido_fts SET categorias = {_CATEGORIAS_DE.format('old.contenido_id')} WHERE rowid = old.contenido_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_categoria_fts_renombrar AFTER UPDATE OF nombre ON myapp_categoria BEGIN
+        UPDATE myapp_contenido_fts SET categorias = {_CATEGORIAS_DE.format('myapp_contenido_fts.rowid')}
+        WHERE rowid IN (SELECT contenido_id FROM myapp_contenidocategoria WHERE categoria_id = new.id);
+    END""",
+    "INSERT INTO myapp_contenido_fts (rowid, titulo, descripcion, categorias) "
+    f"SELECT id, titulo, descripcion, {_CATEGORIAS_DE.format('myapp_contenido.id')} FROM myapp_contenido",
+]
+
+SQL_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_insertar',
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_actualizar',
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_borrar',
+    'DROP TRIGGER IF EXISTS myapp_contenidocategoria_fts_insertar',
+    'DROP TRIGGER IF EXISTS myapp_contenidocategoria_fts_borrar',
+    'DROP TRIGGER IF EXISTS myapp_categoria_fts_renombrar',
+    'DROP TABLE IF EXISTS myapp_contenido_fts',
+]
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    # Solo SQLite tiene FTS5; con otras bases de datos se usan los trigramas
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in SQL_CREAR:
+            cursor.execute(sql)
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in SQL_ELIMINAR:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0027_recomendacionprecalculada'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
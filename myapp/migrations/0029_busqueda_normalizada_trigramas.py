@@ -0,0 +1,145 @@
+# Generated by Django 5.2 on 2026-10-18 08:24
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+_CATEGORIAS_DE = (
+    "(SELECT coalesce(group_concat(c.nombre, ' '), '') FROM myapp_contenidocategoria cc "
+    "JOIN myapp_categoria c ON c.id = cc.categoria_id WHERE cc.contenido_id = {})"
+)
+
+# Los mismos triggers que crea 0028
+SQL_CREAR_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_insertar AFTER INSERT ON myapp_contenido BEGIN
+        INSERT INTO myapp_contenido_fts (rowid, titulo, descripcion, categorias)
+        VALUES (new.id, new.titulo, new.descripcion, {_CATEGORIAS_DE.format('new.id')});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_actualizar AFTER UPDATE OF titulo, descripcion ON myapp_contenido BEGIN
+        UPDATE myapp_contenido_fts SET titulo = new.titulo, descripcion = new.descripcion WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS myapp_contenido_fts_borrar AFTER DELETE ON myapp_contenido BEGIN
+        DELETE FROM myapp_contenido_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenidocategoria_fts_insertar AFTER INSERT ON myapp_contenidocategoria BEGIN
+        UPDATE myapp_contenido_fts SET categorias = {_CATEGORIAS_DE.format('new.contenido_id')} WHERE rowid = new.contenido_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_contenidocategoria_fts_borrar AFTER DELETE ON myapp_contenidocategoria BEGIN
+        UPDATE myapp_contenido_fts SET categorias = {_CATEGORIAS_DE.format('old.contenido_id')} WHERE rowid = old.contenido_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS myapp_categoria_fts_renombrar AFTER UPDATE OF nombre ON myapp_categoria BEGIN
+        UPDATE myapp_contenido_fts SET categorias = {_CATEGORIAS_DE.format('myapp_contenido_fts.rowid')}
+        WHERE rowid IN (SELECT contenido_id FROM myapp_contenidocategoria WHERE categoria_id = new.id);
+    END""",
+]
+
+SQL_ELIMINAR_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_insertar',
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_actualizar',
+    'DROP TRIGGER IF EXISTS myapp_contenido_fts_borrar',
+    'DROP TRIGGER IF EXISTS myapp_contenidocategoria_fts_insertar',
+    'DROP TRIGGER IF EXISTS myapp_contenidocategoria_fts_borrar',
+    'DROP TRIGGER IF EXISTS myapp_categoria_fts_renombrar',
+]
+
+_SEPARADORES = re.compile(r'[\W_]+')
+
+
+def _ejecutar(schema_editor, sentencias):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+def quitar_triggers_fts(apps, schema_editor):
+    # Los triggers de 0028 leen myapp_contenido, myapp_contenidocategoria y
+    # myapp_categoria, y SQLite no deja rehacer esas tablas (AddField) mientras existan
+    _ejecutar(schema_editor, SQL_ELIMINAR_TRIGGERS)
+
+
+def crear_triggers_fts(apps, schema_editor):
+    _ejecutar(schema_editor, SQL_CREAR_TRIGGERS)
+
+
+def normalizar(texto):
+    # Copia de trigramas.normalizar al crear la migración
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_acentos = ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+    return _SEPARADORES.sub(' ', sin_acentos.casefold()).strip()
+
+
+def trigramas(normalizado):
+    return {normalizado[i:i + 3] for i in range(len(normalizado) - 2)}
+
+
+def poblar_normalizados(apps, schema_editor):
+    Contenido = apps.get_model('myapp', 'Contenido')
+    Categoria = apps.get_model('myapp', 'Categoria')
+    TrigramaContenido = apps.get_model('myapp', 'TrigramaContenido')
+
+    contenidos = [Contenido(id=pk, titulo_normalizado=normalizar(titulo))
+                  for pk, titulo in Contenido.objects.values_list('id', 'titulo')]
+    Contenido.objects.bulk_update(contenidos, ['titulo_normalizado'], batch_size=1000)
+    categorias = [Categoria(id=pk, nombre_normalizado=normalizar(nombre))
+                  for pk, nombre in Categoria.objects.values_list('id', 'nombre')]
+    Categoria.objects.bulk_update(categorias, ['nombre_normalizado'], batch_size=1000)
+    TrigramaContenido.objects.bulk_create([
+        TrigramaContenido(trigrama=trigrama, contenido_id=contenido.id)
+        for contenido in contenidos for trigrama in trigramas(contenido.titulo_normalizado)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0028_busqueda_fts5'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_triggers_fts, crear_triggers_fts),
+        migrations.AddField(
+            model_name='categoria',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Nombre sin acentos y en minúsculas', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='contenido',
+            name='titulo_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Título sin acentos y en minúsculas (ver trigramas.py)', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='AliasContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('texto', models.CharField(max_length=255)),
+                ('texto_normalizado', models.CharField(blank=True, db_index=True, editable=False, max_length=255)),
+                ('tipo', models.CharField(choices=[('romaji', 'Romaji'), ('english', 'Inglés'), ('native', 'Nativo'), ('sinonimo', 'Sinónimo')], max_length=10)),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alias', to='myapp.contenido')),
+            ],
+            options={
+                'verbose_name': 'Alias de Contenido',
+                'verbose_name_plural': 'Alias de Contenido',
+                'unique_together': {('contenido', 'texto')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrigramaContenido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('contenido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.contenido')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de Contenido',
+                'verbose_name_plural': 'Trigramas de Contenido',
+                'unique_together': {('trigrama', 'contenido')},
+            },
+        ),
+        migrations.RunPython(poblar_normalizados, migrations.RunPython.noop),
+        migrations.RunPython(crear_triggers_fts, quitar_triggers_fts),
+    ]
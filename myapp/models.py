@@ -24,6 +24,7 @@ class Perfil(models.Model):
 # Tabla de categorías
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True, db_index=True)
+    nombre_normalizado = models.CharField(max_length=100, blank=True, db_index=True, editable=False, help_text="Nombre sin acentos y en minúsculas")
 
     class Meta:
         ordering = ['nombre']
@@ -39,6 +40,7 @@ class Contenido(models.Model):
     ]
 
     titulo = models.CharField(max_length=255, db_index=True)
+    titulo_normalizado = models.CharField(max_length=255, blank=True, db_index=True, editable=False, help_text="Título sin acentos y en minúsculas (ver trigramas.py)")
     tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, db_index=True)
     descripcion = models.TextField(blank=True)
     año = models.PositiveIntegerField(null=True, blank=True, db_index=True)
@@ -61,6 +63,12 @@ class Contenido(models.Model):
             models.Index(fields=['titulo', 'tipo']),
             models.Index(fields=['año', '-id']),
             models.Index(fields=['-id']),
+            # Paginación por cursor del catálogo: (orden, id) con y sin filtro por tipo
+            models.Index(fields=['titulo', 'id']),
+            models.Index(fields=['año', 'id']),
+            models.Index(fields=['tipo', '-id']),
+            models.Index(fields=['tipo', 'titulo', 'id']),
+            models.Index(fields=['tipo', 'año', 'id']),
         ]
         ordering = ['-id']
 
@@ -81,6 +89,11 @@ class ContenidoCategoria(models.Model):
     contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE)
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['categoria', 'contenido']),
+        ]
+
 # Tabla de episodios (solo para series)
 class Episodio(models.Model):
     serie = models.ForeignKey(Contenido, on_delete=models.CASCADE, limit_choices_to={'tipo': 'serie'})
@@ -112,12 +125,24 @@ class HistorialReproduccion(models.Model):
     tiempo_reproducido = models.PositiveIntegerField(help_text="Segundos")
     fecha = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Exclusión de lo ya visto por perfil (NOT EXISTS en vistos.py)
+        indexes = [
+            models.Index(fields=['perfil', 'contenido']),
+        ]
+
 # Favoritos por perfil
 class Favorito(models.Model):
     perfil = models.ForeignKey(Perfil, on_delete=models.CASCADE)
     contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE)
     fecha_agregado = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Exclusión de lo ya visto por perfil (NOT EXISTS en vistos.py)
+        indexes = [
+            models.Index(fields=['perfil', 'contenido']),
+        ]
+
 # Calificaciones por perfil
 class Calificacion(models.Model):
     perfil = models.ForeignKey(Perfil, on_delete=models.CASCADE)
@@ -125,9 +150,160 @@ class Calificacion(models.Model):
     calificacion = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)])
     fecha = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Exclusión de lo ya visto por perfil (NOT EXISTS en vistos.py)
+        indexes = [
+            models.Index(fields=['perfil', 'contenido']),
+        ]
+
     def __str__(self):
         return f"{self.perfil.nombre} - {self.contenido.titulo} ({self.calificacion}⭐)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Recordar el valor guardado para ajustar los contadores al modificarlo
+        instancia = super().from_db(db, field_names, values)
+        instancia._calificacion_guardada = instancia.__dict__.get('calificacion')
+        return instancia
+
+# Contadores de interacción por contenido, mantenidos en cada escritura
+class EstadisticasContenido(models.Model):
+    contenido = models.OneToOneField(Contenido, on_delete=models.CASCADE, primary_key=True, related_name='estadisticas')
+    total_reproducciones = models.PositiveIntegerField(default=0, db_index=True)
+    total_likes = models.PositiveIntegerField(default=0, db_index=True)
+    total_dislikes = models.PositiveIntegerField(default=0)
+    total_favoritos = models.PositiveIntegerField(default=0)
+    total_calificaciones = models.PositiveIntegerField(default=0, db_index=True)
+    suma_calificaciones = models.PositiveIntegerField(default=0)
+    rating_promedio = models.FloatField(null=True, blank=True, db_index=True)
+    # Puntuación de popularidad con decaimiento temporal (ver popularidad.py)
+    puntuacion_popularidad = models.FloatField(default=0, db_index=True)
+    popularidad_calculada = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Estadísticas de Contenido"
+        verbose_name_plural = "Estadísticas de Contenidos"
+
+    def __str__(self):
+        return f"{self.contenido.titulo}: {self.total_reproducciones} reproducciones"
+
+# Conteos de facetas del catálogo mantenidos incrementalmente (ver facetas.py)
+class ConteoFaceta(models.Model):
+    # categoria=None agrupa todo el catálogo sin filtrar por categoría
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True)
+    tipo = models.CharField(max_length=10, choices=Contenido.TIPO_CHOICES)
+    decada = models.PositiveIntegerField(null=True, blank=True, help_text="Año inicial de la década (1990, 2000...)")
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Conteo de Faceta"
+        verbose_name_plural = "Conteos de Facetas"
+        unique_together = ('categoria', 'tipo', 'decada')
+
+    def __str__(self):
+        return f"{self.categoria or 'Todas'} / {self.tipo} / {self.decada or '?'}: {self.total}"
+
+# Versiones de datos para ETag / Last-Modified (ver versiones.py)
+class VersionDatos(models.Model):
+    clave = models.CharField(max_length=64, unique=True)
+    valor = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Versión de Datos"
+        verbose_name_plural = "Versiones de Datos"
+
+    def __str__(self):
+        return f"{self.clave} v{self.valor}"
+
+# Vecinos más similares de cada contenido calculados por lotes (ver similitud.py)
+class ContenidoSimilar(models.Model):
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='similares')
+    similar = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='+')
+    puntuacion = models.FloatField()
+    posicion = models.PositiveSmallIntegerField(help_text="0 = el más similar")
+
+    class Meta:
+        verbose_name = "Contenido Similar"
+        verbose_name_plural = "Contenidos Similares"
+        unique_together = ('contenido', 'similar')
+        indexes = [
+            models.Index(fields=['contenido', 'posicion']),
+        ]
+
+    def __str__(self):
+        return f"{self.contenido_id} -> {self.similar_id} ({self.puntuacion:.3f})"
+
+# Afinidad de cada perfil por categoría mantenida incrementalmente (ver gustos.py)
+class AfinidadCategoria(models.Model):
+    perfil = models.ForeignKey(Perfil, on_delete=models.CASCADE, related_name='afinidades')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='+')
+    # Escalada por el decaimiento hacia adelante: solo es comparable dentro del mismo perfil
+    puntuacion = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Afinidad por Categoría"
+        verbose_name_plural = "Afinidades por Categoría"
+        unique_together = ('perfil', 'categoria')
+        indexes = [
+            models.Index(fields=['perfil', '-puntuacion']),
+        ]
+
+    def __str__(self):
+        return f"{self.perfil_id} -> {self.categoria_id} ({self.puntuacion:.3f})"
+
+# Recomendaciones calculadas por lotes antes de las horas punta (ver precalculo.py)
+class RecomendacionPrecalculada(models.Model):
+    perfil = models.OneToOneField(Perfil, on_delete=models.CASCADE, primary_key=True, related_name='recomendacion_precalculada')
+    contenido_ids = models.JSONField(default=list, help_text="Ids ordenados por prioridad")
+    # Versión del perfil al calcularla: una interacción posterior la deja obsoleta
+    version_perfil = models.PositiveBigIntegerField(default=0)
+    lote = models.CharField(max_length=20, db_index=True, help_text="Ejecución que la generó (para reanudar)")
+    generado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Recomendación Precalculada"
+        verbose_name_plural = "Recomendaciones Precalculadas"
+
+    def __str__(self):
+        return f"{self.perfil_id}: {len(self.contenido_ids)} recomendaciones ({self.lote})"
+
+# Títulos alternativos de AniList (romaji, inglés, nativo y sinónimos) para la búsqueda
+class AliasContenido(models.Model):
+    TIPO_CHOICES = [
+        ('romaji', 'Romaji'),
+        ('english', 'Inglés'),
+        ('native', 'Nativo'),
+        ('sinonimo', 'Sinónimo'),
+    ]
+
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='alias')
+    texto = models.CharField(max_length=255)
+    texto_normalizado = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+
+    class Meta:
+        verbose_name = "Alias de Contenido"
+        verbose_name_plural = "Alias de Contenido"
+        unique_together = ('contenido', 'texto')
+
+    def __str__(self):
+        return f"{self.contenido_id}: {self.texto} ({self.tipo})"
+
+# Trigramas del título y los alias normalizados de cada contenido (ver trigramas.py)
+class TrigramaContenido(models.Model):
+    trigrama = models.CharField(max_length=3)
+    contenido = models.ForeignKey(Contenido, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name = "Trigrama de Contenido"
+        verbose_name_plural = "Trigramas de Contenido"
+        # El índice único (trigrama, contenido) resuelve las búsquedas por trigrama
+        unique_together = ('trigrama', 'contenido')
+
+    def __str__(self):
+        return f"{self.trigrama!r} -> {self.contenido_id}"
+
 # Modelo de Auditoría
 class AuditLog(models.Model):
     ACCION_CHOICES = [
@@ -179,36 +355,52 @@ class AuditLog(models.Model):
         perfil_str = f" - {self.perfil.nombre}" if self.perfil else ""
         return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {usuario_str}{perfil_str} | {self.get_accion_display()}"
 
+    @classmethod
+    def nueva_entrada(cls, accion, descripcion, usuario=None, perfil=None, tabla_afectada='',
+                      objeto_id='', nivel='INFO', ip_address=None, user_agent='', datos_adicionales=None):
+        """Entrada de auditoría sin guardar (las de búsqueda se escriben en lote, ver telemetria.py)"""
+        return cls(
+            usuario=usuario,
+            perfil=perfil,
+            accion=accion,
+            tabla_afectada=tabla_afectada,
+            objeto_id=str(objeto_id) if objeto_id else '',
+            descripcion=descripcion,
+            nivel=nivel,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            datos_adicionales=datos_adicionales
+        )
+
+    @staticmethod
+    def registrar_en_archivo(accion, descripcion, usuario=None, perfil=None, nivel='INFO'):
+        """Escribir la acción en el log de auditoría"""
+        usuario_str = usuario.username if usuario else 'Anónimo'
+        perfil_str = f" - Perfil: {perfil.nombre}" if perfil else ""
+        log_message = f"Usuario: {usuario_str}{perfil_str} | Acción: {accion} | {descripcion}"
+        
+        if nivel == 'ERROR' or nivel == 'CRITICAL':
+            audit_logger.error(log_message)
+        elif nivel == 'WARNING':
+            audit_logger.warning(log_message)
+        else:
+            audit_logger.info(log_message)
+
     @classmethod
     def log_action(cls, accion, descripcion, usuario=None, perfil=None, tabla_afectada='', 
                     objeto_id='', nivel='INFO', ip_address=None, user_agent='', datos_adicionales=None):
         """Método para registrar acciones de auditoría"""
         try:
             # Registrar en base de datos
-            audit_entry = cls.objects.create(
-                usuario=usuario,
-                perfil=perfil,
-                accion=accion,
-                tabla_afectada=tabla_afectada,
-                objeto_id=str(objeto_id) if objeto_id else '',
-                descripcion=descripcion,
-                nivel=nivel,
-                ip_address=ip_address,
-                user_agent=user_agent,
+            audit_entry = cls.nueva_entrada(
+                accion, descripcion, usuario=usuario, perfil=perfil, tabla_afectada=tabla_afectada,
+                objeto_id=objeto_id, nivel=nivel, ip_address=ip_address, user_agent=user_agent,
                 datos_adicionales=datos_adicionales
             )
+            audit_entry.save(force_insert=True)
             
             # También registrar en archivo de log
-            usuario_str = usuario.username if usuario else 'Anónimo'
-            perfil_str = f" - Perfil: {perfil.nombre}" if perfil else ""
-            log_message = f"Usuario: {usuario_str}{perfil_str} | Acción: {accion} | {descripcion}"
-            
-            if nivel == 'ERROR' or nivel == 'CRITICAL':
-                audit_logger.error(log_message)
-            elif nivel == 'WARNING':
-                audit_logger.warning(log_message)
-            else:
-                audit_logger.info(log_message)
+            cls.registrar_en_archivo(accion, descripcion, usuario=usuario, perfil=perfil, nivel=nivel)
                 
             return audit_entry
             
@@ -283,15 +475,14 @@ class HistorialBusqueda(models.Model):
         return f"{usuario_str}: '{self.termino_busqueda}' ({self.resultados_encontrados} resultados) - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
     
     @classmethod
-    def registrar_busqueda(cls, termino, usuario=None, perfil=None, resultados_count=0, ip_address='127.0.0.1', user_agent=''):
-        """Método para registrar una nueva búsqueda"""
+    def nueva_busqueda(cls, termino, usuario=None, perfil=None, resultados_count=0, ip_address='127.0.0.1', user_agent=''):
+        """Registro de búsqueda sin guardar (las de la vista se escriben en lote, ver telemetria.py)"""
         if not termino or not termino.strip():
             return None
             
         termino_normalizado = termino.strip().lower()
         
-        # Crear registro de búsqueda
-        historial = cls.objects.create(
+        return cls(
             usuario=usuario,
             perfil=perfil,
             termino_busqueda=termino.strip(),
@@ -300,7 +491,13 @@ class HistorialBusqueda(models.Model):
             ip_address=ip_address,
             user_agent=user_agent
         )
-        
+    
+    @classmethod
+    def registrar_busqueda(cls, termino, usuario=None, perfil=None, resultados_count=0, ip_address='127.0.0.1', user_agent=''):
+        """Método para registrar una nueva búsqueda"""
+        historial = cls.nueva_busqueda(termino, usuario, perfil, resultados_count, ip_address, user_agent)
+        if historial is not None:
+            historial.save(force_insert=True)
         return historial
     
     @classmethod
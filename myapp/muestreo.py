@@ -0,0 +1,116 @@
+"""
+Muestreo aleatorio sin ORDER BY RANDOM()
+
+``order_by('?')`` obliga a la base de datos a generar un aleatorio por fila y
+ordenar todo el resultado. En su lugar cada proceso mantiene "pools" de ids
+barajados (todo el catálogo o una categoría) construidos desde el catálogo
+compacto. La permutación se genera con una semilla derivada de la clave, la
+versión del catálogo y el periodo de rotación, así que cambia cada
+``MUESTREO_ROTACION_SEGUNDOS`` y es la misma en todos los procesos.
+
+Extraer k elementos recorre el pool desde una posición aleatoria saltando
+los excluidos: O(k + excluidos encontrados) en lugar de O(n log n).
+"""
+import random
+import threading
+import time
+from itertools import groupby
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .catalogo_compacto import obtener_catalogo
+
+TODOS = 'todos'
+
+_pools: Dict[str, Tuple[object, int, List[int]]] = {}  # clave -> (catálogo, periodo, ids)
+_bloqueo = threading.Lock()
+
+
+def _rotacion() -> int:
+    return getattr(settings, 'MUESTREO_ROTACION_SEGUNDOS', 15 * 60)
+
+
+def _construir(clave: str, catalogo) -> List[int]:
+    indice = catalogo.bitmaps
+    if clave == TODOS:
+        return list(indice.ids)
+    return indice.a_ids(indice.categoria(int(clave.split(':', 1)[1])))
+
+
+def pool(clave: str) -> List[int]:
+    """Ids barajados del pool (``TODOS`` o ``'categoria:<id>'``) para la versión y el periodo actuales"""
+    catalogo = obtener_catalogo()
+    periodo = int(time.time() // _rotacion())
+    actual = _pools.get(clave)
+    if actual and actual[0] is catalogo and actual[1] == periodo:
+        return actual[2]
+
+    ids = _construir(clave, catalogo)
+    random.Random(f'{clave}:{catalogo.version}:{periodo}').shuffle(ids)
+    with _bloqueo:
+        _pools[clave] = (catalogo, periodo, ids)
+    return ids
+
+
+def pool_categoria(categoria_id: int) -> List[int]:
+    return pool(f'categoria:{categoria_id}')
+
+
+def extraer(ids: Sequence[int], k: int, excluir: Collection[int] = (), rng: Optional[random.Random] = None) -> List[int]:
+    """Hasta k ids del pool a partir de una posición aleatoria, saltando los excluidos"""
+    if not ids or k <= 0:
+        return []
+    rng = rng or random
+    inicio = rng.randrange(len(ids))
+    resultado = []
+    for desplazamiento in range(len(ids)):
+        contenido_id = ids[(inicio + desplazamiento) % len(ids)]
+        if contenido_id not in excluir:
+            resultado.append(contenido_id)
+            if len(resultado) >= k:
+                break
+    return resultado
+
+
+def aleatorios(k: int, excluir: Collection[int] = ()) -> List[int]:
+    """k ids al azar de todo el catálogo"""
+    return extraer(pool(TODOS), k, excluir)
+
+
+def de_categorias(categoria_ids: Iterable[int], k: int, excluir: Collection[int] = ()) -> List[int]:
+    """k ids al azar repartidos entre las categorías indicadas (sin repetir)"""
+    categoria_ids = list(categoria_ids)
+    if not categoria_ids:
+        return []
+    vistos = set(excluir)
+    resultado = []
+    # Pedir a cada categoría su parte proporcional y completar en rondas
+    while len(resultado) < k:
+        antes = len(resultado)
+        for categoria_id in categoria_ids:
+            parte = -(-(k - len(resultado)) // len(categoria_ids))
+            nuevos = extraer(pool_categoria(categoria_id), parte, vistos)
+            vistos.update(nuevos)
+            resultado += nuevos[:k - len(resultado)]
+            if len(resultado) >= k:
+                break
+        if len(resultado) == antes:
+            break
+    return resultado
+
+
+def barajar_empates(elementos: Sequence, clave: Callable, limite: Optional[int] = None) -> List:
+    """
+    Conservar el orden de ``elementos`` (ya ordenados por ``clave``) barajando
+    solo dentro de cada grupo empatado; sustituye al ``'?'`` como último criterio.
+    """
+    resultado = []
+    for _, grupo in groupby(elementos, key=clave):
+        grupo = list(grupo)
+        random.shuffle(grupo)
+        resultado += grupo
+        if limite is not None and len(resultado) >= limite:
+            break
+    return resultado[:limite]
+
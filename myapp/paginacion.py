@@ -0,0 +1,164 @@
+"""
+Paginación por cursor (keyset)
+
+En lugar de ``OFFSET`` cada página continúa desde los valores de ordenación
+del último elemento de la anterior (``WHERE (titulo, id) > (...)``), de modo
+que el coste por página es constante sin importar la profundidad del scroll.
+El último campo del orden debe ser único (``id``/``-id``) para desempatar.
+
+Con todos los campos en la misma dirección se emite una comparación de
+valores de fila (SQLite >= 3.15), que el planificador resuelve como un
+``SEARCH`` sobre el índice compuesto desde el cursor. Un ``OR`` equivalente
+obliga a SQLite a recorrer el índice desde el principio (``SCAN``). Las
+direcciones mezcladas, los valores NULL en el cursor y los campos con NULL
+que el motor ordena al final usan la expansión ``OR`` campo a campo.
+"""
+import base64
+import json
+from typing import List, Optional, Sequence, Tuple
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import BooleanField, Expression, F, Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores: Sequence) -> str:
+    datos = json.dumps(list(valores), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str, campos: int) -> list:
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido(str(e))
+    if not isinstance(valores, list) or len(valores) != campos:
+        raise CursorInvalido("El cursor no corresponde al orden solicitado")
+    return valores
+
+
+def _nulos_al_final(descendente: bool) -> bool:
+    """Posición de NULL según el motor: SQLite/MySQL los tratan como el menor valor"""
+    nulos_mayores = connection.features.nulls_order_largest
+    return not nulos_mayores if descendente else nulos_mayores
+
+
+def _posteriores(campo: str, valor, descendente: bool) -> Optional[Q]:
+    """Filas cuyo ``campo`` va estrictamente después de ``valor`` en el orden (None si ninguna)"""
+    if valor is None:
+        # Si los NULL van al final no hay nada después de un NULL
+        return None if _nulos_al_final(descendente) else Q(**{f'{campo}__isnull': False})
+    posteriores = Q(**{f'{campo}__lt' if descendente else f'{campo}__gt': valor})
+    if _nulos_al_final(descendente):
+        posteriores |= Q(**{f'{campo}__isnull': True})
+    return posteriores
+
+
+def _iguales(campo: str, valor) -> Q:
+    return Q(**{f'{campo}__isnull': True}) if valor is None else Q(**{campo: valor})
+
+
+class ComparacionFilas(Expression):
+    """``(a, b, ...) > (va, vb, ...)`` (``<`` en orden descendente) como comparación de valores de fila"""
+    output_field = BooleanField()
+
+    def __init__(self, campos: Sequence[str], valores: Sequence, descendente: bool):
+        super().__init__()
+        self.columnas = [F(campo) for campo in campos]
+        self.valores = list(valores)
+        self.descendente = descendente
+
+    def get_source_expressions(self):
+        return self.columnas
+
+    def set_source_expressions(self, expresiones):
+        self.columnas = list(expresiones)
+
+    def as_sql(self, compiler, connection):
+        columnas, parametros = [], []
+        for columna in self.columnas:
+            sql, params = compiler.compile(columna)
+            columnas.append(sql)
+            parametros.extend(params)
+        for columna, valor in zip(self.columnas, self.valores):
+            parametros.append(columna.output_field.get_db_prep_value(valor, connection))
+        operador = '<' if self.descendente else '>'
+        marcadores = ', '.join(['%s'] * len(self.valores))
+        return f"({', '.join(columnas)}) {operador} ({marcadores})", parametros
+
+
+def _admite_valores_fila() -> bool:
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 15)
+    return connection.vendor in ('postgresql', 'mysql')
+
+
+def _comparacion_filas(modelo, orden: Sequence[str], valores: Sequence) -> Optional[Q]:
+    """Comparación de valores de fila si equivale a la expansión OR para este cursor (None si no)"""
+    direcciones = {campo.startswith('-') for campo in orden}
+    if modelo is None or len(direcciones) != 1 or None in valores or not _admite_valores_fila():
+        return None
+    descendente = direcciones.pop()
+    campos = [campo.lstrip('-') for campo in orden]
+    try:
+        nulables = any(modelo._meta.get_field(campo).null for campo in campos)
+    except FieldDoesNotExist:
+        return None  # Campos de relaciones o anotaciones
+    if nulables and _nulos_al_final(descendente):
+        # Las filas con NULL van después del cursor pero la comparación de filas las descarta
+        return None
+    valores = [modelo._meta.get_field(campo).to_python(valor) for campo, valor in zip(campos, valores)]
+    return Q(ComparacionFilas(campos, valores, descendente))
+
+
+def filtro_keyset(orden: Sequence[str], valores: Sequence, modelo=None) -> Q:
+    """
+    Condición "después del cursor" para un orden de varios campos: ``(a, b, id) > (va, vb, vid)``
+    cuando es posible (ver ``_comparacion_filas``) o, si no,
+    (a > va) OR (a = va AND b > vb) OR (a = va AND b = vb AND id > vid) ...
+    """
+    filas = _comparacion_filas(modelo, orden, valores)
+    if filas is not None:
+        return filas
+
+    condicion = Q(pk__in=[])
+    prefijo = Q()
+    for campo_orden, valor in zip(orden, valores):
+        descendente = campo_orden.startswith('-')
+        campo = campo_orden.lstrip('-')
+        posteriores = _posteriores(campo, valor, descendente)
+        if posteriores is not None:
+            condicion |= prefijo & posteriores
+        prefijo &= _iguales(campo, valor)
+    return condicion
+
+
+def paginar_keyset(queryset, orden: Sequence[str], cursor: Optional[str] = None,
+                   limite: int = 24) -> Tuple[List, Optional[str]]:
+    """
+    Devuelve los elementos de la página y el cursor de la siguiente (None si es la última).
+    Lanza ``CursorInvalido`` si el cursor no se puede interpretar.
+    """
+    queryset = queryset.order_by(*orden)
+    if cursor:
+        try:
+            queryset = queryset.filter(
+                filtro_keyset(orden, decodificar_cursor(cursor, len(orden)), queryset.model)
+            )
+        except (ValueError, TypeError, ValidationError) as e:
+            # Valores con un tipo que no corresponde al campo
+            raise CursorInvalido(str(e))
+
+    elementos = list(queryset[:limite + 1])
+    if len(elementos) <= limite:
+        return elementos, None
+
+    elementos = elementos[:limite]
+    ultimo = elementos[-1]
+    siguiente = codificar_cursor([getattr(ultimo, campo.lstrip('-')) for campo in orden])
+    return elementos, siguiente
@@ -0,0 +1,224 @@
+"""
+Pipeline de recomendaciones por etapas
+
+La lista de candidatos de un perfil se construye en cuatro tipos de etapa:
+
+1. generadores: cada estrategia propone contenidos (su cuota es
+   ``limite // divisor``); se pueden ejecutar a la vez en un pool de hilos
+   con ``RECOMENDACIONES_CONCURRENCIA`` > 1
+2. fusión: intercala las propuestas, quita duplicados y lo ya visto, y da
+   a cada candidato una puntuación inicial según su puesto
+3. puntuadores: ajustan la puntuación de los candidatos
+4. reordenadores: ordenan, recortan o completan la lista
+
+Cada etapa se mide (milisegundos, candidatos de entrada y de salida) y se
+puede desactivar por llamada con ``desactivar={'rating', ...}``. Las
+ejecuciones más lentas que ``RECOMENDACIONES_PIPELINE_LENTO_MS`` se
+registran con el desglose por etapa.
+
+Las etapas reciben el ``SistemaRecomendaciones`` del perfil; para añadir
+una basta con registrar una función más en ``PIPELINE``.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import zip_longest
+from typing import Callable, Collection, Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+from .concurrencia import cerrando_conexiones
+from .muestreo import aleatorios
+
+logger = logging.getLogger(__name__)
+
+GENERADOR = 'generador'
+GENERADORES = 'generadores'  # Medición conjunta de todos los generadores
+FUSION = 'fusion'
+PUNTUADOR = 'puntuador'
+REORDENADOR = 'reordenador'
+
+BONO_CONSENSO = 1.0  # Fracción de la puntuación sumada por cada generador adicional que propone el mismo contenido
+
+
+def _concurrencia() -> int:
+    return getattr(settings, 'RECOMENDACIONES_CONCURRENCIA', 1)
+
+
+def _umbral_lento_ms() -> float:
+    return getattr(settings, 'RECOMENDACIONES_PIPELINE_LENTO_MS', 200)
+
+
+class Candidato:
+    __slots__ = ('contenido', 'puntuacion', 'fuentes')
+
+    def __init__(self, contenido, puntuacion: float, fuente: str):
+        self.contenido = contenido
+        self.puntuacion = puntuacion
+        self.fuentes = [fuente]
+
+    def __repr__(self):
+        return f'Candidato({self.contenido.id}, {self.puntuacion:.3f}, {self.fuentes})'
+
+
+class Etapa:
+    """Función de una etapa con su nombre, tipo y, para los generadores, el divisor de su cuota"""
+
+    def __init__(self, nombre: str, tipo: str, funcion: Callable, divisor: int = 1):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.funcion = funcion
+        self.divisor = divisor
+
+
+class ResultadoPipeline:
+    def __init__(self, candidatos: List[Candidato], mediciones: List[Dict]):
+        self.candidatos = candidatos
+        self.mediciones = mediciones
+
+    @property
+    def contenidos(self) -> list:
+        return [candidato.contenido for candidato in self.candidatos]
+
+    @property
+    def total_ms(self) -> float:
+        # Los generadores cuentan por su tiempo conjunto (pueden ejecutarse a la vez)
+        return sum(medicion['ms'] for medicion in self.mediciones if medicion['tipo'] != GENERADOR)
+
+    def resumen(self) -> str:
+        return ', '.join(f"{medicion['etapa']} {medicion['ms']:.1f}ms ({medicion['entrada']}→{medicion['salida']})"
+                         for medicion in self.mediciones)
+
+
+def _medir(mediciones: List[Dict], etapa: str, tipo: str, inicio: float, entrada: int, salida: int):
+    mediciones.append({
+        'etapa': etapa, 'tipo': tipo, 'ms': (time.perf_counter() - inicio) * 1000,
+        'entrada': entrada, 'salida': salida,
+    })
+
+
+class Pipeline:
+    def __init__(self, etapas: Sequence[Etapa]):
+        self.etapas = list(etapas)
+
+    def nombres(self, tipo: Optional[str] = None) -> List[str]:
+        return [etapa.nombre for etapa in self.etapas if tipo is None or etapa.tipo == tipo]
+
+    def _activas(self, tipo: str, desactivar: Collection[str]) -> List[Etapa]:
+        return [etapa for etapa in self.etapas if etapa.tipo == tipo and etapa.nombre not in desactivar]
+
+    def _generar(self, sistema, limite: int, desactivar: Collection[str], mediciones: List[Dict]) -> List[tuple]:
+        generadores = self._activas(GENERADOR, desactivar)
+        inicio_total = time.perf_counter()
+
+        def ejecutar(etapa):
+            inicio = time.perf_counter()
+            propuestas = etapa.funcion(sistema, limite // etapa.divisor)
+            return propuestas, inicio, time.perf_counter()
+
+        concurrencia = min(_concurrencia(), len(generadores))
+        if concurrencia > 1:
+            with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+                futuros = [pool.submit(cerrando_conexiones(partial(ejecutar, etapa))) for etapa in generadores]
+                resultados = [futuro.result() for futuro in futuros]
+        else:
+            resultados = [ejecutar(etapa) for etapa in generadores]
+
+        for etapa, (propuestas, inicio, fin) in zip(generadores, resultados):
+            mediciones.append({'etapa': etapa.nombre, 'tipo': GENERADOR, 'ms': (fin - inicio) * 1000,
+                               'entrada': limite // etapa.divisor, 'salida': len(propuestas)})
+        _medir(mediciones, 'generadores', GENERADORES, inicio_total, len(generadores),
+               sum(len(propuestas) for propuestas, _, _ in resultados))
+        return [(etapa.nombre, propuestas) for etapa, (propuestas, _, _) in zip(generadores, resultados)]
+
+    def ejecutar(self, sistema, limite: int = 10, desactivar: Collection[str] = ()) -> ResultadoPipeline:
+        mediciones = []
+        propuestas = self._generar(sistema, limite, desactivar, mediciones)
+
+        candidatos = []
+        for etapa in self._activas(FUSION, desactivar):
+            inicio = time.perf_counter()
+            entrada = sum(len(lista) for _, lista in propuestas)
+            candidatos = etapa.funcion(sistema, propuestas)
+            _medir(mediciones, etapa.nombre, etapa.tipo, inicio, entrada, len(candidatos))
+
+        for tipo in (PUNTUADOR, REORDENADOR):
+            for etapa in self._activas(tipo, desactivar):
+                inicio = time.perf_counter()
+                entrada = len(candidatos)
+                candidatos = etapa.funcion(sistema, candidatos, limite)
+                _medir(mediciones, etapa.nombre, etapa.tipo, inicio, entrada, len(candidatos))
+
+        resultado = ResultadoPipeline(candidatos, mediciones)
+        if resultado.total_ms > _umbral_lento_ms():
+            logger.warning(f"Pipeline de recomendaciones lento ({resultado.total_ms:.0f}ms) "
+                           f"para el perfil {sistema.perfil.id}: {resultado.resumen()}")
+        else:
+            logger.debug(f"Pipeline de recomendaciones: {resultado.resumen()}")
+        return resultado
+
+
+# ===== ETAPAS POR DEFECTO =====
+
+def intercalar(sistema, propuestas: List[tuple]) -> List[Candidato]:
+    """
+    Intercalar las propuestas de los generadores (uno de cada en cada vuelta)
+    sin duplicados ni contenido ya visto; la puntuación inicial decrece con el puesto
+    """
+    vistos = sistema._obtener_contenido_ya_visto()
+    por_id: Dict[int, Candidato] = {}
+    candidatos = []
+    vueltas = zip_longest(*[[(nombre, contenido) for contenido in lista] for nombre, lista in propuestas])
+    for vuelta in vueltas:
+        for par in vuelta:
+            if par is None:
+                continue
+            nombre, contenido = par
+            if contenido.id in vistos:
+                continue
+            existente = por_id.get(contenido.id)
+            if existente is not None:
+                if nombre not in existente.fuentes:
+                    existente.fuentes.append(nombre)
+                continue
+            candidato = Candidato(contenido, 1 / (len(candidatos) + 1), nombre)
+            por_id[contenido.id] = candidato
+            candidatos.append(candidato)
+    return candidatos
+
+
+def puntuar_consenso(sistema, candidatos: List[Candidato], limite: int) -> List[Candidato]:
+    """Subir lo que proponen varios generadores a la vez"""
+    for candidato in candidatos:
+        candidato.puntuacion *= 1 + BONO_CONSENSO * (len(candidato.fuentes) - 1)
+    return candidatos
+
+
+def ordenar(sistema, candidatos: List[Candidato], limite: int) -> List[Candidato]:
+    # Orden estable: a igual puntuación se conserva el orden de la fusión
+    return sorted(candidatos, key=lambda candidato: -candidato.puntuacion)
+
+
+def completar_aleatorio(sistema, candidatos: List[Candidato], limite: int) -> List[Candidato]:
+    """Si no hay suficientes candidatos, añadir contenido aleatorio no visto al final"""
+    if len(candidatos) >= limite:
+        return candidatos
+    excluidos = set(sistema._obtener_contenido_ya_visto()) | {candidato.contenido.id for candidato in candidatos}
+    relleno = sistema._cargar_contenidos(aleatorios(limite - len(candidatos), excluir=excluidos))
+    minima = min((candidato.puntuacion for candidato in candidatos), default=1.0)
+    return candidatos + [Candidato(contenido, minima / 2, 'aleatorio') for contenido in relleno]
+
+
+PIPELINE = Pipeline([
+    # Filtrado colaborativo, si hay un modelo entrenado (manage.py entrenar_recomendador)
+    Etapa('colaborativas', GENERADOR, lambda sistema, limite: sistema._recomendaciones_colaborativas(limite), 2),
+    Etapa('historial', GENERADOR, lambda sistema, limite: sistema._recomendaciones_por_historial(limite), 2),
+    Etapa('rating', GENERADOR, lambda sistema, limite: sistema._recomendaciones_por_rating(limite), 3),
+    Etapa('categorias', GENERADOR, lambda sistema, limite: sistema._recomendaciones_por_categorias(limite), 4),
+    Etapa('populares', GENERADOR, lambda sistema, limite: sistema._recomendaciones_populares(limite), 5),
+    Etapa('intercalar', FUSION, intercalar),
+    Etapa('consenso', PUNTUADOR, puntuar_consenso),
+    Etapa('ordenar', REORDENADOR, ordenar),
+    Etapa('completar_aleatorio', REORDENADOR, completar_aleatorio),
+])
@@ -0,0 +1,162 @@
+"""
+Puntuación de popularidad con decaimiento temporal
+
+Un proceso periódico (``manage.py calcular_popularidad``) combina las
+reproducciones, favoritos y calificaciones de cada contenido, ponderadas por
+su antigüedad con una vida media configurable, con ``anilist_score`` y
+``anilist_popularity``. El resultado se guarda en la columna indexada
+``EstadisticasContenido.puntuacion_popularidad``, de modo que los rankings
+son un ``ORDER BY ... LIMIT`` sobre el índice.
+"""
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Calificacion, Contenido, EstadisticasContenido, Favorito, HistorialReproduccion
+
+logger = logging.getLogger(__name__)
+
+PESOS_POR_DEFECTO = {
+    'reproducciones': 0.35,
+    'favoritos': 0.10,
+    'calificaciones': 0.25,
+    'anilist_score': 0.20,
+    'anilist_popularidad': 0.10,
+}
+
+# Calificación media supuesta y su peso (en calificaciones) para suavizar el promedio
+CALIFICACION_PREVIA = 3.0
+PESO_PREVIO = 2.0
+
+
+def _vida_media_dias() -> float:
+    return getattr(settings, 'POPULARIDAD_VIDA_MEDIA_DIAS', 14)
+
+
+def _pesos() -> Dict[str, float]:
+    return {**PESOS_POR_DEFECTO, **getattr(settings, 'POPULARIDAD_PESOS', {})}
+
+
+def _factor_decaimiento(ahora: datetime):
+    """Devuelve una función que pondera un día según su antigüedad"""
+    lambda_ = math.log(2) / _vida_media_dias()
+    hoy = timezone.localdate(ahora)
+    cache_factores = {}
+
+    def factor(dia) -> float:
+        if dia not in cache_factores:
+            edad = max((hoy - dia).days, 0)
+            cache_factores[dia] = math.exp(-lambda_ * edad)
+        return cache_factores[dia]
+
+    return factor
+
+
+def _conteos_decaidos(queryset, campo_fecha: str, factor) -> Dict[int, float]:
+    """Sumar eventos por contenido ponderados por antigüedad (agregados por día en la BD)"""
+    totales = defaultdict(float)
+    filas = queryset.annotate(dia=TruncDate(campo_fecha)).values('contenido_id', 'dia').annotate(total=Count('id'))
+    for fila in filas:
+        totales[fila['contenido_id']] += fila['total'] * factor(fila['dia'])
+    return totales
+
+
+def _calificaciones_decaidas(factor) -> Dict[int, float]:
+    """Promedio de calificaciones ponderado por antigüedad y suavizado hacia la media"""
+    pesos = defaultdict(float)
+    sumas = defaultdict(float)
+    filas = Calificacion.objects.annotate(dia=TruncDate('fecha')).values(
+        'contenido_id', 'dia', 'calificacion'
+    ).annotate(total=Count('id'))
+    for fila in filas:
+        peso = fila['total'] * factor(fila['dia'])
+        pesos[fila['contenido_id']] += peso
+        sumas[fila['contenido_id']] += peso * fila['calificacion']
+
+    # Normalizado a [0, 1]: 1 estrella -> 0, 5 estrellas -> 1
+    return {
+        contenido_id: ((sumas[contenido_id] + CALIFICACION_PREVIA * PESO_PREVIO) /
+                       (peso + PESO_PREVIO) - 1) / 4
+        for contenido_id, peso in pesos.items()
+    }
+
+
+def _normalizar_log(valores: Dict[int, float]) -> Dict[int, float]:
+    """Escalar a [0, 1] con log1p para que unos pocos éxitos no aplasten al resto"""
+    maximo = max(valores.values(), default=0)
+    if maximo <= 0:
+        return {}
+    escala = math.log1p(maximo)
+    return {clave: math.log1p(valor) / escala for clave, valor in valores.items()}
+
+
+def calcular_puntuaciones(ahora: Optional[datetime] = None) -> Dict[int, float]:
+    """Calcular la puntuación de popularidad de todo el catálogo"""
+    ahora = ahora or timezone.now()
+    factor = _factor_decaimiento(ahora)
+    pesos = _pesos()
+
+    reproducciones = _normalizar_log(_conteos_decaidos(HistorialReproduccion.objects.all(), 'fecha', factor))
+    favoritos = _normalizar_log(_conteos_decaidos(Favorito.objects.all(), 'fecha_agregado', factor))
+    calificaciones = _calificaciones_decaidas(factor)
+
+    catalogo = Contenido.objects.values_list('id', 'anilist_score', 'anilist_popularity')
+    datos_anilist = {contenido_id: (score, popularidad) for contenido_id, score, popularidad in catalogo}
+    popularidad_anilist = _normalizar_log({
+        contenido_id: popularidad for contenido_id, (_, popularidad) in datos_anilist.items() if popularidad
+    })
+
+    puntuaciones = {}
+    for contenido_id, (score_anilist, _) in datos_anilist.items():
+        puntuacion = (
+            pesos['reproducciones'] * reproducciones.get(contenido_id, 0) +
+            pesos['favoritos'] * favoritos.get(contenido_id, 0) +
+            pesos['calificaciones'] * calificaciones.get(contenido_id, 0) +
+            pesos['anilist_score'] * (float(score_anilist) / 100 if score_anilist else 0) +
+            pesos['anilist_popularidad'] * popularidad_anilist.get(contenido_id, 0)
+        )
+        puntuaciones[contenido_id] = round(puntuacion, 6)
+    return puntuaciones
+
+
+def actualizar_popularidad(ahora: Optional[datetime] = None) -> int:
+    """
+    Recalcular y guardar la puntuación de popularidad.
+    Devuelve cuántos contenidos cambiaron de puntuación.
+    """
+    from . import estantes
+    from .contadores import recalcular_contadores
+
+    ahora = ahora or timezone.now()
+    puntuaciones = calcular_puntuaciones(ahora)
+
+    # Contenidos sin fila de contadores: crearla con valores reales
+    existentes = set(EstadisticasContenido.objects.values_list('contenido_id', flat=True))
+    faltantes = set(puntuaciones) - existentes
+    if faltantes:
+        recalcular_contadores(faltantes)
+
+    modificar = []
+    for estadisticas in EstadisticasContenido.objects.only('contenido_id', 'puntuacion_popularidad'):
+        puntuacion = puntuaciones.get(estadisticas.contenido_id, 0)
+        if estadisticas.puntuacion_popularidad != puntuacion:
+            estadisticas.puntuacion_popularidad = puntuacion
+            estadisticas.popularidad_calculada = ahora
+            modificar.append(estadisticas)
+
+    EstadisticasContenido.objects.bulk_update(
+        modificar, ['puntuacion_popularidad', 'popularidad_calculada'], batch_size=500
+    )
+    if modificar:
+        # bulk_update no emite señales: invalidar los estantes que usan la puntuación (la marca va en la
+        # cache compartida, así que la ven todos los procesos del servidor)
+        estantes.marcar_estantes_sucios(estantes.POPULARIDAD)
+        logger.info(f"Popularidad recalculada: {len(modificar)} contenidos actualizados")
+    return len(modificar)
@@ -0,0 +1,138 @@
+"""
+Recomendaciones precalculadas por lotes
+
+``manage.py precalcular_recomendaciones`` genera la lista de candidatos de
+todos los perfiles antes de las horas punta. Los perfiles se reparten en
+trozos entre ``PRECALCULO_PROCESOS`` procesos (``multiprocessing.Pool``);
+cada proceso abre su propia conexión y devuelve las listas al proceso
+principal, que es el único que escribe (``bulk_create`` con
+``update_conflicts``, un lote por trozo terminado).
+
+Cada fila guarda la ejecución (``lote``) que la generó: si el comando se
+interrumpe, ``--reanudar <lote>`` procesa solo los perfiles que faltan.
+También guarda la versión del perfil al calcularla, de modo que cualquier
+interacción posterior la deja obsoleta y la cache de recomendaciones vuelve
+a calcular en vivo.
+"""
+import logging
+import multiprocessing
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Perfil, RecomendacionPrecalculada, VersionDatos
+from .recommendations import SistemaRecomendaciones
+from .versiones import clave_perfil, obtener_versiones
+
+logger = logging.getLogger(__name__)
+
+Resultado = Tuple[int, List[int], int]  # (perfil, ids, versión del perfil)
+
+
+def _procesos() -> int:
+    return getattr(settings, 'PRECALCULO_PROCESOS', 4)
+
+
+def _vigencia() -> int:
+    return getattr(settings, 'PRECALCULO_VIGENCIA', 24 * 60 * 60)
+
+
+def _candidatos() -> int:
+    return getattr(settings, 'RECOMENDACIONES_CANDIDATOS', 40)
+
+
+def calcular_trozo(perfil_ids: Sequence[int]) -> List[Resultado]:
+    """Candidatos de cada perfil del trozo (se ejecuta en los procesos del pool)"""
+    # La versión se lee antes de calcular: una interacción simultánea deja la fila obsoleta
+    versiones = obtener_versiones(clave_perfil(perfil_id) for perfil_id in perfil_ids)
+    perfiles = Perfil.objects.in_bulk(perfil_ids)
+    resultados = []
+    for perfil_id in perfil_ids:
+        perfil = perfiles.get(perfil_id)
+        if perfil is None:
+            continue
+        candidatos = SistemaRecomendaciones(perfil).obtener_candidatos(_candidatos())
+        version = versiones.get(clave_perfil(perfil_id), (0, None))[0]
+        resultados.append((perfil_id, [contenido.id for contenido in candidatos], version))
+    return resultados
+
+
+def guardar(resultados: List[Resultado], lote: str):
+    ahora = timezone.now()
+    RecomendacionPrecalculada.objects.bulk_create([
+        RecomendacionPrecalculada(perfil_id=perfil_id, contenido_ids=ids, version_perfil=version, lote=lote, generado=ahora)
+        for perfil_id, ids, version in resultados
+    ], update_conflicts=True, unique_fields=['perfil'],
+        update_fields=['contenido_ids', 'version_perfil', 'lote', 'generado'])
+
+
+def _iniciar_proceso():
+    # Con "spawn" (macOS, Windows) el proceso hijo no hereda la configuración de Django
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def precalcular(procesos: Optional[int] = None, tamaño_trozo: int = 100, lote: Optional[str] = None,
+                progreso: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Precalcular las recomendaciones de todos los perfiles (o de los que faltan en ``lote``).
+    Devuelve un resumen con el lote, los perfiles procesados y el rendimiento.
+    """
+    procesos = procesos or _procesos()
+    lote = lote or timezone.now().strftime('%Y%m%d%H%M%S%f')
+    pendientes = list(Perfil.objects.exclude(
+        recomendacion_precalculada__lote=lote
+    ).order_by('id').values_list('id', flat=True))
+    trozos = [pendientes[i:i + tamaño_trozo] for i in range(0, len(pendientes), tamaño_trozo)]
+
+    inicio = time.perf_counter()
+    hechos = 0
+    pool = None
+    if procesos <= 1:
+        resultados = map(calcular_trozo, trozos)
+    else:
+        # Los hijos no deben heredar las conexiones abiertas del proceso principal
+        connections.close_all()
+        pool = multiprocessing.Pool(procesos, initializer=_iniciar_proceso)
+        resultados = pool.imap_unordered(calcular_trozo, trozos)
+    try:
+        for filas in resultados:
+            guardar(filas, lote)
+            hechos += len(filas)
+            if progreso:
+                progreso(hechos, len(pendientes))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    duracion = time.perf_counter() - inicio
+    logger.info(f"Recomendaciones precalculadas: {hechos} perfiles en {duracion:.2f}s (lote {lote}, {procesos} procesos)")
+    return {
+        'lote': lote,
+        'procesos': procesos,
+        'perfiles': hechos,
+        'segundos': duracion,
+        'perfiles_por_segundo': hechos / duracion if duracion else 0.0,
+    }
+
+
+def leer_precalculadas(perfil_id: int) -> Optional[List[int]]:
+    """Lista precalculada del perfil si sigue vigente (una consulta), o None"""
+    version_actual = VersionDatos.objects.filter(clave=clave_perfil(perfil_id)).values('valor')[:1]
+    fila = RecomendacionPrecalculada.objects.filter(
+        perfil_id=perfil_id, generado__gte=timezone.now() - timedelta(seconds=_vigencia())
+    ).annotate(
+        version_actual=Coalesce(Subquery(version_actual), 0)
+    ).values_list('contenido_ids', 'version_perfil', 'version_actual').first()
+    if fila is None or fila[1] != fila[2]:
+        return None
+    return fila[0]
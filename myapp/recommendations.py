@@ -1,9 +1,22 @@
-from django.db.models import Count, Avg, Q, F
+from django.db.models import Avg, Q, F
 from django.utils import timezone
 from datetime import timedelta
-from .models import Contenido, HistorialReproduccion, Calificacion, Favorito, Categoria
+from .models import Contenido, Calificacion
+from .gustos import categorias_preferidas
+from .bitmaps import obtener_indice, ordinales
+from .catalogo_compacto import obtener_catalogo
+from .similitud import similares_ids
+from .embeddings import similares_embeddings
+from .factorizacion import obtener_modelo
+from .muestreo import barajar_empates, de_categorias
+from .pipeline import PIPELINE
+from .vistos import excluir_vistos, obtener_vistos
+from collections import Counter
 import random
 
+# Candidatos por resultado que se ordenan por rating dentro de un grupo empatado
+MUESTRA_POR_RESULTADO = 20
+
 
 class SistemaRecomendaciones:
     """
@@ -13,204 +26,175 @@ class SistemaRecomendaciones:
     3. Contenido similar por categorías
     4. Popularidad global
     5. Contenido reciente
+    6. Filtrado colaborativo (ALS implícito entrenado offline)
     """
     
     def __init__(self, perfil):
         self.perfil = perfil
+        self._vistos = None
+        self._preferidas = None
         
     def obtener_recomendaciones(self, limite=10):
         """
         Obtiene recomendaciones personalizadas para el usuario
         """
-        recomendaciones = []
-        
-        # 1. Recomendaciones basadas en historial (40% del peso)
-        recomendaciones_historial = self._recomendaciones_por_historial(limite//2)
-        recomendaciones.extend(recomendaciones_historial)
-        
-        # 2. Recomendaciones basadas en calificaciones (30% del peso)
-        recomendaciones_rating = self._recomendaciones_por_rating(limite//3)
-        recomendaciones.extend(recomendaciones_rating)
-        
-        # 3. Recomendaciones basadas en categorías favoritas (20% del peso)
-        recomendaciones_categorias = self._recomendaciones_por_categorias(limite//4)
-        recomendaciones.extend(recomendaciones_categorias)
-        
-        # 4. Contenido popular y nuevo (10% del peso)
-        recomendaciones_populares = self._recomendaciones_populares(limite//5)
-        recomendaciones.extend(recomendaciones_populares)
-        
-        # Eliminar duplicados y contenido ya visto/calificado
-        recomendaciones_unicas = self._filtrar_contenido_ya_visto(recomendaciones)
-        
-        # Si no hay suficientes recomendaciones, añadir contenido aleatorio
-        if len(recomendaciones_unicas) < limite:
-            contenido_restante = limite - len(recomendaciones_unicas)
-            contenido_aleatorio = Contenido.objects.exclude(
-                id__in=self._obtener_contenido_ya_visto()
-            ).exclude(
-                id__in=[r.id for r in recomendaciones_unicas]
-            ).order_by('?')[:contenido_restante]
-            
-            recomendaciones_unicas.extend(list(contenido_aleatorio))
-        
         # Mezclar y limitar
-        random.shuffle(recomendaciones_unicas)
-        return recomendaciones_unicas[:limite]
+        recomendaciones = self.obtener_candidatos(limite)
+        random.shuffle(recomendaciones)
+        return recomendaciones[:limite]
+    
+    def obtener_candidatos(self, limite=10, desactivar=()):
+        """
+        Candidatos sin duplicados ni contenido ya visto, ordenados por prioridad:
+        las estrategias se intercalan para que los primeros puestos sean variados
+        y se puntúan y reordenan en el pipeline (ver pipeline.py)
+        """
+        return self.ejecutar_pipeline(limite, desactivar).contenidos
+    
+    def ejecutar_pipeline(self, limite=10, desactivar=()):
+        """
+        Resultado completo del pipeline: candidatos con puntuación y fuentes,
+        y la duración y los candidatos de cada etapa
+        """
+        return PIPELINE.ejecutar(self, limite, desactivar)
+    
+    def _recomendaciones_colaborativas(self, limite):
+        """
+        Recomienda lo mejor puntuado por los factores del perfil (producto vectorial + top-k)
+        """
+        modelo = obtener_modelo()
+        if modelo is None:
+            return []
+        contenido_ids = modelo.recomendar(self.perfil.id, excluir=self._obtener_contenido_ya_visto(), limite=limite)
+        return self._cargar_contenidos(contenido_ids)
     
     def _recomendaciones_por_historial(self, limite):
         """
         Recomienda contenido similar al que ha reproducido el usuario
         """
-        # Obtener categorías de contenido más reproducido
-        categorias_vistas = Categoria.objects.filter(
-            contenidos__historialreproduccion__perfil=self.perfil
-        ).annotate(
-            veces_visto=Count('contenidos__historialreproduccion')
-        ).order_by('-veces_visto')[:8]  # Aumentado de 5 a 8
-        
-        if not categorias_vistas:
-            # Fallback: usar categorías de contenido favorito
-            categorias_vistas = Categoria.objects.filter(
-                contenidos__favorito__perfil=self.perfil
-            ).distinct()[:8]
+        # Categorías con más afinidad (reproducciones, favoritos y calificaciones con decaimiento)
+        categorias_vistas = self._categorias_preferidas(8)
             
         if not categorias_vistas:
             return []
             
-        # Buscar contenido similar en esas categorías
-        contenido_similar = Contenido.objects.filter(
-            categorias__in=categorias_vistas
-        ).exclude(
-            id__in=self._obtener_contenido_ya_visto()
-        ).distinct().order_by('?')[:limite]
-        
-        return list(contenido_similar)
+        # Buscar contenido similar en esas categorías (pools barajados en memoria, sin JOIN)
+        contenido_ids = de_categorias(
+            categorias_vistas, limite, excluir=self._obtener_contenido_ya_visto()
+        )
+        return self._cargar_contenidos(contenido_ids)
     
     def _recomendaciones_por_rating(self, limite):
         """
         Recomienda contenido basado en las calificaciones positivas del usuario
         """
-        # Obtener categorías de contenido con rating medio-alto (3-5 estrellas)
-        categorias_gustadas = Categoria.objects.filter(
-            contenidos__calificacion__perfil=self.perfil,
-            contenidos__calificacion__calificacion__gte=3  # Reducido de 4 a 3
-        ).annotate(
-            promedio_rating=Avg('contenidos__calificacion__calificacion')
-        ).order_by('-promedio_rating')[:8]  # Aumentado de 5 a 8
-        
-        if not categorias_gustadas:
-            # Fallback: obtener categorías de cualquier contenido calificado
-            categorias_gustadas = Categoria.objects.filter(
-                contenidos__calificacion__perfil=self.perfil
-            ).distinct()[:8]
+        # Categorías con afinidad positiva (las calificaciones bajas la restan)
+        categorias_gustadas = self._categorias_preferidas(8)
         
         if not categorias_gustadas:
             return []
             
         # Buscar contenido en esas categorías con calificaciones globales decentes
-        contenido_recomendado = Contenido.objects.filter(
+        contenido_recomendado = excluir_vistos(Contenido.objects.filter(
             categorias__in=categorias_gustadas
         ).annotate(
-            promedio_global=Avg('calificacion__calificacion'),
-            total_ratings=Count('calificacion')
+            promedio_global=F('estadisticas__rating_promedio'),
+            total_ratings=F('estadisticas__total_calificaciones')
         ).filter(
             # Relajado: permitir contenido sin calificaciones O con rating >= 2.5
             Q(promedio_global__isnull=True) | Q(promedio_global__gte=2.5)
-        ).exclude(
-            id__in=self._obtener_contenido_ya_visto()
-        ).distinct().order_by('-promedio_global', '-total_ratings', '?')[:limite]
+        ), self.perfil.id).distinct()
         
-        return list(contenido_recomendado)
+        return self._mejores_con_empates_al_azar(
+            contenido_recomendado, ['-promedio_global', '-total_ratings'], ['promedio_global', 'total_ratings'], limite
+        )
     
     def _recomendaciones_por_categorias(self, limite):
         """
         Recomienda contenido de las categorías más frecuentes del usuario
         """
-        # Obtener las categorías más frecuentes en el historial del usuario
-        categorias_frecuentes = Categoria.objects.filter(
-            Q(contenidos__historialreproduccion__perfil=self.perfil) |
-            Q(contenidos__favorito__perfil=self.perfil)
-        ).annotate(
-            frecuencia=Count('contenidos__historialreproduccion') + Count('contenidos__favorito')
-        ).order_by('-frecuencia')[:3]
+        # Las tres categorías con más afinidad del perfil
+        categorias_frecuentes = self._categorias_preferidas(3)
         
         if not categorias_frecuentes:
             return []
             
-        # Buscar contenido nuevo en esas categorías
-        contenido_categorias = Contenido.objects.filter(
-            categorias__in=categorias_frecuentes
-        ).exclude(
-            id__in=self._obtener_contenido_ya_visto()
-        ).distinct().order_by('-año', '?')[:limite]
+        # Buscar contenido nuevo en esas categorías: año más reciente primero, al azar dentro del año
+        indice = obtener_indice()
+        candidatos = indice.union_categorias(categorias_frecuentes) & \
+            ~indice.de_ids(self._obtener_contenido_ya_visto())
+        contenido_ids = []
+        for año in sorted(indice.años, reverse=True):
+            if len(contenido_ids) >= limite:
+                break
+            contenido_ids += indice.muestrear(candidatos & indice.años[año], limite - len(contenido_ids))
+        if len(contenido_ids) < limite:
+            # Contenido sin año al final
+            sin_año = candidatos & ~indice.rango_años()
+            contenido_ids += indice.muestrear(sin_año, limite - len(contenido_ids))
         
-        return list(contenido_categorias)
+        return self._cargar_contenidos(contenido_ids)
     
     def _recomendaciones_populares(self, limite):
         """
         Recomienda contenido popular y reciente
         """
-        # Contenido más reproducido globalmente en los últimos 90 días (aumentado de 30)
-        fecha_limite = timezone.now() - timedelta(days=90)
-        
-        contenido_popular = Contenido.objects.annotate(
-            reproducciones_recientes=Count(
-                'historialreproduccion',
-                filter=Q(historialreproduccion__fecha__gte=fecha_limite)
-            ),
-            reproducciones_totales=Count('historialreproduccion'),  # Agregado
-            rating_promedio=Avg('calificacion__calificacion')
-        ).filter(
-            # Relajado: permitir contenido con reproducciones totales > 0 O recientes > 0
-            Q(reproducciones_recientes__gt=0) | Q(reproducciones_totales__gt=0)
-        ).exclude(
-            id__in=self._obtener_contenido_ya_visto()
-        ).order_by('-reproducciones_recientes', '-reproducciones_totales', '-rating_promedio', '?')[:limite]
+        # Puntuación de popularidad con decaimiento temporal: favorece lo popular reciente
+        contenido_popular = excluir_vistos(Contenido.objects.filter(
+            estadisticas__puntuacion_popularidad__gt=0
+        ), self.perfil.id).order_by(
+            '-estadisticas__puntuacion_popularidad',
+            '-id'
+        )[:limite]
         
         # Si no hay suficiente contenido popular, añadir contenido aleatorio reciente
         if len(contenido_popular) < limite:
             contenido_restante = limite - len(contenido_popular)
-            contenido_extra = Contenido.objects.exclude(
-                id__in=self._obtener_contenido_ya_visto()
-            ).exclude(
+            contenido_extra = excluir_vistos(Contenido.objects.all(), self.perfil.id).exclude(
                 id__in=[c.id for c in contenido_popular]
-            ).order_by('-id', '?')[:contenido_restante]
+            ).order_by('-id')[:contenido_restante]
             
             contenido_popular = list(contenido_popular) + list(contenido_extra)
         
         return list(contenido_popular)
     
+    def _mejores_con_empates_al_azar(self, queryset, orden, atributos, limite):
+        """
+        Los ``limite`` primeros según ``orden`` con los empates barajados en Python
+        (sobre una ventana acotada de candidatos) en lugar de ORDER BY RANDOM()
+        """
+        candidatos = list(queryset.order_by(*orden)[:limite * MUESTRA_POR_RESULTADO])
+        return barajar_empates(
+            candidatos, clave=lambda c: tuple(getattr(c, atributo) for atributo in atributos), limite=limite
+        )
+    
+    def _cargar_contenidos(self, contenido_ids):
+        """Cargar contenidos por id conservando el orden"""
+        contenidos = Contenido.objects.in_bulk(contenido_ids)
+        return [contenidos[contenido_id] for contenido_id in contenido_ids if contenido_id in contenidos]
+    
+    def _categorias_preferidas(self, limite):
+        """
+        Ids de las categorías con más afinidad del perfil (una lectura compartida por las estrategias)
+        """
+        if self._preferidas is None:
+            self._preferidas = categorias_preferidas(self.perfil.id, 8)
+        return self._preferidas[:limite]
+    
     def _obtener_contenido_ya_visto(self):
         """
-        Obtiene IDs del contenido que ya ha visto/calificado el usuario
+        Conjunto ordenado del contenido que ya ha visto/calificado el usuario
+        (cacheado por perfil y reutilizado por todas las estrategias de esta instancia)
         """
-        contenido_visto = set()
-        
-        # Contenido del historial
-        historial_ids = HistorialReproduccion.objects.filter(
-            perfil=self.perfil
-        ).values_list('contenido_id', flat=True)
-        contenido_visto.update(historial_ids)
-          # Contenido calificado
-        calificado_ids = Calificacion.objects.filter(
-            perfil=self.perfil
-        ).values_list('contenido_id', flat=True)
-        contenido_visto.update(calificado_ids)
-        
-        # Favoritos
-        favoritos_ids = Favorito.objects.filter(
-            perfil=self.perfil
-        ).values_list('contenido_id', flat=True)
-        contenido_visto.update(favoritos_ids)
-        
-        return list(contenido_visto)
+        if self._vistos is None:
+            self._vistos = obtener_vistos(self.perfil.id)
+        return self._vistos
     
     def _filtrar_contenido_ya_visto(self, recomendaciones):
         """
         Filtra el contenido que el usuario ya ha visto
         """
-        contenido_visto = set(self._obtener_contenido_ya_visto())
+        contenido_visto = self._obtener_contenido_ya_visto()
         return [contenido for contenido in recomendaciones if contenido.id not in contenido_visto]
     
     def obtener_recomendaciones_por_categoria(self, categoria, limite=8):
@@ -223,55 +207,84 @@ class SistemaRecomendaciones:
         ).aggregate(promedio=Avg('calificacion'))['promedio'] or 3
         
         # Recomendar contenido de la categoría con buen rating
-        contenido_categoria = Contenido.objects.filter(
+        contenido_categoria = excluir_vistos(Contenido.objects.filter(
             categorias=categoria
         ).annotate(
-            rating_promedio=Avg('calificacion__calificacion'),
-            total_ratings=Count('calificacion')
-        ).exclude(
-            id__in=self._obtener_contenido_ya_visto()        ).order_by('-rating_promedio', '-total_ratings', '?')[:limite]
+            rating_promedio=F('estadisticas__rating_promedio'),
+            total_ratings=F('estadisticas__total_calificaciones')
+        ), self.perfil.id)
         
-        return list(contenido_categoria)
+        return self._mejores_con_empates_al_azar(
+            contenido_categoria, ['-rating_promedio', '-total_ratings'], ['rating_promedio', 'total_ratings'], limite
+        )
 
     def obtener_contenido_similar(self, contenido, limite=6):
         """
         Obtiene contenido similar a uno específico
         """
-        # Buscar contenido con categorías similares
-        categorias_contenido = contenido.categorias.all()
+        ya_visto = self._obtener_contenido_ya_visto()
         
-        if not categorias_contenido.exists():
-            # Si no tiene categorías, devolver contenido popular
-            return list(Contenido.objects.annotate(
-                rating_promedio=Avg('calificacion__calificacion')
-            ).exclude(id=contenido.id).order_by('-rating_promedio', '?')[:limite])
+        # Vecinos precalculados (manage.py calcular_similitudes): una lectura por índice
+        vecinos = similares_ids(contenido.id, excluir=ya_visto, limite=limite)
+        if vecinos:
+            return obtener_catalogo().tarjetas(vecinos)
         
-        contenido_similar = Contenido.objects.filter(
-            categorias__in=categorias_contenido
-        ).exclude(
-            id=contenido.id
-        ).exclude(
-            id__in=self._obtener_contenido_ya_visto()
-        ).annotate(
-            categorias_compartidas=Count('categorias', filter=Q(categorias__in=categorias_contenido)),
-            rating_promedio=Avg('calificacion__calificacion')
-        ).order_by('-categorias_compartidas', '-rating_promedio', '?')[:limite]
+        # Contenido aún sin vecinos calculados (p. ej. recién importado): vectores de texto y categorías
+        cercanos = similares_embeddings(contenido.id, excluir=ya_visto, limite=limite)
+        if cercanos:
+            return obtener_catalogo().tarjetas(contenido_id for contenido_id, _ in cercanos)
         
-        # Convertir a lista y verificar que todos los objetos tengan ID válido
-        resultado = []
-        for item in contenido_similar:
-            if item and item.id:
-                resultado.append(item)
+        # Sin vecinos ni vectores: categorías similares (bitmaps en memoria, sin JOIN)
+        if obtener_indice().categorias_de(contenido.id):
+            return similares_por_categorias(contenido.id, excluir=ya_visto, limite=limite)
         
-        return resultado
+        # Si no tiene categorías, devolver contenido popular
+        return self._mejores_con_empates_al_azar(
+            Contenido.objects.annotate(
+                rating_promedio=F('estadisticas__rating_promedio')
+            ).exclude(id=contenido.id),
+            [F('rating_promedio').desc(nulls_last=True)], ['rating_promedio'], limite
+        )
+
+
+def similares_por_categorias(contenido_id, excluir=(), limite=6):
+    """
+    Contenidos que más categorías comparten con ``contenido_id`` (bitmaps en memoria);
+    dentro del grupo que completa el límite decide el rating y los empates se barajan
+    """
+    indice = obtener_indice()
+    excluidos = indice.de_ids([contenido_id, *excluir])
+    compartidas = Counter()
+    for categoria_id in indice.categorias_de(contenido_id):
+        compartidas.update(ordinales(indice.categoria(categoria_id) & ~excluidos))
+    
+    grupos = {}
+    for posicion, total in compartidas.items():
+        grupos.setdefault(total, []).append(indice.ids[posicion])
+    
+    resultado = []
+    for total in sorted(grupos, reverse=True):
+        faltan = limite - len(resultado)
+        if faltan <= 0:
+            break
+        grupo = grupos[total]
+        if len(grupo) > faltan * MUESTRA_POR_RESULTADO:
+            grupo = random.sample(grupo, faltan * MUESTRA_POR_RESULTADO)
+        candidatos = Contenido.objects.filter(id__in=grupo).annotate(
+            rating_promedio=F('estadisticas__rating_promedio')
+        ).order_by(F('rating_promedio').desc(nulls_last=True))
+        resultado += barajar_empates(candidatos, clave=lambda c: c.rating_promedio, limite=faltan)
+    
+    return resultado
 
 
 def obtener_recomendaciones_para_perfil(perfil, limite=10):
     """
     Función helper para obtener recomendaciones para un perfil
+    (servidas desde la lista cacheada por perfil, ver cache_recomendaciones.py)
     """
-    sistema = SistemaRecomendaciones(perfil)
-    return sistema.obtener_recomendaciones(limite)
+    from .cache_recomendaciones import obtener_recomendaciones_cacheadas
+    return obtener_recomendaciones_cacheadas(perfil, limite)
 
 
 def obtener_recomendaciones_por_categoria(perfil, categoria, limite=8):
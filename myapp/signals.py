@@ -0,0 +1,290 @@
+"""
+Receivers que mantienen sincronizadas las estructuras derivadas del catálogo
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocompletado, cache_busqueda, cache_recomendaciones, catalogo_compacto, estantes, facetas, gustos, trigramas, versiones, vistos
+from .contadores import actualizar_contadores, deltas_calificacion
+from .models import (AliasContenido, Calificacion, Categoria, Contenido, ContenidoCategoria, Episodio,
+                     EstadisticasContenido, Favorito, HistorialReproduccion, Perfil)
+
+# Modelo -> dependencia de estantes que invalida
+DEPENDENCIAS_ESTANTES = {
+    Contenido: estantes.CATALOGO,
+    Categoria: estantes.CATALOGO,
+    ContenidoCategoria: estantes.CATALOGO,
+    HistorialReproduccion: estantes.REPRODUCCIONES,
+    Calificacion: estantes.CALIFICACIONES,
+}
+
+
+def _borrado_en_cascada(kwargs, modelo):
+    """Indica si el borrado viene de eliminar una instancia de ``modelo``"""
+    origen = kwargs.get('origin')
+    return getattr(origen, 'model', type(origen)) is modelo
+
+
+def _borrado_en_cascada_de_contenido(kwargs):
+    """Indica si el borrado viene de eliminar el propio contenido"""
+    return _borrado_en_cascada(kwargs, Contenido)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_estantes(sender, **kwargs):
+    """Marcar como desactualizados los estantes afectados por una escritura"""
+    dependencia = DEPENDENCIAS_ESTANTES.get(sender)
+    if dependencia:
+        estantes.marcar_estantes_sucios(dependencia)
+
+
+# ===== CONTADORES DE INTERACCIÓN =====
+
+@receiver(post_save, sender=Contenido)
+def crear_estadisticas_contenido(sender, instance, created, **kwargs):
+    if created:
+        EstadisticasContenido.objects.get_or_create(contenido=instance)
+
+
+@receiver(post_save, sender=HistorialReproduccion)
+def contar_reproduccion(sender, instance, created, **kwargs):
+    if created:
+        actualizar_contadores(instance.contenido_id, total_reproducciones=1)
+
+
+@receiver(post_delete, sender=HistorialReproduccion)
+def descontar_reproduccion(sender, instance, **kwargs):
+    if not _borrado_en_cascada_de_contenido(kwargs):
+        actualizar_contadores(instance.contenido_id, total_reproducciones=-1)
+
+
+@receiver(post_save, sender=Favorito)
+def contar_favorito(sender, instance, created, **kwargs):
+    if created:
+        actualizar_contadores(instance.contenido_id, total_favoritos=1)
+
+
+@receiver(post_delete, sender=Favorito)
+def descontar_favorito(sender, instance, **kwargs):
+    if not _borrado_en_cascada_de_contenido(kwargs):
+        actualizar_contadores(instance.contenido_id, total_favoritos=-1)
+
+
+@receiver(post_save, sender=Calificacion)
+def contar_calificacion(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_calificacion_guardada', None)
+    deltas = Counter(deltas_calificacion(instance.calificacion, 1))
+    deltas.update(deltas_calificacion(anterior, -1))
+    instance._calificacion_guardada = instance.calificacion
+    actualizar_contadores(instance.contenido_id, **deltas)
+    # La afinidad del perfil se ajusta aquí porque también necesita el valor anterior
+    gustos.ajustar_afinidad(
+        instance.perfil_id, instance.contenido_id,
+        gustos.peso_calificacion(instance.calificacion) - gustos.peso_calificacion(anterior), instance.fecha
+    )
+
+
+@receiver(post_delete, sender=Calificacion)
+def descontar_calificacion(sender, instance, **kwargs):
+    if not _borrado_en_cascada_de_contenido(kwargs):
+        valor = getattr(instance, '_calificacion_guardada', instance.calificacion)
+        actualizar_contadores(instance.contenido_id, **deltas_calificacion(valor, -1))
+
+
+# ===== CONTENIDO VISTO POR PERFIL =====
+
+@receiver(post_save, sender=HistorialReproduccion)
+@receiver(post_save, sender=Calificacion)
+@receiver(post_save, sender=Favorito)
+def registrar_visto(sender, instance, created, **kwargs):
+    # El conjunto de vistos se pasa a la nueva versión del perfil en incrementar_versiones
+    cache_recomendaciones.registrar_evento(instance.perfil_id, instance.contenido_id)
+
+
+@receiver(post_delete, sender=HistorialReproduccion)
+@receiver(post_delete, sender=Calificacion)
+@receiver(post_delete, sender=Favorito)
+def descartar_vistos(sender, instance, **kwargs):
+    # El contenido puede seguir visto por otra interacción: la nueva versión del perfil
+    # deja el conjunto anterior sin usar y se reconstruye en la próxima lectura
+    cache_recomendaciones.registrar_evento(instance.perfil_id)
+
+
+# ===== AFINIDAD DEL PERFIL POR CATEGORÍA =====
+
+@receiver(post_save, sender=HistorialReproduccion)
+def sumar_gusto_reproduccion(sender, instance, created, **kwargs):
+    if created:
+        gustos.ajustar_afinidad(instance.perfil_id, instance.contenido_id, gustos.peso_reproduccion(), instance.fecha)
+
+
+@receiver(post_save, sender=Favorito)
+def sumar_gusto_favorito(sender, instance, created, **kwargs):
+    if created:
+        gustos.ajustar_afinidad(instance.perfil_id, instance.contenido_id, gustos.peso_favorito(), instance.fecha_agregado)
+
+
+@receiver(post_delete, sender=HistorialReproduccion)
+@receiver(post_delete, sender=Favorito)
+@receiver(post_delete, sender=Calificacion)
+def restar_gusto(sender, instance, **kwargs):
+    # Al borrar el perfil sus afinidades caen en cascada; al borrar el contenido se conservan
+    if _borrado_en_cascada(kwargs, Perfil) or _borrado_en_cascada_de_contenido(kwargs):
+        return
+    if sender is HistorialReproduccion:
+        peso, fecha = gustos.peso_reproduccion(), instance.fecha
+    elif sender is Favorito:
+        peso, fecha = gustos.peso_favorito(), instance.fecha_agregado
+    else:
+        valor = getattr(instance, '_calificacion_guardada', instance.calificacion)
+        peso, fecha = gustos.peso_calificacion(valor), instance.fecha
+    gustos.ajustar_afinidad(instance.perfil_id, instance.contenido_id, -peso, fecha)
+
+
+# ===== VERSIONES PARA ETAG / LAST-MODIFIED =====
+
+MODELOS_CATALOGO = (Contenido, Episodio, Categoria, ContenidoCategoria, AliasContenido)
+MODELOS_INTERACCION = (HistorialReproduccion, Favorito, Calificacion)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def incrementar_versiones(sender, instance, **kwargs):
+    """Incrementar la versión del catálogo o del perfil afectado por una escritura"""
+    if sender in MODELOS_CATALOGO:
+        versiones.incrementar_version(versiones.CATALOGO)
+        catalogo_compacto.invalidar()
+        autocompletado.invalidar()
+        cache_busqueda.invalidar()
+    elif sender in MODELOS_INTERACCION:
+        if not _borrado_en_cascada(kwargs, Perfil):
+            version = versiones.incrementar_version(versiones.clave_perfil(instance.perfil_id))
+            if kwargs.get('signal') is post_save:
+                vistos.agregar_visto(instance.perfil_id, instance.contenido_id, version)
+    elif sender is Perfil:
+        if kwargs.get('signal') is post_delete:
+            versiones.eliminar_version(versiones.clave_perfil(instance.pk))
+        else:
+            versiones.incrementar_version(versiones.clave_perfil(instance.pk))
+    elif sender is User and kwargs.get('signal') is post_save and \
+            kwargs.get('update_fields') != frozenset({'last_login'}):
+        # Nombre y correo del usuario aparecen en las páginas de sus perfiles
+        for perfil_id in instance.perfiles.values_list('id', flat=True):
+            versiones.incrementar_version(versiones.clave_perfil(perfil_id))
+
+
+@receiver(m2m_changed, sender=Contenido.categorias.through)
+def categorias_modificadas(sender, action, **kwargs):
+    """Las altas de categorías vía ``.add()``/``.set()`` no emiten post_save"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        versiones.incrementar_version(versiones.CATALOGO)
+        catalogo_compacto.invalidar()
+        autocompletado.invalidar()
+        cache_busqueda.invalidar()
+        estantes.marcar_estantes_sucios(estantes.CATALOGO)
+
+
+# ===== CONTEOS DE FACETAS =====
+
+@receiver(pre_save, sender=Contenido)
+def recordar_faceta_contenido(sender, instance, **kwargs):
+    if instance.pk and not instance._state.adding:
+        instance._faceta_anterior = Contenido.objects.filter(pk=instance.pk).values_list('tipo', 'año').first()
+
+
+@receiver(post_save, sender=Contenido)
+def contar_faceta_contenido(sender, instance, created, **kwargs):
+    if created:
+        facetas.sumar(facetas.claves_contenido(instance.tipo, instance.año), 1)
+        return
+    anterior = getattr(instance, '_faceta_anterior', None)
+    if anterior is None:
+        return
+    tipo_anterior, año_anterior = anterior
+    if (tipo_anterior, facetas.decada(año_anterior)) != (instance.tipo, facetas.decada(instance.año)):
+        categoria_ids = list(instance.categorias.values_list('id', flat=True))
+        cambios = Counter({clave: -1 for clave in facetas.claves_contenido(tipo_anterior, año_anterior, categoria_ids)})
+        cambios.update({clave: 1 for clave in facetas.claves_contenido(instance.tipo, instance.año, categoria_ids)})
+        facetas.ajustar_conteos(cambios)
+    instance._faceta_anterior = (instance.tipo, instance.año)
+
+
+@receiver(pre_delete, sender=Contenido)
+def recordar_categorias_contenido(sender, instance, **kwargs):
+    # Las relaciones se borran en cascada antes del post_delete del contenido
+    instance._categorias_faceta = list(instance.categorias.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Contenido)
+def descontar_faceta_contenido(sender, instance, **kwargs):
+    categoria_ids = getattr(instance, '_categorias_faceta', [])
+    facetas.sumar(facetas.claves_contenido(instance.tipo, instance.año, categoria_ids), -1)
+
+
+@receiver(post_save, sender=ContenidoCategoria)
+def contar_faceta_categoria(sender, instance, created, **kwargs):
+    if created:
+        contenido = instance.contenido
+        facetas.sumar(facetas.claves_contenido(contenido.tipo, contenido.año, [instance.categoria_id], total=False), 1)
+
+
+@receiver(post_delete, sender=ContenidoCategoria)
+def descontar_faceta_categoria(sender, instance, **kwargs):
+    # Al borrar el contenido o la categoría ya se ajustan (o eliminan) sus conteos
+    if _borrado_en_cascada(kwargs, Contenido) or _borrado_en_cascada(kwargs, Categoria):
+        return
+    tipo, año = Contenido.objects.filter(pk=instance.contenido_id).values_list('tipo', 'año').first() or (None, None)
+    if tipo:
+        facetas.sumar(facetas.claves_contenido(tipo, año, [instance.categoria_id], total=False), -1)
+
+
+@receiver(m2m_changed, sender=Contenido.categorias.through)
+def contar_facetas_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    ``.add()`` crea las relaciones con bulk_create (sin post_save). Las bajas
+    (``.remove()``/``.clear()``) borran filas y ya pasan por post_delete.
+    """
+    if action != 'post_add' or not pk_set:
+        return
+    cambios = Counter()
+    if reverse:
+        for tipo, año in Contenido.objects.filter(pk__in=pk_set).values_list('tipo', 'año'):
+            cambios.update({clave: 1 for clave in facetas.claves_contenido(tipo, año, [instance.pk], total=False)})
+    else:
+        cambios.update({clave: 1 for clave in facetas.claves_contenido(instance.tipo, instance.año, pk_set, total=False)})
+    facetas.ajustar_conteos(cambios)
+
+
+# ===== BÚSQUEDA: COLUMNAS NORMALIZADAS Y TRIGRAMAS =====
+
+@receiver(pre_save, sender=Contenido)
+def normalizar_titulo(sender, instance, **kwargs):
+    instance.titulo_normalizado = trigramas.normalizar(instance.titulo)
+
+
+@receiver(pre_save, sender=AliasContenido)
+def normalizar_alias(sender, instance, **kwargs):
+    instance.texto_normalizado = trigramas.normalizar(instance.texto)
+
+
+@receiver(pre_save, sender=Categoria)
+def normalizar_categoria(sender, instance, **kwargs):
+    instance.nombre_normalizado = trigramas.normalizar(instance.nombre)
+
+
+@receiver(post_save, sender=Contenido)
+def indexar_trigramas_contenido(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'titulo' in update_fields:
+        trigramas.indexar_contenidos([instance.pk])
+
+
+@receiver(post_save, sender=AliasContenido)
+@receiver(post_delete, sender=AliasContenido)
+def indexar_trigramas_alias(sender, instance, **kwargs):
+    # Al borrar el contenido sus trigramas se eliminan en cascada
+    if not _borrado_en_cascada_de_contenido(kwargs):
+        trigramas.indexar_contenidos([instance.contenido_id])
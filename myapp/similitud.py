@@ -0,0 +1,178 @@
+"""
+Índice de similitud item-item precalculado
+
+Un proceso por lotes (``manage.py calcular_similitudes``) calcula para cada
+contenido sus ``SIMILITUD_VECINOS`` vecinos más parecidos combinando dos
+similitudes coseno calculadas con NumPy por bloques de filas:
+
+- categorías: filas contenido × categoría normalizadas, ``C[bloque] @ C.T``
+- co-consumo: perfiles que reprodujeron, marcaron como favorito o calificaron
+  con 4+ ambos contenidos, normalizado por ``sqrt(grado_i * grado_j)``
+
+El resultado se escribe en ``ContenidoSimilar`` bloque a bloque dentro de
+una transacción (las lecturas ven la tabla anterior hasta el final) y se
+incrementa la versión ``recomendadores``, que invalida el ETag de la página
+de detalle. La consulta de similares pasa a ser una lectura por índice
+(contenido, posicion).
+"""
+import logging
+import time
+from typing import Collection, Dict, Iterable, List, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Calificacion, Contenido, ContenidoCategoria, ContenidoSimilar, Favorito, HistorialReproduccion
+from .versiones import RECOMENDADORES, incrementar_version
+
+logger = logging.getLogger(__name__)
+
+PESOS_POR_DEFECTO = {'categorias': 0.6, 'coconsumo': 0.4}
+CELDAS_POR_BLOQUE = 1 << 22  # filas del bloque × tamaño del catálogo (acota la matriz densa del bloque)
+CALIFICACION_POSITIVA = 4
+
+
+def _vecinos_por_contenido() -> int:
+    return getattr(settings, 'SIMILITUD_VECINOS', 20)
+
+
+def _pesos() -> Dict[str, float]:
+    return getattr(settings, 'SIMILITUD_PESOS', PESOS_POR_DEFECTO)
+
+
+def _csr(filas: np.ndarray, columnas: np.ndarray, total_filas: int, total_columnas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pares (fila, columna) -> matriz dispersa CSR (indptr, indices) sin duplicados"""
+    claves = np.unique(filas.astype(np.int64) * total_columnas + columnas)
+    filas, columnas = np.divmod(claves, total_columnas)
+    indptr = np.zeros(total_filas + 1, dtype=np.int64)
+    np.cumsum(np.bincount(filas, minlength=total_filas), out=indptr[1:])
+    return indptr, columnas
+
+
+def _expandir(indptr: np.ndarray, indices: np.ndarray, filas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Todas las entradas de las filas indicadas como (posición en ``filas``, columna)"""
+    inicios = indptr[filas]
+    longitudes = indptr[filas + 1] - inicios
+    origen = np.repeat(np.arange(len(filas)), longitudes)
+    desplazamientos = np.arange(longitudes.sum()) - np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+    return origen, indices[np.repeat(inicios, longitudes) + desplazamientos]
+
+
+def _matriz_categorias(ids: np.ndarray) -> np.ndarray:
+    """Pertenencia contenido × categoría con filas de norma 1 (las filas sin categorías quedan a cero)"""
+    relaciones = np.array(list(ContenidoCategoria.objects.values_list('contenido_id', 'categoria_id')), dtype=np.int64)
+    if not len(relaciones):
+        return np.zeros((len(ids), 0), dtype=np.float32)
+    categorias, columnas = np.unique(relaciones[:, 1], return_inverse=True)
+    matriz = np.zeros((len(ids), len(categorias)), dtype=np.float32)
+    matriz[np.searchsorted(ids, relaciones[:, 0]), columnas] = 1
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return np.divide(matriz, normas, out=np.zeros_like(matriz), where=normas > 0)
+
+
+def _interacciones() -> np.ndarray:
+    """Pares (perfil, contenido) de reproducciones, favoritos y calificaciones positivas"""
+    pares = list(HistorialReproduccion.objects.values_list('perfil_id', 'contenido_id'))
+    pares += Favorito.objects.values_list('perfil_id', 'contenido_id')
+    pares += Calificacion.objects.filter(
+        calificacion__gte=CALIFICACION_POSITIVA
+    ).values_list('perfil_id', 'contenido_id')
+    return np.array(pares, dtype=np.int64).reshape(-1, 2)
+
+
+class _Coconsumo:
+    """Co-ocurrencias entre contenidos a través de los perfiles que interactuaron con ambos"""
+
+    def __init__(self, ids: np.ndarray, pares: np.ndarray):
+        self.total = len(ids)
+        perfiles, filas_perfil = np.unique(pares[:, 0], return_inverse=True)
+        items = np.searchsorted(ids, pares[:, 1])
+        self.item_ptr, self.item_perfiles = _csr(items, filas_perfil, self.total, len(perfiles))
+        self.perfil_ptr, self.perfil_items = _csr(filas_perfil, items, len(perfiles), self.total)
+        self.grados = np.diff(self.item_ptr).astype(np.float32)
+        self.hay_datos = len(pares) > 0
+
+    def coseno(self, desde: int, hasta: int) -> np.ndarray:
+        filas = hasta - desde
+        origen, perfiles = _expandir(self.item_ptr, self.item_perfiles, np.arange(desde, hasta))
+        origen_perfil, items = _expandir(self.perfil_ptr, self.perfil_items, perfiles)
+        conteos = np.bincount(origen[origen_perfil] * self.total + items, minlength=filas * self.total)
+        conteos = conteos.reshape(filas, self.total).astype(np.float32)
+        normas = np.sqrt(np.outer(self.grados[desde:hasta], self.grados))
+        return np.divide(conteos, normas, out=conteos, where=normas > 0)
+
+
+def _top_k(similitud: np.ndarray, desde: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Las k columnas de mayor similitud de cada fila, ordenadas (sin la diagonal)"""
+    filas = np.arange(similitud.shape[0])
+    similitud[filas, filas + desde] = -np.inf
+    candidatos = np.argpartition(-similitud, k - 1, axis=1)[:, :k]
+    puntuaciones = np.take_along_axis(similitud, candidatos, axis=1)
+    orden = np.lexsort((candidatos, -puntuaciones), axis=1)
+    return np.take_along_axis(candidatos, orden, axis=1), np.take_along_axis(puntuaciones, orden, axis=1)
+
+
+def calcular_vecinos(ids: np.ndarray, categorias: np.ndarray, coconsumo: _Coconsumo,
+                     vecinos: int, pesos: Dict[str, float]) -> Iterable[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    Genera (ordinal inicial del bloque, vecinos, puntuaciones) por bloques de filas.
+    Las matrices de vecinos usan ordinales (posiciones en ``ids``).
+    """
+    total = len(ids)
+    k = min(vecinos, total - 1)
+    if k <= 0:
+        return
+    peso_total = (pesos.get('categorias', 0) + pesos.get('coconsumo', 0)) or 1
+    peso_categorias = pesos.get('categorias', 0) / peso_total
+    peso_coconsumo = pesos.get('coconsumo', 0) / peso_total
+    bloque = max(1, CELDAS_POR_BLOQUE // total)
+
+    for desde in range(0, total, bloque):
+        hasta = min(desde + bloque, total)
+        similitud = categorias[desde:hasta] @ categorias.T
+        similitud *= peso_categorias
+        if peso_coconsumo and coconsumo.hay_datos:
+            similitud += peso_coconsumo * coconsumo.coseno(desde, hasta)
+        yield (desde, *_top_k(similitud, desde, k))
+
+
+def actualizar_similitudes(vecinos: int = None) -> int:
+    """Recalcular la tabla de vecinos de todo el catálogo. Devuelve el número de filas guardadas"""
+    inicio = time.perf_counter()
+    vecinos = vecinos or _vecinos_por_contenido()
+    ids = np.array(Contenido.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    categorias = _matriz_categorias(ids)
+    coconsumo = _Coconsumo(ids, _interacciones())
+
+    guardados = 0
+    with transaction.atomic():
+        # Cada bloque se escribe según se calcula: en memoria solo hay las filas de un bloque
+        ContenidoSimilar.objects.all().delete()
+        for desde, candidatos, puntuaciones in calcular_vecinos(ids, categorias, coconsumo, vecinos, _pesos()):
+            filas = []
+            for desplazamiento in range(len(candidatos)):
+                contenido_id = int(ids[desde + desplazamiento])
+                posicion = 0
+                for ordinal, puntuacion in zip(candidatos[desplazamiento], puntuaciones[desplazamiento]):
+                    if puntuacion <= 0:
+                        break
+                    filas.append(ContenidoSimilar(
+                        contenido_id=contenido_id, similar_id=int(ids[ordinal]),
+                        puntuacion=float(puntuacion), posicion=posicion
+                    ))
+                    posicion += 1
+            ContenidoSimilar.objects.bulk_create(filas, batch_size=1000)
+            guardados += len(filas)
+        incrementar_version(RECOMENDADORES)
+    logger.info(f"Similitudes recalculadas: {guardados} vecinos de {len(ids)} contenidos "
+                f"({time.perf_counter() - inicio:.2f}s)")
+    return guardados
+
+
+def similares_ids(contenido_id: int, excluir: Collection[int] = (), limite: int = 6) -> List[int]:
+    """Ids de los vecinos precalculados, del más al menos similar (la exclusión se aplica en memoria)"""
+    vecinos = ContenidoSimilar.objects.filter(
+        contenido_id=contenido_id
+    ).order_by('posicion').values_list('similar_id', flat=True)
+    return [similar_id for similar_id in vecinos if similar_id not in excluir][:limite]
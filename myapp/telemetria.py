@@ -0,0 +1,189 @@
+"""
+Escritura diferida y en lote del historial de búsqueda y su auditoría
+
+Cada búsqueda de un usuario autenticado genera un ``HistorialBusqueda`` y
+un ``AuditLog``. En lugar de dos INSERT dentro de la petición (y esperar el
+bloqueo de escritura de SQLite), la vista deja los objetos sin guardar en un
+``BufferEscrituras`` del proceso. Un hilo en segundo plano los escribe con
+``bulk_create`` en una transacción cuando hay ``TELEMETRIA_LOTE`` pendientes
+o cada ``TELEMETRIA_INTERVALO_SEGUNDOS``, y al terminar el proceso.
+
+- Memoria acotada: con ``TELEMETRIA_MAX_PENDIENTES`` objetos en espera los
+  nuevos se descartan y se cuentan (``descartados``).
+- Un lote que falla al escribirse se descarta y se cuenta (``errores``);
+  nunca se reintenta dentro de la petición.
+- Con ``TELEMETRIA_ASINCRONA = False`` (las pruebas que buscan lo activan
+  con ``override_settings``) se escribe en el momento, en el hilo de la
+  petición, con el mismo código.
+
+Ninguno de los dos modelos tiene señales, así que ``bulk_create`` no se
+salta ningún efecto. Los contadores se suman entre todos los procesos con
+``metricas.ContadoresCompartidos`` (``manage.py metricas_busqueda``).
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .metricas import ContadoresCompartidos
+from .models import AuditLog, HistorialBusqueda
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_METRICA = 'telemetria:metricas:'
+METRICAS = ('escritos', 'lotes', 'descartados', 'errores')
+
+_contadores = ContadoresCompartidos(PREFIJO_METRICA, METRICAS)
+
+
+def _ajuste(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _sumar(metrica: str, cantidad: int = 1):
+    _contadores.sumar(metrica, cantidad)
+
+
+def metricas() -> Dict[str, int]:
+    resultado = _contadores.valores()
+    resultado['pendientes'] = len(_buffer) if _buffer is not None else 0
+    return resultado
+
+
+def reiniciar_metricas():
+    _contadores.reiniciar()
+
+
+class BufferEscrituras:
+    """Cola acotada de objetos sin guardar que un hilo escribe en lotes con ``bulk_create``"""
+
+    def __init__(self, lote: int, max_pendientes: int, intervalo: float):
+        self.lote = lote
+        self.max_pendientes = max_pendientes
+        self.intervalo = intervalo
+        self._pendientes = deque()
+        self._condicion = threading.Condition()
+        self._escribiendo = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    def agregar(self, objetos: List) -> bool:
+        """Encolar los objetos de un evento (todos o ninguno). False si el buffer está lleno"""
+        with self._condicion:
+            if len(self._pendientes) + len(objetos) > self.max_pendientes:
+                descartado = True
+            else:
+                descartado = False
+                self._pendientes.extend(objetos)
+                if len(self._pendientes) >= self.lote:
+                    self._condicion.notify()
+        if descartado:
+            _sumar('descartados', len(objetos))
+        return not descartado
+
+    def vaciar(self) -> int:
+        """Escribir ahora todo lo pendiente. Devuelve los objetos escritos"""
+        escritos = 0
+        with self._escribiendo:
+            while True:
+                with self._condicion:
+                    lote = [self._pendientes.popleft() for _ in range(min(self.lote, len(self._pendientes)))]
+                if not lote:
+                    return escritos
+                escritos += self._escribir(lote)
+
+    def _escribir(self, lote: List) -> int:
+        por_modelo = defaultdict(list)
+        for objeto in lote:
+            por_modelo[type(objeto)].append(objeto)
+        try:
+            with transaction.atomic():
+                for modelo, objetos in por_modelo.items():
+                    modelo.objects.bulk_create(objetos, batch_size=self.lote)
+        except Exception as e:
+            logger.warning(f"No se pudo escribir un lote de telemetría ({len(lote)} objetos): {e}")
+            _sumar('errores', len(lote))
+            return 0
+        _sumar('escritos', len(lote))
+        _sumar('lotes')
+        return len(lote)
+
+    def iniciar(self):
+        """Arrancar el hilo escritor si este proceso aún no lo tiene"""
+        # Tras un fork (p. ej. gunicorn --preload) el hilo del proceso padre no existe en el hijo
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._condicion:
+            if self._hilo is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='telemetria-busqueda', daemon=True)
+            self._hilo.start()
+        atexit.register(self.vaciar)
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                if len(self._pendientes) < self.lote:
+                    self._condicion.wait(self.intervalo)
+            try:
+                self.vaciar()
+            finally:
+                # El hilo no debe retener su conexión (y con SQLite, el fichero) entre lotes
+                connection.close()
+
+
+_buffer: Optional[BufferEscrituras] = None
+_bloqueo = threading.Lock()
+
+
+def _asincrona() -> bool:
+    return _ajuste('TELEMETRIA_ASINCRONA', True)
+
+
+def obtener_buffer() -> BufferEscrituras:
+    global _buffer
+    if _buffer is None:
+        with _bloqueo:
+            if _buffer is None:
+                _buffer = BufferEscrituras(
+                    lote=_ajuste('TELEMETRIA_LOTE', 200),
+                    max_pendientes=_ajuste('TELEMETRIA_MAX_PENDIENTES', 10000),
+                    intervalo=_ajuste('TELEMETRIA_INTERVALO_SEGUNDOS', 2.0),
+                )
+    return _buffer
+
+
+def registrar_busqueda(termino: str, total: int, usuario=None, perfil=None, ip_address='127.0.0.1', user_agent=''):
+    """Encolar el historial y la auditoría de una búsqueda (se escriben en el momento en modo síncrono)"""
+    historial = HistorialBusqueda.nueva_busqueda(termino, usuario=usuario, perfil=perfil, resultados_count=total,
+                                                 ip_address=ip_address, user_agent=user_agent)
+    if historial is None:
+        return
+    descripcion = f"Búsqueda realizada: '{historial.termino_busqueda}' - {total} resultados"
+    auditoria = AuditLog.nueva_entrada(
+        'SEARCH', descripcion, usuario=usuario, perfil=perfil, ip_address=ip_address, user_agent=user_agent,
+        datos_adicionales={
+            'query': historial.termino_busqueda,
+            'query_length': len(historial.termino_busqueda),
+            'results_count': total,
+            'has_results': total > 0,
+        }
+    )
+    AuditLog.registrar_en_archivo('SEARCH', descripcion, usuario=usuario, perfil=perfil)
+
+    buffer = obtener_buffer()
+    if not buffer.agregar([historial, auditoria]):
+        return
+    if _asincrona():
+        buffer.iniciar()
+    else:
+        buffer.vaciar()
@@ -0,0 +1,78 @@
+"""
+Tendencias de búsqueda resueltas a contenidos
+
+Un proceso periódico (``manage.py calcular_tendencias``) toma los términos
+más buscados y resuelve cada uno a los IDs de contenido relacionados. El
+mapeo término -> contenidos se guarda en la cache con un TTL, de modo que
+la página principal lo obtiene con una sola lectura por clave en lugar de
+ejecutar un ``icontains`` por término.
+
+El mapeo va en la cache compartida por todos los procesos y no expira: si el
+proceso periódico se retrasa más de ``TENDENCIAS_TTL``, un único proceso (el
+que obtiene el bloqueo) lo recalcula y el resto sigue sirviendo el anterior.
+Solo se resuelve dentro de la petición cuando la cache está vacía.
+"""
+import logging
+import time
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Contenido, HistorialBusqueda
+
+logger = logging.getLogger(__name__)
+
+CLAVE_TENDENCIAS = 'tendencias:busquedas'
+CLAVE_BLOQUEO = 'tendencias:recalculando'
+
+LIMITE_TERMINOS = 8
+DIAS_TENDENCIA = 30
+CONTENIDOS_POR_TERMINO = 3
+
+
+def _ttl():
+    return getattr(settings, 'TENDENCIAS_TTL', 30 * 60)
+
+
+def _contenidos_para_termino(termino: str) -> List[int]:
+    return list(
+        Contenido.objects.filter(
+            Q(titulo__icontains=termino) |
+            Q(descripcion__icontains=termino) |
+            Q(categorias__nombre__icontains=termino)
+        ).distinct().values_list('id', flat=True)[:CONTENIDOS_POR_TERMINO]
+    )
+
+
+def resolver_tendencias(invalidar_estantes: bool = True) -> Dict:
+    """Resolver los términos más buscados a contenidos y guardar el mapeo en la cache"""
+    from . import estantes
+
+    terminos = []
+    for termino_data in HistorialBusqueda.obtener_mas_buscados(limite=LIMITE_TERMINOS, dias=DIAS_TENDENCIA):
+        termino = dict(termino_data)
+        termino['contenido_ids'] = _contenidos_para_termino(termino['termino_normalizado'])
+        terminos.append(termino)
+
+    tendencias = {'generado': time.time(), 'terminos': terminos}
+    cache.set(CLAVE_TENDENCIAS, tendencias, None)
+    if invalidar_estantes:
+        estantes.marcar_estantes_sucios(estantes.TENDENCIAS)
+    logger.info(f"Tendencias de búsqueda resueltas: {len(terminos)} términos")
+    return tendencias
+
+
+def obtener_tendencias() -> Dict:
+    """Leer el mapeo término -> contenidos (se recalcula si falta o venció y nadie más lo hace)"""
+    tendencias = cache.get(CLAVE_TENDENCIAS)
+    if tendencias is not None and (time.time() - tendencias['generado'] < _ttl()
+                                   or not cache.add(CLAVE_BLOQUEO, True, _ttl())):
+        return tendencias
+    try:
+        # Los estantes que llaman aquí se están reconstruyendo: no hace falta invalidarlos
+        return resolver_tendencias(invalidar_estantes=False)
+    finally:
+        if tendencias is not None:
+            cache.delete(CLAVE_BLOQUEO)
@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from django.db import connection
 from django.test.utils import override_settings
 from .models import Contenido, Categoria, Episodio, Perfil, ContenidoCategoria
+import os
 import time
 from django.core.cache import cache
 from django.test import TransactionTestCase
@@ -51,6 +52,7 @@ class ModeloTestCase(TestCase):
         self.assertEqual(episodio.temporada, 1)
 
 
+@override_settings(TELEMETRIA_ASINCRONA=False)
 class BusquedaTestCase(TestCase):
     """Pruebas para funcionalidad de búsqueda"""
     
@@ -116,7 +118,25 @@ class BusquedaTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertNotContains(response, 'Naruto')
 
+    def test_indice_fts_sigue_cargas_masivas(self):
+        """Los triggers mantienen la tabla FTS5 con bulk_create y update() (sin señales)"""
+        from myapp import buscador
 
+        nuevo, = Contenido.objects.bulk_create([
+            Contenido(titulo='Kimetsu no Yaiba', tipo='serie', año=2019, descripcion='Cazadores de demonios')
+        ])
+        ContenidoCategoria.objects.bulk_create([ContenidoCategoria(contenido=nuevo, categoria=self.categoria_drama)])
+        with self.settings(BUSQUEDA_BACKEND='fts5'):
+            self.assertEqual([c.id for c in buscador.buscar('kimetsu')], [nuevo.id])
+            self.assertIn(nuevo.id, [c.id for c in buscador.buscar('drama')])
+
+            Categoria.objects.filter(pk=self.categoria_drama.pk).update(nombre='Tragedia')
+            self.assertIn(nuevo.id, [c.id for c in buscador.buscar('tragedia')])
+            Contenido.objects.filter(pk=nuevo.pk).delete()
+            self.assertEqual(buscador.buscar('kimetsu'), [])
+
+
+@override_settings(TELEMETRIA_ASINCRONA=False)
 class RendimientoTestCase(TestCase):
     """Pruebas de rendimiento y carga"""
     
@@ -191,6 +211,7 @@ class RendimientoTestCase(TestCase):
             self.assertEqual(response.status_code, 200)
 
 
+@override_settings(TELEMETRIA_ASINCRONA=False)
 class CargaConcurrenteTestCase(TransactionTestCase):
     """Pruebas de carga concurrente"""
     
@@ -241,6 +262,7 @@ class CargaConcurrenteTestCase(TransactionTestCase):
         self.assertGreater(success_rate, 0.8, f"Tasa de éxito: {success_rate:.2%}, debe ser > 80%")
 
 
+@override_settings(TELEMETRIA_ASINCRONA=False)
 class IntegracionTestCase(TestCase):
     """Pruebas de integración completas"""
     
@@ -278,4 +300,1298 @@ class IntegracionTestCase(TestCase):
         self.assertContains(response, 'Test Integration Anime')
 
 
+class EstantesTestCase(TestCase):
+    """Pruebas para los estantes precalculados de la página principal"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=self.user, nombre='Test User', tipo='adulto')
+        self.contenido = Contenido.objects.create(titulo='Anime Estante', tipo='serie', año=2024)
+        
+    def test_estantes_se_leen_de_la_cache(self):
+        """Una segunda lectura no recalcula ningún estante"""
+        from .estantes import obtener_estantes
+        obtener_estantes()
+        
+        with self.assertNumQueries(0):  # Hidratación desde el catálogo compacto en memoria
+            estantes = obtener_estantes()
+        self.assertEqual([c.id for c in estantes['contenidos_recientes']], [self.contenido.id])
+        
+    @override_settings(ESTANTES_REFRESCO_MINIMO=0)
+    def test_escritura_invalida_estantes_dependientes(self):
+        """Una reproducción recalcula solo los estantes que dependen de ella"""
+        from .estantes import obtener_estantes, PREFIJO_SUCIO
+        from .models import HistorialReproduccion
+        obtener_estantes()
+        
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenido, tiempo_reproducido=10)
+        self.assertTrue(cache.get(PREFIJO_SUCIO + 'contenido_popular'))
+        self.assertIsNone(cache.get(PREFIJO_SUCIO + 'contenidos_recientes'))
+        
+        estantes = obtener_estantes()
+        self.assertEqual(estantes['contenido_popular'][0].id, self.contenido.id)
+        self.assertEqual(estantes['contenido_popular'][0].total_reproducciones, 1)
+
+    @override_settings(ESTANTES_REFRESCO_MINIMO=0)
+    def test_estante_en_reconstruccion_sirve_version_anterior(self):
+        """Mientras otro proceso reconstruye un estante vencido se sirve el anterior"""
+        from .estantes import obtener_estantes, PREFIJO_BLOQUEO
+        from .models import HistorialReproduccion
+        obtener_estantes()
+
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenido, tiempo_reproducido=10)
+        cache.set(PREFIJO_BLOQUEO + 'contenido_popular', True)
+        self.assertEqual(obtener_estantes()['contenido_popular'], [])
+
+        cache.delete(PREFIJO_BLOQUEO + 'contenido_popular')
+        self.assertEqual(obtener_estantes()['contenido_popular'][0].id, self.contenido.id)
+
+
+class ContadoresTestCase(TestCase):
+    """Pruebas para los contadores de interacción desnormalizados"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=self.user, nombre='Test User', tipo='adulto')
+        self.contenido = Contenido.objects.create(titulo='Anime Contado', tipo='pelicula', año=2024)
+        self.client.login(username='testuser', password='testpass123')
+        
+    def estadisticas(self):
+        from .models import EstadisticasContenido
+        return EstadisticasContenido.objects.get(contenido=self.contenido)
+        
+    def test_like_dislike_actualizan_contadores(self):
+        """Los toggles de like/dislike mantienen likes, dislikes y rating promedio"""
+        self.client.post(reverse('toggle_like'), {'contenido_id': self.contenido.id})
+        estadisticas = self.estadisticas()
+        self.assertEqual((estadisticas.total_likes, estadisticas.total_dislikes), (1, 0))
+        self.assertEqual(estadisticas.rating_promedio, 5.0)
+        
+        self.client.post(reverse('toggle_dislike'), {'contenido_id': self.contenido.id})
+        estadisticas = self.estadisticas()
+        self.assertEqual((estadisticas.total_likes, estadisticas.total_dislikes), (0, 1))
+        self.assertEqual(estadisticas.rating_promedio, 1.0)
+        
+        self.client.post(reverse('toggle_dislike'), {'contenido_id': self.contenido.id})
+        estadisticas = self.estadisticas()
+        self.assertEqual(estadisticas.total_calificaciones, 0)
+        self.assertIsNone(estadisticas.rating_promedio)
+        
+        response = self.client.get(reverse('get_content_ratings', args=[self.contenido.id]))
+        self.assertEqual(response.json()['total_ratings'], 0)
+        
+    def test_reproduccion_y_favorito_actualizan_contadores(self):
+        """Reproducir y marcar favorito incrementan sus contadores"""
+        self.client.get(reverse('movie_watching', args=[self.contenido.id]))
+        self.client.post(reverse('toggle_favorito'), {'contenido_id': self.contenido.id})
+        estadisticas = self.estadisticas()
+        self.assertEqual(estadisticas.total_reproducciones, 1)
+        self.assertEqual(estadisticas.total_favoritos, 1)
+        
+    def test_reconciliacion_corrige_desviaciones(self):
+        """El comando de reconciliación recalcula los contadores desde los eventos"""
+        from django.core.management import call_command
+        from .models import EstadisticasContenido, Calificacion
+        Calificacion.objects.create(perfil=self.perfil, contenido=self.contenido, calificacion=4)
+        EstadisticasContenido.objects.filter(contenido=self.contenido).update(total_calificaciones=7)
+        
+        call_command('reconciliar_contadores', stdout=open('/dev/null', 'w'))
+        estadisticas = self.estadisticas()
+        self.assertEqual(estadisticas.total_calificaciones, 1)
+        self.assertEqual(estadisticas.rating_promedio, 4.0)
+
+    def test_admin_y_gestion_leen_los_contadores(self):
+        """El admin no escribe al mostrar estadísticas y la gestión usa likes = 5 estrellas"""
+        from django.contrib.admin.sites import AdminSite
+        from .admin import ContenidoAdmin
+        from .models import Calificacion, EstadisticasContenido
+        Calificacion.objects.create(perfil=self.perfil, contenido=self.contenido, calificacion=4)
+        modelo_admin = ContenidoAdmin(Contenido, AdminSite())
+        contenido = Contenido.objects.select_related('estadisticas').get(pk=self.contenido.pk)
+        with self.assertNumQueries(0):
+            self.assertIn('Rating promedio', modelo_admin.estadisticas_content(contenido))
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('perfil'), {'seccion': 'gestion'})
+        fila = response.context['contenidos'].get(pk=self.contenido.pk)
+        self.assertEqual((fila.total_likes, fila.total_dislikes, fila.rating_promedio), (0, 0, 4.0))
+
+        EstadisticasContenido.objects.filter(contenido=self.contenido).delete()
+        contenido = Contenido.objects.get(pk=self.contenido.pk)
+        self.assertEqual(modelo_admin.estadisticas_content(contenido), 'Estadísticas no disponibles')
+        self.assertFalse(EstadisticasContenido.objects.filter(contenido=self.contenido).exists())
+
+
+class PopularidadTestCase(TestCase):
+    """Pruebas para la puntuación de popularidad con decaimiento temporal"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=self.user, nombre='Test User', tipo='adulto')
+        self.antiguo = Contenido.objects.create(titulo='Anime Antiguo', tipo='serie', año=2020, imagen_portada='a.jpg')
+        self.reciente = Contenido.objects.create(titulo='Anime Reciente', tipo='serie', año=2024, imagen_portada='b.jpg')
+        
+    def reproducir(self, contenido, veces, dias_atras):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import HistorialReproduccion
+        for _ in range(veces):
+            historial = HistorialReproduccion.objects.create(
+                perfil=self.perfil, contenido=contenido, tiempo_reproducido=60
+            )
+            HistorialReproduccion.objects.filter(id=historial.id).update(
+                fecha=timezone.now() - timedelta(days=dias_atras)
+            )
+        
+    def test_eventos_recientes_pesan_mas(self):
+        """Pocas reproducciones recientes superan a muchas antiguas"""
+        from django.core.management import call_command
+        from .estantes import leer_cache_estantes, obtener_estantes
+        self.reproducir(self.antiguo, 6, dias_atras=120)
+        self.reproducir(self.reciente, 3, dias_atras=1)
+        
+        call_command('calcular_popularidad', stdout=open('/dev/null', 'w'))
+        self.assertNotIn('contenido_destacado', leer_cache_estantes()[1])  # Reconstruido por el comando
+        self.antiguo.estadisticas.refresh_from_db()
+        self.reciente.estadisticas.refresh_from_db()
+        self.assertGreater(
+            self.reciente.estadisticas.puntuacion_popularidad,
+            self.antiguo.estadisticas.puntuacion_popularidad
+        )
+        
+        destacado = obtener_estantes()['contenido_destacado']
+        self.assertEqual([c.id for c in destacado], [self.reciente.id, self.antiguo.id])
+        
+    def test_anilist_aporta_sin_interacciones(self):
+        """Sin interacciones locales, la puntuación refleja los datos de AniList"""
+        from .popularidad import calcular_puntuaciones
+        Contenido.objects.filter(id=self.antiguo.id).update(anilist_score=85, anilist_popularity=100000)
+        puntuaciones = calcular_puntuaciones()
+        self.assertGreater(puntuaciones[self.antiguo.id], puntuaciones[self.reciente.id])
+        self.assertEqual(puntuaciones[self.reciente.id], 0)
+
+
+class TendenciasTestCase(TestCase):
+    """Pruebas para el mapeo precalculado de búsquedas populares"""
+    
+    def setUp(self):
+        cache.clear()
+        self.naruto = Contenido.objects.create(titulo='Naruto', tipo='serie', año=2002)
+        self.bleach = Contenido.objects.create(titulo='Bleach', tipo='serie', año=2004)
+        
+    def test_estante_usa_mapeo_precalculado(self):
+        """Tras el proceso periódico el estante no consulta la base de datos"""
+        from django.core.management import call_command
+        from .models import HistorialBusqueda
+        from .estantes import construir_estante
+        for termino in ('naruto', 'naruto', 'bleach'):
+            HistorialBusqueda.registrar_busqueda(termino)
+        call_command('calcular_tendencias', stdout=open('/dev/null', 'w'))
+        
+        with self.assertNumQueries(0):
+            filas = construir_estante('contenido_mas_buscado')['filas']
+        self.assertEqual([fila['id'] for fila in filas], [self.naruto.id, self.bleach.id])
+        
+        terminos = construir_estante('terminos_mas_buscados')['filas']
+        self.assertEqual(terminos[0]['termino_normalizado'], 'naruto')
+        self.assertNotIn('contenido_ids', terminos[0])
+
+    @override_settings(TENDENCIAS_TTL=0)
+    def test_mapeo_vencido_se_recalcula_en_un_solo_proceso(self):
+        """Con otro proceso recalculando, un mapeo vencido se sirve sin consultas"""
+        from .tendencias import CLAVE_BLOQUEO, obtener_tendencias, resolver_tendencias
+        anterior = resolver_tendencias()
+        cache.set(CLAVE_BLOQUEO, True)
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_tendencias(), anterior)
+
+        cache.delete(CLAVE_BLOQUEO)
+        self.assertGreater(obtener_tendencias()['generado'], anterior['generado'])
+        self.assertIsNone(cache.get(CLAVE_BLOQUEO))
+
+
+class IndexAsincronoTestCase(TestCase):
+    """Pruebas para la página principal asíncrona"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=self.user, nombre='Test User', tipo='adulto')
+        for i in range(3):
+            Contenido.objects.create(titulo=f'Anime {i}', tipo='serie', año=2024, imagen_portada=f'{i}.jpg')
+        self.client.login(username='testuser', password='testpass123')
+        
+    # SQLite en memoria no admite conexiones desde otros hilos dentro de la transacción de la prueba
+    @override_settings(INDEX_CONCURRENCIA=1)
+    def test_mismo_contexto_que_la_vista_sincrona(self):
+        """La vista asíncrona construye los mismos estantes que la síncrona"""
+        asincrona = self.client.get(reverse('index_async'))
+        self.assertEqual(asincrona.status_code, 200)
+        sincrona = self.client.get(reverse('index'))
+        for estante in ('contenidos_recientes', 'contenido_destacado', 'nuevo_contenido_sidebar'):
+            self.assertEqual(
+                [c.id for c in asincrona.context[estante]],
+                [c.id for c in sincrona.context[estante]]
+            )
+        self.assertTrue(asincrona.context['tiene_perfil'])
+
+    def test_requiere_sesion_iniciada(self):
+        """Igual que la vista síncrona, sin sesión redirige al login"""
+        self.client.logout()
+        response = self.client.get(reverse('index_async'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith('/login/'))
+
+
+@override_settings(TELEMETRIA_ASINCRONA=False)
+class PeticionesCondicionalesTestCase(TestCase):
+    """Pruebas para ETag / Last-Modified de las páginas del catálogo"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=self.user, nombre='Test User', tipo='adulto')
+        self.contenido = Contenido.objects.create(titulo='Anime Versionado', tipo='serie', año=2024, imagen_portada='a.jpg')
+        self.client.login(username='testuser', password='testpass123')
+        
+    def test_304_hasta_que_cambia_el_catalogo(self):
+        """Sin cambios se responde 304; una escritura en el catálogo invalida el ETag"""
+        url = reverse('categories')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        Contenido.objects.create(titulo='Anime Nuevo', tipo='pelicula', año=2024)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        
+    def test_interacciones_invalidan_solo_paginas_del_perfil(self):
+        """Un favorito cambia el ETag del detalle pero no el del listado de categorías"""
+        detalle = reverse('anime_details', args=[self.contenido.id])
+        categorias = reverse('categories')
+        etag_detalle = self.client.get(detalle)['ETag']
+        etag_categorias = self.client.get(categorias)['ETag']
+        
+        self.client.post(reverse('toggle_favorito'), {'contenido_id': self.contenido.id})
+        self.assertEqual(self.client.get(detalle, HTTP_IF_NONE_MATCH=etag_detalle).status_code, 200)
+        self.assertEqual(self.client.get(categorias, HTTP_IF_NONE_MATCH=etag_categorias).status_code, 304)
+
+    def test_recalcular_similitudes_invalida_el_detalle(self):
+        """Los vecinos nuevos cambian el ETag del detalle sin tocar el del catálogo"""
+        from django.core.management import call_command
+        detalle = reverse('anime_details', args=[self.contenido.id])
+        categorias = reverse('categories')
+        etag_detalle = self.client.get(detalle)['ETag']
+        etag_categorias = self.client.get(categorias)['ETag']
+
+        call_command('calcular_similitudes', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.client.get(detalle, HTTP_IF_NONE_MATCH=etag_detalle).status_code, 200)
+        self.assertEqual(self.client.get(categorias, HTTP_IF_NONE_MATCH=etag_categorias).status_code, 304)
+
+    def test_busqueda_repetida_se_registra(self):
+        """La búsqueda no responde 304: cada repetición queda en el historial"""
+        from .models import HistorialBusqueda
+        busqueda = reverse('busqueda') + '?q=anime'
+        response = self.client.get(busqueda)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(self.client.get(busqueda, HTTP_IF_NONE_MATCH='"x"').status_code, 200)
+        self.assertEqual(HistorialBusqueda.objects.filter(termino_normalizado='anime').count(), 2)
+
+
+class PaginacionCatalogoTestCase(TestCase):
+    """Pruebas para la paginación por cursor del catálogo"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        años = [2001, None, 2001, 1999, None, 2010, 2001]
+        for i, año in enumerate(años):
+            Contenido.objects.create(titulo=f'Anime {i % 3}', tipo='serie', año=año)
+        self.client.login(username='testuser', password='testpass123')
+        
+    def test_recorrido_completo_sin_huecos_ni_duplicados(self):
+        """Cada orden recorre todo el catálogo en el mismo orden que sin paginar, con NULL y empates"""
+        from .paginacion import paginar_keyset
+        for orden in (['-id'], ['titulo', 'id'], ['-titulo', '-id'], ['año', 'id'], ['-año', '-id'], ['titulo', '-año', '-id']):
+            esperado = list(Contenido.objects.order_by(*orden).values_list('id', flat=True))
+            obtenido, cursor = [], None
+            while True:
+                pagina, cursor = paginar_keyset(Contenido.objects.all(), orden, cursor, limite=2)
+                obtenido += [contenido.id for contenido in pagina]
+                if not cursor:
+                    break
+            self.assertEqual(obtenido, esperado, orden)
+
+    def test_cursor_usa_valores_de_fila_sobre_el_indice(self):
+        """Con una sola dirección el cursor es (titulo, id) > (...) y SQLite busca en el índice"""
+        from .paginacion import filtro_keyset
+        queryset = Contenido.objects.filter(filtro_keyset(['titulo', 'id'], ['Anime 1', 3], Contenido))
+        sql, parametros = queryset.order_by('titulo', 'id').values('id').query.sql_with_params()
+        self.assertIn('("myapp_contenido"."titulo", "myapp_contenido"."id") > (%s, %s)', sql)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, parametros)
+            plan = ' '.join(str(fila[-1]) for fila in cursor.fetchall())
+        self.assertIn('SEARCH', plan)
+        self.assertEqual(list(queryset.order_by('titulo', 'id').values_list('titulo', flat=True)),
+                         ['Anime 1', 'Anime 2', 'Anime 2'])
+
+    def test_api_catalogo(self):
+        """El endpoint JSON devuelve la página siguiente y rechaza cursores inválidos"""
+        from unittest import mock
+        with mock.patch('myapp.views.CATALOGO_POR_PAGINA', 4):
+            primera = self.client.get(reverse('categories'), {'orden_año': 'desc'})
+            self.assertEqual(len(primera.context['contenidos']), 4)
+            datos = self.client.get(reverse('api_catalogo'), {
+                'orden_año': 'desc', 'cursor': primera.context['siguiente_cursor']
+            }).json()
+        self.assertEqual(len(datos['contenidos']), 3)
+        self.assertIsNone(datos['siguiente'])
+        self.assertEqual(self.client.get(reverse('api_catalogo'), {'cursor': 'no-valido'}).status_code, 400)
+
+
+class FacetasTestCase(TestCase):
+    """Pruebas para los conteos de facetas incrementales"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.romance = Categoria.objects.create(nombre='Romance')
+        self.a = Contenido.objects.create(titulo='A', tipo='serie', año=2021)
+        self.b = Contenido.objects.create(titulo='B', tipo='pelicula', año=2015)
+        self.c = Contenido.objects.create(titulo='C', tipo='serie', año=1998)
+        ContenidoCategoria.objects.create(contenido=self.a, categoria=self.accion)
+        self.b.categorias.add(self.accion, self.romance)
+        self.c.categorias.add(self.romance)
+        self.client.login(username='testuser', password='testpass123')
+        
+    def conteos(self):
+        from .models import ConteoFaceta
+        return sorted(ConteoFaceta.objects.filter(total__gt=0).values_list('categoria_id', 'tipo', 'decada', 'total'),
+                      key=str)
+        
+    def test_incremental_coincide_con_reconstruccion(self):
+        """Las altas, cambios y bajas mantienen los mismos conteos que una reconstrucción"""
+        from .facetas import reconstruir_facetas
+        self.a.año = 2009
+        self.a.save()
+        self.c.categorias.remove(self.romance)
+        self.b.delete()
+        incrementales = self.conteos()
+        reconstruir_facetas()
+        self.assertEqual(incrementales, self.conteos())
+        
+    def test_facetas_en_categorias(self):
+        """La página de categorías filtra por década y muestra conteos del resto de facetas"""
+        response = self.client.get(reverse('categories'), {'cat': self.accion.id, 'decada': 2010})
+        self.assertEqual([c.id for c in response.context['contenidos']], [self.b.id])
+        facetas = response.context['facetas']
+        self.assertEqual({t['valor']: t['total'] for t in facetas['tipos']}, {'pelicula': 1})
+        self.assertEqual({d['valor']: d['total'] for d in facetas['decadas']}, {2020: 1, 2010: 1})
+        self.assertEqual({c['nombre']: c['total'] for c in facetas['categorias']}, {'Acción': 1, 'Romance': 1})
+
+    def test_decada_se_normaliza_y_valida(self):
+        """Un año cualquiera filtra por su década; un valor no numérico se rechaza"""
+        response = self.client.get(reverse('categories'), {'decada': 2013})
+        self.assertEqual([c.id for c in response.context['contenidos']], [self.b.id])
+        self.assertEqual(response.context['decada_actual'], 2010)
+        self.assertEqual(self.client.get(reverse('categories'), {'decada': 'abc'}).status_code, 302)
+        self.assertEqual(self.client.get(reverse('api_catalogo'), {'decada': 'abc'}).status_code, 400)
+
+
+class BitmapsTestCase(TestCase):
+    """Pruebas para el índice de bitmaps del catálogo"""
+    
+    def setUp(self):
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.romance = Categoria.objects.create(nombre='Romance')
+        self.a = Contenido.objects.create(titulo='A', tipo='serie', año=2021)
+        self.b = Contenido.objects.create(titulo='B', tipo='serie', año=2015)
+        self.c = Contenido.objects.create(titulo='C', tipo='pelicula', año=2022)
+        self.a.categorias.add(self.accion, self.romance)
+        self.b.categorias.add(self.accion, self.romance)
+        self.c.categorias.add(self.accion)
+        
+    def test_filtros_combinados(self):
+        """Acción Y Romance Y serie Y 2020+ se resuelve con ANDs de bitsets"""
+        from .bitmaps import obtener_indice
+        indice = obtener_indice()
+        bits = indice.filtrar([self.accion.id, self.romance.id], tipo='serie', año_desde=2020)
+        self.assertEqual(indice.a_ids(bits), [self.a.id])
+        self.assertEqual(indice.a_ids(indice.filtrar([self.accion.id])), [self.a.id, self.b.id, self.c.id])
+        
+    def test_reconstruccion_al_cambiar_el_catalogo(self):
+        """Una escritura en el catálogo invalida el índice y la similitud la refleja"""
+        from .bitmaps import obtener_indice
+        from .recommendations import obtener_contenido_similar
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        
+        self.assertEqual([c.id for c in obtener_contenido_similar(perfil, self.a, limite=1)], [self.b.id])
+        self.c.categorias.add(self.romance)
+        self.assertIn(self.c.id, obtener_indice().a_ids(obtener_indice().categoria(self.romance.id)))
+        similares = {c.id for c in obtener_contenido_similar(perfil, self.a, limite=2)}
+        self.assertEqual(similares, {self.b.id, self.c.id})
+
+
+class CatalogoCompactoTestCase(TestCase):
+    """Pruebas para el catálogo compacto en memoria"""
+    
+    def setUp(self):
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.drama = Categoria.objects.create(nombre='Drama')
+        self.a = Contenido.objects.create(titulo='Beta', tipo='serie', año=2021, anilist_score=80)
+        self.b = Contenido.objects.create(titulo='alfa', tipo='serie', año=2015, anilist_score=90)
+        self.c = Contenido.objects.create(titulo='Gamma', tipo='pelicula', año=2022)
+        for contenido in (self.a, self.b, self.c):
+            contenido.categorias.add(self.accion)
+        self.a.categorias.add(self.drama)
+        
+    def test_consultar_filtra_y_ordena_sin_consultas(self):
+        """Filtros, orden y top-k se resuelven en memoria"""
+        from .catalogo_compacto import obtener_catalogo
+        catalogo = obtener_catalogo()
+        with self.assertNumQueries(0):
+            self.assertEqual([t.id for t in catalogo.consultar([self.accion.id], orden='titulo')],
+                             [self.b.id, self.a.id, self.c.id])
+            self.assertEqual([t.id for t in catalogo.consultar(tipo='serie', año_desde=2020)], [self.a.id])
+            self.assertEqual([t.id for t in catalogo.consultar(orden='-anilist_score', limite=1)], [self.b.id])
+            self.assertEqual([t.id for t in catalogo.consultar(orden='-año', limite=2)], [self.c.id, self.a.id])
+        
+    def test_tarjeta_y_recarga_por_version(self):
+        """La tarjeta expone los campos de listado y el catálogo se recarga tras una escritura"""
+        from .catalogo_compacto import obtener_catalogo
+        tarjeta = obtener_catalogo().tarjeta(self.a.id, rating_promedio=4.5)
+        self.assertEqual((tarjeta.titulo, tarjeta.get_tipo_display(), tarjeta.año), ('Beta', 'Serie', 2021))
+        self.assertEqual([c.nombre for c in tarjeta.categorias.all()], ['Acción', 'Drama'])
+        self.assertEqual(tarjeta.rating_promedio, 4.5)
+        self.assertFalse(tarjeta.imagen_portada)
+        
+        self.a.titulo = 'Beta 2'
+        self.a.save()
+        self.assertEqual(obtener_catalogo().tarjeta(self.a.id).titulo, 'Beta 2')
+
+
+class SimilitudTestCase(TestCase):
+    """Pruebas para el índice de similitud item-item precalculado"""
+    
+    def setUp(self):
+        cache.clear()
+        accion = Categoria.objects.create(nombre='Acción')
+        drama = Categoria.objects.create(nombre='Drama')
+        self.a = Contenido.objects.create(titulo='A', tipo='serie')
+        self.b = Contenido.objects.create(titulo='B', tipo='serie')
+        self.c = Contenido.objects.create(titulo='C', tipo='serie')
+        self.d = Contenido.objects.create(titulo='D', tipo='serie')
+        self.a.categorias.add(accion, drama)
+        self.b.categorias.add(accion, drama)
+        self.c.categorias.add(accion)
+        self.d.categorias.add(drama)
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        
+    def test_vecinos_por_categorias_y_coconsumo(self):
+        """El co-consumo se suma a la afinidad de categorías (C y D comparten una categoría con A)"""
+        from django.core.management import call_command
+        from .models import Favorito
+        from .similitud import actualizar_similitudes, similares_ids
+        otro = Perfil.objects.create(usuario=self.perfil.usuario, nombre='Otro', tipo='adulto')
+        for perfil in (self.perfil, otro):
+            Favorito.objects.create(perfil=perfil, contenido=self.a)
+            Favorito.objects.create(perfil=perfil, contenido=self.d)
+        
+        call_command('calcular_similitudes', stdout=open('/dev/null', 'w'))
+        self.assertEqual(similares_ids(self.a.id, limite=3), [self.d.id, self.b.id, self.c.id])
+        self.assertEqual(similares_ids(self.a.id, excluir=[self.d.id], limite=1), [self.b.id])
+        self.assertEqual(actualizar_similitudes(vecinos=1), 4)
+        
+    def test_contenido_similar_lee_la_tabla(self):
+        """obtener_contenido_similar usa los vecinos guardados y excluye lo ya visto"""
+        from django.core.management import call_command
+        from .models import HistorialReproduccion
+        from .recommendations import obtener_contenido_similar
+        call_command('calcular_similitudes', stdout=open('/dev/null', 'w'))
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.b, tiempo_reproducido=10)
+        
+        similares = obtener_contenido_similar(self.perfil, self.a, limite=2)
+        self.assertEqual([c.id for c in similares], [self.c.id, self.d.id])
+        self.assertEqual(similares[0].titulo, 'C')
+
+
+class FactorizacionTestCase(TestCase):
+    """Pruebas para el filtrado colaborativo con ALS implícito"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, True)
+        ajustes = override_settings(RECOMENDADOR_DIR=os.path.join(directorio, 'als'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfiles = [Perfil.objects.create(usuario=user, nombre=f'P{i}', tipo='adulto') for i in range(5)]
+        self.contenidos = [Contenido.objects.create(titulo=f'C{i}', tipo='serie') for i in range(4)]
+        
+    def test_recomienda_lo_que_ven_perfiles_parecidos(self):
+        """Un perfil que vio C0 recibe C1 (visto junto a C0 por otros) antes que C3"""
+        from django.core.management import call_command
+        from .models import HistorialReproduccion
+        from .factorizacion import obtener_modelo
+        from .recommendations import SistemaRecomendaciones
+        self.assertIsNone(obtener_modelo())
+        
+        c0, c1, c2, c3 = self.contenidos
+        vistas = {0: [c0, c1], 1: [c0, c1], 2: [c0, c1, c2], 3: [c3], 4: [c0]}
+        for indice, contenidos in vistas.items():
+            for contenido in contenidos:
+                HistorialReproduccion.objects.create(perfil=self.perfiles[indice], contenido=contenido, tiempo_reproducido=10)
+        call_command('entrenar_recomendador', '--iteraciones', '15', stdout=open('/dev/null', 'w'))
+        
+        modelo = obtener_modelo()
+        self.assertEqual(modelo.recomendar(self.perfiles[4].id, excluir=[c0.id], limite=1), [c1.id])
+        self.assertEqual(modelo.recomendar(999999), [])
+        sistema = SistemaRecomendaciones(self.perfiles[4])
+        self.assertEqual([c.id for c in sistema._recomendaciones_colaborativas(1)], [c1.id])
+
+    def test_entrenamientos_simultaneos_no_se_pisan(self):
+        """Dos guardados a la vez usan su propio temporal y dejan un modelo completo"""
+        from unittest import mock
+        import numpy as np
+        from django.conf import settings
+        from .factorizacion import guardar_modelo, obtener_modelo
+
+        def guardar(factores):
+            guardar_modelo(np.ones((2, factores), dtype=np.float32), np.ones((3, factores), dtype=np.float32),
+                           np.array([1, 2]), np.array([1, 2, 3]))
+
+        hilos = [Thread(target=guardar, args=(factores,)) for factores in (4, 8, 4, 8)]
+        # Los hilos no comparten la base de datos de la prueba
+        with mock.patch('myapp.factorizacion.incrementar_version'):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        padre = os.path.dirname(settings.RECOMENDADOR_DIR)
+        self.assertEqual(sorted(os.listdir(padre)), ['als', 'als.lock'])
+        self.assertEqual(obtener_modelo().recomendar(1, limite=3), [1, 2, 3])
+
+
+class MuestreoTestCase(TestCase):
+    """Pruebas para el muestreo aleatorio sin ORDER BY RANDOM()"""
+    
+    def setUp(self):
+        cache.clear()
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.drama = Categoria.objects.create(nombre='Drama')
+        self.contenidos = [Contenido.objects.create(titulo=f'C{i}', tipo='serie') for i in range(12)]
+        for contenido in self.contenidos[:6]:
+            contenido.categorias.add(self.accion)
+        for contenido in self.contenidos[6:]:
+            contenido.categorias.add(self.drama)
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        
+    def test_pools_y_empates(self):
+        """Las muestras respetan exclusiones y categorías; los empates se barajan sin reordenar grupos"""
+        from .muestreo import aleatorios, barajar_empates, de_categorias
+        ids_accion = {c.id for c in self.contenidos[:6]}
+        excluidos = set(list(ids_accion)[:2])
+        
+        muestra = de_categorias([self.accion.id], 10, excluir=excluidos)
+        self.assertEqual(set(muestra), ids_accion - excluidos)
+        self.assertEqual(len(set(aleatorios(5))), 5)
+        self.assertEqual(len(aleatorios(50)), 12)
+        
+        ordenados = barajar_empates([3, 3, 2, 2, 2, 1], clave=lambda x: x, limite=4)
+        self.assertEqual(ordenados, [3, 3, 2, 2])
+        
+    def test_recomendaciones_sin_order_by_random(self):
+        """Ninguna consulta de recomendaciones ni de la página de detalle usa RANDOM()"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import Calificacion, HistorialReproduccion
+        from .recommendations import SistemaRecomendaciones
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenidos[0], tiempo_reproducido=10)
+        Calificacion.objects.create(perfil=self.perfil, contenido=self.contenidos[6], calificacion=5)
+        
+        client = Client()
+        client.force_login(self.perfil.usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            recomendaciones = SistemaRecomendaciones(self.perfil).obtener_recomendaciones(limite=8)
+            self.assertEqual(client.get(reverse('anime_details', args=[self.contenidos[1].id])).status_code, 200)
+        self.assertEqual(len(recomendaciones), 8)
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if 'RANDOM()' in c['sql'].upper()])
+
+
+class VistosTestCase(TestCase):
+    """Pruebas para el conjunto de contenido visto por perfil"""
+    
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        self.contenidos = [Contenido.objects.create(titulo=f'C{i}', tipo='serie') for i in range(6)]
+        
+    def test_actualizacion_incremental(self):
+        """Las interacciones nuevas se añaden sin reconstruir; un borrado obliga a reconstruir"""
+        from .models import Favorito, HistorialReproduccion
+        from .vistos import obtener_vistos
+        c0, c1, c2 = self.contenidos[:3]
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=c2, tiempo_reproducido=10)
+        self.assertEqual(list(obtener_vistos(self.perfil.id)), [c2.id])
+        
+        favorito = Favorito.objects.create(perfil=self.perfil, contenido=c0)
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=c0, tiempo_reproducido=10)
+        with self.assertNumQueries(1):  # Solo la versión del perfil
+            vistos = obtener_vistos(self.perfil.id)
+        self.assertEqual(list(vistos), [c0.id, c2.id])
+        self.assertIn(c0.id, vistos)
+        self.assertNotIn(c1.id, vistos)
+        
+        favorito.delete()
+        self.assertEqual(list(obtener_vistos(self.perfil.id)), [c0.id, c2.id])  # sigue en el historial
+
+    def test_clave_sigue_la_version_del_perfil(self):
+        """Un cambio que el conjunto no conoce pero sube la versión del perfil obliga a reconstruirlo"""
+        from .models import HistorialReproduccion
+        from .versiones import clave_perfil, incrementar_version
+        from .vistos import obtener_vistos
+        c0, c1 = self.contenidos[:2]
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=c0, tiempo_reproducido=10)
+        self.assertEqual(list(obtener_vistos(self.perfil.id)), [c0.id])
+
+        # Sin señales (carga en bloque u otro proceso): la entrada anterior deja de usarse
+        HistorialReproduccion.objects.bulk_create([
+            HistorialReproduccion(perfil=self.perfil, contenido=c1, tiempo_reproducido=10)
+        ])
+        incrementar_version(clave_perfil(self.perfil.id))
+        self.assertEqual(list(obtener_vistos(self.perfil.id)), [c0.id, c1.id])
+        
+    def test_recomendaciones_leen_vistos_una_vez(self):
+        """Todas las estrategias comparten el mismo conjunto y ninguna devuelve lo visto"""
+        from unittest import mock
+        from .models import Calificacion, HistorialReproduccion
+        from .recommendations import SistemaRecomendaciones
+        from . import vistos
+        categoria = Categoria.objects.create(nombre='Acción')
+        for contenido in self.contenidos:
+            contenido.categorias.add(categoria)
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenidos[0], tiempo_reproducido=10)
+        Calificacion.objects.create(perfil=self.perfil, contenido=self.contenidos[1], calificacion=5)
+        
+        with mock.patch('myapp.recommendations.obtener_vistos', wraps=vistos.obtener_vistos) as obtener:
+            recomendaciones = SistemaRecomendaciones(self.perfil).obtener_recomendaciones(limite=10)
+        self.assertEqual(obtener.call_count, 1)
+        self.assertEqual({c.id for c in recomendaciones}, {c.id for c in self.contenidos[2:]})
+
+
+@override_settings(CATALOGO_VERIFICACION_SEGUNDOS=3600, RECOMENDACIONES_EVENTOS_REFRESCO=3)
+class CacheRecomendacionesTestCase(TestCase):
+    """Pruebas para la cache de recomendaciones por perfil"""
+    
+    def setUp(self):
+        from .cache_recomendaciones import reiniciar_metricas
+        cache.clear()
+        reiniciar_metricas()  # Lo pendiente de otras pruebas en este proceso
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        self.contenidos = [Contenido.objects.create(titulo=f'C{i}', tipo='serie') for i in range(8)]
+        
+    def test_aciertos_sin_consultas(self):
+        """La segunda petición se sirve de la cache; solo se consulta la versión del perfil"""
+        from .cache_recomendaciones import metricas
+        from .recommendations import obtener_recomendaciones_para_perfil
+        primera = obtener_recomendaciones_para_perfil(self.perfil, limite=5)
+        with self.assertNumQueries(1):  # Versión del perfil para la clave del conjunto de vistos
+            segunda = obtener_recomendaciones_para_perfil(self.perfil, limite=5)
+        self.assertEqual(len(primera), 5)
+        self.assertEqual(len(set(c.id for c in segunda)), 5)
+        self.assertEqual(segunda[0].titulo[0], 'C')
+        datos = metricas()
+        self.assertEqual((datos['aciertos'], datos['fallos'], datos['tasa_aciertos']), (1, 1, 0.5))
+        
+    def test_eventos_refrescan_e_invalidan(self):
+        """Una reproducción quita el contenido de la lista; tras varios eventos se recalcula"""
+        from .cache_recomendaciones import PREFIJO, metricas
+        from .models import HistorialReproduccion
+        from .recommendations import obtener_recomendaciones_para_perfil
+        obtener_recomendaciones_para_perfil(self.perfil, limite=5)
+        visto = self.contenidos[0]
+        
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=visto, tiempo_reproducido=10)
+        self.assertNotIn(visto.id, cache.get(PREFIJO + str(self.perfil.id))['ids'])
+        self.assertNotIn(visto.id, [c.id for c in obtener_recomendaciones_para_perfil(self.perfil, limite=5)])
+        
+        for contenido in self.contenidos[1:3]:
+            HistorialReproduccion.objects.create(perfil=self.perfil, contenido=contenido, tiempo_reproducido=10)
+        self.assertIsNone(cache.get(PREFIJO + str(self.perfil.id)))
+        datos = metricas()
+        self.assertEqual((datos['parciales'], datos['invalidaciones']), (2, 1))
+
+    def test_metricas_suman_todos_los_procesos(self):
+        """Lo que cuenta otro proceso se suma al volcarlo en la cache compartida"""
+        from .cache_recomendaciones import METRICAS, PREFIJO_METRICA, metricas
+        from .metricas import ContadoresCompartidos
+        from .recommendations import obtener_recomendaciones_para_perfil
+        otro_proceso = ContadoresCompartidos(PREFIJO_METRICA, METRICAS)
+        otro_proceso.sumar('aciertos', 3)
+        otro_proceso.volcar()
+        obtener_recomendaciones_para_perfil(self.perfil, limite=5)
+        datos = metricas()
+        self.assertEqual((datos['aciertos'], datos['fallos'], datos['tasa_aciertos']), (3, 1, 0.75))
+
+
+class GustosTestCase(TestCase):
+    """Pruebas para la afinidad por categoría mantenida incrementalmente"""
+    
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.drama = Categoria.objects.create(nombre='Drama')
+        self.terror = Categoria.objects.create(nombre='Terror')
+        self.contenidos = []
+        for i, categoria in enumerate([self.accion, self.drama, self.terror, self.accion]):
+            contenido = Contenido.objects.create(titulo=f'C{i}', tipo='serie')
+            contenido.categorias.add(categoria)
+            self.contenidos.append(contenido)
+        
+    def test_actualizacion_incremental_igual_a_reconstruir(self):
+        """Altas, cambios y bajas ajustan solo las categorías del contenido y coinciden con el recálculo"""
+        from .gustos import afinidades, reconstruir_gustos
+        from .models import AfinidadCategoria, Calificacion, Favorito, HistorialReproduccion
+        c0, c1, c2, c3 = self.contenidos
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=c1, tiempo_reproducido=10)
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=c1, tiempo_reproducido=20)
+        Favorito.objects.create(perfil=self.perfil, contenido=c0)
+        calificacion = Calificacion.objects.create(perfil=self.perfil, contenido=c2, calificacion=5)
+        calificacion.calificacion = 1
+        calificacion.save()
+        Favorito.objects.create(perfil=self.perfil, contenido=c3).delete()
+        
+        # Favorito (3) > dos reproducciones (2); la calificación de 1 estrella deja Terror en negativo
+        self.assertEqual([categoria_id for categoria_id, _ in afinidades(self.perfil.id)], [self.accion.id, self.drama.id])
+        self.assertAlmostEqual(dict(afinidades(self.perfil.id))[self.accion.id], 3.0, places=3)
+        incremental = dict(AfinidadCategoria.objects.values_list('categoria_id', 'puntuacion'))
+        
+        reconstruir_gustos()
+        reconstruidas = dict(AfinidadCategoria.objects.values_list('categoria_id', 'puntuacion'))
+        self.assertEqual(incremental.keys(), reconstruidas.keys())
+        for categoria_id, puntuacion in reconstruidas.items():
+            self.assertAlmostEqual(incremental[categoria_id] / puntuacion, 1.0, places=6)
+        
+    def test_decaimiento_y_lectura_compartida(self):
+        """Las interacciones antiguas pesan menos y las estrategias leen las afinidades una vez"""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from . import gustos
+        from .models import HistorialReproduccion
+        from .recommendations import SistemaRecomendaciones
+        antigua = HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenidos[0], tiempo_reproducido=10)
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenidos[1], tiempo_reproducido=10)
+        HistorialReproduccion.objects.filter(pk=antigua.pk).update(fecha=timezone.now() - timedelta(days=60))
+        gustos.reconstruir_gustos([self.perfil.id])
+        
+        valores = dict(gustos.afinidades(self.perfil.id))
+        self.assertAlmostEqual(valores[self.drama.id], 1.0, places=3)
+        self.assertAlmostEqual(valores[self.accion.id], 0.25, places=3)  # dos vidas medias
+        
+        with mock.patch('myapp.recommendations.categorias_preferidas', wraps=gustos.categorias_preferidas) as leer:
+            SistemaRecomendaciones(self.perfil).obtener_candidatos(limite=10)
+        self.assertEqual(leer.call_count, 1)
+
+
+class PrecalculoTestCase(TestCase):
+    """Pruebas para las recomendaciones precalculadas por lotes"""
+    
+    def setUp(self):
+        from .cache_recomendaciones import reiniciar_metricas
+        cache.clear()
+        reiniciar_metricas()
+        self.perfiles = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'testuser{i}', password='testpass123')
+            self.perfiles.append(Perfil.objects.create(usuario=user, nombre=f'Perfil {i}', tipo='adulto'))
+        self.contenidos = [Contenido.objects.create(titulo=f'C{i}', tipo='serie') for i in range(8)]
+        
+    def test_precalcular_y_reanudar(self):
+        """Se guarda una lista por perfil y al reanudar solo se procesan los que faltan"""
+        from .models import RecomendacionPrecalculada
+        from .precalculo import precalcular
+        resumen = precalcular(procesos=1, tamaño_trozo=2)
+        self.assertEqual(resumen['perfiles'], 3)
+        self.assertEqual(RecomendacionPrecalculada.objects.filter(lote=resumen['lote']).count(), 3)
+        
+        RecomendacionPrecalculada.objects.filter(perfil=self.perfiles[1]).delete()
+        reanudado = precalcular(procesos=1, lote=resumen['lote'])
+        self.assertEqual(reanudado['perfiles'], 1)
+        self.assertEqual(len(RecomendacionPrecalculada.objects.get(perfil=self.perfiles[1]).contenido_ids), 8)
+        
+    def test_cache_usa_lista_vigente(self):
+        """Un fallo de cache sirve la lista precalculada hasta que el perfil interactúa"""
+        from .cache_recomendaciones import metricas
+        from .models import HistorialReproduccion
+        from .precalculo import leer_precalculadas, precalcular
+        from .recommendations import obtener_recomendaciones_para_perfil
+        perfil = self.perfiles[0]
+        precalcular(procesos=1)
+        
+        recomendaciones = obtener_recomendaciones_para_perfil(perfil, limite=5)
+        self.assertEqual(len(recomendaciones), 5)
+        self.assertEqual(metricas()['precalculadas'], 1)
+        
+        HistorialReproduccion.objects.create(perfil=perfil, contenido=self.contenidos[0], tiempo_reproducido=10)
+        self.assertIsNone(leer_precalculadas(perfil.id))
+        self.assertIsNotNone(leer_precalculadas(self.perfiles[1].id))
+
+
+class EvaluacionTestCase(TestCase):
+    """Pruebas para la evaluación offline de las estrategias"""
+    
+    def test_dataset_y_metricas(self):
+        """El corte temporal reserva interacciones y cada estrategia devuelve calidad y coste"""
+        from .evaluacion import ESTRATEGIAS, evaluar, generar_dataset, percentil, preparar_derivados
+        from .models import HistorialReproduccion
+        cache.clear()
+        prueba = generar_dataset(perfiles=20, contenidos=60, categorias=5, interacciones=10, semilla=7)
+        preparar_derivados()
+        self.assertEqual(HistorialReproduccion.objects.count() + sum(map(len, prueba.values())), 200)
+        for perfil_id, items in prueba.items():
+            self.assertFalse(items & set(HistorialReproduccion.objects.filter(
+                perfil_id=perfil_id).values_list('contenido_id', flat=True)))
+        
+        resultados = evaluar(prueba, k=5, muestra=10, iteraciones_colaborativo=2)
+        self.assertEqual(list(resultados), list(ESTRATEGIAS))
+        for datos in resultados.values():
+            self.assertTrue(0 <= datos['precision'] <= 1 and 0 <= datos['recall'] <= 1)
+            self.assertTrue(0 < datos['cobertura'] <= 1)
+            self.assertLessEqual(datos['p50_ms'], datos['p99_ms'])
+            self.assertGreater(datos['consultas_media'], 0)
+        self.assertEqual(percentil([4, 1, 3, 2], 50), 2)
+
+
+class PipelineTestCase(TestCase):
+    """Pruebas para el pipeline de recomendaciones por etapas"""
+    
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=user, nombre='Test User', tipo='adulto')
+        self.contenidos = [Contenido.objects.create(titulo=f'C{i}', tipo='serie') for i in range(8)]
+        
+    def test_etapas_medidas_y_desactivables(self):
+        """Cada etapa activa queda medida; las desactivadas no se ejecutan"""
+        from .models import HistorialReproduccion
+        from .recommendations import SistemaRecomendaciones
+        HistorialReproduccion.objects.create(perfil=self.perfil, contenido=self.contenidos[0], tiempo_reproducido=10)
+        resultado = SistemaRecomendaciones(self.perfil).ejecutar_pipeline(6, desactivar={'rating', 'consenso'})
+        
+        etapas = [medicion['etapa'] for medicion in resultado.mediciones]
+        self.assertEqual(etapas, ['colaborativas', 'historial', 'categorias', 'populares', 'generadores',
+                                  'intercalar', 'ordenar', 'completar_aleatorio'])
+        self.assertTrue(all(medicion['ms'] >= 0 for medicion in resultado.mediciones))
+        ids = [contenido.id for contenido in resultado.contenidos]
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(len(set(ids)), 6)
+        self.assertNotIn(self.contenidos[0].id, ids)
+        
+    @override_settings(RECOMENDACIONES_CONCURRENCIA=2)
+    def test_generadores_concurrentes_y_consenso(self):
+        """Los generadores lentos se solapan y lo propuesto por varios sube en la lista"""
+        import time
+        from .pipeline import GENERADOR, PIPELINE, Etapa, Pipeline
+        from .recommendations import SistemaRecomendaciones
+        a, b, c = self.contenidos[:3]
+        
+        def lento(*propuestos):
+            def generar(sistema, limite):
+                time.sleep(0.2)
+                return list(propuestos)
+            return generar
+        
+        pipeline = Pipeline([Etapa('uno', GENERADOR, lento(a, b)), Etapa('dos', GENERADOR, lento(c, b))] +
+                            [etapa for etapa in PIPELINE.etapas if etapa.tipo != GENERADOR])
+        resultado = pipeline.ejecutar(SistemaRecomendaciones(self.perfil), limite=3)
+        
+        generadores = next(m for m in resultado.mediciones if m['etapa'] == 'generadores')
+        self.assertLess(generadores['ms'], 350)
+        self.assertEqual(resultado.contenidos, [a, b, c])
+        self.assertEqual(resultado.candidatos[1].fuentes, ['uno', 'dos'])
+        sin_consenso = pipeline.ejecutar(SistemaRecomendaciones(self.perfil), limite=3, desactivar={'consenso'})
+        self.assertEqual(sin_consenso.contenidos, [a, c, b])
+
+
+
+class EmbeddingsTestCase(TestCase):
+    """Pruebas para los vectores de contenido y su índice IVF ("más como este")"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, True)
+        ajustes = override_settings(EMBEDDINGS_DIR=os.path.join(directorio, 'embeddings'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.perfil = Perfil.objects.create(usuario=self.user, nombre='Test User', tipo='adulto')
+        mechas = Categoria.objects.create(nombre='Mechas')
+        cocina = Categoria.objects.create(nombre='Cocina')
+        textos = [
+            ('Robots de acero', 'Pilotos adolescentes controlan robots gigantes contra invasores', mechas),
+            ('Acero estelar', 'Una academia de pilotos de robots gigantes en el espacio', mechas),
+            ('Sabores del mar', 'Un joven cocinero abre un restaurante de mariscos junto al puerto', cocina),
+            ('Cocina de barrio', 'Recetas caseras y un restaurante familiar con clientes excéntricos', cocina),
+            ('Ruta escolar', 'Un club de ciclismo del instituto prepara su primera carrera', None),
+        ]
+        self.contenidos = []
+        for titulo, descripcion, categoria in textos:
+            contenido = Contenido.objects.create(titulo=titulo, tipo='serie', descripcion=descripcion)
+            if categoria:
+                ContenidoCategoria.objects.create(contenido=contenido, categoria=categoria)
+            self.contenidos.append(contenido)
+        
+    def test_similares_por_texto_y_categorias(self):
+        """El vecino más cercano comparte tema; lo usan obtener_contenido_similar y /api/similar/"""
+        from django.core.management import call_command
+        from .embeddings import obtener_indice_embeddings, similares_embeddings
+        from .recommendations import obtener_contenido_similar
+        self.assertEqual(similares_embeddings(self.contenidos[0].id), [])
+        call_command('construir_embeddings', stdout=open('/dev/null', 'w'))
+        
+        robots, acero, mar, barrio, _ = self.contenidos
+        self.assertEqual(len(obtener_indice_embeddings()), 5)
+        self.assertEqual(similares_embeddings(robots.id, limite=1)[0][0], acero.id)
+        self.assertEqual(similares_embeddings(mar.id, limite=1)[0][0], barrio.id)
+        self.assertEqual([c.id for c in obtener_contenido_similar(self.perfil, robots, limite=1)], [acero.id])
+        
+        self.client.login(username='testuser', password='testpass123')
+        datos = self.client.get(f'/api/similar/{robots.id}/?limite=2').json()
+        self.assertEqual(datos['similares'][0]['id'], acero.id)
+        self.assertGreater(datos['similares'][0]['similitud'], datos['similares'][1]['similitud'])
+        self.assertEqual(self.client.get('/api/similar/999999/').status_code, 404)
+        
+    def test_agregar_contenidos_incremental(self):
+        """Lo importado después de construir se indexa con los centroides existentes"""
+        from .embeddings import agregar_contenidos, construir_indice, obtener_indice_embeddings, similares_embeddings
+        self.assertEqual(agregar_contenidos([self.contenidos[0].id]), 0)  # Sin índice no hace nada
+        construir_indice()
+        
+        nuevo = Contenido.objects.create(titulo='Robots del mar', tipo='serie',
+                                         descripcion='Pilotos de robots gigantes defienden el puerto')
+        ContenidoCategoria.objects.create(contenido=nuevo, categoria=Categoria.objects.get(nombre='Mechas'))
+        self.assertEqual(agregar_contenidos([nuevo.id, self.contenidos[0].id]), 1)
+        self.assertEqual(agregar_contenidos([nuevo.id]), 0)
+        
+        indice = obtener_indice_embeddings()
+        self.assertEqual((len(indice), indice.metadatos['agregados']), (6, 1))
+        cercanos = [contenido_id for contenido_id, _ in similares_embeddings(nuevo.id, limite=2)]
+        self.assertEqual(set(cercanos), {self.contenidos[0].id, self.contenidos[1].id})
+
+    def test_reconstruccion_pendiente_queda_para_el_comando(self):
+        """Pasado el umbral la importación solo marca el índice; el comando lo reconstruye"""
+        from unittest import mock
+        from django.core.management import call_command
+        from .embeddings import agregar_contenidos, construir_indice, necesita_reconstruccion, obtener_indice_embeddings
+        construir_indice()
+        nuevos = [Contenido.objects.create(titulo=f'Robots {i}', tipo='serie', descripcion='Pilotos de robots')
+                  for i in range(2)]
+        with mock.patch('myapp.embeddings.kmeans_esferico') as kmeans:
+            self.assertEqual(agregar_contenidos(contenido.id for contenido in nuevos), 2)
+        kmeans.assert_not_called()
+        indice = obtener_indice_embeddings()
+        self.assertEqual((len(indice), indice.metadatos['construidos']), (7, 5))
+        self.assertTrue(necesita_reconstruccion())
+
+        call_command('construir_embeddings', '--si-hace-falta', stdout=open('/dev/null', 'w'))
+        indice = obtener_indice_embeddings()
+        self.assertEqual((indice.metadatos['construidos'], indice.metadatos['agregados']), (7, 0))
+        self.assertFalse(necesita_reconstruccion())
+
+
+class BuscadorTestCase(TestCase):
+    """Pruebas para la búsqueda con el índice FTS5"""
+    
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nombre='Acción')
+        self.titulo = Contenido.objects.create(titulo='Dragones de fuego', tipo='serie', año=2001,
+                                               descripcion='Una aventura en las montañas')
+        self.descripcion = Contenido.objects.create(titulo='Viaje al sur', tipo='pelicula', año=2020,
+                                                    descripcion='Dos hermanos buscan dragones <b>legendarios</b>')
+        self.otro = Contenido.objects.create(titulo='Cocina familiar', tipo='serie', año=2010)
+        
+    def test_bm25_prefijos_y_fragmentos(self):
+        """El título pesa más que la descripción, los términos son prefijos y el fragmento se escapa"""
+        from .buscador import buscar
+        self.assertEqual([c.id for c in buscar('dragones')], [self.titulo.id, self.descripcion.id])
+        self.assertEqual([c.id for c in buscar('drag')], [self.titulo.id, self.descripcion.id])
+        self.assertEqual([c.id for c in buscar('hermanos drag')], [self.descripcion.id])
+        self.assertEqual(buscar('"OR ('), [])  # Los operadores del usuario no llegan a FTS5
+        
+        fragmento = buscar('hermanos')[0].fragmento
+        self.assertIn('<mark>hermanos</mark>', fragmento)
+        self.assertIn('&lt;b&gt;', fragmento)
+        
+    def test_senales_sincronizan_categorias_y_cambios(self):
+        """Altas, cambios de categoría, renombres y bajas se reflejan sin reconstruir"""
+        from .buscador import buscar
+        ContenidoCategoria.objects.create(contenido=self.otro, categoria=self.categoria)
+        self.assertEqual([c.id for c in buscar('accion')], [self.otro.id])
+        
+        self.categoria.nombre = 'Aventuras'
+        self.categoria.save()
+        self.assertEqual(buscar('accion'), [])
+        self.assertEqual([c.id for c in buscar('aventuras')], [self.otro.id])
+        
+        self.titulo.titulo = 'Dinastía helada'
+        self.titulo.save()
+        self.assertEqual([c.id for c in buscar('dragones')], [self.descripcion.id])
+        self.descripcion.delete()
+        self.assertEqual(buscar('dragones'), [])
+        
+    @override_settings(BUSQUEDA_BACKEND='basico')
+    def test_backend_basico(self):
+        """El backend básico mantiene el comportamiento de icontains y la búsqueda por tipo"""
+        from .buscador import buscar
+        self.assertEqual([c.id for c in buscar('ragon')], [self.descripcion.id, self.titulo.id])
+        self.assertEqual([c.id for c in buscar('películas')], [self.descripcion.id])
+
+
+@override_settings(TELEMETRIA_ASINCRONA=False)
+class TrigramasTestCase(TestCase):
+    """Pruebas para las columnas normalizadas y el índice de trigramas"""
+    
+    def setUp(self):
+        cache.clear()
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.titan = Contenido.objects.create(titulo='Attack on Titan', tipo='serie')
+        self.pelicula = Contenido.objects.create(titulo='La Película Definitiva', tipo='pelicula')
+        self.otro = Contenido.objects.create(titulo='Naruto', tipo='serie')
+        ContenidoCategoria.objects.create(contenido=self.otro, categoria=self.accion)
+        
+    def test_normalizacion_sin_acentos_ni_mayusculas(self):
+        """Las señales guardan el texto normalizado y los trigramas del título y los alias"""
+        from .models import AliasContenido, TrigramaContenido
+        from .trigramas import guardar_alias, normalizar
+        self.assertEqual(normalizar('  ¡Acción, Película!  '), 'accion pelicula')
+        self.pelicula.refresh_from_db()
+        self.accion.refresh_from_db()
+        self.assertEqual((self.pelicula.titulo_normalizado, self.accion.nombre_normalizado),
+                         ('la pelicula definitiva', 'accion'))
+        
+        guardar_alias(self.titan, [('romaji', 'Shingeki no Kyojin'), ('english', 'Attack on Titan'), ('native', '進撃の巨人')])
+        self.assertEqual(AliasContenido.objects.filter(contenido=self.titan).count(), 2)
+        trigramas = set(TrigramaContenido.objects.filter(contenido=self.titan).values_list('trigrama', flat=True))
+        self.assertTrue({'shi', 'tit', '進撃の'} <= trigramas)
+        
+    def test_subcadenas_aproximadas_y_categorias(self):
+        """'accion' encuentra 'Acción', 'pelicula' la subcadena y las erratas se toleran"""
+        from .trigramas import buscar, guardar_alias
+        guardar_alias(self.titan, [('romaji', 'Shingeki no Kyojin')])
+        ids = lambda consulta: [contenido_id for contenido_id, _ in buscar(consulta)]
+        self.assertEqual(ids('accion'), [self.otro.id])
+        self.assertEqual(ids('PELICULA'), [self.pelicula.id])
+        self.assertEqual(ids('kyojin'), [self.titan.id])
+        self.assertEqual(ids('narutto'), [self.otro.id])
+        self.assertEqual(ids('at'), [self.titan.id])
+        self.assertEqual(ids('xyz'), [])
+        
+        self.client.force_login(User.objects.create_user(username='testuser', password='testpass123'))
+        response = self.client.get(reverse('busqueda'), {'q': 'shingeki'})
+        self.assertContains(response, 'Attack on Titan')
+
+class AutocompletadoTestCase(TestCase):
+    """Pruebas para el índice de autocompletado en memoria"""
+    
+    def setUp(self):
+        cache.clear()
+        from . import autocompletado
+        autocompletado.invalidar()
+        self.accion = Categoria.objects.create(nombre='Acción')
+        self.titan = Contenido.objects.create(titulo='Attack on Titan', tipo='serie', anilist_popularity=900)
+        self.astro = Contenido.objects.create(titulo='Astro Boy', tipo='serie', anilist_popularity=10)
+        self.aventura = Contenido.objects.create(titulo='Aventura Acuática', tipo='pelicula')
+        ContenidoCategoria.objects.create(contenido=self.aventura, categoria=self.accion)
+        
+    def test_prefijos_alias_categorias_y_popularidad(self):
+        """Cada palabra es un prefijo, los alias llevan al contenido y manda la popularidad"""
+        from .autocompletado import sugerir
+        from .trigramas import guardar_alias
+        guardar_alias(self.titan, [('romaji', 'Shingeki no Kyojin'), ('english', 'Attack on Titan')])
+        textos = lambda consulta: [sugerencia['texto'] for sugerencia in sugerir(consulta)]
+        self.assertEqual(textos('a'), ['Attack on Titan', 'Astro Boy', 'Acción', 'Aventura Acuática'])
+        self.assertEqual(textos('ACU'), ['Aventura Acuática'])
+        self.assertEqual(textos('acc'), ['Acción'])
+        self.assertEqual(sugerir('kyo'), [{'texto': 'Shingeki no Kyojin', 'tipo': 'contenido',
+                                           'id': self.titan.id, 'titulo': 'Attack on Titan'}])
+        self.assertEqual(textos('zz'), [])
+        
+    def test_busquedas_recientes_recarga_y_api(self):
+        """Lo más buscado sube, un contenido nuevo aparece sin reiniciar y el endpoint responde JSON"""
+        from .autocompletado import IndiceAutocompletado, sugerir
+        from .models import HistorialBusqueda
+        self.assertEqual([s['texto'] for s in sugerir('ast')], ['Astro Boy'])
+        Contenido.objects.create(titulo='Astral Project', tipo='serie', anilist_popularity=50)
+        self.assertEqual([s['texto'] for s in sugerir('ast')], ['Astral Project', 'Astro Boy'])
+        for _ in range(20):
+            HistorialBusqueda.registrar_busqueda('Astro ')
+        with override_settings(AUTOCOMPLETADO_REFRESCO_SEGUNDOS=0, CATALOGO_VERIFICACION_SEGUNDOS=0):
+            self.assertEqual([s['texto'] for s in sugerir('ast')], ['Astro Boy', 'Astral Project'])
+        
+        response = self.client.get(reverse('api_autocompletar'), {'q': 'attack'})
+        self.assertEqual(response.json()['sugerencias'][0]['url'], reverse('anime_details', args=[self.titan.id]))
+        self.assertEqual(self.client.get(reverse('api_autocompletar'), {'q': 'a', 'limite': 'x'}).status_code, 400)
+        
+        # Prefijos con muchas claves: las sugerencias precalculadas coinciden con recorrer el rango
+        entradas = [(f'serie {i:03d}', f'Serie {i:03d}', 'contenido', i, f'Serie {i:03d}', i % 7) for i in range(600)]
+        indice = IndiceAutocompletado(0, entradas)
+        self.assertIn('se', indice.precalculadas)
+        self.assertEqual(indice.precalculadas['serie'], tuple(indice._mejores(0, len(indice.claves), 10)))
+        esperados = sorted(range(500, 600), key=lambda i: (-(i % 7), i))[:10]
+        self.assertEqual([s['id'] for s in indice.sugerir('serie 5')], esperados)
+
+@override_settings(TELEMETRIA_ASINCRONA=False)
+class CacheBusquedaTestCase(TestCase):
+    """Pruebas para la cache de resultados de búsqueda"""
+    
+    def setUp(self):
+        cache.clear()
+        from . import cache_busqueda
+        cache_busqueda.invalidar()
+        cache_busqueda.reiniciar_metricas()
+        self.dragones = Contenido.objects.create(titulo='Dragones de fuego', tipo='serie',
+                                                 descripcion='Una aventura en las montañas')
+        self.viaje = Contenido.objects.create(titulo='Viaje al sur', tipo='pelicula',
+                                              descripcion='Dos hermanos buscan dragones')
+        
+    def test_aciertos_por_termino_normalizado_y_version(self):
+        """Mayúsculas y espacios comparten entrada, un acierto no consulta la base y un alta la invalida"""
+        from .cache_busqueda import buscar, metricas
+        from .catalogo_compacto import Tarjeta, obtener_catalogo
+        primera = buscar('Dragones ')
+        self.assertEqual([c.id for c in primera], [self.dragones.id, self.viaje.id])
+        self.assertTrue(all(isinstance(c, Tarjeta) for c in primera))
+        obtener_catalogo()
+        with self.assertNumQueries(0):
+            segunda = buscar('  dragones')
+        self.assertEqual([c.id for c in segunda], [self.dragones.id, self.viaje.id])
+        self.assertTrue(all(isinstance(c, Tarjeta) for c in segunda))
+        self.assertEqual(str(segunda[1].fragmento), str(primera[1].fragmento))
+        self.assertEqual((metricas()['aciertos'], metricas()['fallos']), (1, 1))
+        
+        nuevo = Contenido.objects.create(titulo='Dragones del norte', tipo='serie')
+        self.assertIn(nuevo.id, [c.id for c in buscar('DRAGONES')])
+        self.assertEqual(metricas()['fallos'], 2)
+        
+        response = self.client.get(reverse('busqueda'), {'q': 'dragones'})
+        self.assertContains(response, 'Dragones del norte')
+        self.assertEqual(metricas()['aciertos'], 2)
+        
+    @override_settings(BUSQUEDA_CACHE_ENTRADAS=2)
+    def test_lru_y_single_flight(self):
+        """Se desaloja el término menos usado y las búsquedas simultáneas del mismo término se ejecutan una vez"""
+        from unittest import mock
+        from . import cache_busqueda
+        for termino in ('dragones', 'viaje', 'dragones', 'fuego'):
+            cache_busqueda.buscar(termino)
+        metricas = cache_busqueda.metricas()
+        self.assertEqual((metricas['aciertos'], metricas['desalojos'], metricas['entradas']), (1, 1, 2))
+        cache_busqueda.buscar('viaje')  # Desalojado: vuelve a fallar
+        self.assertEqual(cache_busqueda.metricas()['fallos'], 4)
+        
+        llamadas = []
+        
+        def lenta(termino, limite):
+            llamadas.append(termino)
+            time.sleep(0.2)
+            return []
+        
+        with mock.patch('myapp.buscador.buscar', side_effect=lenta):
+            hilos = [Thread(target=cache_busqueda.buscar, args=('montañas',)) for _ in range(5)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        self.assertEqual(llamadas, ['montañas'])
+        self.assertEqual(cache_busqueda.metricas()['esperas'], 4)
+
+@override_settings(TELEMETRIA_ASINCRONA=False)
+class TelemetriaTestCase(TestCase):
+    """Pruebas para la escritura en lote del historial y la auditoría de búsqueda"""
+    
+    def setUp(self):
+        cache.clear()
+        from . import telemetria
+        telemetria.reiniciar_metricas()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Contenido.objects.create(titulo='Dragones de fuego', tipo='serie')
+        
+    def test_vista_registra_historial_y_auditoria(self):
+        """En modo síncrono la búsqueda deja su historial y su auditoría al responder"""
+        from .models import AuditLog, HistorialBusqueda
+        from .telemetria import metricas
+        self.client.force_login(self.user)
+        self.client.get(reverse('busqueda'), {'q': '  Dragones '})
+        historial = HistorialBusqueda.objects.get()
+        self.assertEqual((historial.termino_busqueda, historial.termino_normalizado, historial.resultados_encontrados),
+                         ('Dragones', 'dragones', 1))
+        auditoria = AuditLog.objects.get(accion='SEARCH')
+        self.assertEqual(auditoria.datos_adicionales['results_count'], 1)
+        self.assertEqual((metricas()['escritos'], metricas()['lotes']), (2, 1))
+        
+    def test_buffer_acotado_lotes_y_errores(self):
+        """Lleno descarta eventos completos, vaciar escribe por lotes y un lote inválido se cuenta como error"""
+        from .models import HistorialBusqueda
+        from .telemetria import BufferEscrituras, metricas
+        buffer = BufferEscrituras(lote=2, max_pendientes=5, intervalo=60)
+        busqueda = lambda termino: HistorialBusqueda.nueva_busqueda(termino, usuario=self.user)
+        self.assertTrue(buffer.agregar([busqueda('a'), busqueda('b')]))
+        self.assertTrue(buffer.agregar([busqueda('c'), busqueda('d'), busqueda('e')]))
+        self.assertFalse(buffer.agregar([busqueda('f')]))
+        self.assertEqual(len(buffer), 5)
+        
+        with self.assertNumQueries(3 * 3):  # Por lote: savepoint, INSERT y liberación
+            self.assertEqual(buffer.vaciar(), 5)
+        self.assertEqual(HistorialBusqueda.objects.count(), 5)
+        
+        invalida = busqueda('g')
+        invalida.ip_address = None
+        buffer.agregar([invalida])
+        self.assertEqual(buffer.vaciar(), 0)
+        self.assertEqual({k: metricas()[k] for k in ('escritos', 'lotes', 'descartados', 'errores', 'pendientes')},
+                         {'escritos': 5, 'lotes': 3, 'descartados': 1, 'errores': 1, 'pendientes': 0})
+
+
+class TelemetriaHiloTestCase(TransactionTestCase):
+    """Pruebas para el hilo escritor de la telemetría"""
+    
+    def test_hilo_escribe_en_segundo_plano(self):
+        """Las búsquedas encoladas llegan a la base sin que la petición las escriba"""
+        from .models import HistorialBusqueda
+        from .telemetria import BufferEscrituras
+        buffer = BufferEscrituras(lote=100, max_pendientes=1000, intervalo=0.05)
+        with self.assertNumQueries(0):
+            buffer.agregar([HistorialBusqueda.nueva_busqueda('naruto')])
+            buffer.iniciar()
+        limite = time.monotonic() + 5
+        while not HistorialBusqueda.objects.exists() and time.monotonic() < limite:
+            time.sleep(0.05)
+        self.assertEqual(list(HistorialBusqueda.objects.values_list('termino_normalizado', flat=True)), ['naruto'])
+
 # Create your tests here.
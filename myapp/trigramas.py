@@ -0,0 +1,170 @@
+"""
+Columnas normalizadas e índice de trigramas para búsquedas por subcadena y aproximadas
+
+``normalizar`` quita acentos, pasa a minúsculas y deja solo letras y números
+separados por un espacio ("Acción!" -> "accion"). Las señales guardan el
+resultado en ``Contenido.titulo_normalizado``, ``AliasContenido.texto_normalizado``
+y ``Categoria.nombre_normalizado``, y ``TrigramaContenido`` guarda los
+trigramas (subcadenas de 3 caracteres) del título y los alias de cada
+contenido.
+
+``buscar`` toma los trigramas de la consulta y, con el índice
+(trigrama, contenido), cuenta cuántos comparte cada contenido. Solo los que
+comparten al menos ``UMBRAL_SIMILITUD`` de ellos se comparan en memoria:
+
+- la consulta es prefijo del título o de un alias: ``PUNTUACION_PREFIJO``
+- la consulta aparece dentro: ``PUNTUACION_SUBCADENA``
+- la consulta está en el nombre de una de sus categorías: ``PUNTUACION_CATEGORIA``
+- si no, coincidencia aproximada (errores de escritura): fracción de los
+  trigramas de la consulta presentes en el texto
+
+Las consultas de menos de 3 caracteres usan un rango sobre
+``titulo_normalizado`` (prefijo, también por índice).
+``bulk_create`` no emite señales: ``manage.py reconstruir_busqueda`` lo
+recalcula todo.
+"""
+import logging
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import AliasContenido, Categoria, Contenido, ContenidoCategoria, TrigramaContenido
+
+logger = logging.getLogger(__name__)
+
+UMBRAL_SIMILITUD = 0.5  # Fracción mínima de trigramas de la consulta que comparte un candidato
+CANDIDATOS = 500  # Contenidos con más trigramas compartidos que se comparan en memoria
+PUNTUACION_PREFIJO = 3.0
+PUNTUACION_SUBCADENA = 2.0
+PUNTUACION_CATEGORIA = 1.0
+TAMAÑO_LOTE = 1000
+
+_SEPARADORES = re.compile(r'[\W_]+')
+
+
+def normalizar(texto: str) -> str:
+    """Sin acentos, en minúsculas y con las palabras separadas por un espacio"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_acentos = ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+    return _SEPARADORES.sub(' ', sin_acentos.casefold()).strip()
+
+
+def trigramas(normalizado: str) -> Set[str]:
+    """Subcadenas de 3 caracteres de un texto ya normalizado (vacío si es más corto)"""
+    return {normalizado[i:i + 3] for i in range(len(normalizado) - 2)}
+
+
+def indexar_contenidos(contenido_ids: Iterable[int]) -> int:
+    """Volver a calcular los trigramas de título y alias de los contenidos. Devuelve las filas creadas"""
+    contenido_ids = list(contenido_ids)
+    textos = defaultdict(list)
+    for contenido_id, titulo in Contenido.objects.filter(id__in=contenido_ids).values_list('id', 'titulo_normalizado'):
+        textos[contenido_id].append(titulo)
+    for contenido_id, texto in AliasContenido.objects.filter(contenido_id__in=contenido_ids).values_list(
+            'contenido_id', 'texto_normalizado'):
+        textos[contenido_id].append(texto)
+
+    filas = [
+        TrigramaContenido(trigrama=trigrama, contenido_id=contenido_id)
+        for contenido_id, lista in textos.items()
+        for trigrama in set().union(*map(trigramas, lista))
+    ]
+    with transaction.atomic():
+        TrigramaContenido.objects.filter(contenido_id__in=contenido_ids).delete()
+        TrigramaContenido.objects.bulk_create(filas, batch_size=TAMAÑO_LOTE)
+    return len(filas)
+
+
+def guardar_alias(contenido: Contenido, alias: Iterable[Tuple[str, str]]) -> int:
+    """Guardar los títulos alternativos ``(tipo, texto)`` del contenido y reindexar sus trigramas"""
+    vistos = {contenido.titulo}
+    nuevos = []
+    for tipo, texto in alias:
+        texto = (texto or '').strip()[:255]
+        if texto and texto not in vistos:
+            vistos.add(texto)
+            nuevos.append(AliasContenido(contenido=contenido, tipo=tipo, texto=texto, texto_normalizado=normalizar(texto)))
+    AliasContenido.objects.bulk_create(nuevos, ignore_conflicts=True)
+    indexar_contenidos([contenido.id])
+    return len(nuevos)
+
+
+def reconstruir() -> Dict[str, int]:
+    """Recalcular las columnas normalizadas y todos los trigramas (tras cargas con ``bulk_create``)"""
+    resumen = {}
+    for modelo, campo, destino in ((Contenido, 'titulo', 'titulo_normalizado'),
+                                   (AliasContenido, 'texto', 'texto_normalizado'),
+                                   (Categoria, 'nombre', 'nombre_normalizado')):
+        cambios = [modelo(id=pk, **{destino: normalizar(valor)})
+                   for pk, valor, actual in modelo.objects.values_list('id', campo, destino).iterator(chunk_size=TAMAÑO_LOTE)
+                   if normalizar(valor) != actual]
+        modelo.objects.bulk_update(cambios, [destino], batch_size=TAMAÑO_LOTE)
+        resumen[destino] = len(cambios)
+
+    TrigramaContenido.objects.all().delete()
+    ids = list(Contenido.objects.order_by('id').values_list('id', flat=True))
+    resumen['trigramas'] = sum(indexar_contenidos(ids[i:i + TAMAÑO_LOTE]) for i in range(0, len(ids), TAMAÑO_LOTE))
+    logger.info(f"Columnas normalizadas y trigramas reconstruidos: {resumen}")
+    return resumen
+
+
+def _puntuar(consulta: str, de_consulta: Set[str], textos: List[str]) -> float:
+    mejor = 0.0
+    for texto in textos:
+        if texto.startswith(consulta):
+            return PUNTUACION_PREFIJO
+        if consulta in texto:
+            mejor = max(mejor, PUNTUACION_SUBCADENA)
+        elif de_consulta:
+            mejor = max(mejor, len(de_consulta & trigramas(texto)) / len(de_consulta))
+    return mejor
+
+
+def buscar(consulta: str, limite: int = 50, excluir: Iterable[int] = ()) -> List[Tuple[int, float]]:
+    """[(id, puntuación)] de los contenidos que coinciden con la consulta, de mayor a menor puntuación"""
+    normalizada = normalizar(consulta)
+    if not normalizada:
+        return []
+    excluidos = set(excluir)
+    de_consulta = trigramas(normalizada)
+
+    if de_consulta:
+        minimo = max(1, math.ceil(len(de_consulta) * UMBRAL_SIMILITUD))
+        candidatos = list(TrigramaContenido.objects.filter(trigrama__in=de_consulta).values('contenido_id').annotate(
+            compartidos=Count('id')
+        ).filter(compartidos__gte=minimo).order_by('-compartidos').values_list('contenido_id', flat=True)[:CANDIDATOS])
+    else:
+        # Menos de 3 caracteres: prefijo del título con un rango sobre el índice
+        candidatos = list(Contenido.objects.filter(
+            titulo_normalizado__gte=normalizada, titulo_normalizado__lt=normalizada + '\uffff'
+        ).values_list('id', flat=True)[:CANDIDATOS])
+
+    textos = defaultdict(list)
+    for contenido_id, titulo in Contenido.objects.filter(id__in=candidatos).values_list('id', 'titulo_normalizado'):
+        textos[contenido_id].append(titulo)
+    for contenido_id, texto in AliasContenido.objects.filter(contenido_id__in=candidatos).values_list(
+            'contenido_id', 'texto_normalizado'):
+        textos[contenido_id].append(texto)
+
+    puntuaciones = {}
+    for contenido_id, lista in textos.items():
+        puntuacion = _puntuar(normalizada, de_consulta, lista)
+        if contenido_id not in excluidos and puntuacion >= UMBRAL_SIMILITUD:
+            puntuaciones[contenido_id] = (puntuacion, -min(map(len, lista)))
+
+    # Categorías: tabla pequeña, basta con su columna normalizada
+    categoria_ids = list(Categoria.objects.filter(nombre_normalizado__contains=normalizada).values_list('id', flat=True))
+    if categoria_ids:
+        for contenido_id in ContenidoCategoria.objects.filter(categoria_id__in=categoria_ids).values_list(
+                'contenido_id', flat=True)[:CANDIDATOS]:
+            if contenido_id not in excluidos and contenido_id not in puntuaciones:
+                puntuaciones[contenido_id] = (PUNTUACION_CATEGORIA, 0)
+
+    # A igual puntuación, el texto más corto (más cercano a la consulta) y luego lo más reciente
+    ordenados = sorted(puntuaciones.items(), key=lambda par: (-par[1][0], -par[1][1], -par[0]))
+    return [(contenido_id, puntuacion) for contenido_id, (puntuacion, _) in ordenados[:limite]]
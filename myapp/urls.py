@@ -6,6 +6,7 @@ urlpatterns = [
     # Rutas de la aplicación
     path('', views.index, name='home'),
     path('index/', views.index, name='index'),
+    path('index-async/', views.index_async, name='index_async'),
     path('anime-details/', views.render_anime_details, name='anime_details'),
     path('anime-details/<int:contenido_id>/', views.anime_details, name='anime_details'),
     path('anime-watching/<int:episodio_id>/', views.anime_watching, name='anime_watching'),
@@ -16,6 +17,7 @@ urlpatterns = [
     path('signup/', views.signup_view, name='signup'),
     path('logout/', views.logout_view, name='logout'),
     path('categories/', views.render_categories, name='categories'),
+    path('api/catalogo/', views.api_catalogo, name='api_catalogo'),
     # CRUD Contenido - Gestionado desde /perfil/?seccion=gestion
     path('contenido/crear/', views.contenido_create, name='contenido_create'),
     path('contenido/<int:pk>/editar/', views.contenido_update, name='contenido_update'),
@@ -40,11 +42,13 @@ urlpatterns = [
     path('get-user-rating/<int:contenido_id>/', views.get_user_rating, name='get_user_rating'),
     path('get-content-ratings/<int:contenido_id>/', views.get_content_ratings, name='get_content_ratings'), 
     path('busqueda/', views.busqueda, name='busqueda'),
+    path('api/autocompletar/', views.api_autocompletar, name='api_autocompletar'),
     # Sistema de Recomendaciones
     path('recomendaciones/', views.recomendaciones_personalizadas, name='recomendaciones_personalizadas'),
     path('recomendaciones/categoria/<int:categoria_id>/', views.recomendaciones_categoria, name='recomendaciones_categoria'),
     path('contenido/<int:contenido_id>/similar/', views.contenido_similar, name='contenido_similar'),
     path('api/recomendaciones/', views.api_recomendaciones, name='api_recomendaciones'),
+    path('api/similar/<int:contenido_id>/', views.api_similar, name='api_similar'),
     path('admin/estadisticas-recomendaciones/', views.estadisticas_recomendaciones, name='estadisticas_recomendaciones'),
     # Sistema de Auditoría y Logs
     path('admin/audit-dashboard/', audit_views.audit_dashboard, name='audit_dashboard'),
@@ -0,0 +1,118 @@
+"""
+Versiones de datos para peticiones condicionales
+
+Un contador global ``catalogo`` se incrementa con cada escritura en
+Contenido, Episodio, Categoria o ContenidoCategoria, y un contador
+``perfil:<id>`` con cada interacción del perfil. ``recomendadores`` sube
+cada vez que los procesos por lotes publican vecinos, embeddings o un modelo
+ALS nuevos (cambian los similares y las recomendaciones sin tocar el
+catálogo). Las vistas del catálogo
+derivan de ellos un ETag fuerte y un Last-Modified, de modo que una
+petición condicional sin cambios responde 304 sin ejecutar la vista.
+"""
+import hashlib
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import VersionDatos
+
+CATALOGO = 'catalogo'
+RECOMENDADORES = 'recomendadores'
+
+
+def clave_perfil(perfil_id: int) -> str:
+    return f'perfil:{perfil_id}'
+
+
+def incrementar_version(clave: str) -> int:
+    """Incrementar atómicamente una versión (creándola si no existe). Devuelve el nuevo valor"""
+    ahora = timezone.now()
+    actualizados = VersionDatos.objects.filter(clave=clave).update(valor=F('valor') + 1, actualizado=ahora)
+    if not actualizados:
+        version, creada = VersionDatos.objects.get_or_create(clave=clave, defaults={'valor': 1, 'actualizado': ahora})
+        if creada:
+            return version.valor
+    return VersionDatos.objects.filter(clave=clave).values_list('valor', flat=True).first()
+
+
+def eliminar_version(clave: str):
+    VersionDatos.objects.filter(clave=clave).delete()
+
+
+def obtener_versiones(claves: Iterable[str]) -> Dict[str, Tuple[int, datetime]]:
+    """Leer varias versiones con una sola consulta"""
+    return {
+        clave: (valor, actualizado)
+        for clave, valor, actualizado in VersionDatos.objects.filter(
+            clave__in=list(claves)
+        ).values_list('clave', 'valor', 'actualizado')
+    }
+
+
+def _huella(valor: Optional[str]) -> str:
+    return hashlib.sha256((valor or '').encode()).hexdigest()[:16]
+
+
+def _calcular_estado(request, por_perfil: bool, extra: Optional[Callable], dependencias: Iterable[str] = ()):
+    """Calcular (etag, last_modified) de una petición, o (None, None) si no se puede cachear"""
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        # Los mensajes pendientes se consumen al renderizar: siempre ejecutar la vista
+        return None, None
+
+    # La página incluye datos del usuario y el token CSRF de su sesión
+    partes = [
+        str(request.user.pk or 0),
+        _huella(getattr(request.session, 'session_key', None)),  # Sin SessionStore (p. ej. RequestFactory)
+        _huella(request.COOKIES.get(settings.CSRF_COOKIE_NAME)),
+    ]
+    marcas = []
+
+    claves = [CATALOGO, *dependencias]
+    if por_perfil and request.user.is_authenticated:
+        perfil_id = request.user.perfiles.values_list('id', flat=True).first()
+        if perfil_id:
+            claves.append(clave_perfil(perfil_id))
+
+    if extra:
+        resultado = extra(request)
+        if resultado is None:
+            return None, None
+        token, marca = resultado
+        partes.append(token)
+        marcas.append(marca)
+
+    versiones = obtener_versiones(claves)
+    for clave in claves:
+        valor, actualizado = versiones.get(clave, (0, None))
+        partes.append(f'{clave}={valor}')
+        if actualizado:
+            marcas.append(actualizado)
+
+    etag = hashlib.sha256('|'.join(partes).encode()).hexdigest()[:32]
+    return etag, max(marcas) if marcas else None
+
+
+def condicion_catalogo(por_perfil: bool = False, extra: Optional[Callable] = None, dependencias: Iterable[str] = ()):
+    """
+    Decorador que añade ETag/Last-Modified a una vista del catálogo y
+    responde 304 a las peticiones condicionales sin cambios.
+
+    ``extra(request)`` puede aportar un (token, fecha) adicional o None para
+    desactivar la respuesta condicional en esa petición. ``dependencias``
+    son otras versiones que forman parte del ETag (p. ej. ``RECOMENDADORES``).
+    """
+    def estado(request, *args, **kwargs):
+        if not hasattr(request, '_estado_condicional'):
+            request._estado_condicional = _calcular_estado(request, por_perfil, extra, dependencias)
+        return request._estado_condicional
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: estado(request)[0],
+        last_modified_func=lambda request, *args, **kwargs: estado(request)[1],
+    )
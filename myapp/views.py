@@ -9,9 +9,17 @@ from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from .forms import ContenidoForm, UserUpdateForm, PerfilUpdateForm, EpisodioForm
 from .models import (Contenido, Categoria, Episodio, ContenidoCategoria, Perfil, 
-                     HistorialReproduccion, Favorito, Calificacion, AuditLog)
-from .recommendations import obtener_recomendaciones_para_perfil, obtener_recomendaciones_por_categoria, obtener_contenido_similar
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+                     HistorialReproduccion, Favorito, Calificacion, AuditLog, EstadisticasContenido)
+from .recommendations import obtener_recomendaciones_para_perfil, obtener_recomendaciones_por_categoria, obtener_contenido_similar, similares_por_categorias
+from .estantes import obtener_estantes, leer_cache_estantes, construir_estante_seguro, hidratar_estantes, firma_estantes
+from .versiones import RECOMENDADORES, condicion_catalogo
+from .paginacion import paginar_keyset, CursorInvalido
+from . import autocompletado, cache_busqueda, facetas, gustos, telemetria
+from .catalogo_compacto import obtener_catalogo
+from .similitud import similares_ids
+from .embeddings import similares_embeddings
+from .concurrencia import ejecutar_en_paralelo
+from django.utils.http import urlencode, urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.template.loader import render_to_string
 from django.contrib.sites.shortcuts import get_current_site
@@ -25,8 +33,10 @@ from django.forms import modelformset_factory
 import re
 from django.contrib import messages
 from django.views.decorators.http import require_POST
-from django.db.models import Q, Count
+from django.db.models import Q, Count, F, Sum
 import logging
+from functools import partial
+from asgiref.sync import sync_to_async
 
 # Logger para vistas
 logger = logging.getLogger('myapp.views')
@@ -43,9 +53,8 @@ def get_client_ip(request):
 
 # Vista principal
 @login_required
-def index(request):    # Contenido reciente
-    contenidos_recientes = Contenido.objects.all().order_by('-id')[:8]
-    
+@condicion_catalogo(por_perfil=True, extra=firma_estantes, dependencias=[RECOMENDADORES])
+def index(request):
     # Recomendaciones personalizadas si el usuario tiene perfil
     recomendaciones_personalizadas = []
     perfil = request.user.perfiles.first() if request.user.is_authenticated else None
@@ -53,155 +62,38 @@ def index(request):    # Contenido reciente
     if perfil:
         recomendaciones_personalizadas = obtener_recomendaciones_para_perfil(perfil, limite=8)
     
-    # Contenido popular (más reproducido)
-    contenido_popular = Contenido.objects.annotate(
-        total_reproducciones=Count('historialreproduccion')
-    ).filter(
-        total_reproducciones__gt=0
-    ).order_by('-total_reproducciones')[:6]
-    
-    # Categorías más populares
-    categorias_populares = Categoria.objects.annotate(
-        total_contenido=Count('contenidos')
-    ).filter(
-        total_contenido__gt=0
-    ).order_by('-total_contenido')[:6]
-    
-    # Términos más buscados (basado en historial de búsqueda)
-    from .models import HistorialBusqueda
-    terminos_mas_buscados = HistorialBusqueda.obtener_mas_buscados(limite=8, dias=30)
-      # Contenido más buscado basado en los términos populares
-    contenido_mas_buscado = []
-    if terminos_mas_buscados:
-        # Obtener contenido que coincida con los términos más buscados
-        for termino_data in terminos_mas_buscados[:6]:
-            termino = termino_data['termino_normalizado']
-            contenidos_relacionados = Contenido.objects.filter(
-                Q(titulo__icontains=termino) | 
-                Q(descripcion__icontains=termino) | 
-                Q(categorias__nombre__icontains=termino)
-            ).distinct()[:3]
-            for contenido in contenidos_relacionados:
-                if contenido not in contenido_mas_buscado:
-                    contenido_mas_buscado.append(contenido)
-                if len(contenido_mas_buscado) >= 8:
-                    break
-            if len(contenido_mas_buscado) >= 8:
-                break
-    
-    # Contenido más visto (con rating promedio y cantidad de reproducciones)
-    from django.db.models import Avg
-    contenido_mas_visto = Contenido.objects.annotate(
-        total_reproducciones=Count('historialreproduccion'),
-        rating_promedio=Avg('calificacion__calificacion'),
-        total_calificaciones=Count('calificacion')
-    ).filter(
-        total_reproducciones__gt=0
-    ).order_by('-total_reproducciones')[:8]
-      # Contenido con más me gusta (calificaciones 5)
-    contenido_mas_gustado = Contenido.objects.annotate(
-        total_likes=Count('calificacion', filter=Q(calificacion__calificacion=5)),
-        total_dislikes=Count('calificacion', filter=Q(calificacion__calificacion=1)),
-        rating_promedio=Avg('calificacion__calificacion'),
-        total_calificaciones=Count('calificacion')
-    ).filter(
-        total_likes__gt=0
-    ).order_by('-total_likes', '-rating_promedio')[:8]      # Contenido mejor valorado (por rating promedio)
-    contenido_mejor_valorado = Contenido.objects.annotate(
-        rating_promedio=Avg('calificacion__calificacion'),
-        total_calificaciones=Count('calificacion'),
-        total_likes=Count('calificacion', filter=Q(calificacion__calificacion=5))
-    ).filter(
-        total_calificaciones__gte=3  # Al menos 3 calificaciones para ser considerado
-    ).order_by('-rating_promedio', '-total_calificaciones')[:8]
-    
-    # Contenido destacado para hero slider (mejor valorado + popular)
-    contenido_destacado = Contenido.objects.annotate(
-        rating_promedio=Avg('calificacion__calificacion'),
-        total_calificaciones=Count('calificacion'),
-        total_reproducciones=Count('historialreproduccion'),
-        score_combinado=(
-            Avg('calificacion__calificacion') * 0.6 + 
-            Count('historialreproduccion') * 0.0001 +  # Factor pequeño para popularidad
-            Count('calificacion') * 0.01  # Factor pequeño para cantidad de reviews
-        )
-    ).filter(
-        rating_promedio__gte=4.0,  # Solo contenido bien valorado
-        total_calificaciones__gte=1,
-        imagen_portada__isnull=False  # Solo contenido con imagen
-    ).order_by('-score_combinado', '-rating_promedio')[:4]
-    
-    # Si no hay suficiente contenido bien valorado, rellenar con popular
-    if len(contenido_destacado) < 4:
-        contenido_adicional = Contenido.objects.annotate(
-            total_reproducciones=Count('historialreproduccion')
-        ).filter(
-            imagen_portada__isnull=False
-        ).exclude(
-            id__in=[c.id for c in contenido_destacado]
-        ).order_by('-total_reproducciones')[:4-len(contenido_destacado)]
-        
-        contenido_destacado = list(contenido_destacado) + list(contenido_adicional)
-    
-    # Contenido agregado recientemente (últimos añadidos por fecha de creación)
-    contenido_agregado_recientemente = Contenido.objects.filter(
-        imagen_portada__isnull=False
-    ).order_by('-id')[:6]
-    
-    # Contenido de Live Action (películas principalmente)
-    contenido_live_action = Contenido.objects.filter(
-        tipo='pelicula',
-        imagen_portada__isnull=False
-    ).annotate(
-        total_reproducciones=Count('historialreproduccion')
-    ).order_by('-total_reproducciones', '-id')[:6]
-    
-    # Si no hay suficientes películas, agregar series
-    if len(contenido_live_action) < 6:
-        contenido_adicional_live = Contenido.objects.filter(
-            imagen_portada__isnull=False
-        ).exclude(
-            id__in=[c.id for c in contenido_live_action]
-        ).order_by('-id')[:6-len(contenido_live_action)]
-        contenido_live_action = list(contenido_live_action) + list(contenido_adicional_live)
-    
-    # Contenido más visto (sidebar)
-    contenido_sidebar_mas_visto = Contenido.objects.annotate(
-        total_reproducciones=Count('historialreproduccion')
-    ).filter(
-        total_reproducciones__gt=0,
-        imagen_portada__isnull=False
-    ).order_by('-total_reproducciones')[:4]
-    
-    # Nuevo contenido (sidebar) - similar a recientes pero limitado
-    nuevo_contenido_sidebar = Contenido.objects.filter(
-        imagen_portada__isnull=False
-    ).order_by('-id')[:4]
-    
-    context = {
-        'contenidos_recientes': contenidos_recientes,
+    # Estantes no personalizados (recientes, populares, más vistos, mejor valorados,
+    # destacados, live action, sidebars...) precalculados en una sola lectura
+    context = obtener_estantes()
+    context.update({
         'recomendaciones_personalizadas': recomendaciones_personalizadas,
-        'contenido_popular': contenido_popular,
-        'categorias_populares': categorias_populares,
-        'contenido_mas_buscado': contenido_mas_buscado,
-        'contenido_mas_visto': contenido_mas_visto,
-        'contenido_mas_gustado': contenido_mas_gustado,
-        'contenido_mejor_valorado': contenido_mejor_valorado,
-        'contenido_destacado': contenido_destacado,
-        'contenido_agregado_recientemente': contenido_agregado_recientemente,
-        'contenido_live_action': contenido_live_action,
-        'contenido_sidebar_mas_visto': contenido_sidebar_mas_visto,
-        'nuevo_contenido_sidebar': nuevo_contenido_sidebar,
-        'terminos_mas_buscados': terminos_mas_buscados,
         'tiene_perfil': bool(perfil),
-        'contenido_agregado_recientemente': contenido_agregado_recientemente,
-        'contenido_live_action': contenido_live_action,
-        'contenido_sidebar_mas_visto': contenido_sidebar_mas_visto,
-        'nuevo_contenido_sidebar': nuevo_contenido_sidebar
-    }
+    })
     
     return render(request, 'myapp/index.html', context)
 
+# Versión asíncrona de la página principal (ASGI): los estantes vencidos y las
+# recomendaciones se calculan de forma concurrente antes de renderizar
+@login_required  # Admite vistas asíncronas: comprueba el usuario con request.auser()
+async def index_async(request):
+    usuario = await request.auser()
+    perfil = await usuario.perfiles.afirst()
+    
+    snapshot, vencidos = await sync_to_async(leer_cache_estantes)()
+    tareas = [partial(construir_estante_seguro, nombre, snapshot[nombre]) for nombre in vencidos]
+    if perfil:
+        tareas.append(partial(obtener_recomendaciones_para_perfil, perfil, limite=8))
+    resultados = await ejecutar_en_paralelo(tareas)
+    
+    snapshot.update(zip(vencidos, resultados))
+    context = await sync_to_async(hidratar_estantes)(snapshot)
+    context.update({
+        'recomendaciones_personalizadas': resultados[len(vencidos)] if perfil else [],
+        'tiene_perfil': bool(perfil),
+    })
+    
+    return await sync_to_async(render)(request, 'myapp/index.html', context)
+
 # Vista detalle de contenido
 @login_required
 def render_anime_details(request):
@@ -231,23 +123,33 @@ def render_signup(request):
 
 # vistas renderizadas con conexión a la base de datos
 
-# Vista para renderizar categorías con filtrado y ordenamiento
-@login_required
-def render_categories(request):
-    cat_id = request.GET.get('cat')
-    tipo = request.GET.get('tipo')
-    
+CATALOGO_POR_PAGINA = 24
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+def _decada(valor):
+    """Inicio de la década (2013 -> 2010) como las claves de las facetas. ``ValueError`` si no es un número"""
+    if not valor:
+        return None
+    año = int(valor)
+    return año - año % 10
+
+def _filtros_catalogo(request):
+    """
+    Filtros (categoria_id, tipo, decada) del catálogo según los parámetros GET.
+    Lanza ``ValueError`` si la década no es un número.
+    """
+    return _entero(request.GET.get('cat')), request.GET.get('tipo') or None, _decada(request.GET.get('decada'))
+
+def _orden_catalogo(request):
+    """Orden (con desempate por id) del catálogo según los parámetros GET"""
     # Parámetros de ordenamiento separados
     orden_titulo = request.GET.get('orden_titulo') 
     orden_año = request.GET.get('orden_año')
-    
-    qs = Contenido.objects.all()
-    
-    # Filtros
-    if cat_id:
-        qs = qs.filter(categorias__id=cat_id)
-    if tipo:
-        qs = qs.filter(tipo=tipo)
 
     # Orden dinámico
     order_fields = []
@@ -264,18 +166,70 @@ def render_categories(request):
     elif orden_año == 'desc':
         order_fields.append('-año')
     
-    # Aplicar ordenamiento
+    # Desempate por id en la misma dirección que el último campo (usa los índices compuestos)
     if order_fields:
-        qs = qs.order_by(*order_fields)
+        order_fields.append('-id' if order_fields[-1].startswith('-') else 'id')
     else:
-        qs = qs.order_by('-id')  # lo más reciente por defecto
+        order_fields = ['-id']  # lo más reciente por defecto
+
+    return order_fields
+
+# Vista para renderizar categorías con filtrado, ordenamiento y paginación por cursor
+@login_required
+@condicion_catalogo()
+def render_categories(request):
+    try:
+        cat_id, tipo, decada = _filtros_catalogo(request)
+    except ValueError:
+        return redirect(reverse('categories'))
+    # Resultados y conteos de cada faceta para los mismos filtros
+    qs, conteos = facetas.navegar(cat_id, tipo, decada)
+    order_fields = _orden_catalogo(request)
+    try:
+        contenidos, siguiente = paginar_keyset(qs, order_fields, request.GET.get('cursor'), CATALOGO_POR_PAGINA)
+    except CursorInvalido:
+        return redirect(reverse('categories'))
+
+    # Parámetros actuales sin el cursor para construir los enlaces de la página siguiente
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
 
     categorias = Categoria.objects.all()
     return render(request, 'myapp/categories.html', {
-        'contenidos': qs, 
+        'contenidos': contenidos, 
         'categorias': categorias,
-        'orden_titulo': orden_titulo,  
-        'orden_año': orden_año
+        'orden_titulo': request.GET.get('orden_titulo'),  
+        'orden_año': request.GET.get('orden_año'),
+        'siguiente_cursor': siguiente,
+        'parametros': parametros.urlencode(),
+        'facetas': conteos,
+        'cat_actual': cat_id,
+        'tipo_actual': tipo,
+        'decada_actual': decada,
+    })
+
+# Página siguiente del catálogo en JSON para el scroll infinito
+@login_required
+@condicion_catalogo()
+def api_catalogo(request):
+    try:
+        qs = facetas.filtrar_catalogo(*_filtros_catalogo(request))
+    except ValueError:
+        return JsonResponse({'error': 'Década inválida'}, status=400)
+    order_fields = _orden_catalogo(request)
+    try:
+        contenidos, siguiente = paginar_keyset(qs, order_fields, request.GET.get('cursor'), CATALOGO_POR_PAGINA)
+    except CursorInvalido:
+        return JsonResponse({'error': 'Cursor inválido'}, status=400)
+
+    return JsonResponse({
+        'contenidos': [{
+            'id': contenido.id,
+            'titulo': contenido.titulo,
+            'imagen_portada': contenido.imagen_portada.url if contenido.imagen_portada else None,
+            'url': reverse('anime_details', args=[contenido.id]),
+        } for contenido in contenidos],
+        'siguiente': siguiente,
     })
 
 # Vista del catálogo
@@ -306,11 +260,11 @@ def perfil_view(request):
     total_logs = None
     
     if seccion == 'gestion' and user.is_staff: # solo admin.
-        from django.db.models import Avg
+        # Contadores desnormalizados de EstadisticasContenido, sin agregar Calificacion
         contenidos = Contenido.objects.annotate(
-            total_likes=Count('calificacion', filter=Q(calificacion__calificacion=5)),
-            total_dislikes=Count('calificacion', filter=Q(calificacion__calificacion=1)),
-            rating_promedio=Avg('calificacion__calificacion')
+            total_likes=F('estadisticas__total_likes'),
+            total_dislikes=F('estadisticas__total_dislikes'),
+            rating_promedio=F('estadisticas__rating_promedio')
         )
         
         # Funcionalidad de búsqueda simple
@@ -570,6 +524,7 @@ def password_reset_confirm(request, uidb64, token):
     else:
         return render(request, 'myapp/password_reset_confirm.html', {'validlink': False})
 
+@condicion_catalogo(por_perfil=True, dependencias=[RECOMENDADORES])
 def anime_details(request, contenido_id):
     contenido = Contenido.objects.get(pk=contenido_id)
     es_favorito = False
@@ -583,17 +538,13 @@ def anime_details(request, contenido_id):
             contenido_similar = obtener_contenido_similar(perfil, contenido, limite=6)
     
     # Si no hay usuario autenticado o no tiene recomendaciones personalizadas,
-    # mostrar contenido similar basado solo en categorías
+    # mostrar los vecinos precalculados sin filtrar por lo ya visto
+    if not contenido_similar:
+        contenido_similar = obtener_catalogo().tarjetas(similares_ids(contenido.id, limite=6))
+    
+    # Contenido nuevo aún sin vecinos calculados: similar basado solo en categorías
     if not contenido_similar:
-        categorias_contenido = contenido.categorias.all()
-        contenido_similar = Contenido.objects.filter(
-            categorias__in=categorias_contenido
-        ).exclude(
-            id=contenido.id
-        ).annotate(
-            categorias_compartidas=Count('categorias', filter=Q(categorias__in=categorias_contenido))
-        ).order_by('-categorias_compartidas', '?')[:6]
-        contenido_similar = list(contenido_similar)
+        contenido_similar = similares_por_categorias(contenido.id, limite=6)
     
     context = {
         'contenido': contenido, 
@@ -801,62 +752,46 @@ def toggle_favorito(request):
     
     return JsonResponse({'success': True, 'favorito': is_favorito})
 
+# Sin ETag: cada búsqueda repetida debe llegar a la vista para registrar el historial y la auditoría
 def busqueda(request):
     query = request.GET.get('q', '').strip()
     resultados = []
     
     if query:
-        # Búsqueda optimizada con índices
-        tipo = None
-        if query.lower() in ['serie', 'series']:
-            tipo = 'serie'
-        elif query.lower() in ['pelicula', 'películas', 'peliculas', 'movie', 'movies']:
-            tipo = 'pelicula'
-        
-        # Construir filtros de búsqueda optimizados
-        filtros = Q(titulo__icontains=query) | Q(descripcion__icontains=query) | Q(categorias__nombre__icontains=query)
-        if tipo:
-            filtros = filtros | Q(tipo=tipo)
-        
-        # Optimizar consulta con prefetch_related y select_related
-        resultados = Contenido.objects.filter(filtros).prefetch_related('categorias').distinct().order_by('-año', '-id')
+        # Relevancia BM25 con el índice FTS5 (ver buscador.py), cacheada por término normalizado
+        resultados = cache_busqueda.buscar(query)
         
-        # Limitar resultados para mejor rendimiento
-        resultados = resultados[:50]  # Máximo 50 resultados
-        
-        # Registrar búsqueda en historial y logs de auditoría
+        # Historial y auditoría se escriben en lote fuera de la petición (ver telemetria.py)
         if request.user.is_authenticated:
-            perfil = request.user.perfiles.first()
-            
-            # Registrar en historial de búsqueda
-            from .models import HistorialBusqueda
-            HistorialBusqueda.registrar_busqueda(
-                termino=query,
+            telemetria.registrar_busqueda(
+                query,
+                len(resultados),  # Lista ya materializada por el buscador
                 usuario=request.user,
-                perfil=perfil,
-                resultados_count=len(resultados),
+                perfil=request.user.perfiles.first(),
                 ip_address=get_client_ip(request),
                 user_agent=request.META.get('HTTP_USER_AGENT', '')
             )
-            
-            # Registrar en logs de auditoría
-            AuditLog.log_action(
-                accion='SEARCH',
-                descripcion=f"Búsqueda realizada: '{query}' - {len(resultados)} resultados",
-                usuario=request.user,
-                perfil=perfil,
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                datos_adicionales={
-                    'query': query,
-                    'query_length': len(query),
-                    'results_count': len(resultados),
-                    'has_results': len(resultados) > 0
-                }
-            )
     
     return render(request, 'myapp/busqueda.html', {'query': query, 'resultados': resultados})
 
+# Sugerencias mientras se escribe en el buscador (índice en memoria, sin consultas por tecla)
+def api_autocompletar(request):
+    try:
+        limite = min(max(int(request.GET.get('limite', autocompletado.MAX_SUGERENCIAS)), 1), 20)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Límite inválido'}, status=400)
+    consulta = request.GET.get('q', '')[:100]
+
+    sugerencias = autocompletado.sugerir(consulta, limite) if consulta.strip() else []
+    for sugerencia in sugerencias:
+        if sugerencia['tipo'] == autocompletado.CONTENIDO:
+            sugerencia['url'] = reverse('anime_details', args=[sugerencia['id']])
+        else:
+            sugerencia['url'] = f"{reverse('busqueda')}?{urlencode({'q': sugerencia['texto']})}"
+    respuesta = JsonResponse({'success': True, 'consulta': consulta, 'sugerencias': sugerencias})
+    respuesta['Cache-Control'] = 'public, max-age=60'
+    return respuesta
+
 # VISTA DE ESTADÍSTICAS DEL SISTEMA DE RECOMENDACIONES
 @staff_member_required
 def estadisticas_recomendaciones(request):
@@ -876,19 +811,23 @@ def estadisticas_recomendaciones(request):
     ).filter(total_actividad__gt=0).order_by('-total_actividad')[:10]
     # Contenido más popular
     contenido_popular = Contenido.objects.annotate(
-        total_interacciones=Count('historialreproduccion') + 
-                            Count('calificacion') + 
-                            Count('favorito')
+        total_interacciones=F('estadisticas__total_reproducciones') + 
+                            F('estadisticas__total_calificaciones') + 
+                            F('estadisticas__total_favoritos')
     ).filter(total_interacciones__gt=0).order_by('-total_interacciones')[:10]
     # Categorías más populares
     categorias_populares = Categoria.objects.annotate(
-        total_interacciones=Count('contenidos__historialreproduccion') + 
-                            Count('contenidos__calificacion') + 
-                            Count('contenidos__favorito')
+        total_interacciones=Sum('contenidos__estadisticas__total_reproducciones') + 
+                            Sum('contenidos__estadisticas__total_calificaciones') + 
+                            Sum('contenidos__estadisticas__total_favoritos')
     ).filter(total_interacciones__gt=0).order_by('-total_interacciones')[:10]    # Calificaciones promedio
-    likes = Calificacion.objects.filter(calificacion=5).count()
-    dislikes = Calificacion.objects.filter(calificacion=1).count()
-    neutrales = Calificacion.objects.filter(calificacion__in=[2, 3, 4]).count()
+    totales_calificaciones = EstadisticasContenido.objects.aggregate(
+        likes=Sum('total_likes'),
+        dislikes=Sum('total_dislikes'),
+    )
+    likes = totales_calificaciones['likes'] or 0
+    dislikes = totales_calificaciones['dislikes'] or 0
+    neutrales = total_calificaciones - likes - dislikes
     
     context = {
         'total_usuarios': total_usuarios,
@@ -1003,10 +942,13 @@ def get_user_rating(request, contenido_id):
 
 def get_content_ratings(request, contenido_id):
     """Función para obtener estadísticas de rating de un contenido"""
-    contenido = get_object_or_404(Contenido, pk=contenido_id)
-      # Contar likes (calificación 5) y dislikes (calificación 1)
-    likes = Calificacion.objects.filter(contenido=contenido, calificacion=5).count()
-    dislikes = Calificacion.objects.filter(contenido=contenido, calificacion=1).count()
+    # Contadores desnormalizados de likes (calificación 5) y dislikes (calificación 1)
+    estadisticas = EstadisticasContenido.objects.filter(contenido_id=contenido_id).first()
+    if estadisticas is None:
+        get_object_or_404(Contenido, pk=contenido_id)
+        estadisticas = EstadisticasContenido(contenido_id=contenido_id)
+    likes = estadisticas.total_likes
+    dislikes = estadisticas.total_dislikes
     
     return JsonResponse({
         'success': True, 
@@ -1025,15 +967,13 @@ def recomendaciones_personalizadas(request):
     
     # Obtener recomendaciones personalizadas
     recomendaciones = obtener_recomendaciones_para_perfil(perfil, limite=20)
-      # Obtener categorías favoritas del usuario
-    categorias_usuario = Categoria.objects.filter(
-        Q(contenidos__historialreproduccion__perfil=perfil) |        Q(contenidos__favorito__perfil=perfil) |
-        Q(contenidos__calificacion__perfil=perfil, contenidos__calificacion__calificacion=5)
-    ).annotate(
-        popularidad=Count('contenidos__historialreproduccion') + 
-                   Count('contenidos__favorito') + 
-                   Count('contenidos__calificacion')
-    ).order_by('-popularidad')[:6]
+    # Categorías favoritas del usuario: afinidad guardada, nombres desde el catálogo compacto
+    nombres = obtener_catalogo().nombres_categorias
+    categorias_usuario = []
+    for categoria_id, afinidad in gustos.afinidades(perfil.id, limite=6):
+        categoria = Categoria(id=categoria_id, nombre=nombres.get(categoria_id, ''))
+        categoria.afinidad = afinidad
+        categorias_usuario.append(categoria)
     
     context = {
         'recomendaciones': recomendaciones,
@@ -1135,6 +1075,35 @@ def api_recomendaciones(request):
         'total': len(data)
     })
 
+@login_required
+def api_similar(request, contenido_id):
+    """API "más como este": vecinos por vectores de contenido (manage.py construir_embeddings)"""
+    catalogo = obtener_catalogo()
+    if catalogo.tarjeta(contenido_id) is None:
+        return JsonResponse({'success': False, 'error': 'Contenido no encontrado'}, status=404)
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Límite inválido'}, status=400)
+
+    similares = [catalogo.tarjeta(similar_id, similitud=round(similitud, 4))
+                 for similar_id, similitud in similares_embeddings(contenido_id, limite=limite)]
+    if not similares:
+        # Sin índice construido o contenido aún sin vector: vecinos precalculados o categorías
+        similares = (catalogo.tarjetas(similares_ids(contenido_id, limite=limite))
+                     or similares_por_categorias(contenido_id, limite=limite))
+
+    return JsonResponse({
+        'success': True,
+        'similares': [{
+            'id': contenido.id,
+            'titulo': contenido.titulo,
+            'imagen_url': contenido.imagen_portada.url if contenido.imagen_portada else None,
+            'url_detalle': reverse('anime_details', args=[contenido.id]),
+            'similitud': getattr(contenido, 'similitud', None),
+        } for contenido in similares if contenido is not None],
+    })
+
 # Vista que muestra confirmación de que se envió el email
 def password_reset_done(request):
     return render(request, 'myapp/password_reset_done.html')
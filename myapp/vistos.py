@@ -0,0 +1,118 @@
+"""
+Contenido ya visto por cada perfil
+
+Las recomendaciones excluyen lo que el perfil reprodujo, calificó o marcó
+como favorito. En lugar de tres consultas por estrategia, el conjunto se
+guarda en la cache como un ``array`` de enteros ordenado (8 bytes por id).
+
+La clave incluye la versión del formato y la versión ``perfil:<id>`` (ver
+versiones.py), que sube con cada interacción: una entrada nunca se lee
+después de un cambio que no conoce, aunque venga de otro proceso o de un
+borrado. Al guardar una interacción la señal pasa el conjunto de la versión
+anterior a la nueva añadiendo el contenido (actualización incremental); tras
+un borrado no se pasa y se reconstruye en la siguiente lectura.
+
+Para consultas del ORM ``excluir_vistos`` aplica la exclusión como anti-join
+(``NOT EXISTS``) en lugar de una lista ``id__in`` enorme.
+"""
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from .models import Calificacion, Favorito, HistorialReproduccion
+from .versiones import clave_perfil, obtener_versiones
+
+FORMATO = 1
+MODELOS_INTERACCION = (HistorialReproduccion, Calificacion, Favorito)
+
+
+def _clave(perfil_id: int, version: int) -> str:
+    return f'vistos:v{FORMATO}:{perfil_id}:{version}'
+
+
+def _version(perfil_id: int) -> int:
+    clave = clave_perfil(perfil_id)
+    return obtener_versiones([clave]).get(clave, (0, None))[0]
+
+
+def _ttl() -> int:
+    return getattr(settings, 'VISTOS_TTL', 60 * 60)
+
+
+class ConjuntoVistos:
+    """Ids ordenados y sin repetir con pertenencia por búsqueda binaria"""
+    __slots__ = ('ids',)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.ids = array('q', sorted(set(ids)))
+
+    @classmethod
+    def desde_bytes(cls, datos: bytes) -> 'ConjuntoVistos':
+        conjunto = cls()
+        conjunto.ids.frombytes(datos)
+        return conjunto
+
+    def __contains__(self, contenido_id) -> bool:
+        posicion = bisect_left(self.ids, contenido_id)
+        return posicion < len(self.ids) and self.ids[posicion] == contenido_id
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def agregar(self, contenido_id: int) -> bool:
+        """Insertar manteniendo el orden. Devuelve False si ya estaba"""
+        posicion = bisect_left(self.ids, contenido_id)
+        if posicion < len(self.ids) and self.ids[posicion] == contenido_id:
+            return False
+        self.ids.insert(posicion, contenido_id)
+        return True
+
+
+def _consultar(perfil_id: int) -> ConjuntoVistos:
+    ids = []
+    for modelo in MODELOS_INTERACCION:
+        ids += modelo.objects.filter(perfil_id=perfil_id).values_list('contenido_id', flat=True)
+    return ConjuntoVistos(ids)
+
+
+def obtener_vistos(perfil_id: int) -> ConjuntoVistos:
+    """Conjunto de contenidos vistos del perfil (desde la cache o reconstruido)"""
+    # La versión se lee antes que las interacciones: si cambia entre medias, la entrada queda huérfana
+    clave = _clave(perfil_id, _version(perfil_id))
+    datos = cache.get(clave)
+    if datos is not None:
+        return ConjuntoVistos.desde_bytes(datos)
+    conjunto = _consultar(perfil_id)
+    cache.set(clave, conjunto.ids.tobytes(), _ttl())
+    return conjunto
+
+
+def agregar_visto(perfil_id: int, contenido_id: int, version: int):
+    """
+    Pasar el conjunto cacheado de la versión anterior del perfil a ``version`` con el
+    contenido añadido (si no está en cache se construirá al leerlo)
+    """
+    anterior = _clave(perfil_id, version - 1)
+    datos = cache.get(anterior)
+    if datos is None:
+        return
+    conjunto = ConjuntoVistos.desde_bytes(datos)
+    conjunto.agregar(contenido_id)
+    cache.set(_clave(perfil_id, version), conjunto.ids.tobytes(), _ttl())
+    cache.delete(anterior)
+
+
+def excluir_vistos(queryset, perfil_id: int, campo: str = 'pk'):
+    """Excluir del queryset lo visto por el perfil con NOT EXISTS por cada tipo de interacción"""
+    for modelo in MODELOS_INTERACCION:
+        queryset = queryset.exclude(Exists(
+            modelo.objects.filter(perfil_id=perfil_id, contenido_id=OuterRef(campo))
+        ))
+    return queryset
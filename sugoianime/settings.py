@@ -143,6 +143,97 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 LOGIN_URL = '/login/'
 
+# Cache en disco, compartida por todos los procesos del servidor y los comandos de manage.py
+# (estantes, tendencias y sus marcas de invalidación se escriben desde los comandos y las señales)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+METRICAS_VOLCADO_SEGUNDOS = 5  # Cada cuánto suma cada proceso sus contadores de métricas a la cache (ver metricas.py)
+
+# Estantes precalculados de la página principal
+ESTANTES_TTL = 15 * 60  # Reconstrucción completa como máximo cada 15 minutos
+ESTANTES_REFRESCO_MINIMO = 60  # Segundos mínimos entre reconstrucciones tras una escritura
+TENDENCIAS_TTL = 30 * 60  # Antigüedad a partir de la cual un proceso recalcula el mapeo término -> contenidos (manage.py calcular_tendencias)
+INDEX_CONCURRENCIA = 4  # Tareas simultáneas por petición en la página principal asíncrona
+CATALOGO_VERIFICACION_SEGUNDOS = 5  # Cada cuánto se comprueba la versión del catálogo compacto y sus bitmaps
+MUESTREO_ROTACION_SEGUNDOS = 15 * 60  # Cada cuánto se vuelven a barajar los pools de ids aleatorios
+VISTOS_TTL = 60 * 60  # Conjunto de contenido visto por perfil (se actualiza también desde las señales)
+
+# Puntuación de popularidad (manage.py calcular_popularidad)
+POPULARIDAD_VIDA_MEDIA_DIAS = 14  # Un evento pesa la mitad cada 14 días
+POPULARIDAD_PESOS = {
+    'reproducciones': 0.35,
+    'favoritos': 0.10,
+    'calificaciones': 0.25,
+    'anilist_score': 0.20,
+    'anilist_popularidad': 0.10,
+}
+
+# Vecinos item-item precalculados (manage.py calcular_similitudes)
+SIMILITUD_VECINOS = 20
+SIMILITUD_PESOS = {
+    'categorias': 0.6,  # Coseno sobre categorías compartidas
+    'coconsumo': 0.4,  # Coseno sobre perfiles que vieron, guardaron o calificaron 4+ ambos
+}
+
+# Búsqueda (ver buscador.py, manage.py reconstruir_busqueda)
+BUSQUEDA_BACKEND = 'fts5'  # 'fts5' (SQLite, BM25 con prefijos), 'trigramas' (sin acentos y aproximada) o 'basico' (icontains)
+BUSQUEDA_LIMITE = 50
+BUSQUEDA_CACHE_ENTRADAS = 1000  # Términos con resultados cacheados por proceso (LRU, ver cache_busqueda.py)
+BUSQUEDA_CACHE_ESPERA_SEGUNDOS = 5  # Espera máxima por la misma búsqueda en curso en otra petición
+
+# Historial y auditoría de búsquedas escritos en lote por un hilo (ver telemetria.py)
+TELEMETRIA_ASINCRONA = True  # False: se escribe dentro de la petición (las pruebas lo desactivan con override_settings)
+TELEMETRIA_LOTE = 200
+TELEMETRIA_INTERVALO_SEGUNDOS = 2.0
+TELEMETRIA_MAX_PENDIENTES = 10000  # Objetos en espera; a partir de ahí las búsquedas no se registran
+AUTOCOMPLETADO_REFRESCO_SEGUNDOS = 300  # Reconstrucción periódica para recoger las búsquedas recientes
+AUTOCOMPLETADO_PESO_BUSQUEDAS = 1.0  # Peso de la frecuencia en HistorialBusqueda frente a la popularidad
+
+# Vectores de contenido e índice IVF para "más como este" (manage.py construir_embeddings)
+EMBEDDINGS_DIR = os.path.join(BASE_DIR, 'modelos', 'embeddings')  # Matriz .npy abierta con mmap
+EMBEDDINGS_DIMENSION_TEXTO = 64  # Proyección aleatoria del TF-IDF de título y descripción
+EMBEDDINGS_VOCABULARIO = 20000
+EMBEDDINGS_SONDEOS = 8  # Listas del IVF recorridas por consulta (más = mejor recall, más lento)
+EMBEDDINGS_PESOS = {
+    'texto': 0.55,
+    'categorias': 0.4,
+    'metricas': 0.05,  # Puntuación y popularidad de AniList
+}
+
+# Filtrado colaborativo (manage.py entrenar_recomendador)
+RECOMENDADOR_DIR = os.path.join(BASE_DIR, 'modelos', 'als')  # Factores .npy abiertos con mmap
+RECOMENDADOR_PESOS = {
+    'reproduccion': 1.0,
+    'favorito': 3.0,
+    'calificacion_positiva': 2.0,  # Calificaciones de 4 o 5 estrellas
+}
+
+# Cache de recomendaciones por perfil (ver cache_recomendaciones.py)
+RECOMENDACIONES_TTL = 30 * 60
+RECOMENDACIONES_CANDIDATOS = 40  # Lista ordenada guardada por perfil; cada petición sirve una muestra
+RECOMENDACIONES_EVENTOS_REFRESCO = 5  # Interacciones del perfil antes de recalcular la lista
+# Generadores del pipeline ejecutados a la vez, en hilos con su propia conexión (1 con SQLite en memoria)
+RECOMENDACIONES_CONCURRENCIA = 1
+RECOMENDACIONES_PIPELINE_LENTO_MS = 200  # Registrar el desglose por etapa de las ejecuciones más lentas
+PRECALCULO_PROCESOS = 4  # Procesos de manage.py precalcular_recomendaciones (1 = sin pool)
+PRECALCULO_VIGENCIA = 24 * 60 * 60  # Segundos que se usa una lista precalculada si el perfil no cambia
+
+# Afinidad de cada perfil por categoría (ver gustos.py, manage.py reconstruir_gustos)
+GUSTOS_VIDA_MEDIA_DIAS = 30  # Una interacción pesa la mitad cada 30 días
+GUSTOS_PESOS = {
+    'reproduccion': 1.0,
+    'favorito': 3.0,
+    'calificacion': 1.0,  # Por estrella sobre 3: 5 estrellas suman 2, 1 estrella resta 2
+}
+
 # Configuración para enviar emails
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' 
 # Cambiar a 'django.core.mail.backends.smtp.EmailBackend' en producción